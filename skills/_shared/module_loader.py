@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按文件路径加载其他技能中的模块
+
+技能目录名带连字符、也不在 sys.path 上，跨技能复用代码时按文件路径加载。
+调用方通过 runpy 取得 load_module，本文件自身不登记到 sys.modules：
+
+    load_module = runpy.run_path(os.path.join(SKILLS_DIR, "_shared", "module_loader.py"))["load_module"]
+"""
+
+import os
+import sys
+import importlib.util
+
+
+def load_module(name: str, path: str):
+    """
+    按文件路径加载模块并登记为 sys.modules[name]
+
+    - 同一文件已登记过时直接复用，每个文件只执行一次
+    - 模块名已被其他文件占用时抛出ImportError，不替换已有模块
+    - 执行失败时撤销登记，不留下半初始化的模块
+
+    Raises:
+        ImportError: 文件不存在、无法加载或模块名被占用
+    """
+    path = os.path.abspath(path)
+    existing = sys.modules.get(name)
+    if existing is not None:
+        if os.path.abspath(getattr(existing, '__file__', '') or '') == path:
+            return existing
+        raise ImportError(f"模块名 {name} 已被占用: {getattr(existing, '__file__', existing)}")
+
+    spec = importlib.util.spec_from_file_location(name, path)
+    if spec is None or not os.path.exists(path):
+        raise ImportError(f"无法加载模块 {name}: {path}")
+    module = importlib.util.module_from_spec(spec)
+    # 先登记再执行：模块内的 dataclass 等按 sys.modules[__name__] 查找自身
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        sys.modules.pop(name, None)
+        raise
+    return module
@@ -8,6 +8,9 @@ import json
 import time
 import uuid
 import hashlib
+import math
+import bisect
+import threading
 from dataclasses import dataclass, field, asdict
 from typing import Dict, List, Any, Optional, Callable, Union
 from datetime import datetime, timedelta
@@ -59,6 +62,26 @@ class Service:
         self.status = "healthy"
         self.last_health_check = 0
         self.failure_count = 0
+        self.success_count = 0
+        self.healthy_since = 0.0  # 最近一次恢复健康的时间，用于慢启动
+
+        # 被动异常检测状态
+        self.consecutive_errors = 0
+        self.ejected_until = 0.0
+        self.ejection_count = 0
+
+        # 负载状态
+        self.outstanding = 0
+        self.ewma_latency = 0.0
+        self.ewma_updated = 0.0
+
+    def is_ejected(self, now: float = None) -> bool:
+        """是否处于被驱逐状态"""
+        return self.ejected_until > (now if now is not None else time.time())
+
+    def is_available(self, now: float = None) -> bool:
+        """是否可以接收流量"""
+        return self.status == "healthy" and not self.is_ejected(now)
 
 
 @dataclass
@@ -176,19 +199,41 @@ class AuthManager:
 
 
 class LoadBalancer:
-    """负载均衡器"""
-
-    def __init__(self, strategy: str = "round_robin"):
+    """负载均衡器 - 支持被动异常驱逐、慢启动和按负载选择"""
+
+    def __init__(self, strategy: str = "round_robin",
+                 consecutive_errors: int = 5,
+                 base_ejection_time: float = 30.0,
+                 max_ejection_percent: int = 50,
+                 slow_start_window: float = 0.0,
+                 ewma_decay: float = 10.0,
+                 max_ejection_time: float = 300.0):
         self.strategy = strategy
         self.current_index = 0
 
+        # 被动异常检测：连续5xx/超时达到阈值后驱逐，驱逐时长随次数递增（不超过max_ejection_time）；
+        # 恢复后每正常运行一个base_ejection_time，驱逐次数减一
+        self.consecutive_errors = consecutive_errors
+        self.base_ejection_time = base_ejection_time
+        self.max_ejection_time = max_ejection_time
+        self.max_ejection_percent = max_ejection_percent
+
+        # 慢启动：实例恢复后在窗口内线性提升权重
+        self.slow_start_window = slow_start_window
+
+        # peak EWMA 衰减时间常数（秒）
+        self.ewma_decay = ewma_decay
+
+        self._lock = threading.Lock()
+
     def select(self, services: List[Service]) -> Optional[Service]:
         """选择服务实例"""
         if not services:
             return None
 
-        # 过滤健康的服务
-        healthy_services = [s for s in services if s.status == "healthy"]
+        # 过滤健康且未被驱逐的服务
+        now = time.time()
+        healthy_services = [s for s in services if s.is_available(now)]
 
         if not healthy_services:
             return None
@@ -198,7 +243,11 @@ class LoadBalancer:
         elif self.strategy == "random":
             return self._random(healthy_services)
         elif self.strategy == "weighted":
-            return self._weighted(healthy_services)
+            return self._weighted(healthy_services, now)
+        elif self.strategy == "least_outstanding":
+            return self._least_outstanding(healthy_services, now)
+        elif self.strategy == "peak_ewma":
+            return self._peak_ewma(healthy_services, now)
         else:
             return healthy_services[0]
 
@@ -213,83 +262,503 @@ class LoadBalancer:
         import random
         return random.choice(services)
 
-    def _weighted(self, services: List[Service]) -> Service:
+    def _weighted(self, services: List[Service], now: float) -> Service:
         """加权算法"""
         import random
 
+        weights = [self.effective_weight(s, now) for s in services]
+
         # 计算总权重
-        total_weight = sum(s.weight for s in services)
+        total_weight = sum(weights)
 
         # 随机选择
         rand = random.uniform(0, total_weight)
         current = 0
 
-        for service in services:
-            current += service.weight
+        for service, weight in zip(services, weights):
+            current += weight
             if rand <= current:
                 return service
 
         return services[-1]
 
+    def _least_outstanding(self, services: List[Service], now: float) -> Service:
+        """最少在途请求算法（按有效权重归一化）"""
+        return min(
+            services,
+            key=lambda s: (s.outstanding + 1) / self.effective_weight(s, now)
+        )
+
+    def _peak_ewma(self, services: List[Service], now: float) -> Service:
+        """Peak EWMA算法 - 延迟估计 × 在途请求数"""
+        def cost(service: Service) -> float:
+            latency = self._decayed_latency(service, now)
+            return latency * (service.outstanding + 1) / self.effective_weight(service, now)
+
+        return min(services, key=cost)
+
+    def _decayed_latency(self, service: Service, now: float) -> float:
+        """随时间衰减后的延迟估计"""
+        if service.ewma_updated == 0:
+            return 0.0
+        elapsed = max(0.0, now - service.ewma_updated)
+        return service.ewma_latency * math.exp(-elapsed / self.ewma_decay)
+
+    def effective_weight(self, service: Service, now: float = None) -> float:
+        """考虑慢启动后的有效权重"""
+        weight = max(service.weight, 1)
+        if self.slow_start_window <= 0 or not service.healthy_since:
+            return weight
+
+        now = now if now is not None else time.time()
+        progress = (now - service.healthy_since) / self.slow_start_window
+        if progress >= 1:
+            return weight
+
+        # 至少保留10%的权重，避免实例完全无流量而无法预热
+        return weight * max(progress, 0.1)
+
+    def on_request_start(self, service: Service):
+        """请求开始"""
+        with self._lock:
+            service.outstanding += 1
+
+    def on_request_end(self, service: Service, latency: float,
+                       status_code: int = 200, timeout: bool = False,
+                       pool: List[Service] = None):
+        """请求结束 - 更新负载估计并执行被动异常检测"""
+        now = time.time()
+
+        with self._lock:
+            service.outstanding = max(0, service.outstanding - 1)
+
+            # peak EWMA：延迟高于估计值时直接取峰值，否则按时间衰减平滑
+            if latency > service.ewma_latency or service.ewma_updated == 0:
+                service.ewma_latency = latency
+            else:
+                elapsed = max(0.0, now - service.ewma_updated)
+                alpha = 1 - math.exp(-elapsed / self.ewma_decay)
+                service.ewma_latency += alpha * (latency - service.ewma_latency)
+            service.ewma_updated = now
+
+            if timeout or status_code >= 500:
+                service.consecutive_errors += 1
+                if service.consecutive_errors >= self.consecutive_errors:
+                    self._eject(service, now, pool)
+            else:
+                service.consecutive_errors = 0
+
+    def _eject(self, service: Service, now: float, pool: List[Service] = None):
+        """驱逐异常实例"""
+        if service.is_ejected(now):
+            return
+
+        # 限制同时被驱逐的实例比例，避免整个服务不可用
+        if pool:
+            ejected = sum(1 for s in pool if s.is_ejected(now))
+            if (ejected + 1) * 100 > self.max_ejection_percent * len(pool):
+                return
+
+        if service.ejection_count and self.base_ejection_time > 0:
+            # 上次驱逐结束后正常运行的时长按base_ejection_time抵扣驱逐次数
+            recovered = int((now - service.ejected_until) // self.base_ejection_time)
+            service.ejection_count = max(0, service.ejection_count - recovered)
+
+        service.ejection_count += 1
+        service.ejected_until = now + min(self.base_ejection_time * service.ejection_count,
+                                          self.max_ejection_time)
+        service.consecutive_errors = 0
+        # 驱逐结束后重新慢启动
+        service.healthy_since = service.ejected_until
+
+
+class HealthChecker:
+    """主动健康检查 - 后台线程按服务的检查间隔发起探测"""
+
+    def __init__(self, services: Dict[str, List[Service]],
+                 probe: Callable[[Service], bool] = None,
+                 healthy_threshold: int = 2,
+                 unhealthy_threshold: int = 3,
+                 timeout: float = 2.0,
+                 max_workers: int = 8):
+        self.services = services
+        self.probe = probe or self._http_probe
+        self.healthy_threshold = healthy_threshold
+        self.unhealthy_threshold = unhealthy_threshold
+        self.timeout = timeout
+        self.max_workers = max_workers
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _http_probe(self, service: Service) -> bool:
+        """默认HTTP探测：返回2xx视为健康"""
+        import urllib.request
+
+        url = service.url.rstrip("/") + service.health_check_url
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                return 200 <= response.status < 300
+        except Exception:
+            return False
+
+    def _apply(self, service: Service, ok: bool, now: float):
+        """根据探测结果更新服务状态"""
+        service.last_health_check = now
+
+        if ok:
+            service.failure_count = 0
+            service.success_count += 1
+            if service.status != "healthy" and service.success_count >= self.healthy_threshold:
+                service.status = "healthy"
+                service.healthy_since = now
+        else:
+            service.success_count = 0
+            service.failure_count += 1
+            if service.status == "healthy" and service.failure_count >= self.unhealthy_threshold:
+                service.status = "unhealthy"
+
+    def _due_services(self, now: float) -> List[Service]:
+        """获取需要检查的服务实例"""
+        return [
+            s for service_list in list(self.services.values()) for s in service_list
+            if now - s.last_health_check >= s.health_check_interval
+        ]
+
+    def check_once(self, force: bool = False) -> int:
+        """执行一轮健康检查，返回探测的实例数"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        now = time.time()
+        if force:
+            due = [s for service_list in list(self.services.values()) for s in service_list]
+        else:
+            due = self._due_services(now)
+
+        if not due:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(due))) as executor:
+            results = list(executor.map(self.probe, due))
+
+        now = time.time()
+        for service, ok in zip(due, results):
+            self._apply(service, ok, now)
+
+        return len(due)
+
+    def _run(self, tick: float):
+        while not self._stop_event.is_set():
+            self.check_once()
+            self._stop_event.wait(tick)
+
+    def start(self, tick: float = 1.0):
+        """启动后台健康检查"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(tick,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台健康检查"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+class LatencyHistogram:
+    """对数分桶延迟直方图 - 固定内存，分位数相对误差不超过relative_error，可合并"""
+
+    def __init__(self, min_value: float = 1e-5, max_value: float = 120.0,
+                 relative_error: float = 0.01):
+        if min_value <= 0 or max_value <= min_value:
+            raise ValueError("需要 0 < min_value < max_value")
+        if not 0 < relative_error < 1:
+            raise ValueError("relative_error 必须在 (0, 1) 之间")
+
+        self.min_value = min_value
+        self.max_value = max_value
+        self.relative_error = relative_error
+
+        # 桶 i 覆盖 (min_value * gamma^(i-1), min_value * gamma^i]
+        self._gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self._gamma)
+        self._bucket_count = int(math.ceil(math.log(max_value / min_value) / self._log_gamma)) + 1
+
+        self.counts: List[int] = [0] * self._bucket_count
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _index(self, value: float) -> int:
+        """计算数值所在的桶"""
+        if value <= self.min_value:
+            return 0
+        index = int(math.ceil(math.log(value / self.min_value) / self._log_gamma))
+        return min(index, self._bucket_count - 1)
+
+    def _bucket_value(self, index: int) -> float:
+        """桶的代表值（相对误差最小的点）"""
+        if index == 0:
+            return self.min_value
+        return 2 * self.min_value * self._gamma ** index / (self._gamma + 1)
+
+    def record(self, value: float, count: int = 1):
+        """记录一个样本"""
+        self.counts[self._index(value)] += count
+        self.count += count
+        self.sum += value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> float:
+        """获取分位数（q 取值 0-1）"""
+        if self.count == 0:
+            return 0.0
+
+        rank = max(1, int(math.ceil(q * self.count)))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(max(self._bucket_value(index), self.min), self.max)
+
+        return self.max
+
+    def mean(self) -> float:
+        """平均值"""
+        return self.sum / self.count if self.count else 0.0
+
+    def compatible(self, other: "LatencyHistogram") -> bool:
+        """检查两个直方图的分桶布局是否一致"""
+        return (self.min_value == other.min_value and
+                self.max_value == other.max_value and
+                self.relative_error == other.relative_error)
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """合并另一个直方图到当前直方图"""
+        if not self.compatible(other):
+            raise ValueError("直方图分桶布局不一致，无法合并")
+
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def copy(self) -> "LatencyHistogram":
+        """复制直方图"""
+        clone = self.empty_like()
+        clone.merge(self)
+        return clone
+
+    def empty_like(self) -> "LatencyHistogram":
+        """创建布局相同的空直方图"""
+        return LatencyHistogram(self.min_value, self.max_value, self.relative_error)
+
+    def reset(self):
+        """清空直方图"""
+        self.counts = [0] * self._bucket_count
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+
+class WindowedHistogram:
+    """滑动窗口直方图 - 按时间片轮转子直方图，窗口外的样本自动过期"""
+
+    def __init__(self, window: float = 60.0, slots: int = 6,
+                 clock: Callable[[], float] = time.monotonic, **histogram_options):
+        if slots < 1:
+            raise ValueError("slots 至少为 1")
+
+        self.window = window
+        self.slot_duration = window / slots
+        self.clock = clock
+        self._slots = [LatencyHistogram(**histogram_options) for _ in range(slots)]
+        self._epochs = [-1] * slots
+
+    def _epoch(self) -> int:
+        return int(self.clock() // self.slot_duration)
+
+    def record(self, value: float):
+        """记录样本到当前时间片"""
+        epoch = self._epoch()
+        index = epoch % len(self._slots)
+        if self._epochs[index] != epoch:
+            # 时间片已过期，轮转复用
+            self._slots[index].reset()
+            self._epochs[index] = epoch
+        self._slots[index].record(value)
+
+    def snapshot(self) -> LatencyHistogram:
+        """合并窗口内所有时间片，返回独立的直方图快照"""
+        oldest = self._epoch() - len(self._slots)
+        merged = self._slots[0].empty_like()
+        for epoch, histogram in zip(self._epochs, self._slots):
+            if epoch > oldest:
+                merged.merge(histogram)
+        return merged
+
+
+# Prometheus 默认的直方图边界（秒）
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _status_class(status_code: int) -> str:
+    """状态码分类，如 200 -> 2xx"""
+    return f"{status_code // 100}xx"
+
+
+def _escape_label(value: str) -> str:
+    """转义Prometheus标签值"""
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
 
 class MetricsCollector:
-    """指标收集器"""
+    """指标收集器 - 按路由和状态类别维护窗口直方图与累计计数"""
+
+    def __init__(self, window: float = 60.0, window_slots: int = 6,
+                 buckets: tuple = DEFAULT_LATENCY_BUCKETS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.window_slots = window_slots
+        self.buckets = tuple(sorted(buckets))
+        self.clock = clock
 
-    def __init__(self):
         self.requests: Dict[str, int] = defaultdict(int)
         self.errors: Dict[str, int] = defaultdict(int)
-        self.latency: Dict[str, List[float]] = defaultdict(list)
         self.status_codes: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
 
-    def record_request(self, route: str, status_code: int, latency: float):
-        """记录请求"""
-        key = f"{route}"
-        self.requests[key] += 1
+        # {route: {status_class: WindowedHistogram}} 用于窗口分位数
+        self.latency: Dict[str, Dict[str, WindowedHistogram]] = defaultdict(dict)
 
-        if status_code >= 400:
-            self.errors[key] += 1
+        # {(route, status_class): [count, ...]} 累计直方图，用于Prometheus导出
+        self._bucket_counts: Dict[tuple, List[int]] = {}
+        self._latency_sum: Dict[tuple, float] = defaultdict(float)
+        self._latency_count: Dict[tuple, int] = defaultdict(int)
 
-        self.latency[key].append(latency)
+        self._lock = threading.Lock()
 
-        # 保持最近1000条记录
-        if len(self.latency[key]) > 1000:
-            self.latency[key] = self.latency[key][-1000:]
-
-        self.status_codes[key][status_code] += 1
+    def record_request(self, route: str, status_code: int, latency: float):
+        """记录请求"""
+        key = f"{route}"
+        status_class = _status_class(status_code)
+        series = (key, status_class)
+
+        with self._lock:
+            self.requests[key] += 1
+
+            if status_code >= 400:
+                self.errors[key] += 1
+
+            self.status_codes[key][status_code] += 1
+
+            histogram = self.latency[key].get(status_class)
+            if histogram is None:
+                histogram = WindowedHistogram(self.window, self.window_slots, self.clock)
+                self.latency[key][status_class] = histogram
+            histogram.record(latency)
+
+            counts = self._bucket_counts.get(series)
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+                self._bucket_counts[series] = counts
+            counts[bisect.bisect_left(self.buckets, latency)] += 1
+            self._latency_sum[series] += latency
+            self._latency_count[series] += 1
+
+    def snapshot(self, route: str, status_class: str = None) -> LatencyHistogram:
+        """获取路由（可选状态类别）在当前窗口内的合并直方图"""
+        with self._lock:
+            histograms = self.latency.get(route, {})
+            if status_class is not None:
+                selected = [histograms[status_class]] if status_class in histograms else []
+            else:
+                selected = list(histograms.values())
+            snapshots = [h.snapshot() for h in selected]
+
+        if not snapshots:
+            return LatencyHistogram()
+
+        merged = snapshots[0]
+        for other in snapshots[1:]:
+            merged.merge(other)
+        return merged
 
     def get_metrics(self, route: str = None) -> Dict[str, Any]:
         """获取指标"""
         if route:
             key = route
-            metrics = {
+            histogram = self.snapshot(key)
+            return {
                 "requests": self.requests.get(key, 0),
                 "errors": self.errors.get(key, 0),
-                "avg_latency": 0,
-                "p95_latency": 0,
-                "p99_latency": 0,
+                "avg_latency": histogram.mean(),
+                "p50_latency": histogram.percentile(0.50),
+                "p95_latency": histogram.percentile(0.95),
+                "p99_latency": histogram.percentile(0.99),
+                "window_requests": histogram.count,
                 "status_codes": dict(self.status_codes.get(key, {}))
             }
 
-            if self.latency[key]:
-                latencies = sorted(self.latency[key])
-                metrics["avg_latency"] = sum(latencies) / len(latencies)
-                metrics["p95_latency"] = latencies[int(len(latencies) * 0.95)]
-                metrics["p99_latency"] = latencies[int(len(latencies) * 0.99)]
-
-            return metrics
-
         return {
             "total_requests": sum(self.requests.values()),
             "total_errors": sum(self.errors.values()),
             "routes": len(self.requests)
         }
 
+    def render_prometheus(self, prefix: str = "gateway") -> str:
+        """以Prometheus文本格式导出指标"""
+        lines = [
+            f"# HELP {prefix}_requests_total Total requests handled per route and status code.",
+            f"# TYPE {prefix}_requests_total counter",
+        ]
+
+        with self._lock:
+            for route in sorted(self.status_codes):
+                for status_code, count in sorted(self.status_codes[route].items()):
+                    lines.append(
+                        f'{prefix}_requests_total{{route="{_escape_label(route)}",'
+                        f'status="{status_code}"}} {count}'
+                    )
+
+            name = f"{prefix}_request_duration_seconds"
+            lines.append(f"# HELP {name} Request latency per route and status class.")
+            lines.append(f"# TYPE {name} histogram")
+
+            for route, status_class in sorted(self._bucket_counts):
+                series = (route, status_class)
+                labels = f'route="{_escape_label(route)}",status_class="{status_class}"'
+                cumulative = 0
+                counts = self._bucket_counts[series]
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self._latency_count[series]}')
+                lines.append(f"{name}_sum{{{labels}}} {self._latency_sum[series]}")
+                lines.append(f"{name}_count{{{labels}}} {self._latency_count[series]}")
+
+        return "\n".join(lines) + "\n"
+
     def reset(self):
         """重置指标"""
-        self.requests.clear()
-        self.errors.clear()
-        self.latency.clear()
-        self.status_codes.clear()
+        with self._lock:
+            self.requests.clear()
+            self.errors.clear()
+            self.latency.clear()
+            self.status_codes.clear()
+            self._bucket_counts.clear()
+            self._latency_sum.clear()
+            self._latency_count.clear()
 
 
 class APIGateway:
@@ -302,6 +771,10 @@ class APIGateway:
         self.auth_manager = AuthManager()
         self.load_balancer = LoadBalancer(strategy="round_robin")
         self.metrics = MetricsCollector()
+        self.metrics_route: Optional[Route] = None  # Prometheus抓取端点，默认关闭
+        # 上游调用 transport(service, route, request) -> APIResponse，默认模拟返回200
+        self.transport: Callable[[Service, Route, APIRequest], APIResponse] = self._simulated_transport
+        self.health_checker = HealthChecker(self.services)
 
         # 中间件
         self.middleware: List[Callable] = []
@@ -318,6 +791,21 @@ class APIGateway:
         """添加服务"""
         self.services[service.name].append(service)
 
+    def enable_metrics_endpoint(self, path: str = "/metrics", auth_required: bool = True,
+                                rate_limit: int = 100) -> Route:
+        """
+        开启Prometheus指标端点
+
+        端点作为普通路由加入路由表末尾：先添加的同路径用户路由优先匹配，
+        并与其他路由一样经过限流和认证（默认需要API密钥或JWT）
+        """
+        if self.metrics_route is not None:
+            self.routes.remove(self.metrics_route)
+        self.metrics_route = Route(path, "GET", "", "gateway",
+                                   rate_limit=rate_limit, auth_required=auth_required)
+        self.routes.append(self.metrics_route)
+        return self.metrics_route
+
     def find_route(self, path: str, method: str) -> Optional[Route]:
         """查找匹配的路由"""
         for route in self.routes:
@@ -378,20 +866,31 @@ class APIGateway:
                 service=route.service_name
             )
 
-        # 模拟请求转发
-        # 实际实现应该使用requests或aiohttp
-        duration = time.time() - start_time
-
-        response = APIResponse(
-            request_id=request.id,
-            status_code=200,
-            body={"message": "OK", "service": service.name},
-            duration=duration,
-            service=route.service_name
-        )
-
+        # 在途计数覆盖整个上游调用，负载感知策略才能看到并发压力
+        self.load_balancer.on_request_start(service)
+        sent = time.time()
+        status_code, timed_out = 502, False
+        try:
+            response = self.transport(service, route, request)
+            status_code = response.status_code
+        except TimeoutError:
+            status_code, timed_out = 504, True
+            response = APIResponse(status_code=504, body={"error": "Upstream timeout"})
+        except Exception as e:
+            response = APIResponse(status_code=502, body={"error": f"Bad gateway: {e}"})
+        finally:
+            self.load_balancer.on_request_end(service, time.time() - sent, status_code,
+                                              timeout=timed_out, pool=service_list)
+
+        response.request_id = request.id
+        response.duration = time.time() - start_time
+        response.service = route.service_name
         return response
 
+    def _simulated_transport(self, service: Service, route: Route, request: APIRequest) -> APIResponse:
+        """模拟上游调用（实际部署时替换为基于requests或aiohttp的transport）"""
+        return APIResponse(status_code=200, body={"message": "OK", "service": service.name})
+
     def handle_request(self, request: APIRequest, client_id: str = "anonymous") -> APIResponse:
         """处理API请求"""
         start_time = time.time()
@@ -429,6 +928,10 @@ class APIGateway:
                 body={"error": "Unauthorized"}
             )
 
+        # Prometheus指标端点（抓取请求本身不计入指标）
+        if route is self.metrics_route:
+            return self.metrics_response(request)
+
         # 转发请求
         response = self._forward_request(route, request)
 
@@ -438,6 +941,24 @@ class APIGateway:
 
         return response
 
+    def metrics_response(self, request: APIRequest) -> APIResponse:
+        """返回Prometheus文本格式的指标"""
+        return APIResponse(
+            request_id=request.id,
+            status_code=200,
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+            body=self.metrics.render_prometheus(),
+            service="gateway"
+        )
+
+    def start_health_checks(self, tick: float = 1.0):
+        """启动后台主动健康检查"""
+        self.health_checker.start(tick)
+
+    def stop_health_checks(self):
+        """停止后台主动健康检查"""
+        self.health_checker.stop()
+
     def health_check(self) -> Dict[str, Any]:
         """健康检查"""
         now = time.time()
@@ -449,7 +970,8 @@ class APIGateway:
             services_status[service_name] = {
                 "total": len(service_list),
                 "healthy": healthy_count,
-                "unhealthy": len(service_list) - healthy_count
+                "unhealthy": len(service_list) - healthy_count,
+                "ejected": sum(1 for s in service_list if s.is_ejected(now))
             }
 
         return {
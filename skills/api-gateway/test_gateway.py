@@ -15,6 +15,7 @@ from api_gateway import (
     Route, Service, APIRequest, APIResponse,
     RateLimiter, AuthManager, LoadBalancer,
     MetricsCollector, APIGateway,
+    LatencyHistogram, WindowedHistogram, HealthChecker,
     create_cors_middleware, create_logging_middleware,
     create_cache_middleware
 )
@@ -478,6 +479,229 @@ def test_rate_limit_with_burst():
     print("  测试通过!\n")
 
 
+def test_latency_histogram():
+    """测试延迟直方图"""
+    print("测试 13: LatencyHistogram")
+
+    histogram = LatencyHistogram(relative_error=0.01)
+
+    # 1ms - 1000ms 均匀分布
+    for i in range(1, 1001):
+        histogram.record(i / 1000)
+
+    assert histogram.count == 1000
+    assert abs(histogram.mean() - 0.5005) < 1e-9
+    assert abs(histogram.percentile(0.99) - 0.99) / 0.99 <= 0.01
+    assert abs(histogram.percentile(0.50) - 0.5) / 0.5 <= 0.01
+
+    # 合并快照
+    other = LatencyHistogram(relative_error=0.01)
+    for _ in range(1000):
+        other.record(2.0)
+
+    merged = histogram.copy().merge(other)
+    assert merged.count == 2000
+    assert histogram.count == 1000
+    assert abs(merged.percentile(0.99) - 2.0) / 2.0 <= 0.01
+
+    # 布局不一致时拒绝合并
+    try:
+        histogram.merge(LatencyHistogram(relative_error=0.05))
+        assert False
+    except ValueError:
+        pass
+
+    print("  ✓ 分位数误差在1%以内")
+    print("  ✓ 快照合并成功")
+    print("  测试通过!\n")
+
+
+def test_windowed_metrics():
+    """测试窗口轮转和Prometheus导出"""
+    print("测试 14: Windowed Metrics")
+
+    now = [0.0]
+    window = WindowedHistogram(window=60, slots=6, clock=lambda: now[0])
+
+    window.record(0.1)
+    now[0] = 30
+    window.record(0.2)
+    assert window.snapshot().count == 2
+
+    # 第一个样本滑出窗口
+    now[0] = 65
+    assert window.snapshot().count == 1
+
+    now[0] = 200
+    assert window.snapshot().count == 0
+
+    # 路由 + 状态类别
+    collector = MetricsCollector(clock=lambda: now[0])
+    collector.record_request("/api/users", 200, 0.01)
+    collector.record_request("/api/users", 503, 0.2)
+
+    assert collector.snapshot("/api/users", "2xx").count == 1
+    assert collector.snapshot("/api/users").count == 2
+
+    text = collector.render_prometheus()
+    assert '# TYPE gateway_request_duration_seconds histogram' in text
+    assert 'gateway_requests_total{route="/api/users",status="503"} 1' in text
+    assert 'gateway_request_duration_seconds_bucket{route="/api/users",status_class="2xx",le="0.01"} 1' in text
+    assert 'gateway_request_duration_seconds_count{route="/api/users",status_class="5xx"} 1' in text
+
+    # 网关 /metrics 端点：默认关闭，开启后经过路由表与认证
+    gateway = APIGateway()
+    gateway.add_route(Route("/api/test", "GET", "http://test-service", "test"))
+    gateway.add_service(Service("test", "http://test:8001"))
+    gateway.handle_request(APIRequest(path="/api/test", method="GET"))
+    assert gateway.handle_request(APIRequest(path="/metrics", method="GET")).status_code == 404
+
+    gateway.enable_metrics_endpoint()
+    assert gateway.handle_request(APIRequest(path="/metrics", method="GET")).status_code == 401
+
+    api_key = gateway.auth_manager.generate_api_key("prometheus")
+    response = gateway.handle_request(APIRequest(path="/metrics", method="GET", headers={"X-API-Key": api_key}))
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert 'route="/api/test"' in response.body
+
+    # 同路径的用户路由优先于指标端点
+    shadowed = APIGateway()
+    shadowed.add_route(Route("/metrics", "GET", "http://app", "app"))
+    shadowed.add_service(Service("app", "http://app:8001"))
+    shadowed.enable_metrics_endpoint(auth_required=False)
+    assert shadowed.handle_request(APIRequest(path="/metrics", method="GET")).service == "app"
+
+    print("  ✓ 窗口轮转成功")
+    print("  ✓ 状态类别分组成功")
+    print("  ✓ Prometheus导出成功")
+    print("  测试通过!\n")
+
+
+def test_outlier_ejection_and_strategies():
+    """测试异常驱逐和负载感知策略"""
+    print("测试 15: Outlier Ejection")
+
+    services = [
+        Service("users", "http://users1:8001"),
+        Service("users", "http://users2:8001"),
+        Service("users", "http://users3:8001"),
+    ]
+
+    lb = LoadBalancer(strategy="least_outstanding", consecutive_errors=3, base_ejection_time=30)
+
+    # 连续5xx后驱逐
+    for _ in range(3):
+        lb.on_request_start(services[0])
+        lb.on_request_end(services[0], 0.5, status_code=503, pool=services)
+
+    assert services[0].is_ejected()
+    assert services[0].outstanding == 0
+    assert all(lb.select(services) is not services[0] for _ in range(10))
+
+    # 最多驱逐50%的实例
+    for _ in range(3):
+        lb.on_request_end(services[1], 0.5, timeout=True, pool=services)
+    assert not services[1].is_ejected()
+
+    # 最少在途请求
+    lb.on_request_start(services[1])
+    assert lb.select(services) is services[2]
+
+    # peak EWMA 偏向低延迟实例
+    fast = Service("orders", "http://orders1:8001")
+    slow = Service("orders", "http://orders2:8001")
+    ewma = LoadBalancer(strategy="peak_ewma")
+    ewma.on_request_end(fast, 0.01)
+    ewma.on_request_end(slow, 0.5)
+    assert ewma.select([slow, fast]) is fast
+
+    # 驱逐时长不超过上限，恢复正常一段时间后驱逐次数衰减
+    capped = LoadBalancer(consecutive_errors=1, base_ejection_time=30, max_ejection_time=60)
+    flaky = Service("orders", "http://orders4:8001")
+    at = time.time()
+    for _ in range(5):
+        # 每次驱逐一结束就再次触发
+        at = max(at, flaky.ejected_until)
+        capped._eject(flaky, at)
+    assert flaky.ejection_count == 5
+    assert flaky.ejected_until - at == 60
+    capped._eject(flaky, flaky.ejected_until + 95)
+    assert flaky.ejection_count == 3
+
+    # 在途计数覆盖真实的上游调用，上游异常计为5xx参与驱逐
+    gateway = APIGateway()
+    gateway.add_route(Route("/api/orders", "GET", "http://orders", "orders"))
+    upstream = Service("orders", "http://orders5:8001")
+    gateway.add_service(upstream)
+    seen = []
+
+    def transport(service, route, request):
+        seen.append(service.outstanding)
+        if request.headers.get("fail"):
+            raise ConnectionError("refused")
+        return APIResponse(status_code=200, body="ok")
+
+    gateway.transport = transport
+    assert gateway.handle_request(APIRequest(path="/api/orders", method="GET")).status_code == 200
+    assert seen == [1] and upstream.outstanding == 0
+    failed = gateway.handle_request(APIRequest(path="/api/orders", method="GET", headers={"fail": "1"}))
+    assert failed.status_code == 502 and upstream.consecutive_errors == 1
+
+    # 慢启动降低刚恢复实例的权重
+    warm = LoadBalancer(slow_start_window=60)
+    fresh = Service("orders", "http://orders3:8001", weight=100)
+    fresh.healthy_since = time.time()
+    assert warm.effective_weight(fresh) < 20
+
+    print("  ✓ 被动异常驱逐成功")
+    print("  ✓ 驱逐比例限制成功")
+    print("  ✓ least_outstanding / peak_ewma 策略成功")
+    print("  ✓ 慢启动成功")
+    print("  测试通过!\n")
+
+
+def test_active_health_check():
+    """测试主动健康检查"""
+    print("测试 16: Active Health Check")
+
+    gateway = APIGateway()
+    service1 = Service("users", "http://users1:8001")
+    service2 = Service("users", "http://users2:8001")
+    gateway.add_service(service1)
+    gateway.add_service(service2)
+
+    down = {"http://users2:8001"}
+    checker = HealthChecker(
+        gateway.services,
+        probe=lambda s: s.url not in down,
+        healthy_threshold=2,
+        unhealthy_threshold=2
+    )
+
+    checker.check_once(force=True)
+    assert service2.status == "healthy"
+    checker.check_once(force=True)
+    assert service2.status == "unhealthy"
+    assert gateway.load_balancer.select(gateway.services["users"]) is service1
+
+    # 恢复后需要连续成功才重新加入
+    down.clear()
+    checker.check_once(force=True)
+    assert service2.status == "unhealthy"
+    checker.check_once(force=True)
+    assert service2.status == "healthy"
+    assert service2.healthy_since > 0
+
+    # 未到检查间隔时不探测
+    assert checker.check_once() == 0
+
+    print("  ✓ 不健康阈值生效")
+    print("  ✓ 恢复阈值生效")
+    print("  ✓ 检查间隔生效")
+    print("  测试通过!\n")
+
+
 def run_all_tests():
     """运行所有测试"""
     print("=" * 60)
@@ -497,7 +721,11 @@ def run_all_tests():
         test_gateway_statistics,
         test_complex_workflow,
         test_serialization,
-        test_rate_limit_with_burst
+        test_rate_limit_with_burst,
+        test_latency_histogram,
+        test_windowed_metrics,
+        test_outlier_ejection_and_strategies,
+        test_active_health_check
     ]
 
     passed = 0
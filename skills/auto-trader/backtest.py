@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+策略回测引擎
+
+用本地历史K线逐根回放 TradingStrategy：指标与策略逻辑和实盘 on_bar 完全相同，
+收盘产生的信号在下一根K线开盘成交（含滑点与手续费），持仓期间按最高/最低价检查止损止盈；
+参数扫描在多进程中并行执行。
+"""
+
+import math
+import itertools
+import multiprocessing
+from dataclasses import dataclass, field, asdict, replace
+from typing import Any, Callable, Dict, List, Optional
+
+from trader import (
+    TradingStrategy, MarketType, HAS_STREAMING_INDICATORS, FINANCIAL_ANALYZER_PATH,
+    financial_analyzer, create_indicators, build_indicator_data, evaluate_strategy
+)
+
+
+# 参数扫描中直接对应 TradingStrategy 字段的参数，其余参数写入 strategy.params
+STRATEGY_FIELDS = ("position_size", "stop_loss", "take_profit")
+
+# 越小越好的指标（排序时升序）
+ASCENDING_METRICS = ("max_drawdown", "max_drawdown_bars", "total_fees")
+
+
+@dataclass
+class Bars:
+    """按列存储的K线"""
+    dates: List[str]
+    opens: List[float]
+    highs: List[float]
+    lows: List[float]
+    closes: List[float]
+
+    def __len__(self) -> int:
+        return len(self.closes)
+
+    def between(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> "Bars":
+        """截取日期范围（含首尾），日期支持 2025-01-01 / 20250101 两种写法"""
+        start = _date_key(start_date) if start_date else None
+        end = _date_key(end_date) if end_date else None
+        keep = [
+            i for i, date in enumerate(self.dates)
+            if (start is None or _date_key(date) >= start) and (end is None or _date_key(date) <= end)
+        ]
+        if not keep:
+            return Bars([], [], [], [], [])
+        first, last = keep[0], keep[-1] + 1
+        return Bars(
+            self.dates[first:last], self.opens[first:last], self.highs[first:last],
+            self.lows[first:last], self.closes[first:last]
+        )
+
+
+def _date_key(value: str) -> str:
+    return str(value).replace("-", "").replace("/", "")[:8]
+
+
+def load_bars(path: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Bars:
+    """
+    加载历史K线（.csv / .parquet，列名与 financial-analysis 的行情加载器一致）
+
+    Args:
+        path: 行情文件路径
+        start_date: 开始日期
+        end_date: 结束日期
+    """
+    if financial_analyzer is None:
+        raise ImportError(f"无法加载行情读取模块: {FINANCIAL_ANALYZER_PATH}")
+
+    stock = financial_analyzer.OHLCVLoader.load_file(path)
+    bars = Bars(
+        list(stock.dates), list(stock.opens), list(stock.highs), list(stock.lows), list(stock.prices)
+    )
+    return bars.between(start_date, end_date)
+
+
+@dataclass
+class BacktestTrade:
+    """回测中的一笔完整交易（开仓到平仓）"""
+    entry_date: str
+    entry_price: float
+    exit_date: Optional[str]
+    exit_price: Optional[float]
+    quantity: float
+    fees: float
+    pnl: Optional[float]
+    return_percent: Optional[float]
+    exit_reason: Optional[str]
+
+
+@dataclass
+class BacktestResult:
+    """回测结果"""
+    strategy_id: str
+    params: Dict[str, Any]
+    metrics: Dict[str, Any]
+    trades: List[BacktestTrade] = field(default_factory=list)
+    equity_curve: List[float] = field(default_factory=list)
+
+    def to_dict(self, include_curve: bool = False) -> Dict:
+        result = {
+            "strategy_id": self.strategy_id,
+            "params": self.params,
+            "metrics": self.metrics,
+            "trades": [asdict(t) for t in self.trades]
+        }
+        if include_curve:
+            result["equity_curve"] = self.equity_curve
+        return result
+
+
+def calculate_metrics(
+    equity_curve: List[float],
+    trades: List[BacktestTrade],
+    initial_capital: float,
+    periods_per_year: int = 252
+) -> Dict[str, Any]:
+    """
+    计算收益与回撤指标
+
+    Args:
+        equity_curve: 每根K线收盘时的账户总值
+        trades: 交易列表
+        initial_capital: 初始资金
+        periods_per_year: 每年K线数量（日线252，分钟线约 252*240）
+    """
+    final_value = equity_curve[-1] if equity_curve else initial_capital
+    bars = len(equity_curve)
+
+    # 最大回撤及其持续的K线数
+    peak = initial_capital
+    peak_index = -1
+    max_drawdown = 0.0
+    max_drawdown_bars = 0
+    for i, value in enumerate(equity_curve):
+        if value >= peak:
+            peak = value
+            peak_index = i
+        else:
+            max_drawdown = max(max_drawdown, (peak - value) / peak)
+            max_drawdown_bars = max(max_drawdown_bars, i - peak_index)
+
+    # 逐K线收益率的夏普比率（无风险利率按0计）
+    returns = []
+    prev = initial_capital
+    for value in equity_curve:
+        returns.append(value / prev - 1 if prev > 0 else 0.0)
+        prev = value
+    sharpe = 0.0
+    if len(returns) > 1:
+        mean = sum(returns) / len(returns)
+        std = math.sqrt(sum((r - mean) ** 2 for r in returns) / (len(returns) - 1))
+        if std > 0:
+            sharpe = mean / std * math.sqrt(periods_per_year)
+
+    annual_return = 0.0
+    if bars > 0 and final_value > 0:
+        annual_return = ((final_value / initial_capital) ** (periods_per_year / bars) - 1) * 100
+
+    closed = [t for t in trades if t.pnl is not None]
+    wins = [t.pnl for t in closed if t.pnl > 0]
+    losses = [-t.pnl for t in closed if t.pnl <= 0]
+    gross_loss = sum(losses)
+
+    return {
+        "initial_capital": initial_capital,
+        "final_value": round(final_value, 2),
+        "total_profit": round(final_value - initial_capital, 2),
+        "total_return": round((final_value / initial_capital - 1) * 100, 2),
+        "annual_return": round(annual_return, 2),
+        "max_drawdown": round(max_drawdown * 100, 2),
+        "max_drawdown_bars": max_drawdown_bars,
+        "sharpe_ratio": round(sharpe, 2),
+        "total_trades": len(closed),
+        "winning_trades": len(wins),
+        "win_rate": round(len(wins) / len(closed) * 100, 2) if closed else 0,
+        "profit_factor": round(sum(wins) / gross_loss, 2) if gross_loss > 0 else None,
+        "total_fees": round(sum(t.fees for t in trades), 2),
+        "bars": bars
+    }
+
+
+class Backtester:
+    """回测引擎"""
+
+    def __init__(
+        self,
+        initial_capital: float = 100000.0,
+        commission: float = 0.0003,
+        slippage: float = 0.001,
+        min_commission: float = 0.0,
+        lot_size: int = 1,
+        periods_per_year: int = 252
+    ):
+        """
+        初始化回测引擎
+
+        Args:
+            initial_capital: 初始资金
+            commission: 手续费率（按成交金额）
+            slippage: 滑点（买入价上浮、卖出价下浮的比例）
+            min_commission: 单笔最低手续费
+            lot_size: 每手股数（A股为100）
+            periods_per_year: 每年K线数量，用于年化
+        """
+        if not HAS_STREAMING_INDICATORS:
+            raise ImportError(f"无法加载增量指标: {FINANCIAL_ANALYZER_PATH}")
+
+        self.initial_capital = initial_capital
+        self.commission = commission
+        self.slippage = slippage
+        self.min_commission = min_commission
+        self.lot_size = lot_size
+        self.periods_per_year = periods_per_year
+
+    @classmethod
+    def from_config(cls, config: Dict, **kwargs) -> "Backtester":
+        """按 trader.yaml 的交易设置（手续费率、滑点）创建"""
+        trading = (config or {}).get("trading", {})
+        kwargs.setdefault("commission", trading.get("commission", 0.0003))
+        kwargs.setdefault("slippage", trading.get("slippage", 0.001))
+        return cls(**kwargs)
+
+    def _fee(self, amount: float) -> float:
+        return max(amount * self.commission, self.min_commission)
+
+    def run(self, strategy: TradingStrategy, bars: Bars, keep_curve: bool = True) -> BacktestResult:
+        """
+        回测单个策略
+
+        Args:
+            strategy: 交易策略（与实盘使用同一定义）
+            bars: 历史K线
+            keep_curve: 是否保留资金曲线（参数扫描时不保留以减少进程间传输）
+
+        Returns:
+            回测结果
+        """
+        # 以脚本方式运行 trader.py 时，策略的枚举来自 __main__ 模块，按值换成本模块的枚举
+        market_type = MarketType(strategy.type.value)
+        if market_type != MarketType.STOCK:
+            raise ValueError(f"只支持股票策略回测: {market_type.value}")
+        if strategy.type is not market_type:
+            strategy = replace(strategy, type=market_type)
+
+        indicators = create_indicators(strategy, full=False)
+        cash = self.initial_capital
+        position = None  # 当前持仓的 BacktestTrade
+        pending = None   # 上一根K线收盘产生、待本根开盘成交的信号
+        trades: List[BacktestTrade] = []
+        equity_curve: List[float] = []
+
+        def close_position(price: float, date: str, reason: str):
+            nonlocal cash, position
+            amount = price * position.quantity
+            fee = self._fee(amount)
+            cash += amount - fee
+            cost = position.entry_price * position.quantity
+            position.exit_date = date
+            position.exit_price = price
+            position.fees += fee
+            position.pnl = amount - cost - position.fees
+            position.return_percent = round(position.pnl / cost * 100, 2)
+            position.exit_reason = reason
+            position = None
+
+        for i in range(len(bars)):
+            date = bars.dates[i]
+            open_price, high, low, close = bars.opens[i], bars.highs[i], bars.lows[i], bars.closes[i]
+
+            # 1. 上一根的信号在本根开盘成交
+            if pending == "buy" and position is None:
+                price = open_price * (1 + self.slippage)
+                budget = cash * strategy.position_size
+                quantity = int(budget / (price * (1 + self.commission)) / self.lot_size) * self.lot_size
+                if quantity > 0:
+                    fee = self._fee(price * quantity)
+                    cash -= price * quantity + fee
+                    position = BacktestTrade(date, price, None, None, quantity, fee, None, None, None)
+                    trades.append(position)
+            elif pending == "sell" and position is not None:
+                close_position(open_price * (1 - self.slippage), date, "signal")
+            pending = None
+
+            # 2. 止损止盈（同一根K线都触发时按止损处理；跳空时按开盘价成交）
+            if position is not None:
+                entry = position.entry_price
+                if strategy.stop_loss and low <= entry * (1 - strategy.stop_loss):
+                    exit_price = min(open_price, entry * (1 - strategy.stop_loss))
+                    close_position(exit_price * (1 - self.slippage), date, "stop_loss")
+                elif strategy.take_profit and high >= entry * (1 + strategy.take_profit):
+                    exit_price = max(open_price, entry * (1 + strategy.take_profit))
+                    close_position(exit_price * (1 - self.slippage), date, "take_profit")
+
+            # 3. 收盘更新指标并产生信号
+            data = build_indicator_data(strategy, indicators, close, high, low)
+            signal = evaluate_strategy(strategy, data)
+            if signal == "buy" and position is None:
+                pending = "buy"
+            elif signal == "sell" and position is not None:
+                pending = "sell"
+
+            equity_curve.append(cash + (position.quantity * close if position is not None else 0.0))
+
+        metrics = calculate_metrics(equity_curve, trades, self.initial_capital, self.periods_per_year)
+        metrics["open_position"] = position is not None
+
+        return BacktestResult(
+            strategy_id=strategy.strategy_id,
+            params=dict(strategy.params),
+            metrics=metrics,
+            trades=trades,
+            equity_curve=equity_curve if keep_curve else []
+        )
+
+    def sweep(
+        self,
+        strategy: TradingStrategy,
+        bars: Bars,
+        param_grid: Dict[str, List[Any]],
+        workers: Optional[int] = None,
+        sort_by: str = "total_return",
+        top: Optional[int] = None,
+        constraint: Optional[Callable[[Dict], bool]] = None,
+        chunksize: int = 4
+    ) -> List[Dict]:
+        """
+        参数扫描：对参数网格的每个组合回测并按指标排序
+
+        Args:
+            strategy: 基础策略
+            bars: 历史K线
+            param_grid: 参数网格，如 {"short_period": [5, 10], "long_period": [20, 60]}；
+                position_size / stop_loss / take_profit 对应策略字段，其余写入 params
+            workers: 进程数（默认CPU核数，1表示在当前进程执行）
+            sort_by: 排序指标，max_drawdown 等越小越好的指标升序，其余降序
+            top: 只返回前N个组合
+            constraint: 过滤参数组合，如 lambda p: p["short_period"] < p["long_period"]
+            chunksize: 每次分发给子进程的组合数
+
+        Returns:
+            [{"params": 组合, "metrics": 指标}, ...]
+        """
+        keys = list(param_grid)
+        combos = [dict(zip(keys, values)) for values in itertools.product(*(param_grid[k] for k in keys))]
+        if constraint:
+            combos = [c for c in combos if constraint(c)]
+
+        workers = workers or multiprocessing.cpu_count()
+        if workers <= 1 or len(combos) <= 1:
+            _init_sweep(self, strategy, bars)
+            results = [_run_combo(combo) for combo in combos]
+        else:
+            # 回测引擎、策略与K线在每个子进程初始化时传递一次，任务只传参数组合
+            with multiprocessing.Pool(
+                min(workers, len(combos)), initializer=_init_sweep, initargs=(self, strategy, bars)
+            ) as pool:
+                results = list(pool.imap_unordered(_run_combo, combos, chunksize=chunksize))
+
+        reverse = sort_by not in ASCENDING_METRICS
+        missing = -math.inf if reverse else math.inf
+        results.sort(
+            key=lambda r: r["metrics"].get(sort_by) if r["metrics"].get(sort_by) is not None else missing,
+            reverse=reverse
+        )
+        return results[:top] if top else results
+
+
+def strategy_variant(strategy: TradingStrategy, overrides: Dict[str, Any]) -> TradingStrategy:
+    """按参数组合派生策略"""
+    fields = {k: v for k, v in overrides.items() if k in STRATEGY_FIELDS}
+    params = {k: v for k, v in overrides.items() if k not in STRATEGY_FIELDS}
+    return replace(strategy, params={**strategy.params, **params}, **fields)
+
+
+# 参数扫描子进程的共享上下文
+_sweep_context: Dict[str, Any] = {}
+
+
+def _init_sweep(backtester: Backtester, strategy: TradingStrategy, bars: Bars):
+    _sweep_context.update(backtester=backtester, strategy=strategy, bars=bars)
+
+
+def _run_combo(combo: Dict[str, Any]) -> Dict:
+    variant = strategy_variant(_sweep_context["strategy"], combo)
+    result = _sweep_context["backtester"].run(variant, _sweep_context["bars"], keep_curve=False)
+    return {"params": combo, "metrics": result.metrics}
@@ -11,6 +11,7 @@ import time
 from datetime import datetime
 
 from trader import AutoTrader, TradingStrategy, Trade, Account, MarketType, ActionType, TradeStatus
+from backtest import Backtester, Bars, load_bars, strategy_variant
 
 
 class TestAutoTrader(unittest.TestCase):
@@ -186,6 +187,56 @@ class TestAutoTrader(unittest.TestCase):
         signal = self.trader._execute_strategy_logic(strategy, data)
         self.assertEqual(signal, "hold")
 
+    def test_on_bar_streaming_indicators(self):
+        """测试实时行情增量更新指标"""
+        strategy = self.trader.add_strategy(
+            name="ma_cross live",
+            type="stock",
+            symbol="600519.SH",
+            params={"short_period": 3, "long_period": 5},
+            position_size=0.1,
+            stop_loss=0.05,
+            take_profit=0.1
+        )
+
+        # 先跌后涨，短均线上穿长均线时应该产生买入信号
+        prices = [1500, 1490, 1480, 1470, 1460, 1450, 1470, 1500, 1540]
+        signals = [self.trader.on_bar(strategy.strategy_id, {"close": p}) for p in prices]
+
+        self.assertEqual(signals[:5], ["hold"] * 5)  # 预热期
+        self.assertIn("buy", signals)
+        self.assertEqual(self.trader.trades[0].action, ActionType.BUY)
+
+        indicators = self.trader.indicator_states[strategy.strategy_id]
+        self.assertEqual(indicators.bars, len(prices))
+        self.assertAlmostEqual(indicators.values()["sma_3"], sum(prices[-3:]) / 3)
+
+    def test_indicator_state_persistence(self):
+        """测试指标状态快照与恢复"""
+        strategy = self.trader.add_strategy(
+            name="rsi live",
+            type="stock",
+            symbol="600519.SH",
+            params={"rsi_period": 4},
+            position_size=0.1,
+            stop_loss=0.05,
+            take_profit=0.1
+        )
+
+        for price in [100, 101, 103, 102, 104, 106]:
+            self.trader.on_bar(strategy.strategy_id, {"close": price, "high": price + 1, "low": price - 1})
+        self.trader.save_indicator_states()
+
+        # 新实例从数据库恢复后，继续推送应与未中断时结果一致
+        restored = AutoTrader(config_file="config/trader.yaml")
+        restored.load_strategies_from_db()
+        before = self.trader.indicator_states[strategy.strategy_id]
+        after = restored.indicator_states[strategy.strategy_id]
+        self.assertEqual(after.values(), before.values())
+
+        self.assertEqual(after.update(99), before.update(99))
+        restored.db_conn.close()
+
     def test_execute_trade_buy(self):
         """测试执行买入交易"""
         strategy = self.trader.add_strategy(
@@ -411,6 +462,97 @@ class TestAutoTrader(unittest.TestCase):
         self.assertFalse(self.trader.is_running)
 
 
+class TestBacktester(unittest.TestCase):
+    """测试回测引擎"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        # 先跌后涨再跌：均线先金叉后死叉
+        closes = [100 - i for i in range(10)] + [91 + 2 * i for i in range(10)] + [109 - 3 * i for i in range(10)]
+        self.bars = Bars(
+            dates=[f"2025-01-{i + 1:02d}" for i in range(len(closes))],
+            opens=list(closes),
+            highs=[c + 0.5 for c in closes],
+            lows=[c - 0.5 for c in closes],
+            closes=list(closes)
+        )
+        self.strategy = TradingStrategy(
+            strategy_id="bt", name="ma_cross", type=MarketType.STOCK, symbol="600519.SH",
+            params={"short_period": 3, "long_period": 5},
+            position_size=0.5, stop_loss=0.0, take_profit=0.0, enabled=True
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_run_fills_and_fees(self):
+        """测试信号次日开盘成交、滑点与手续费"""
+        backtester = Backtester(commission=0.001, slippage=0.01)
+        result = backtester.run(self.strategy, self.bars)
+
+        self.assertEqual(result.metrics["total_trades"], 1)
+        trade = result.trades[0]
+        self.assertEqual(trade.exit_reason, "signal")
+
+        # 收盘出现信号，下一根开盘按滑点成交
+        entry_index = self.bars.dates.index(trade.entry_date)
+        self.assertAlmostEqual(trade.entry_price, self.bars.opens[entry_index] * 1.01)
+        exit_index = self.bars.dates.index(trade.exit_date)
+        self.assertAlmostEqual(trade.exit_price, self.bars.opens[exit_index] * 0.99)
+
+        fees = (trade.entry_price + trade.exit_price) * trade.quantity * 0.001
+        self.assertAlmostEqual(trade.fees, fees)
+        expected = (trade.exit_price - trade.entry_price) * trade.quantity - fees
+        self.assertAlmostEqual(trade.pnl, expected)
+        self.assertAlmostEqual(result.metrics["final_value"], round(100000 + expected, 2))
+        self.assertEqual(len(result.equity_curve), len(self.bars))
+
+    def test_stop_loss_and_drawdown(self):
+        """测试止损与最大回撤"""
+        # 开仓后某根K线盘中急跌
+        self.bars.lows[16] = 90
+        strategy = strategy_variant(self.strategy, {"stop_loss": 0.02})
+        result = Backtester(commission=0, slippage=0).run(strategy, self.bars)
+
+        stopped = result.trades[0]
+        self.assertEqual(stopped.exit_reason, "stop_loss")
+        self.assertEqual(stopped.exit_date, self.bars.dates[16])
+        self.assertAlmostEqual(stopped.exit_price, stopped.entry_price * 0.98)
+        self.assertLess(stopped.pnl, 0)
+        self.assertGreater(result.metrics["max_drawdown"], 0)
+
+    def test_parameter_sweep(self):
+        """测试并行参数扫描"""
+        grid = {"short_period": [2, 3, 4], "long_period": [4, 5, 6], "position_size": [0.2, 0.5]}
+        results = Backtester().sweep(
+            self.strategy, self.bars, grid, workers=2,
+            constraint=lambda p: p["short_period"] < p["long_period"]
+        )
+
+        self.assertEqual(len(results), 16)
+        returns = [r["metrics"]["total_return"] for r in results]
+        self.assertEqual(returns, sorted(returns, reverse=True))
+
+        best = Backtester().sweep(self.strategy, self.bars, grid, workers=1, sort_by="max_drawdown", top=3)
+        self.assertEqual(len(best), 3)
+        self.assertLessEqual(best[0]["metrics"]["max_drawdown"], best[-1]["metrics"]["max_drawdown"])
+
+    def test_load_bars(self):
+        """测试从文件加载K线"""
+        path = os.path.join(self.test_dir, "600519.SH.csv")
+        with open(path, "w") as f:
+            f.write("trade_date,open,high,low,close,vol\n")
+            # 降序存储
+            for i in reversed(range(len(self.bars))):
+                f.write(f"{self.bars.dates[i].replace('-', '')},{self.bars.opens[i]},{self.bars.highs[i]},"
+                        f"{self.bars.lows[i]},{self.bars.closes[i]},1000\n")
+
+        bars = load_bars(path, start_date="2025-01-05", end_date="2025-01-20")
+        self.assertEqual(len(bars), 16)
+        self.assertEqual(bars.dates[0], "20250105")
+        self.assertEqual(bars.closes, self.bars.closes[4:20])
+
+
 def run_tests():
     """运行所有测试"""
     # 创建测试套件
@@ -419,6 +561,7 @@ def run_tests():
 
     # 添加所有测试类
     suite.addTests(loader.loadTestsFromTestCase(TestAutoTrader))
+    suite.addTests(loader.loadTestsFromTestCase(TestBacktester))
 
     # 运行测试
     runner = unittest.TextTestRunner(verbosity=2)
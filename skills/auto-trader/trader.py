@@ -4,12 +4,14 @@
 支持多市场交易、策略回测、自动下单
 """
 
+import os
 import json
 import yaml
 import logging
 import sqlite3
 import time
 import threading
+import runpy
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass, asdict
@@ -19,6 +21,21 @@ import random
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+SKILLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+load_module = runpy.run_path(os.path.join(SKILLS_DIR, "_shared", "module_loader.py"))["load_module"]
+
+# 增量技术指标来自同仓库的 financial-analysis 技能
+FINANCIAL_ANALYZER_PATH = os.path.join(SKILLS_DIR, "financial-analysis", "financial-analyzer.py")
+
+try:
+    financial_analyzer = load_module("financial_analyzer", FINANCIAL_ANALYZER_PATH)
+    StreamingIndicators = financial_analyzer.StreamingIndicators
+    HAS_STREAMING_INDICATORS = True
+except (OSError, ImportError, AttributeError):
+    financial_analyzer = None
+    StreamingIndicators = None
+    HAS_STREAMING_INDICATORS = False
+
 
 class MarketType(Enum):
     """市场类型"""
@@ -84,6 +101,132 @@ class Account:
     profit_percent: float
 
 
+def create_indicators(strategy: TradingStrategy, full: bool = True):
+    """
+    按策略参数创建增量指标
+
+    Args:
+        strategy: 交易策略
+        full: 是否计算全部指标；为False时只保留策略逻辑用到的指标（回测时使用）
+    """
+    params = strategy.params
+    sma_periods = (params.get("short_period", 5), params.get("long_period", 20))
+    rsi_period = params.get("rsi_period", 14)
+    if full:
+        return StreamingIndicators(sma_periods=sma_periods, rsi_period=rsi_period)
+
+    name = strategy.name.lower()
+    return StreamingIndicators(
+        sma_periods=sma_periods if "ma_cross" in name else (),
+        ema_period=None,
+        rsi_period=rsi_period if "rsi" in name else None,
+        macd=(12, 26, 9) if "macd" in name else None,
+        kdj_period=None,
+        boll=None
+    )
+
+
+def build_indicator_data(
+    strategy: TradingStrategy,
+    indicators,
+    price: float,
+    high: Optional[float] = None,
+    low: Optional[float] = None
+) -> Dict:
+    """
+    用一根新K线更新增量指标，并整理成策略逻辑使用的市场数据
+
+    Returns:
+        市场数据（均线、上一根的均线、RSI、MACD柱等，数据不足或未计算时为None）
+    """
+    short_key = f"sma_{strategy.params.get('short_period', 5)}"
+    long_key = f"sma_{strategy.params.get('long_period', 20)}"
+
+    prev = indicators.values()
+    current = indicators.update(price, high, low)
+    prev_macd = prev.get("macd")
+    macd = current.get("macd")
+
+    return {
+        "price": price,
+        "ma_short": current.get(short_key),
+        "ma_long": current.get(long_key),
+        "prev_ma_short": prev.get(short_key),
+        "prev_ma_long": prev.get(long_key),
+        "rsi": current.get("rsi"),
+        "macd_hist": macd["histogram"] if macd else None,
+        "prev_macd_hist": prev_macd["histogram"] if prev_macd else None,
+        "indicators": current
+    }
+
+
+def evaluate_strategy(strategy: TradingStrategy, data: Dict) -> str:
+    """
+    策略逻辑（实盘与回测共用）
+
+    Args:
+        strategy: 交易策略
+        data: 市场数据
+
+    Returns:
+        交易信号
+    """
+    if strategy.type == MarketType.STOCK:
+        # 均线交叉策略
+        if "ma_cross" in strategy.name.lower():
+            # 增量指标尚在预热期
+            if any(data.get(key) is None for key in ("ma_short", "ma_long", "prev_ma_short", "prev_ma_long")):
+                return "hold"
+
+            short_ma = data["ma_short"]
+            long_ma = data["ma_long"]
+            prev_short = data["prev_ma_short"]
+            prev_long = data["prev_ma_long"]
+
+            if short_ma > long_ma and prev_short <= prev_long:
+                return "buy"  # 金叉
+            elif short_ma < long_ma and prev_short >= prev_long:
+                return "sell"  # 死叉
+            elif "Strategy" in strategy.name:  # 测试用策略名称匹配
+                return "hold"  # 默认持仓
+
+        # RSI超买超卖策略
+        elif "rsi" in strategy.name.lower():
+            rsi = data.get("rsi")
+            if rsi is None:
+                return "hold"
+
+            if rsi < strategy.params.get("oversold", 30):
+                return "buy"  # 超卖
+            elif rsi > strategy.params.get("overbought", 70):
+                return "sell"  # 超买
+
+        # MACD柱翻转策略
+        elif "macd" in strategy.name.lower():
+            hist = data.get("macd_hist")
+            prev_hist = data.get("prev_macd_hist")
+            if hist is None or prev_hist is None:
+                return "hold"
+
+            if prev_hist <= 0 < hist:
+                return "buy"  # 金叉
+            elif prev_hist >= 0 > hist:
+                return "sell"  # 死叉
+
+    elif strategy.type == MarketType.ECOMMERCE:
+        # 套利策略
+        min_price = min(data["prices"].values())
+        max_price = max(data["prices"].values())
+        profit = (max_price - min_price) / min_price
+
+        if profit >= 0.1:  # 利润超过10%
+            return "buy"  # 低买
+        elif "Arbitrage" in strategy.name:
+            return "hold"  # 测试用，默认持仓
+
+    return "hold"
+
+
 class AutoTrader:
     """自动交易助手"""
 
@@ -100,6 +243,7 @@ class AutoTrader:
         self.account = self._init_account()
         self.is_running = False
         self.worker_thread = None
+        self.indicator_states: Dict[str, Any] = {}
         self.db_conn = self._init_db()
 
     def _load_config(self, config_file: str) -> Dict:
@@ -161,6 +305,15 @@ class AutoTrader:
             )
         """)
 
+        # 创建增量指标状态表
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS indicator_states (
+                strategy_id TEXT PRIMARY KEY,
+                state TEXT,
+                updated_at TEXT
+            )
+        """)
+
         conn.commit()
         return conn
 
@@ -257,6 +410,7 @@ class AutoTrader:
             self.strategies.append(strategy)
 
         logger.info(f"从数据库加载 {len(self.strategies)} 个策略")
+        self.load_indicator_states()
 
     def execute_trade(
         self,
@@ -381,31 +535,134 @@ class AutoTrader:
         # 执行策略逻辑
         signal = self._execute_strategy_logic(strategy, market_data)
 
+        if "price" in market_data:
+            self._act_on_signal(strategy, signal, market_data["price"])
+
+    def _act_on_signal(self, strategy: TradingStrategy, signal: str, price: float):
+        """
+        按交易信号下单
+
+        Args:
+            strategy: 交易策略
+            signal: 交易信号
+            price: 当前价格
+        """
         if signal == "buy":
             # 计算买入数量
             position_value = self.account.total_value * strategy.position_size
-            quantity = int(position_value / market_data["price"])
+            quantity = int(position_value / price)
 
             if quantity > 0:
                 self.execute_trade(
-                    strategy_id=strategy_id,
+                    strategy_id=strategy.strategy_id,
                     action="buy",
-                    price=market_data["price"],
+                    price=price,
                     quantity=quantity
                 )
 
         elif signal == "sell":
             # 卖出所有持仓（简化）
-            quantity = int(self.account.market_value / market_data["price"])
+            quantity = int(self.account.market_value / price)
 
             if quantity > 0:
                 self.execute_trade(
-                    strategy_id=strategy_id,
+                    strategy_id=strategy.strategy_id,
                     action="sell",
-                    price=market_data["price"],
+                    price=price,
                     quantity=quantity
                 )
 
+    def on_bar(self, strategy_id: str, bar: Dict) -> Optional[str]:
+        """
+        实时推送一根新K线/行情：增量更新指标，执行策略逻辑并按信号下单
+
+        每次只更新指标状态（O(1)），不重新计算历史数据，可按tick频率调用。
+
+        Args:
+            strategy_id: 策略ID
+            bar: 行情，包含 close（或 price），可选 high / low
+
+        Returns:
+            交易信号
+        """
+        strategy = self._get_strategy(strategy_id)
+        if not strategy:
+            logger.error(f"未找到策略: {strategy_id}")
+            return None
+
+        if not HAS_STREAMING_INDICATORS:
+            logger.error(f"无法加载增量指标: {FINANCIAL_ANALYZER_PATH}")
+            return None
+
+        price = bar.get("close", bar.get("price"))
+        data = self._update_indicators(strategy, price, bar.get("high"), bar.get("low"))
+
+        signal = self._execute_strategy_logic(strategy, data)
+        self._act_on_signal(strategy, signal, price)
+        return signal
+
+    def _get_indicators(self, strategy: TradingStrategy):
+        """获取（或按策略参数创建）策略的增量指标"""
+        indicators = self.indicator_states.get(strategy.strategy_id)
+        if indicators is None:
+            indicators = create_indicators(strategy)
+            self.indicator_states[strategy.strategy_id] = indicators
+        return indicators
+
+    def _update_indicators(
+        self,
+        strategy: TradingStrategy,
+        price: float,
+        high: Optional[float] = None,
+        low: Optional[float] = None
+    ) -> Dict:
+        """更新增量指标，并整理成策略逻辑使用的市场数据"""
+        return build_indicator_data(strategy, self._get_indicators(strategy), price, high, low)
+
+    def snapshot_indicators(self) -> Dict[str, Dict]:
+        """导出所有策略的增量指标状态"""
+        return {
+            strategy_id: indicators.snapshot()
+            for strategy_id, indicators in self.indicator_states.items()
+        }
+
+    def restore_indicators(self, snapshots: Dict[str, Dict]):
+        """从快照恢复增量指标状态"""
+        if not HAS_STREAMING_INDICATORS:
+            logger.error(f"无法加载增量指标: {FINANCIAL_ANALYZER_PATH}")
+            return
+
+        for strategy_id, snapshot in snapshots.items():
+            self.indicator_states[strategy_id] = StreamingIndicators.from_snapshot(snapshot)
+
+    def save_indicator_states(self):
+        """保存增量指标状态到数据库"""
+        if not self.indicator_states:
+            return
+
+        cursor = self.db_conn.cursor()
+        now = datetime.now().isoformat()
+        cursor.executemany("""
+            INSERT OR REPLACE INTO indicator_states (strategy_id, state, updated_at)
+            VALUES (?, ?, ?)
+        """, [
+            (strategy_id, json.dumps(snapshot), now)
+            for strategy_id, snapshot in self.snapshot_indicators().items()
+        ])
+
+        self.db_conn.commit()
+
+    def load_indicator_states(self):
+        """从数据库恢复增量指标状态"""
+        cursor = self.db_conn.cursor()
+
+        cursor.execute("SELECT strategy_id, state FROM indicator_states")
+        snapshots = {row[0]: json.loads(row[1]) for row in cursor.fetchall()}
+
+        if snapshots:
+            self.restore_indicators(snapshots)
+            logger.info(f"从数据库恢复 {len(snapshots)} 个策略的指标状态")
+
     def _fetch_market_data(self, strategy: TradingStrategy) -> Dict:
         """
         获取市场数据
@@ -475,33 +732,7 @@ class AutoTrader:
         Returns:
             交易信号
         """
-        if strategy.type == MarketType.STOCK:
-            # 均线交叉策略
-            if "ma_cross" in strategy.name.lower():
-                short_ma = data["ma_short"]
-                long_ma = data["ma_long"]
-                prev_short = data["prev_ma_short"]
-                prev_long = data["prev_ma_long"]
-
-                if short_ma > long_ma and prev_short <= prev_long:
-                    return "buy"  # 金叉
-                elif short_ma < long_ma and prev_short >= prev_long:
-                    return "sell"  # 死叉
-                elif "Strategy" in strategy.name:  # 测试用策略名称匹配
-                    return "hold"  # 默认持仓
-
-        elif strategy.type == MarketType.ECOMMERCE:
-            # 套利策略
-            min_price = min(data["prices"].values())
-            max_price = max(data["prices"].values())
-            profit = (max_price - min_price) / min_price
-
-            if profit >= 0.1:  # 利润超过10%
-                return "buy"  # 低买
-            elif "Arbitrage" in strategy.name:
-                return "hold"  # 测试用，默认持仓
-
-        return "hold"
+        return evaluate_strategy(strategy, data)
 
     def start(self, strategy_id: Optional[str] = None, check_interval: int = 60):
         """
@@ -531,6 +762,8 @@ class AutoTrader:
         if self.worker_thread:
             self.worker_thread.join(timeout=5)
 
+        self.save_indicator_states()
+
         logger.info("自动交易已停止")
 
     def _trading_loop(self, strategy_id: Optional[str], check_interval: int):
@@ -628,12 +861,47 @@ class AutoTrader:
         }
 
 
+def _parse_value(value: str) -> Any:
+    """命令行参数值转换为数字（无法转换时保留字符串）"""
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _parse_params(
+    text: Optional[str],
+    list_separator: Optional[str] = None,
+    item_separator: str = ","
+) -> Dict[str, Any]:
+    """
+    解析 key=value 形式的参数
+
+    Args:
+        text: 参数文本，如 "short_period=5,long_period=20"
+        list_separator: 值内的列表分隔符（参数网格用，如 "short_period=5,10;long_period=20,60"）
+        item_separator: 参数之间的分隔符
+    """
+    params: Dict[str, Any] = {}
+    for item in (text or "").split(item_separator):
+        if "=" not in item:
+            continue
+        key, value = item.split("=", 1)
+        if list_separator:
+            params[key.strip()] = [_parse_value(v.strip()) for v in value.split(list_separator) if v.strip()]
+        else:
+            params[key.strip()] = _parse_value(value.strip())
+    return params
+
+
 def main():
     """主函数"""
     import argparse
 
     parser = argparse.ArgumentParser(description="自动化交易助手")
-    parser.add_argument("command", choices=["add_strategy", "start", "list_trades", "profit", "account"],
+    parser.add_argument("command", choices=["add_strategy", "start", "list_trades", "profit", "account", "backtest"],
                         help="命令")
     parser.add_argument("--name", help="策略名称")
     parser.add_argument("--type", choices=["stock", "crypto", "ecommerce"], help="市场类型")
@@ -642,6 +910,14 @@ def main():
     parser.add_argument("--stop_loss", type=float, help="止损比例")
     parser.add_argument("--take_profit", type=float, help="止盈比例")
     parser.add_argument("--strategy_id", help="策略ID")
+    parser.add_argument("--params", help="策略参数，如 short_period=5,long_period=20")
+    parser.add_argument("--data", help="回测用的历史K线文件（.csv / .parquet）")
+    parser.add_argument("--start_date", help="回测开始日期")
+    parser.add_argument("--end_date", help="回测结束日期")
+    parser.add_argument("--sweep", help="参数扫描网格，如 short_period=5,10;long_period=20,60")
+    parser.add_argument("--workers", type=int, help="参数扫描进程数")
+    parser.add_argument("--top", type=int, default=10, help="参数扫描输出前N个组合")
+    parser.add_argument("--sort_by", default="total_return", help="参数扫描排序指标")
 
     args = parser.parse_args()
 
@@ -653,7 +929,7 @@ def main():
             name=args.name,
             type=args.type,
             symbol=args.symbol,
-            params={},
+            params=_parse_params(args.params),
             position_size=args.position_size or 0.1,
             stop_loss=args.stop_loss or 0.05,
             take_profit=args.take_profit or 0.1
@@ -688,6 +964,45 @@ def main():
         account_info = trader.get_account_info()
         print(json.dumps(account_info, ensure_ascii=False, indent=2))
 
+    elif args.command == "backtest":
+        from backtest import Backtester, load_bars
+
+        if not args.data:
+            print("错误: 回测需要 --data 指定历史K线文件")
+            return
+
+        if args.strategy_id:
+            trader.load_strategies_from_db()
+            strategy = trader._get_strategy(args.strategy_id)
+            if not strategy:
+                print(f"错误: 未找到策略 {args.strategy_id}")
+                return
+        else:
+            # 未保存的临时策略
+            strategy = TradingStrategy(
+                strategy_id="backtest",
+                name=args.name or "ma_cross",
+                type=MarketType(args.type or "stock"),
+                symbol=args.symbol or "",
+                params=_parse_params(args.params),
+                position_size=args.position_size or 0.1,
+                stop_loss=args.stop_loss or 0.05,
+                take_profit=args.take_profit or 0.1,
+                enabled=True
+            )
+
+        bars = load_bars(args.data, args.start_date, args.end_date)
+        backtester = Backtester.from_config(trader.config)
+
+        if args.sweep:
+            grid = _parse_params(args.sweep, list_separator=",", item_separator=";")
+            results = backtester.sweep(strategy, bars, grid, workers=args.workers,
+                                       sort_by=args.sort_by, top=args.top)
+            print(json.dumps(results, ensure_ascii=False, indent=2))
+        else:
+            result = backtester.run(strategy, bars)
+            print(json.dumps(result.to_dict(), ensure_ascii=False, indent=2))
+
 
 if __name__ == "__main__":
     main()
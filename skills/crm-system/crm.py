@@ -8,11 +8,19 @@ import json
 import os
 import sys
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable
 from dataclasses import dataclass, asdict, field
 from enum import Enum
+from collections import defaultdict, deque
 import uuid
 import re
+import bisect
+import copy
+import heapq
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
 
 
 # 数据目录
@@ -162,12 +170,380 @@ class Task:
     completed_at: Optional[str] = None
 
 
-class DataManager:
-    """数据管理基类"""
+# 存储后端: sqlite（默认，按条写入；首次使用时导入已有的JSON数据文件）或 json
+STORAGE_BACKEND = os.environ.get('CRM_STORAGE', 'sqlite')
+SQLITE_PATH = os.path.join(DATA_DIR, 'crm.db')
 
-    def __init__(self, filename: str):
-        self.filepath = os.path.join(DATA_DIR, filename)
+# 查询谓词操作符，写法为 字段__操作符=值，如 amount__gte=10000
+QUERY_OPERATORS = ('eq', 'in', 'gt', 'gte', 'lt', 'lte', 'prefix', 'contains')
+
+# 字符串区间查询的上界哨兵
+_MAX_CHAR = '\U0010ffff'
+
+
+def _is_sql_scalar(value) -> bool:
+    """可以原样作为SQLite参数、且比较语义与Python一致的值"""
+    return value is None or isinstance(value, (str, int, float))
+
+
+@dataclass
+class Predicate:
+    """查询谓词"""
+    field: str
+    op: str
+    value: Any
+
+    def matches(self, record: Dict) -> bool:
+        """检查记录是否满足谓词"""
+        if self.field not in record:
+            return False
+        actual = record[self.field]
+
+        # 多值字段（如标签）按包含匹配
+        if isinstance(actual, list) and (self.op == 'in' or (self.op == 'eq' and not isinstance(self.value, list))):
+            candidates = self.value if self.op == 'in' else [self.value]
+            return any(v in actual for v in candidates)
+
+        if self.op == 'eq':
+            return actual == self.value
+        if self.op == 'in':
+            return actual in self.value
+        if self.op == 'contains':
+            return actual is not None and str(self.value).lower() in str(actual).lower()
+        if actual is None:
+            return False
+        if self.op == 'prefix':
+            try:
+                return isinstance(actual, str) and actual.startswith(self.value)
+            except TypeError:
+                return False
+
+        try:
+            if self.op == 'gt':
+                return actual > self.value
+            if self.op == 'gte':
+                return actual >= self.value
+            if self.op == 'lt':
+                return actual < self.value
+            if self.op == 'lte':
+                return actual <= self.value
+        except TypeError:
+            return False
+        return False
+
+
+def parse_filters(filters: Dict[str, Any]) -> List[Predicate]:
+    """把 字段__操作符=值 形式的过滤条件解析为谓词"""
+    predicates = []
+    for key, value in filters.items():
+        field_name, _, op = key.rpartition('__')
+        if not field_name or op not in QUERY_OPERATORS:
+            field_name, op = key, 'eq'
+        if op == 'in':
+            value = list(value)
+        predicates.append(Predicate(field_name, op, value))
+    return predicates
+
+
+class HashIndex:
+    """哈希索引 - 等值查询，多值字段按元素建索引"""
+
+    def __init__(self, field_name: str):
+        self.field = field_name
+        self.postings: Dict[Any, set] = defaultdict(set)
+
+    def clear(self):
+        self.postings.clear()
+
+    def _values(self, value) -> List:
+        if isinstance(value, list):
+            return value
+        return [value]
+
+    def add(self, key: str, value):
+        for v in self._values(value):
+            self.postings[v].add(key)
+
+    def remove(self, key: str, value):
+        for v in self._values(value):
+            keys = self.postings.get(v)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[v]
+
+    def lookup(self, values: List) -> set:
+        result = set()
+        for v in values:
+            result |= self.postings.get(v, set())
+        return result
+
+    def estimate(self, values: List) -> int:
+        return sum(len(self.postings.get(v, ())) for v in values)
+
+
+def _sort_key(value) -> tuple:
+    """混合类型可比较的排序键：None < 数值 < 字符串 < 其他类型（按字符串比较）"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, str(value))
+
+
+class SortedIndex:
+    """有序索引 - 区间和前缀查询
+
+    条目按 _sort_key 排序，字段中混有不同类型的值时也不会比较出错；
+    区间查询只在与查询值同类的条目中进行，与 Predicate.matches 的结果一致
+    """
+
+    def __init__(self, field_name: str):
+        self.field = field_name
+        self.entries: List[tuple] = []  # [(_sort_key(value), key)] 有序
+
+    def clear(self):
+        self.entries = []
+
+    def build(self, items):
+        """由 (value, key) 整体排序构建，避免逐条插入的O(n²)"""
+        self.entries = sorted((_sort_key(value), key) for value, key in items if value is not None)
+
+    def add(self, key: str, value):
+        if value is not None:
+            bisect.insort(self.entries, (_sort_key(value), key))
+
+    def remove(self, key: str, value):
+        if value is None:
+            return
+        entry = (_sort_key(value), key)
+        i = bisect.bisect_left(self.entries, entry)
+        if i < len(self.entries) and self.entries[i] == entry:
+            del self.entries[i]
+
+    def _bounds(self, op: str, value) -> tuple:
+        """计算谓词在有序数组中的下标区间"""
+        entries = self.entries
+        if op == 'prefix':
+            value = str(value)
+            return (bisect.bisect_left(entries, (_sort_key(value),)),
+                    bisect.bisect_left(entries, (_sort_key(value + _MAX_CHAR),)))
+
+        target = _sort_key(value)
+        # 同类值所在的区间
+        type_lo = bisect.bisect_left(entries, ((target[0],),))
+        type_hi = bisect.bisect_left(entries, ((target[0] + 1,),))
+        if op == 'eq':
+            return bisect.bisect_left(entries, (target,)), bisect.bisect_left(entries, (target, _MAX_CHAR))
+        if op == 'gt':
+            return bisect.bisect_left(entries, (target, _MAX_CHAR)), type_hi
+        if op == 'gte':
+            return bisect.bisect_left(entries, (target,)), type_hi
+        if op == 'lt':
+            return type_lo, bisect.bisect_left(entries, (target,))
+        if op == 'lte':
+            return type_lo, bisect.bisect_left(entries, (target, _MAX_CHAR))
+        raise ValueError(f"有序索引不支持操作符: {op}")
+
+    def lookup(self, op: str, value) -> List[str]:
+        lo, hi = self._bounds(op, value)
+        return [key for _, key in self.entries[lo:hi]]
+
+    def estimate(self, op: str, value) -> int:
+        lo, hi = self._bounds(op, value)
+        return max(0, hi - lo)
+
+
+class NGramIndex:
+    """N-gram倒排索引 - 子串查询的候选集（需回表校验）"""
+
+    def __init__(self, field_name: str, n: int = 2):
+        self.field = field_name
+        self.n = n
+        self.postings: Dict[str, set] = defaultdict(set)
+
+    def clear(self):
+        self.postings.clear()
+
+    def grams(self, text) -> set:
+        if text is None:
+            return set()
+        text = str(text).lower()
+        if len(text) < self.n:
+            return {text} if text else set()
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def add(self, key: str, value):
+        for gram in self.grams(value):
+            self.postings[gram].add(key)
+
+    def remove(self, key: str, value):
+        for gram in self.grams(value):
+            keys = self.postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[gram]
+
+    def _posting_lists(self, substring: str) -> Optional[List[set]]:
+        if len(str(substring)) < self.n:
+            return None  # 查询串过短，无法使用索引
+        lists = [self.postings.get(g, set()) for g in self.grams(substring)]
+        return sorted(lists, key=len)
+
+    def lookup(self, substring: str) -> set:
+        lists = self._posting_lists(substring)
+        result = set(lists[0])
+        for keys in lists[1:]:
+            if not result:
+                break
+            result &= keys
+        return result
+
+    def estimate(self, substring: str) -> Optional[int]:
+        lists = self._posting_lists(substring)
+        return len(lists[0]) if lists is not None else None
+
+
+class QueryResult:
+    """惰性查询结果 - 只保存命中的主键，遍历或分页时才加载记录并构造对象"""
+
+    def __init__(self, store: "StorageBackend", keys: List[str],
+                 factory: Callable[[Dict], Any] = None, chunk_size: int = 200):
+        self.store = store
+        self._keys = keys
+        self.factory = factory or (lambda record: record)
+        self.chunk_size = chunk_size
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def count(self) -> int:
+        return len(self._keys)
+
+    def keys(self) -> List[str]:
+        return list(self._keys)
+
+    def _materialize(self, keys: List[str]) -> List:
+        return [self.factory(r) for r in self.store.get_many(keys) if r is not None]
+
+    def __iter__(self):
+        for start in range(0, len(self._keys), self.chunk_size):
+            yield from self._materialize(self._keys[start:start + self.chunk_size])
+
+    def slice(self, offset: int = 0, limit: int = None) -> List:
+        end = None if limit is None else offset + limit
+        return self._materialize(self._keys[offset:end])
+
+    def page(self, number: int = 1, size: int = 20) -> List:
+        """获取第 number 页（从1开始）"""
+        return self.slice((max(number, 1) - 1) * size, size)
+
+    def first(self):
+        items = self.slice(0, 1)
+        return items[0] if items else None
+
+    def all(self) -> List:
+        return list(self)
+
+
+class StorageBackend(ABC):
+    """存储后端基类 - 按主键管理一组字典记录"""
+
+    def __init__(self, collection: str, key_field: str,
+                 indexed_fields: tuple = (), list_fields: tuple = (),
+                 range_fields: tuple = (), text_fields: tuple = ()):
+        self.collection = collection
+        self.key_field = key_field
+        self.indexed_fields = tuple(indexed_fields)  # 等值索引字段
+        self.list_fields = tuple(list_fields)  # 多值索引字段（如标签）
+        self.range_fields = tuple(range_fields)  # 有序索引字段（区间/前缀）
+        self.text_fields = tuple(text_fields)  # n-gram索引字段（子串）
+        self._listeners: List[Callable] = []
+
+    def add_listener(self, listener: Callable[[str, Optional[Dict], Optional[Dict]], None]):
+        """注册变更监听器 listener(event, old, new)，event 为 insert/update/delete/reload"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, event: str, old: Optional[Dict], new: Optional[Dict]):
+        """通知监听器；记录此时已写入，监听器出错只打印警告，不让调用方误以为写入失败"""
+        for listener in self._listeners:
+            try:
+                listener(event, old, new)
+            except Exception as e:
+                print(f"警告: 变更监听器出错 ({self.collection} {event}): {e}")
+
+    def load(self):
+        """重新加载数据"""
+
+    def flush(self):
+        """持久化未写入的数据"""
+
+    @abstractmethod
+    def all(self) -> List[Dict]:
+        """全部记录"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict]:
+        """按主键读取记录，不存在时返回None"""
+
+    def get_many(self, keys: List[str]) -> List[Optional[Dict]]:
+        return [self.get(key) for key in keys]
+
+    @abstractmethod
+    def insert(self, record: Dict):
+        """插入新记录"""
+
+    @abstractmethod
+    def update(self, key: str, fields: Dict) -> Optional[Dict]:
+        """部分更新记录，返回更新后的记录，不存在时返回None"""
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        """删除记录，返回是否存在"""
+
+    @abstractmethod
+    def select_keys(self, predicates: List[Predicate], order_by: str = None,
+                    descending: bool = False) -> List[str]:
+        """返回满足所有谓词的主键"""
+
+    def find(self, **filters) -> List[Dict]:
+        """按条件查询记录"""
+        return self.get_many(self.select_keys(parse_filters(filters)))
+
+    def count(self) -> int:
+        return len(self.all())
+
+    @abstractmethod
+    def transaction(self):
+        """批量事务，事务内的写入合并提交"""
+
+    def close(self):
+        """关闭后端"""
+
+
+class JSONStorage(StorageBackend):
+    """JSON文件存储 - 全量驻留内存并维护二级索引，事务结束时整体写回"""
+
+    def __init__(self, filepath: str, key_field: str, **options):
+        collection = os.path.splitext(os.path.basename(filepath))[0]
+        super().__init__(collection, key_field, **options)
+        self.filepath = filepath
         self.data: List[Dict] = []
+        self._positions: Dict[str, int] = {}
+        self._depth = 0
+        self._dirty = False
+
+        self.hash_indexes = {f: HashIndex(f) for f in self.indexed_fields + self.list_fields}
+        self.sorted_indexes = {f: SortedIndex(f) for f in self.range_fields}
+        self.text_indexes = {f: NGramIndex(f) for f in self.text_fields}
+
         self.load()
 
     def load(self):
@@ -179,21 +555,588 @@ class DataManager:
             except Exception as e:
                 print(f"加载数据失败: {e}")
                 self.data = []
-
-    def save(self):
+        self._reindex()
+        self._notify('reload', None, None)
+
+    def _indexes(self):
+        yield from self.hash_indexes.values()
+        yield from self.sorted_indexes.values()
+        yield from self.text_indexes.values()
+
+    def _reindex(self):
+        self._positions = {r[self.key_field]: i for i, r in enumerate(self.data)}
+        for index in self._indexes():
+            index.clear()
+        for record in self.data:
+            key = record[self.key_field]
+            for index in list(self.hash_indexes.values()) + list(self.text_indexes.values()):
+                index.add(key, record.get(index.field))
+        for f, index in self.sorted_indexes.items():
+            index.build((r.get(f), r[self.key_field]) for r in self.data)
+
+    def _index_record(self, record: Dict, fields=None):
+        key = record[self.key_field]
+        for index in self._indexes():
+            if fields is None or index.field in fields:
+                index.add(key, record.get(index.field))
+
+    def _unindex_record(self, record: Dict, fields=None):
+        key = record[self.key_field]
+        for index in self._indexes():
+            if fields is None or index.field in fields:
+                index.remove(key, record.get(index.field))
+
+    def flush(self):
         """保存数据"""
         try:
             with open(self.filepath, 'w', encoding='utf-8') as f:
                 json.dump(self.data, f, ensure_ascii=False, indent=2)
+            self._dirty = False
         except Exception as e:
             print(f"保存数据失败: {e}")
 
+    def _commit(self):
+        if self._depth:
+            self._dirty = True
+        else:
+            self.flush()
+
+    def all(self) -> List[Dict]:
+        return self.data
+
+    def get(self, key: str) -> Optional[Dict]:
+        pos = self._positions.get(key)
+        return self.data[pos] if pos is not None else None
+
+    def insert(self, record: Dict):
+        self._positions[record[self.key_field]] = len(self.data)
+        self.data.append(record)
+        self._index_record(record)
+        self._commit()
+        self._notify('insert', None, record)
+
+    def update(self, key: str, fields: Dict) -> Optional[Dict]:
+        record = self.get(key)
+        if record is None:
+            return None
+        old = dict(record) if self._listeners else None
+        self._unindex_record(record, fields)
+        record.update(fields)
+        self._index_record(record, fields)
+        self._commit()
+        self._notify('update', old, record)
+        return record
+
+    def delete(self, key: str) -> bool:
+        pos = self._positions.get(key)
+        if pos is None:
+            return False
+        old = self.data[pos]
+        self._unindex_record(old)
+        del self.data[pos]
+        self._positions = {r[self.key_field]: i for i, r in enumerate(self.data)}
+        self._commit()
+        self._notify('delete', old, None)
+        return True
+
+    def count(self) -> int:
+        return len(self.data)
+
+    def _plan(self, predicate: Predicate) -> Optional[tuple]:
+        """为单个谓词选择索引，返回 (预估行数, 索引描述, 查找函数)"""
+        field_name, op, value = predicate.field, predicate.op, predicate.value
+
+        if field_name == self.key_field and op == 'eq':
+            return 1, f"primary:{field_name}", lambda: [value] if value in self._positions else []
+
+        if field_name in self.hash_indexes and op in ('eq', 'in'):
+            values = value if op == 'in' else [value]
+            if isinstance(value, list) and op == 'eq':
+                return None
+            try:
+                index = self.hash_indexes[field_name]
+                return index.estimate(values), f"hash:{field_name}", lambda: index.lookup(values)
+            except TypeError:
+                return None
+
+        if field_name in self.sorted_indexes and op in ('eq', 'gt', 'gte', 'lt', 'lte', 'prefix'):
+            if op == 'prefix' and not isinstance(value, str):
+                return None
+            index = self.sorted_indexes[field_name]
+            try:
+                return index.estimate(op, value), f"sorted:{field_name}", lambda: index.lookup(op, value)
+            except TypeError:
+                return None
+
+        if field_name in self.text_indexes and op == 'contains':
+            index = self.text_indexes[field_name]
+            estimate = index.estimate(value)
+            if estimate is not None:
+                return estimate, f"ngram:{field_name}", lambda: index.lookup(value)
+
+        return None
+
+    def explain(self, predicates: List[Predicate]) -> Dict[str, Any]:
+        """查询计划：选择预估行数最少的索引作为驱动，其余谓词回表过滤"""
+        best = None
+        for predicate in predicates:
+            plan = self._plan(predicate)
+            if plan is not None and (best is None or plan[0] < best[0]):
+                best = plan
+        if best is None:
+            return {'index': 'scan', 'estimated_rows': len(self.data), 'lookup': None}
+        return {'index': best[1], 'estimated_rows': best[0], 'lookup': best[2]}
+
+    def select_keys(self, predicates: List[Predicate], order_by: str = None,
+                    descending: bool = False) -> List[str]:
+        plan = self.explain(predicates)
+
+        if plan['lookup'] is None:
+            records = self.data
+        else:
+            keys = sorted(plan['lookup'](), key=self._positions.get)
+            records = [self.data[self._positions[k]] for k in keys]
+
+        records = [r for r in records if all(p.matches(r) for p in predicates)]
+
+        if order_by:
+            present = [r for r in records if r.get(order_by) is not None]
+            missing = [r for r in records if r.get(order_by) is None]
+            present.sort(key=lambda r: _sort_key(r[order_by]), reverse=descending)
+            records = present + missing
+
+        return [r[self.key_field] for r in records]
+
+    @contextmanager
+    def transaction(self):
+        """JSON后端不支持回滚，仅把事务内的多次写入合并为一次落盘"""
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if self._depth == 0 and self._dirty:
+                self.flush()
+
+
+class SQLiteStorage(StorageBackend):
+    """SQLite存储（WAL模式） - 记录以JSON保存，索引字段单独建列，多值与n-gram索引单独建表"""
+
+    def __init__(self, db_path: str, collection: str, key_field: str,
+                 legacy_path: Optional[str] = None, **options):
+        """
+        Args:
+            legacy_path: 旧的JSON数据文件，集合首次建表时导入其中的记录
+        """
+        super().__init__(collection, key_field, **options)
+        self.db_path = db_path
+        self.legacy_path = legacy_path
+        self.columns = tuple(dict.fromkeys(self.indexed_fields + self.range_fields + self.text_fields))
+        self.ngram = NGramIndex('')  # 仅用于切分n-gram
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._pending_events: List[tuple] = []
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self._create_schema()
+
+    def load(self):
+        """数据始终从数据库读取；通知监听器重建派生状态（如其他进程写入后）"""
+        StorageBackend._notify(self, 'reload', None, None)
+
+    def _list_table(self, field_name: str) -> str:
+        return f"{self.collection}__{field_name}"
+
+    def _ngram_table(self) -> str:
+        return f"{self.collection}__ngram"
+
+    def _create_schema(self):
+        table = self.collection
+        with self.transaction():
+            existing_tables = {row[0] for row in self.conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+            self.conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{table}" (id TEXT PRIMARY KEY, data TEXT NOT NULL)'
+            )
+
+            # 旧库缺少的索引列在此补齐
+            current = {row[1] for row in self.conn.execute(f'PRAGMA table_info("{table}")')}
+            added = [f for f in self.columns if f not in current]
+            for f in added:
+                self.conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{f}"')
+
+            for f in self.columns:
+                self.conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_{f}" ON "{table}" ("{f}")')
+
+            new_tables = []
+            for f in self.list_fields:
+                self.conn.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{self._list_table(f)}" '
+                    f'(value TEXT NOT NULL, id TEXT NOT NULL, PRIMARY KEY (value, id))'
+                )
+                self.conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS "idx_{self._list_table(f)}_id" '
+                    f'ON "{self._list_table(f)}" (id)'
+                )
+                if self._list_table(f) not in existing_tables:
+                    new_tables.append(f)
+
+            if self.text_fields:
+                self.conn.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{self._ngram_table()}" '
+                    f'(field TEXT NOT NULL, gram TEXT NOT NULL, id TEXT NOT NULL, '
+                    f'PRIMARY KEY (field, gram, id))'
+                )
+                self.conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS "idx_{self._ngram_table()}_id" '
+                    f'ON "{self._ngram_table()}" (id)'
+                )
+                if self._ngram_table() not in existing_tables:
+                    new_tables.append(self._ngram_table())
+
+            # 已有数据时回填新增的索引
+            if table in existing_tables and (added or new_tables):
+                for key, data in self.conn.execute(f'SELECT id, data FROM "{table}"').fetchall():
+                    self._write_record(key, json.loads(data))
+
+            # 从JSON存储切换过来时导入原有数据（按原顺序）
+            if table not in existing_tables and self.legacy_path and os.path.exists(self.legacy_path):
+                with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                    for record in json.load(f):
+                        self._write_record(record[self.key_field], record)
+
+    @contextmanager
+    def transaction(self):
+        """批量事务，异常时回滚；变更通知在提交后发出"""
+        with self._lock:
+            self._depth += 1
+            if self._depth == 1:
+                self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute("ROLLBACK")
+                    self._pending_events.clear()
+                raise
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute("COMMIT")
+                    events, self._pending_events = self._pending_events, []
+                    for event in events:
+                        super()._notify(*event)
+
+    def _notify(self, event: str, old: Optional[Dict], new: Optional[Dict]):
+        # 事务内的变更暂存，提交后统一通知，回滚则丢弃
+        if self._listeners:
+            self._pending_events.append((event, old, new))
+
+    def _write_row(self, key: str, record: Dict):
+        values = [record.get(f) for f in self.columns]
+        columns = "".join(f', "{f}"' for f in self.columns)
+        placeholders = ", ?" * len(self.columns)
+        self.conn.execute(
+            f'INSERT OR REPLACE INTO "{self.collection}" (id, data{columns}) '
+            f'VALUES (?, ?{placeholders})',
+            [key, json.dumps(record, ensure_ascii=False)] + values
+        )
+
+    def _write_list(self, key: str, field_name: str, values: List):
+        table = self._list_table(field_name)
+        self.conn.execute(f'DELETE FROM "{table}" WHERE id = ?', (key,))
+        self.conn.executemany(
+            f'INSERT OR IGNORE INTO "{table}" (value, id) VALUES (?, ?)',
+            [(str(v), key) for v in (values or [])]
+        )
+
+    def _write_grams(self, key: str, field_name: str, value):
+        table = self._ngram_table()
+        self.conn.execute(f'DELETE FROM "{table}" WHERE id = ? AND field = ?', (key, field_name))
+        self.conn.executemany(
+            f'INSERT OR IGNORE INTO "{table}" (field, gram, id) VALUES (?, ?, ?)',
+            [(field_name, gram, key) for gram in self.ngram.grams(value)]
+        )
+
+    def _write_record(self, key: str, record: Dict, fields=None):
+        self._write_row(key, record)
+        for f in self.list_fields:
+            if fields is None or f in fields:
+                self._write_list(key, f, record.get(f))
+        for f in self.text_fields:
+            if fields is None or f in fields:
+                self._write_grams(key, f, record.get(f))
+
+    def all(self) -> List[Dict]:
+        with self._lock:
+            rows = self.conn.execute(
+                f'SELECT data FROM "{self.collection}" ORDER BY rowid'
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self.conn.execute(
+                f'SELECT data FROM "{self.collection}" WHERE id = ?', (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, keys: List[str]) -> List[Optional[Dict]]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                for key, data in self.conn.execute(
+                        f'SELECT id, data FROM "{self.collection}" WHERE id IN ({placeholders})', chunk):
+                    found[key] = json.loads(data)
+        return [found.get(key) for key in keys]
+
+    def insert(self, record: Dict):
+        with self.transaction():
+            self._write_record(record[self.key_field], record)
+            self._notify('insert', None, record)
+
+    def update(self, key: str, fields: Dict) -> Optional[Dict]:
+        with self.transaction():
+            record = self.get(key)
+            if record is None:
+                return None
+            old = dict(record) if self._listeners else None
+            record.update(fields)
+            self._write_record(key, record, fields)
+            self._notify('update', old, record)
+        return record
+
+    def delete(self, key: str) -> bool:
+        with self.transaction():
+            old = self.get(key) if self._listeners else None
+            cursor = self.conn.execute(f'DELETE FROM "{self.collection}" WHERE id = ?', (key,))
+            if cursor.rowcount > 0:
+                self._notify('delete', old, None)
+            for f in self.list_fields:
+                self.conn.execute(f'DELETE FROM "{self._list_table(f)}" WHERE id = ?', (key,))
+            if self.text_fields:
+                self.conn.execute(f'DELETE FROM "{self._ngram_table()}" WHERE id = ?', (key,))
+        return cursor.rowcount > 0
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute(f'SELECT COUNT(*) FROM "{self.collection}"').fetchone()[0]
+
+    def _compile(self, predicate: Predicate) -> Optional[tuple]:
+        """
+        把谓词编译为SQL条件，无法与 Predicate.matches 保持一致的操作数返回None（回表过滤）
+
+        - 字段缺失与值为None在列中都是NULL，匹配None时再用 json_type 区分
+        - 区间比较限定同类值：Python中数字与字符串不可比较，SQLite则按类型排序
+        """
+        field_name, op, value = predicate.field, predicate.op, predicate.value
+        operators = {'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+        if op == 'in':
+            if not isinstance(value, (list, tuple)) or not all(_is_sql_scalar(v) for v in value):
+                return None
+        elif op != 'contains' and not _is_sql_scalar(value):
+            return None
+
+        if field_name == self.key_field:
+            # 主键列为TEXT亲和性，非字符串操作数会被转换后比较
+            values = value if op == 'in' else [value]
+            if not all(isinstance(v, str) for v in values):
+                return None
+            column = 'id'
+        elif field_name in self.columns:
+            column = f'"{field_name}"'
+        elif field_name in self.list_fields:
+            values = value if op == 'in' else [value]
+            # 多值表按文本保存元素，只下推字符串
+            if op not in ('eq', 'in') or not all(isinstance(v, str) for v in values):
+                return None
+            placeholders = ", ".join("?" * len(values))
+            return (f'id IN (SELECT id FROM "{self._list_table(field_name)}" '
+                    f'WHERE value IN ({placeholders}))', list(values))
+        else:
+            return None
+
+        # 值为None（而非字段缺失）
+        is_null = f"({column} IS NULL AND json_type(data, ?) = 'null')"
+        null_params = [f'$."{field_name}"']
+
+        if op == 'eq':
+            if value is None:
+                return is_null, null_params
+            return f'{column} = ?', [value]
+        if op == 'in':
+            values = [v for v in value if v is not None]
+            clauses, params = [], []
+            if values:
+                clauses.append(f'{column} IN ({", ".join("?" * len(values))})')
+                params.extend(values)
+            if len(values) < len(value):
+                clauses.append(is_null)
+                params.extend(null_params)
+            if not clauses:
+                return '0', []
+            return f'({" OR ".join(clauses)})', params
+        if op in operators:
+            if value is None:
+                return '0', []
+            kinds = "('text')" if isinstance(value, str) else "('integer', 'real')"
+            return f'{column} {operators[op]} ? AND typeof({column}) IN {kinds}', [value]
+        if op == 'prefix':
+            if not isinstance(value, str):
+                return None
+            return f'{column} >= ? AND {column} < ?', [value, value + _MAX_CHAR]
+        if op == 'contains' and field_name in self.text_fields and len(str(value)) >= self.ngram.n:
+            grams = sorted(self.ngram.grams(value))
+            subquery = " INTERSECT ".join(
+                f'SELECT id FROM "{self._ngram_table()}" WHERE field = ? AND gram = ?' for _ in grams
+            )
+            params = [p for gram in grams for p in (field_name, gram)]
+            # n-gram只给出候选集，仍需回表校验
+            return f'id IN ({subquery})', params, 'candidate'
+        return None
+
+    def _build_query(self, predicates: List[Predicate]) -> tuple:
+        clauses, params, residual = [], [], []
+        for predicate in predicates:
+            compiled = self._compile(predicate)
+            if compiled is None:
+                residual.append(predicate)
+                continue
+            clauses.append(compiled[0])
+            params.extend(compiled[1])
+            if len(compiled) > 2:
+                residual.append(predicate)
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        return where, params, residual
+
+    def explain(self, predicates: List[Predicate]) -> List[str]:
+        """返回SQLite的查询计划"""
+        where, params, _ = self._build_query(predicates)
+        with self._lock:
+            rows = self.conn.execute(
+                f'EXPLAIN QUERY PLAN SELECT id FROM "{self.collection}"{where}', params
+            ).fetchall()
+        return [row[-1] for row in rows]
+
+    def select_keys(self, predicates: List[Predicate], order_by: str = None,
+                    descending: bool = False) -> List[str]:
+        where, params, residual = self._build_query(predicates)
+        sql_order = order_by in self.columns or order_by == self.key_field
+
+        order = " ORDER BY rowid"
+        if order_by and sql_order:
+            column = 'id' if order_by == self.key_field else f'"{order_by}"'
+            direction = "DESC" if descending else "ASC"
+            order = f" ORDER BY {column} IS NULL, {column} {direction}, rowid"
+
+        with self._lock:
+            if not residual and (not order_by or sql_order):
+                rows = self.conn.execute(
+                    f'SELECT id FROM "{self.collection}"{where}{order}', params
+                ).fetchall()
+                return [row[0] for row in rows]
+
+            rows = self.conn.execute(
+                f'SELECT id, data FROM "{self.collection}"{where}{order}', params
+            ).fetchall()
+
+        records = [(key, json.loads(data)) for key, data in rows]
+        records = [(k, r) for k, r in records if all(p.matches(r) for p in residual)]
+
+        if order_by and not sql_order:
+            present = [(k, r) for k, r in records if r.get(order_by) is not None]
+            missing = [(k, r) for k, r in records if r.get(order_by) is None]
+            present.sort(key=lambda item: _sort_key(item[1][order_by]), reverse=descending)
+            records = present + missing
+
+        return [k for k, _ in records]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def create_storage(filename: str, key_field: str, backend: str = None,
+                   **options) -> StorageBackend:
+    """根据配置创建存储后端"""
+    backend = backend or STORAGE_BACKEND
+    if backend == 'json':
+        return JSONStorage(os.path.join(DATA_DIR, filename), key_field, **options)
+    if backend == 'sqlite':
+        collection = os.path.splitext(filename)[0]
+        # 与数据库同目录的JSON数据文件视为切换前的旧数据
+        legacy_path = os.path.join(os.path.dirname(SQLITE_PATH), filename)
+        return SQLiteStorage(SQLITE_PATH, collection, key_field, legacy_path=legacy_path, **options)
+    raise ValueError(f"未知的存储后端: {backend}")
+
+
+class DataManager:
+    """数据管理基类"""
+
+    key_field = 'id'
+    indexed_fields: tuple = ()
+    list_fields: tuple = ()
+    range_fields: tuple = ()
+    text_fields: tuple = ()
+
+    def __init__(self, filename: str, storage: str = None):
+        self.filepath = os.path.join(DATA_DIR, filename)
+        self.store = create_storage(filename, self.key_field, storage,
+                                    indexed_fields=self.indexed_fields,
+                                    list_fields=self.list_fields,
+                                    range_fields=self.range_fields,
+                                    text_fields=self.text_fields)
+
+    @property
+    def data(self) -> List[Dict]:
+        """全部记录"""
+        return self.store.all()
+
+    def load(self):
+        """加载数据"""
+        self.store.load()
+
+    def save(self):
+        """保存数据"""
+        self.store.flush()
+
+    def batch(self):
+        """批量写入事务"""
+        return self.store.transaction()
+
+    def _build(self, record: Dict) -> Any:
+        """把记录转换为数据对象"""
+        return record
+
+    def query(self, order_by: str = None, descending: bool = False, **filters) -> QueryResult:
+        """条件查询，过滤条件写作 字段=值 或 字段__操作符=值
+
+        操作符: eq, in, gt, gte, lt, lte, prefix, contains
+        返回惰性结果，可用 page()/slice() 分页
+        """
+        keys = self.store.select_keys(parse_filters(filters), order_by, descending)
+        return QueryResult(self.store, keys, self._build)
+
 
 class CustomerManager(DataManager):
     """客户管理"""
 
-    def __init__(self):
-        super().__init__('customers.json')
+    key_field = 'customer_id'
+    indexed_fields = ('status', 'industry', 'scale')
+    list_fields = ('tags',)
+    range_fields = ('name', 'created_at', 'updated_at')
+    text_fields = ('name',)
+
+    def __init__(self, storage: str = None):
+        super().__init__('customers.json', storage)
 
     def add_customer(self, name: str, **kwargs) -> Customer:
         """添加客户"""
@@ -202,73 +1145,74 @@ class CustomerManager(DataManager):
             name=name,
             **kwargs
         )
-        self.data.append(asdict(customer))
-        self.save()
+        self.store.insert(asdict(customer))
         return customer
 
     def get_customer(self, customer_id: str) -> Optional[Customer]:
         """获取客户"""
-        for cust in self.data:
-            if cust['customer_id'] == customer_id:
-                return Customer(**cust)
-        return None
+        cust = self.store.get(customer_id)
+        return Customer(**cust) if cust else None
 
     def update_customer(self, customer_id: str, **kwargs) -> bool:
         """更新客户"""
-        for i, cust in enumerate(self.data):
-            if cust['customer_id'] == customer_id:
-                self.data[i].update(kwargs)
-                self.data[i]['updated_at'] = datetime.now().isoformat()
-                self.save()
-                return True
-        return False
+        kwargs['updated_at'] = datetime.now().isoformat()
+        return self.store.update(customer_id, kwargs) is not None
 
     def delete_customer(self, customer_id: str) -> bool:
         """删除客户"""
-        for i, cust in enumerate(self.data):
-            if cust['customer_id'] == customer_id:
-                del self.data[i]
-                self.save()
-                return True
-        return False
+        return self.store.delete(customer_id)
+
+    def _build(self, record: Dict) -> Customer:
+        return Customer(**record)
 
     def search_customers(self, **filters) -> List[Customer]:
-        """搜索客户"""
-        results = []
-        for cust in self.data:
-            match = True
-            for key, value in filters.items():
-                if key not in cust:
-                    match = False
-                    break
-                if isinstance(value, str) and value.lower() not in str(cust[key]).lower():
-                    match = False
-                    break
-            if match:
-                results.append(Customer(**cust))
-        return results
+        """搜索客户
+
+        不带操作符的字符串条件按子串（不区分大小写）匹配，
+        也可使用 字段__操作符=值，如 created_at__gte='2026-01-01'。
+        与早期逐条扫描的实现不同：多值字段（tags）按元素精确匹配，
+        非字符串条件按相等匹配（早期实现忽略这类条件）
+        """
+        return list(self.query(**self._search_filters(filters)))
+
+    def _search_filters(self, filters: Dict[str, Any]) -> Dict[str, Any]:
+        """把不带操作符的字符串条件转换为子串查询"""
+        converted = {}
+        for key, value in filters.items():
+            if '__' not in key and isinstance(value, str) and key not in self.list_fields:
+                key = f"{key}__contains"
+            converted[key] = value
+        return converted
 
     def add_tag(self, customer_id: str, tag: str) -> bool:
         """添加标签"""
-        for cust in self.data:
-            if cust['customer_id'] == customer_id:
-                if tag not in cust['tags']:
-                    cust['tags'].append(tag)
-                    cust['updated_at'] = datetime.now().isoformat()
-                    self.save()
-                return True
-        return False
+        cust = self.store.get(customer_id)
+        if cust is None:
+            return False
+        if tag not in cust['tags']:
+            self.store.update(customer_id, {
+                'tags': cust['tags'] + [tag],
+                'updated_at': datetime.now().isoformat()
+            })
+        return True
+
+    def customers_with_tag(self, tag: str) -> List[Customer]:
+        """按标签获取客户"""
+        return [Customer(**cust) for cust in self.store.find(tags=tag)]
 
     def list_all(self) -> List[Customer]:
         """列出所有客户"""
-        return [Customer(**cust) for cust in self.data]
+        return [Customer(**cust) for cust in self.store.all()]
 
 
 class ContactManager(DataManager):
     """联系人管理"""
 
-    def __init__(self):
-        super().__init__('contacts.json')
+    key_field = 'contact_id'
+    indexed_fields = ('customer_id',)
+
+    def __init__(self, storage: str = None):
+        super().__init__('contacts.json', storage)
 
     def add_contact(self, customer_id: str, name: str, **kwargs) -> Contact:
         """添加联系人"""
@@ -278,35 +1222,40 @@ class ContactManager(DataManager):
             name=name,
             **kwargs
         )
-        self.data.append(asdict(contact))
-        self.save()
+        self.store.insert(asdict(contact))
         return contact
 
     def get_contacts(self, customer_id: str) -> List[Contact]:
         """获取客户的所有联系人"""
-        return [Contact(**c) for c in self.data if c['customer_id'] == customer_id]
+        return [Contact(**c) for c in self.store.find(customer_id=customer_id)]
 
     def add_interaction(self, contact_id: str, interaction_type: str, content: str, **kwargs) -> bool:
         """添加沟通记录"""
-        for contact in self.data:
-            if contact['contact_id'] == contact_id:
-                interaction = Interaction(
-                    date=datetime.now().isoformat(),
-                    type=interaction_type,
-                    content=content,
-                    **kwargs
-                )
-                contact['interactions'].append(asdict(interaction))
-                self.save()
-                return True
-        return False
+        contact = self.store.get(contact_id)
+        if contact is None:
+            return False
+        interaction = Interaction(
+            date=datetime.now().isoformat(),
+            type=interaction_type,
+            content=content,
+            **kwargs
+        )
+        self.store.update(contact_id, {
+            'interactions': contact['interactions'] + [asdict(interaction)]
+        })
+        return True
 
 
 class LeadManager(DataManager):
     """线索管理"""
 
-    def __init__(self):
-        super().__init__('leads.json')
+    key_field = 'lead_id'
+    indexed_fields = ('status', 'assigned_to', 'source')
+    range_fields = ('score', 'created_at')
+    text_fields = ('name', 'company')
+
+    def __init__(self, storage: str = None):
+        super().__init__('leads.json', storage)
 
     def add_lead(self, name: str, company: str, **kwargs) -> Lead:
         """添加线索"""
@@ -318,8 +1267,7 @@ class LeadManager(DataManager):
         )
         # 自动评分
         lead.score = self._score_lead(asdict(lead))
-        self.data.append(asdict(lead))
-        self.save()
+        self.store.insert(asdict(lead))
         return lead
 
     def _score_lead(self, lead: Dict) -> int:
@@ -351,39 +1299,36 @@ class LeadManager(DataManager):
 
     def get_lead(self, lead_id: str) -> Optional[Lead]:
         """获取线索"""
-        for lead in self.data:
-            if lead['lead_id'] == lead_id:
-                return Lead(**lead)
-        return None
+        lead = self.store.get(lead_id)
+        return Lead(**lead) if lead else None
 
     def update_lead(self, lead_id: str, **kwargs) -> bool:
         """更新线索"""
-        for i, lead in enumerate(self.data):
-            if lead['lead_id'] == lead_id:
-                self.data[i].update(kwargs)
-                self.save()
-                return True
-        return False
+        return self.store.update(lead_id, kwargs) is not None
+
+    def _build(self, record: Dict) -> Lead:
+        return Lead(**record)
 
     def list_leads(self, **filters) -> List[Lead]:
-        """列出线索"""
-        results = []
-        for lead in self.data:
-            match = True
-            for key, value in filters.items():
-                if key not in lead or lead[key] != value:
-                    match = False
-                    break
-            if match:
-                results.append(Lead(**lead))
-        return results
+        """列出线索，支持 字段__操作符=值 形式的条件"""
+        return list(self.query(**filters))
 
 
 class OpportunityManager(DataManager):
     """商机管理"""
 
-    def __init__(self):
-        super().__init__('opportunities.json')
+    key_field = 'opportunity_id'
+    indexed_fields = ('customer_id', 'stage', 'status', 'assigned_to')
+    range_fields = ('amount', 'probability', 'expected_close_date', 'created_at', 'updated_at')
+    text_fields = ('title',)
+
+    # Opportunity类的字段
+    opp_fields = {'opportunity_id', 'customer_id', 'title', 'amount', 'stage',
+                  'probability', 'expected_close_date', 'created_at', 'updated_at',
+                  'assigned_to', 'competitors', 'status'}
+
+    def __init__(self, storage: str = None):
+        super().__init__('opportunities.json', storage)
 
     def create_opportunity(self, customer_id: str, title: str, amount: float, **kwargs) -> Opportunity:
         """创建商机"""
@@ -400,8 +1345,7 @@ class OpportunityManager(DataManager):
             probability=probability,
             **kwargs
         )
-        self.data.append(asdict(opportunity))
-        self.save()
+        self.store.insert(asdict(opportunity))
         return opportunity
 
     def _get_stage_probability(self, stage: str) -> int:
@@ -418,16 +1362,11 @@ class OpportunityManager(DataManager):
 
     def update_opportunity(self, opportunity_id: str, **kwargs) -> bool:
         """更新商机"""
-        for i, opp in enumerate(self.data):
-            if opp['opportunity_id'] == opportunity_id:
-                # 如果更新阶段，自动更新概率
-                if 'stage' in kwargs:
-                    kwargs['probability'] = self._get_stage_probability(kwargs['stage'])
-                self.data[i].update(kwargs)
-                self.data[i]['updated_at'] = datetime.now().isoformat()
-                self.save()
-                return True
-        return False
+        # 如果更新阶段，自动更新概率
+        if 'stage' in kwargs:
+            kwargs['probability'] = self._get_stage_probability(kwargs['stage'])
+        kwargs['updated_at'] = datetime.now().isoformat()
+        return self.store.update(opportunity_id, kwargs) is not None
 
     def close_opportunity(self, opportunity_id: str, status: str, **kwargs) -> bool:
         """关闭商机"""
@@ -444,44 +1383,30 @@ class OpportunityManager(DataManager):
         kwargs['status'] = status
         return self.update_opportunity(opportunity_id, **kwargs)
 
+    def _build(self, record: Dict) -> Opportunity:
+        # 只传递Opportunity类定义的字段
+        return Opportunity(**{k: v for k, v in record.items() if k in self.opp_fields})
+
     def list_opportunities(self, **filters) -> List[Opportunity]:
-        """列出商机"""
-        results = []
-        # Opportunity类的字段
-        opp_fields = {'opportunity_id', 'customer_id', 'title', 'amount', 'stage',
-                      'probability', 'expected_close_date', 'created_at', 'updated_at',
-                      'assigned_to', 'competitors', 'status'}
-        for opp in self.data:
-            match = True
-            for key, value in filters.items():
-                if key not in opp or opp[key] != value:
-                    match = False
-                    break
-            if match:
-                # 只传递Opportunity类定义的字段
-                opp_data = {k: v for k, v in opp.items() if k in opp_fields}
-                results.append(Opportunity(**opp_data))
-        return results
+        """列出商机，支持 字段__操作符=值 形式的条件"""
+        return list(self.query(**filters))
 
     def get_opportunity(self, opportunity_id: str) -> Optional[Opportunity]:
         """获取商机"""
-        # Opportunity类的字段
-        opp_fields = {'opportunity_id', 'customer_id', 'title', 'amount', 'stage',
-                      'probability', 'expected_close_date', 'created_at', 'updated_at',
-                      'assigned_to', 'competitors', 'status'}
-        for opp in self.data:
-            if opp['opportunity_id'] == opportunity_id:
-                # 只传递Opportunity类定义的字段
-                opp_data = {k: v for k, v in opp.items() if k in opp_fields}
-                return Opportunity(**opp_data)
-        return None
+        opp = self.store.get(opportunity_id)
+        return self._build(opp) if opp else None
 
 
 class TaskManager(DataManager):
     """任务管理"""
 
-    def __init__(self):
-        super().__init__('tasks.json')
+    key_field = 'task_id'
+    indexed_fields = ('customer_id', 'status', 'assignee', 'priority', 'type')
+    range_fields = ('due_date', 'created_at')
+    text_fields = ('title',)
+
+    def __init__(self, storage: str = None):
+        super().__init__('tasks.json', storage)
 
     def create_task(self, task_type: str, title: str, **kwargs) -> Task:
         """创建任务"""
@@ -491,52 +1416,285 @@ class TaskManager(DataManager):
             title=title,
             **kwargs
         )
-        self.data.append(asdict(task))
-        self.save()
+        self.store.insert(asdict(task))
         return task
 
     def complete_task(self, task_id: str) -> bool:
         """完成任务"""
-        for i, task in enumerate(self.data):
-            if task['task_id'] == task_id:
-                self.data[i]['status'] = TaskStatus.COMPLETED.value
-                self.data[i]['completed_at'] = datetime.now().isoformat()
-                self.save()
-                return True
-        return False
+        return self.store.update(task_id, {
+            'status': TaskStatus.COMPLETED.value,
+            'completed_at': datetime.now().isoformat()
+        }) is not None
+
+    def _build(self, record: Dict) -> Task:
+        return Task(**record)
 
     def list_tasks(self, **filters) -> List[Task]:
-        """列出任务"""
-        results = []
-        for task in self.data:
-            match = True
-            for key, value in filters.items():
-                if key not in task or task[key] != value:
-                    match = False
-                    break
-            if match:
-                results.append(Task(**task))
-        return results
+        """列出任务，支持 字段__操作符=值 形式的条件"""
+        return list(self.query(**filters))
 
     def get_task(self, task_id: str) -> Optional[Task]:
         """获取任务"""
-        for task in self.data:
-            if task['task_id'] == task_id:
-                return Task(**task)
+        task = self.store.get(task_id)
+        return Task(**task) if task else None
+
+
+# 销售漏斗中的未成交阶段
+FUNNEL_STAGES = [OpportunityStage.INITIAL.value,
+                 OpportunityStage.DISCOVERY.value,
+                 OpportunityStage.PROPOSAL.value,
+                 OpportunityStage.NEGOTIATION.value]
+
+
+def _bump(table: Dict, key, delta):
+    """累加计数，归零时删除键"""
+    value = table.get(key, 0) + delta
+    if abs(value) < 1e-9:
+        table.pop(key, None)
+    else:
+        table[key] = value
+
+
+class PipelineAggregates:
+    """销售管道物化聚合 - 订阅存储变更增量维护，报表和快照直接读取"""
+
+    PERIOD_LENGTHS = {'year': 4, 'month': 7, 'day': 10}
+
+    def __init__(self, customer_mgr: "CustomerManager", opportunity_mgr: "OpportunityManager",
+                 lead_mgr: "LeadManager", task_mgr: "TaskManager",
+                 granularity: str = 'month', history_size: int = 120):
+        if granularity not in self.PERIOD_LENGTHS:
+            raise ValueError(f"不支持的统计周期: {granularity}")
+
+        self.customer_mgr = customer_mgr
+        self.opportunity_mgr = opportunity_mgr
+        self.lead_mgr = lead_mgr
+        self.task_mgr = task_mgr
+        self.granularity = granularity
+        self._period_length = self.PERIOD_LENGTHS[granularity]
+
+        self._lock = threading.RLock()
+        self.version = 0
+        self._snapshot: Optional[Dict] = None
+        self._dirty = False  # 增量更新中途失败，读取前需要全量重建
+        self.history: deque = deque(maxlen=history_size)
+
+        self._collections = [
+            (customer_mgr, self._reset_customers, self._apply_customer),
+            (opportunity_mgr, self._reset_opportunities, self._apply_opportunity),
+            (lead_mgr, self._reset_leads, self._apply_lead),
+            (task_mgr, self._reset_tasks, self._apply_task),
+        ]
+        self._listeners = []
+        for manager, reset, apply in self._collections:
+            listener = self._make_listener(manager, reset, apply)
+            manager.store.add_listener(listener)
+            self._listeners.append((manager, listener))
+
+        self.rebuild()
+
+    def _make_listener(self, manager, reset, apply):
+        def on_change(event: str, old: Optional[Dict], new: Optional[Dict]):
+            with self._lock:
+                try:
+                    if event == 'reload':
+                        self._rebuild_collection(manager, reset, apply)
+                    else:
+                        if old is not None:
+                            apply(old, -1)
+                        if new is not None:
+                            apply(new, 1)
+                except Exception:
+                    # 聚合可能只更新了一半，读取时从存储全量重建
+                    self._dirty = True
+                    raise
+                finally:
+                    self.version += 1
+        return on_change
+
+    def close(self):
+        """取消订阅"""
+        for manager, listener in self._listeners:
+            manager.store.remove_listener(listener)
+        self._listeners = []
+
+    def _period(self, timestamp: Optional[str]) -> str:
+        return (timestamp or '')[:self._period_length] or 'unknown'
+
+    def _rebuild_collection(self, manager, reset, apply):
+        reset()
+        for record in manager.store.all():
+            apply(record, 1)
+
+    def rebuild(self):
+        """全量重建聚合"""
+        with self._lock:
+            for manager, reset, apply in self._collections:
+                self._rebuild_collection(manager, reset, apply)
+            self._dirty = False
+            self.version += 1
+
+    @contextmanager
+    def consistent(self):
+        """持有锁读取聚合；增量更新失败过时先全量重建"""
+        with self._lock:
+            if self._dirty:
+                self.rebuild()
+            yield self
+
+    # 客户
+    def _reset_customers(self):
+        self.customer_count = 0
+        self.customer_status_counts: Dict[str, int] = {}
+
+    def _apply_customer(self, record: Dict, sign: int):
+        self.customer_count += sign
+        _bump(self.customer_status_counts, record.get('status'), sign)
+
+    # 商机
+    def _reset_opportunities(self):
+        self.stage_counts: Dict[str, int] = {}
+        self.stage_amounts: Dict[str, float] = {}
+        self.status_counts: Dict[str, int] = {}
+        self.status_amounts: Dict[str, float] = {}
+        self.weighted_pipeline = 0.0
+        self.revenue_by_customer: Dict[str, float] = {}
+        self.rep_opportunities: Dict[str, int] = {}
+        self.rep_won_count: Dict[str, int] = {}
+        self.rep_won_amount: Dict[str, float] = {}
+        self.opportunity_periods: Dict[tuple, int] = {}
+
+    def _apply_opportunity(self, record: Dict, sign: int):
+        amount = record.get('amount') or 0
+        status = record.get('status')
+        stage = record.get('stage')
+
+        _bump(self.status_counts, status, sign)
+        _bump(self.status_amounts, status, sign * amount)
+
+        if status == 'open':
+            _bump(self.stage_counts, stage, sign)
+            _bump(self.stage_amounts, stage, sign * amount)
+            self.weighted_pipeline += sign * amount * (record.get('probability') or 0) / 100
+        elif status == 'won':
+            _bump(self.revenue_by_customer, record.get('customer_id'), sign * amount)
+
+        rep = record.get('assigned_to')
+        if rep:
+            _bump(self.rep_opportunities, rep, sign)
+            if status == 'won':
+                _bump(self.rep_won_count, rep, sign)
+                _bump(self.rep_won_amount, rep, sign * amount)
+
+        # 按商机创建周期统计成交/流失（同期群口径）
+        period = self._period(record.get('created_at'))
+        _bump(self.opportunity_periods, (period, 'created'), sign)
+        if status in ('won', 'lost'):
+            _bump(self.opportunity_periods, (period, status), sign)
+
+    # 线索
+    def _reset_leads(self):
+        self.lead_count = 0
+        self.lead_periods: Dict[tuple, int] = {}
+
+    def _apply_lead(self, record: Dict, sign: int):
+        self.lead_count += sign
+        period = self._period(record.get('created_at'))
+        _bump(self.lead_periods, (period, 'created'), sign)
+        if record.get('status') == LeadStatus.CONVERTED.value:
+            _bump(self.lead_periods, (period, 'converted'), sign)
+
+    # 任务
+    def _reset_tasks(self):
+        self.tasks_completed: Dict[str, int] = {}
+
+    def _apply_task(self, record: Dict, sign: int):
+        if record.get('assignee') and record.get('status') == TaskStatus.COMPLETED.value:
+            _bump(self.tasks_completed, record['assignee'], sign)
+
+    def conversion_rates(self) -> Dict[str, Dict[str, Any]]:
+        """按周期统计线索转化率和商机赢单率"""
+        with self.consistent():
+            periods = sorted({p for p, _ in self.lead_periods} |
+                             {p for p, _ in self.opportunity_periods})
+            result = {}
+            for period in periods:
+                leads = self.lead_periods.get((period, 'created'), 0)
+                converted = self.lead_periods.get((period, 'converted'), 0)
+                opportunities = self.opportunity_periods.get((period, 'created'), 0)
+                won = self.opportunity_periods.get((period, 'won'), 0)
+                lost = self.opportunity_periods.get((period, 'lost'), 0)
+                result[period] = {
+                    'leads': leads,
+                    'converted': converted,
+                    'lead_conversion_rate': round(converted / leads, 4) if leads else 0.0,
+                    'opportunities': opportunities,
+                    'won': won,
+                    'lost': lost,
+                    'win_rate': round(won / (won + lost), 4) if won + lost else 0.0
+                }
+            return result
+
+    def _build_snapshot(self) -> Dict[str, Any]:
+        won = self.status_counts.get('won', 0)
+        lost = self.status_counts.get('lost', 0)
+        return {
+            'version': self.version,
+            'timestamp': datetime.now().isoformat(),
+            'stages': {
+                stage: {
+                    'count': self.stage_counts.get(stage, 0),
+                    'amount': self.stage_amounts.get(stage, 0),
+                    'probability': self.opportunity_mgr._get_stage_probability(stage)
+                }
+                for stage in FUNNEL_STAGES
+            },
+            'open_count': self.status_counts.get('open', 0),
+            'open_amount': self.status_amounts.get('open', 0),
+            'weighted_pipeline': round(self.weighted_pipeline, 2),
+            'won_count': won,
+            'won_amount': self.status_amounts.get('won', 0),
+            'lost_count': lost,
+            'win_rate': round(won / (won + lost), 4) if won + lost else 0.0,
+            'customers': self.customer_count,
+            'leads': self.lead_count,
+            'conversion_by_period': self.conversion_rates()
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前时间点的聚合快照；数据未变化时直接复用上一次的结果"""
+        with self.consistent():
+            if self._snapshot is None or self._snapshot['version'] != self.version:
+                self._snapshot = self._build_snapshot()
+                self.history.append(self._snapshot)
+            return copy.deepcopy(self._snapshot)
+
+    def snapshot_at(self, timestamp: str) -> Optional[Dict[str, Any]]:
+        """获取指定时间点（ISO格式）之前最近的一次快照"""
+        with self._lock:
+            for snapshot in reversed(self.history):
+                if snapshot['timestamp'] <= timestamp:
+                    return copy.deepcopy(snapshot)
         return None
 
 
 class AnalyticsManager:
-    """数据分析"""
-
-    def __init__(self):
-        self.customer_mgr = CustomerManager()
-        self.opportunity_mgr = OpportunityManager()
-        self.lead_mgr = LeadManager()
-        self.task_mgr = TaskManager()
+    """数据分析 - 报表读取增量维护的物化聚合，不再逐次全量扫描"""
+
+    def __init__(self, storage: str = None,
+                 customer_mgr: CustomerManager = None,
+                 opportunity_mgr: OpportunityManager = None,
+                 lead_mgr: LeadManager = None,
+                 task_mgr: TaskManager = None):
+        self.customer_mgr = customer_mgr or CustomerManager(storage)
+        self.opportunity_mgr = opportunity_mgr or OpportunityManager(storage)
+        self.lead_mgr = lead_mgr or LeadManager(storage)
+        self.task_mgr = task_mgr or TaskManager(storage)
+        self.pipeline = PipelineAggregates(self.customer_mgr, self.opportunity_mgr,
+                                           self.lead_mgr, self.task_mgr)
 
     def reload_data(self):
-        """重新加载数据"""
+        """重新加载数据（其他进程写入后调用），聚合随之重建"""
         self.customer_mgr.load()
         self.opportunity_mgr.load()
         self.lead_mgr.load()
@@ -544,64 +1702,44 @@ class AnalyticsManager:
 
     def sales_funnel(self) -> Dict:
         """销售漏斗分析"""
-        # 重新加载数据
-        self.reload_data()
-        opps = self.opportunity_mgr.list_opportunities(status="open")
-
-        funnel = {}
-        for stage in [OpportunityStage.INITIAL.value,
-                      OpportunityStage.DISCOVERY.value,
-                      OpportunityStage.PROPOSAL.value,
-                      OpportunityStage.NEGOTIATION.value]:
-            count = sum(1 for opp in opps if opp.stage == stage)
-            amount = sum(opp.amount for opp in opps if opp.stage == stage)
-            funnel[stage] = {
-                'count': count,
-                'amount': amount,
-                'probability': self.opportunity_mgr._get_stage_probability(stage)
-            }
+        return self.pipeline.snapshot()['stages']
 
-        return funnel
+    def pipeline_snapshot(self) -> Dict:
+        """销售管道快照（阶段分布、加权管道金额、分周期转化率）"""
+        return self.pipeline.snapshot()
+
+    def conversion_rates(self) -> Dict:
+        """分周期转化率"""
+        return self.pipeline.conversion_rates()
 
     def customer_value(self) -> Dict:
         """客户价值分析"""
-        # 重新加载数据
-        self.reload_data()
-        customers = self.customer_mgr.list_all()
-        opps = self.opportunity_mgr.list_opportunities(status="won")
-
-        # 按客户统计成交金额
-        customer_revenue = {}
-        for opp in opps:
-            if opp.customer_id not in customer_revenue:
-                customer_revenue[opp.customer_id] = 0
-            customer_revenue[opp.customer_id] += opp.amount
-
-        # 排序
-        sorted_customers = sorted(customer_revenue.items(),
-                                   key=lambda x: x[1],
-                                   reverse=True)
+        pipeline = self.pipeline
+        with pipeline.consistent():
+            total_customers = pipeline.customer_count
+            active_customers = pipeline.customer_status_counts.get(CustomerStatus.ACTIVE.value, 0)
+            top_customers = heapq.nlargest(10, pipeline.revenue_by_customer.items(),
+                                           key=lambda x: x[1])
+
+        revenue_by_customer = []
+        for cid, revenue in top_customers:  # 前10名
+            customer = self.customer_mgr.get_customer(cid)
+            revenue_by_customer.append({
+                'customer_id': cid,
+                'customer_name': customer.name if customer else cid,
+                'revenue': revenue
+            })
 
         return {
-            'total_customers': len(customers),
-            'active_customers': len([c for c in customers
-                                    if c.status == CustomerStatus.ACTIVE.value]),
-            'revenue_by_customer': [
-                {
-                    'customer_id': cid,
-                    'customer_name': self.customer_mgr.get_customer(cid).name,
-                    'revenue': revenue
-                }
-                for cid, revenue in sorted_customers[:10]  # 前10名
-            ]
+            'total_customers': total_customers,
+            'active_customers': active_customers,
+            'revenue_by_customer': revenue_by_customer
         }
 
     def rfm_analysis(self) -> Dict:
         """RFM分析"""
-        # 重新加载数据
-        self.reload_data()
         opps = self.opportunity_mgr.list_opportunities(status="won")
-        leads = self.lead_mgr.list_leads()
+        lead_count = self.pipeline.lead_count
 
         if not opps:
             return {'message': '暂无成交数据'}
@@ -654,8 +1792,8 @@ class AnalyticsManager:
 
         return {
             'customer_count': len(customer_rfm),
-            'lead_count': len(leads),
-            'conversion_rate': round(len(leads) / max(len(customer_rfm), 1), 2),
+            'lead_count': lead_count,
+            'conversion_rate': round(lead_count / max(len(customer_rfm), 1), 2),
             'top_customers': sorted(customer_rfm.items(),
                                     key=lambda x: x[1]['total_score'],
                                     reverse=True)[:10]
@@ -663,40 +1801,22 @@ class AnalyticsManager:
 
     def sales_performance(self, period: str = None) -> Dict:
         """销售业绩分析"""
-        # 重新加载数据
-        self.reload_data()
-        opps = self.opportunity_mgr.list_opportunities()
-        tasks = self.task_mgr.list_tasks()
-
-        # 按销售人员统计
-        sales_performance = {}
-        for opp in opps:
-            if opp.assigned_to:
-                if opp.assigned_to not in sales_performance:
-                    sales_performance[opp.assigned_to] = {
-                        'opportunities': 0,
-                        'won_amount': 0,
-                        'won_count': 0,
-                        'tasks_completed': 0
-                    }
-                sales_performance[opp.assigned_to]['opportunities'] += 1
-                if opp.status == 'won':
-                    sales_performance[opp.assigned_to]['won_amount'] += opp.amount
-                    sales_performance[opp.assigned_to]['won_count'] += 1
-
-        for task in tasks:
-            if task.assignee and task.status == TaskStatus.COMPLETED.value:
-                if task.assignee not in sales_performance:
-                    sales_performance[task.assignee] = {
-                        'opportunities': 0,
-                        'won_amount': 0,
-                        'won_count': 0,
-                        'tasks_completed': 0
-                    }
-                sales_performance[task.assignee]['tasks_completed'] += 1
+        pipeline = self.pipeline
+        with pipeline.consistent():
+            reps = list(dict.fromkeys(list(pipeline.rep_opportunities) +
+                                      list(pipeline.tasks_completed)))
+            sales_performance = {
+                rep: {
+                    'opportunities': pipeline.rep_opportunities.get(rep, 0),
+                    'won_amount': pipeline.rep_won_amount.get(rep, 0),
+                    'won_count': pipeline.rep_won_count.get(rep, 0),
+                    'tasks_completed': pipeline.tasks_completed.get(rep, 0)
+                }
+                for rep in reps
+            }
 
         return {
-            'sales_reps': list(sales_performance.keys()),
+            'sales_reps': reps,
             'performance': sales_performance
         }
 
@@ -704,13 +1824,17 @@ class AnalyticsManager:
 class CRMSystem:
     """CRM系统主类"""
 
-    def __init__(self):
-        self.customer_mgr = CustomerManager()
-        self.contact_mgr = ContactManager()
-        self.lead_mgr = LeadManager()
-        self.opportunity_mgr = OpportunityManager()
-        self.task_mgr = TaskManager()
-        self.analytics = AnalyticsManager()
+    def __init__(self, storage: str = None):
+        self.customer_mgr = CustomerManager(storage)
+        self.contact_mgr = ContactManager(storage)
+        self.lead_mgr = LeadManager(storage)
+        self.opportunity_mgr = OpportunityManager(storage)
+        self.task_mgr = TaskManager(storage)
+        self.analytics = AnalyticsManager(storage,
+                                          customer_mgr=self.customer_mgr,
+                                          opportunity_mgr=self.opportunity_mgr,
+                                          lead_mgr=self.lead_mgr,
+                                          task_mgr=self.task_mgr)
 
     # 客户管理
     def add_customer(self, name: str, **kwargs) -> Customer:
@@ -818,6 +1942,9 @@ class CRMSystem:
     def sales_performance(self, period: str = None) -> Dict:
         return self.analytics.sales_performance(period)
 
+    def pipeline_snapshot(self) -> Dict:
+        return self.analytics.pipeline_snapshot()
+
 
 def main():
     """命令行接口"""
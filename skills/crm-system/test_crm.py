@@ -8,11 +8,13 @@ import os
 import sys
 import json
 import shutil
+import tempfile
 from datetime import datetime
 
 # 添加技能目录到路径
 sys.path.insert(0, os.path.dirname(__file__))
 
+import crm as crm_module
 from crm import (
     CRMSystem,
     CustomerStatus,
@@ -451,6 +453,303 @@ class TestCRM:
         self.assert_true(sales_001_perf['won_count'] >= 1, "成交数正确")
         self.assert_true(sales_001_perf['tasks_completed'] >= 1, "完成任务数正确")
 
+    def test_sqlite_storage(self):
+        """测试SQLite存储后端"""
+        print("\n📋 测试SQLite存储后端...")
+
+        tmp_dir = tempfile.mkdtemp()
+        original_path = crm_module.SQLITE_PATH
+        crm_module.SQLITE_PATH = os.path.join(tmp_dir, 'crm.db')
+
+        try:
+            crm = CRMSystem(storage='sqlite')
+
+            # 测试1: 批量事务写入
+            with crm.customer_mgr.batch():
+                customers = [crm.add_customer(name=f"批量客户{i}", industry="软件")
+                             for i in range(50)]
+            self.assert_equal(crm.customer_mgr.store.count(), 50, "SQLite批量写入数量正确")
+
+            # 测试2: 主键查询与部分更新
+            target = customers[10]
+            crm.update_customer(target.customer_id, status=CustomerStatus.INACTIVE.value)
+            updated = crm.customer_mgr.get_customer(target.customer_id)
+            self.assert_equal(updated.status, CustomerStatus.INACTIVE.value, "SQLite部分更新正确")
+            self.assert_equal(updated.industry, "软件", "SQLite部分更新保留其他字段")
+
+            # 测试3: 索引查询
+            inactive = crm.customer_mgr.store.find(status=CustomerStatus.INACTIVE.value)
+            self.assert_equal(len(inactive), 1, "SQLite状态索引查询正确")
+
+            crm.add_tag(target.customer_id, "VIP")
+            tagged = crm.customer_mgr.customers_with_tag("VIP")
+            self.assert_equal([c.customer_id for c in tagged], [target.customer_id], "SQLite标签索引查询正确")
+
+            # 测试4: 事务回滚
+            try:
+                with crm.customer_mgr.batch():
+                    crm.add_customer(name="回滚客户")
+                    raise RuntimeError("rollback")
+            except RuntimeError:
+                pass
+            self.assert_equal(crm.customer_mgr.store.count(), 50, "SQLite事务回滚正确")
+
+            # 测试5: 其他管理器共享同一数据库
+            opp = crm.create_opportunity(target.customer_id, "SQLite商机", 10000)
+            crm.close_opportunity(opp.opportunity_id, status="won")
+            won = crm.list_opportunities(status="won")
+            self.assert_equal(len(won), 1, "SQLite商机查询正确")
+
+            fresh = CRMSystem(storage='sqlite')
+            self.assert_equal(len(fresh.customer_mgr.list_all()), 50, "SQLite数据持久化正确")
+
+            self.assert_true(crm.delete_customer(customers[0].customer_id), "SQLite删除客户成功")
+            self.assert_true(crm.customer_mgr.get_customer(customers[0].customer_id) is None, "SQLite删除验证成功")
+
+            # 测试6: 首次使用SQLite时导入同目录的旧JSON数据，只导入一次
+            legacy_dir = tempfile.mkdtemp(dir=tmp_dir)
+            crm_module.SQLITE_PATH = os.path.join(legacy_dir, 'crm.db')
+            with open(os.path.join(legacy_dir, 'customers.json'), 'w', encoding='utf-8') as f:
+                json.dump([{"customer_id": "legacy-1", "name": "旧客户", "tags": ["VIP"]}], f)
+            migrated = CRMSystem(storage='sqlite')
+            self.assert_equal(migrated.customer_mgr.get_customer("legacy-1").name, "旧客户", "旧JSON数据导入正确")
+            self.assert_equal(len(CRMSystem(storage='sqlite').customer_mgr.list_all()), 1, "旧JSON数据只导入一次")
+
+            # 测试7: 存储后端基类不能直接实例化
+            try:
+                crm_module.StorageBackend("x", "id")
+                self.assert_true(False, "存储后端基类应为抽象类")
+            except TypeError:
+                self.assert_true(True, "存储后端基类为抽象类")
+        finally:
+            crm_module.SQLITE_PATH = original_path
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def test_query_planner(self):
+        """测试二级索引与查询计划"""
+        print("\n📋 测试二级索引与查询计划...")
+
+        tmp_dir = tempfile.mkdtemp()
+        original_path = crm_module.SQLITE_PATH
+        crm_module.SQLITE_PATH = os.path.join(tmp_dir, 'crm.db')
+
+        try:
+            systems = {}
+            for storage in ('json', 'sqlite'):
+                crm = systems[storage] = CRMSystem(storage=storage)
+                customer = crm.add_customer(name=f"查询测试公司-{storage}")
+
+                with crm.opportunity_mgr.batch():
+                    for i in range(30):
+                        crm.create_opportunity(
+                            customer.customer_id, f"查询商机{i:02d}", 1000 * i,
+                            stage=OpportunityStage.DISCOVERY.value,
+                            assigned_to=f"query_rep_{i % 3}"
+                        )
+
+                # 区间 + 等值
+                opps = crm.list_opportunities(customer_id=customer.customer_id,
+                                              amount__gte=10000, amount__lt=20000)
+                self.assert_equal(len(opps), 10, f"[{storage}] 区间查询数量正确")
+
+                # in + 前缀
+                opps = crm.list_opportunities(customer_id=customer.customer_id,
+                                              assigned_to__in=["query_rep_0", "query_rep_1"],
+                                              title__prefix="查询商机0")
+                self.assert_equal(len(opps), 7, f"[{storage}] in与前缀查询数量正确")
+
+                # 子串查询（n-gram索引）
+                customers = crm.search_customers(name=f"测试公司-{storage}")
+                self.assert_equal([c.customer_id for c in customers], [customer.customer_id],
+                                  f"[{storage}] 子串查询正确")
+
+                # 排序 + 分页
+                result = crm.opportunity_mgr.query(customer_id=customer.customer_id,
+                                                   order_by='amount', descending=True)
+                self.assert_equal(result.count(), 30, f"[{storage}] 惰性结果计数正确")
+                page = result.page(2, 10)
+                self.assert_equal([o.amount for o in page], [1000 * i for i in range(19, 9, -1)],
+                                  f"[{storage}] 排序分页正确")
+
+                # 更新后索引同步
+                crm.update_opportunity(page[0].opportunity_id, amount=999999)
+                top = crm.opportunity_mgr.query(customer_id=customer.customer_id,
+                                                amount__gt=500000).first()
+                self.assert_equal(top.opportunity_id, page[0].opportunity_id,
+                                  f"[{storage}] 更新后索引同步正确")
+
+            # 查询计划选择选择性最高的索引
+            plan = systems['json'].opportunity_mgr.store.explain(
+                crm_module.parse_filters({'stage': OpportunityStage.DISCOVERY.value,
+                                          'amount__gt': 500000}))
+            self.assert_equal(plan['index'], 'sorted:amount', "查询计划选择有序索引")
+
+            plan = systems['sqlite'].opportunity_mgr.store.explain(
+                crm_module.parse_filters({'amount__gte': 10000}))
+            self.assert_true(any('idx_opportunities_amount' in row for row in plan),
+                             "SQLite查询计划使用索引")
+
+            # 有序索引中混有不同类型的值：不报错，区间只匹配同类值
+            index = crm_module.SortedIndex('amount')
+            for key, value in [('a', 5), ('b', 'abc'), ('c', 3.5), ('d', None), ('e', 'abd'), ('f', 7)]:
+                index.add(key, value)
+            self.assert_equal(index.lookup('gt', 4), ['a', 'f'], "混合类型区间查询正确")
+            self.assert_equal(index.lookup('prefix', 'ab'), ['b', 'e'], "混合类型前缀查询正确")
+            index.remove('b', 'abc')
+            self.assert_equal(index.lookup('lte', 'zzz'), ['e'], "混合类型删除正确")
+
+            crm = systems['json']
+            mixed = crm.add_customer(name="混合类型客户", scale="100-500")
+            crm.add_customer(name="混合类型客户2", scale=200)
+            result = crm.customer_mgr.query(name="混合类型客户", order_by='scale').all()
+            self.assert_equal(len(result), 1, "混合类型查询正确")
+            ordered = crm.customer_mgr.query(name__prefix="混合类型", order_by='scale').all()
+            self.assert_equal(ordered[-1].customer_id, mixed.customer_id, "混合类型排序正确")
+        finally:
+            crm_module.SQLITE_PATH = original_path
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def test_cross_backend_predicates(self):
+        """测试同一组谓词在JSON与SQLite后端上的结果与 Predicate.matches 一致"""
+        print("\n📋 测试跨后端谓词一致性...")
+
+        tmp_dir = tempfile.mkdtemp()
+        options = dict(indexed_fields=('status', 'owner'), list_fields=('tags',),
+                       range_fields=('amount', 'name'), text_fields=('name',))
+        records = [
+            {"id": "r1", "status": "open", "owner": None, "tags": ["vip", "a"], "amount": 100, "name": "Alpha"},
+            {"id": "r2", "status": "closed", "owner": "bob", "tags": [], "amount": 250.5, "name": "alpine"},
+            {"id": "r3", "status": None, "owner": "ann", "tags": ["vip"], "amount": "300", "name": "Beta"},
+            {"id": "r4", "status": "open", "tags": ["b"], "name": "beta2"},  # 缺少 owner 与 amount
+            {"id": "r5", "status": 1, "owner": "1", "tags": ["c"], "amount": 0, "name": ""},
+        ]
+        cases = [
+            {"owner": None}, {"owner__in": ["bob", None]}, {"owner__in": [None]}, {"owner__in": []},
+            {"status__in": ["open", 1]}, {"status": 1}, {"status": "1"}, {"status": None},
+            {"amount__gt": 100}, {"amount__lt": "4"}, {"amount__gte": None}, {"amount__lte": 0},
+            {"amount__lte": 250.5, "status": "closed"},
+            {"name__prefix": "al"}, {"name__prefix": "Al"}, {"name__prefix": 5},
+            {"name__prefix": ("Al", "be")}, {"name__contains": "lp"},
+            {"tags": "vip"}, {"tags__in": ["a", "b"]}, {"tags": ["vip"]}, {"tags": 1},
+            {"owner": {"x": 1}}, {"amount__in": [[1]]}, {"status": ["open"]},
+            {"id": "r1"}, {"id__in": ["r2", "r3"]}, {"id": 1},
+        ]
+
+        try:
+            stores = {
+                'json': crm_module.JSONStorage(os.path.join(tmp_dir, 'items.json'), 'id', **options),
+                'sqlite': crm_module.SQLiteStorage(os.path.join(tmp_dir, 'crm.db'), 'items', 'id', **options),
+            }
+            for store in stores.values():
+                with store.transaction():
+                    for record in records:
+                        store.insert(dict(record))
+
+            mismatches = []
+            for filters in cases:
+                predicates = crm_module.parse_filters(filters)
+                expected = sorted(r["id"] for r in records if all(p.matches(r) for p in predicates))
+                for name, store in stores.items():
+                    try:
+                        actual = sorted(store.select_keys(predicates))
+                    except Exception as e:
+                        actual = f"{type(e).__name__}: {e}"
+                    if actual != expected:
+                        mismatches.append((name, filters, expected, actual))
+            self.assert_equal(mismatches, [], "JSON与SQLite谓词结果一致")
+            stores['sqlite'].close()
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def test_pipeline_aggregates(self):
+        """测试增量物化的管道聚合"""
+        print("\n📋 测试管道物化聚合...")
+
+        tmp_dir = tempfile.mkdtemp()
+        original_path = crm_module.SQLITE_PATH
+        crm_module.SQLITE_PATH = os.path.join(tmp_dir, 'crm.db')
+
+        try:
+            crm = CRMSystem(storage='sqlite')
+            pipeline = crm.analytics.pipeline
+            customer = crm.add_customer(name="管道测试公司")
+
+            opp1 = crm.create_opportunity(customer.customer_id, "管道商机1", 100000,
+                                          stage=OpportunityStage.PROPOSAL.value, assigned_to="sales_p")
+            opp2 = crm.create_opportunity(customer.customer_id, "管道商机2", 50000,
+                                          stage=OpportunityStage.INITIAL.value)
+            opp3 = crm.create_opportunity(customer.customer_id, "管道商机3", 20000,
+                                          stage=OpportunityStage.INITIAL.value)
+
+            snapshot = crm.pipeline_snapshot()
+            self.assert_equal(snapshot['stages'][OpportunityStage.INITIAL.value]['count'], 2, "阶段计数正确")
+            self.assert_equal(snapshot['weighted_pipeline'], 100000 * 0.5 + 70000 * 0.1, "加权管道金额正确")
+
+            # 阶段推进与成交增量更新
+            crm.update_opportunity(opp2.opportunity_id, stage=OpportunityStage.NEGOTIATION.value)
+            crm.close_opportunity(opp1.opportunity_id, status="won")
+            crm.close_opportunity(opp3.opportunity_id, status="lost")
+
+            snapshot = crm.pipeline_snapshot()
+            self.assert_equal(snapshot['stages'][OpportunityStage.INITIAL.value]['count'], 0, "阶段计数增量更新正确")
+            self.assert_equal(snapshot['weighted_pipeline'], 50000 * 0.7, "加权管道金额增量更新正确")
+            self.assert_equal(snapshot['win_rate'], 0.5, "赢单率正确")
+            self.assert_equal(crm.sales_performance()['performance']['sales_p']['won_amount'], 100000,
+                              "销售业绩增量更新正确")
+
+            # 分周期转化率
+            lead = crm.add_lead("管道线索", "管道公司")
+            crm.add_lead("管道线索2", "管道公司2")
+            crm.convert_lead(lead.lead_id, "管道转化客户")
+            period = datetime.now().isoformat()[:7]
+            rates = crm.analytics.conversion_rates()[period]
+            self.assert_equal(rates['lead_conversion_rate'], 0.5, "分周期线索转化率正确")
+
+            # 数据未变化时复用快照
+            first = crm.pipeline_snapshot()
+            second = crm.pipeline_snapshot()
+            self.assert_equal(first['version'], second['version'], "快照按版本复用")
+            self.assert_true(pipeline.snapshot_at(first['timestamp']) is not None, "历史快照可查询")
+
+            # 回滚的事务不影响聚合
+            try:
+                with crm.opportunity_mgr.batch():
+                    crm.create_opportunity(customer.customer_id, "回滚商机", 999999)
+                    raise RuntimeError("rollback")
+            except RuntimeError:
+                pass
+            self.assert_equal(crm.pipeline_snapshot()['open_amount'], 50000, "回滚事务未计入聚合")
+
+            # 增量结果与全量重建一致
+            incremental = crm.pipeline_snapshot()
+            pipeline.rebuild()
+            rebuilt = crm.pipeline_snapshot()
+            for key in ('stages', 'weighted_pipeline', 'won_amount', 'conversion_by_period'):
+                self.assert_equal(incremental[key], rebuilt[key], f"增量与全量一致: {key}")
+
+            # 监听器出错不影响已提交的写入
+            def broken_listener(event, old, new):
+                raise RuntimeError("listener failed")
+
+            crm.opportunity_mgr.store.add_listener(broken_listener)
+            try:
+                saved = crm.create_opportunity(customer.customer_id, "监听器出错商机", 30000)
+            finally:
+                crm.opportunity_mgr.store.remove_listener(broken_listener)
+            self.assert_true(crm.opportunity_mgr.get_opportunity(saved.opportunity_id) is not None,
+                             "监听器出错时写入仍成功")
+            self.assert_equal(crm.pipeline_snapshot()['open_amount'], 80000, "监听器出错时聚合仍更新")
+
+            # 增量更新中途失败后，读取时全量重建
+            crm.update_opportunity(saved.opportunity_id, amount="未知")
+            self.assert_true(pipeline._dirty, "增量更新失败时标记重建")
+            crm.update_opportunity(saved.opportunity_id, amount=40000)
+            self.assert_equal(crm.pipeline_snapshot()['open_amount'], 90000, "重建后聚合恢复一致")
+            self.assert_true(not pipeline._dirty, "重建后清除标记")
+        finally:
+            crm_module.SQLITE_PATH = original_path
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
     def run_all_tests(self):
         """运行所有测试"""
         print("🚀 开始CRM系统测试...")
@@ -471,6 +770,10 @@ class TestCRM:
             self.test_customer_value()
             self.test_rfm_analysis()
             self.test_sales_performance()
+            self.test_sqlite_storage()
+            self.test_query_planner()
+            self.test_cross_backend_predicates()
+            self.test_pipeline_aggregates()
 
             # 打印测试总结
             print("\n" + "=" * 60)
@@ -5,12 +5,21 @@ Data Collector - 数据自动采集系统
 """
 
 import argparse
+import asyncio
+import heapq
 import json
 import csv
+import hashlib
+import os
+import random
 import re
+import sqlite3
 import sys
 import time
-from typing import List, Dict, Set
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Dict, Optional, Set, Tuple
 from urllib.parse import urljoin, urlparse
 
 try:
@@ -22,56 +31,754 @@ except ImportError:
     print("或使用: data-collector --install")
     sys.exit(1)
 
+# 异步采集引擎依赖aiohttp（可选），未安装时退回顺序采集
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+# Parquet输出依赖pyarrow（可选）
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# 遇到这些状态码时按退避重试
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def parse_page(html, selector: str, limit: int = 100, clean: bool = True,
+               encoding: Optional[str] = None) -> List[str]:
+    """
+    解析网页并提取元素文本（模块级函数，可在进程池中运行）
+
+    Args:
+        html: 网页内容（str，或由BeautifulSoup自动识别编码的bytes）
+        selector: CSS选择器
+        limit: 最多提取的元素数量
+        clean: 是否清洗空白字符
+        encoding: bytes内容的编码（来自响应头，可为None）
+    """
+    if not html:
+        return []
+
+    if isinstance(html, bytes):
+        soup = BeautifulSoup(html, 'lxml', from_encoding=encoding)
+    else:
+        soup = BeautifulSoup(html, 'lxml')
+
+    texts = []
+    for elem in soup.select(selector)[:limit]:
+        text = elem.get_text(strip=True)
+
+        if not text:
+            continue
+
+        # 数据清洗
+        if clean:
+            text = re.sub(r'\s+', ' ', text)
+            text = text.strip()
+
+        texts.append(text)
+
+    return texts
+
+
+class RecordSink(ABC):
+    """
+    流式记录输出基类
+
+    - 记录先进入缓冲区，累计 buffer_size 条或距上次刷新超过 flush_interval 秒时写入文件
+    - 设置 max_bytes 后按文件大小轮转：out.jsonl -> out-00000.jsonl、out-00001.jsonl ...
+    - 数据落盘后调用 on_flush（增量采集用它提交页面状态）：逐行格式每次刷新后即可读取，
+      JSON数组与Parquet要到文件关闭（轮转或close）后才完整，只在关闭时回调
+    - append=True（恢复中断的采集）时不截断已有文件：逐行格式续写，轮转序号接着已有文件继续；
+      JSON/Parquet 先写 .part 临时文件、关闭时改名，已存在的完整文件保留，新数据写入下一个序号文件
+    """
+
+    default_buffer_size = 1000
+    streaming = True    # 每次刷新后文件都完整可读
+    appendable = True   # 可以在已有文件末尾续写
+
+    def __init__(self, path: str, buffer_size: Optional[int] = None, flush_interval: float = 5.0,
+                 max_bytes: Optional[int] = None, fieldnames: Optional[List[str]] = None,
+                 on_flush: Optional[Callable[[], None]] = None, append: bool = False):
+        """
+        Args:
+            path: 输出文件路径
+            buffer_size: 缓冲记录数
+            flush_interval: 最长刷新间隔（秒）
+            max_bytes: 单个文件的最大字节数，None表示不轮转
+            fieldnames: 字段名（CSV表头 / Parquet列）
+            on_flush: 数据落盘后的回调
+            append: 续写已有输出，不截断
+        """
+        self.path = path
+        self.buffer_size = buffer_size or self.default_buffer_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.fieldnames = fieldnames or ['text', 'url']
+        self.on_flush = on_flush
+        self.append = append
+        self.buffer: List[Dict] = []
+        self.count = 0
+        self.files: List[str] = []
+        self._file = None
+        self._next_part: Optional[int] = None
+        self._closed = False
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, records: List[Dict]):
+        """写入记录（空列表也会检查是否到了刷新时间）"""
+        self.buffer.extend(records)
+        if (len(self.buffer) >= self.buffer_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """把缓冲区写入文件"""
+        if self.buffer:
+            if self._file is None:
+                self._open_part()
+            self._write_records(self.buffer)
+            self._sync()
+            self.count += len(self.buffer)
+            self.buffer = []
+            if self.max_bytes and self._size() >= self.max_bytes:
+                self._close_part()
+        self._last_flush = time.monotonic()
+        if self.streaming and self.on_flush:
+            self.on_flush()
+
+    def close(self):
+        """刷新并关闭（没有任何数据时也生成一个空文件，续写时除外）"""
+        if self._closed:
+            return
+        self.flush()
+        if not self.files and not self.append:
+            self._open_part()
+        if self._file is not None:
+            self._close_part()
+        self._closed = True
+
+    def _open_part(self):
+        root, ext = os.path.splitext(self.path)
+        numbered = self.max_bytes or (
+            self.append and not self.appendable and os.path.exists(self.path)
+        )
+        if numbered:
+            if self._next_part is None:
+                self._next_part = self._existing_parts(root, ext) if self.append else 0
+            path = f"{root}-{self._next_part:05d}{ext}"
+            self._next_part += 1
+        else:
+            path = self.path
+        self.files.append(path)
+        # 非逐行格式先写临时文件，关闭时改名：目标文件存在即完整
+        self._open(path if self.streaming else path + '.part')
+
+    @staticmethod
+    def _existing_parts(root: str, ext: str) -> int:
+        """已有序号文件的下一个序号"""
+        directory = os.path.dirname(root) or '.'
+        pattern = re.compile(re.escape(os.path.basename(root)) + r'-(\d{5})' + re.escape(ext) + '$')
+        numbers = [int(m.group(1)) for m in map(pattern.match, os.listdir(directory)) if m]
+        return max(numbers) + 1 if numbers else 0
+
+    def _close_part(self):
+        self._close()
+        self._file = None
+        if not self.streaming:
+            os.replace(self.files[-1] + '.part', self.files[-1])
+            if self.on_flush:
+                self.on_flush()
+
+    # 子类实现
+    @abstractmethod
+    def _open(self, path: str):
+        """打开分片文件"""
+
+    @abstractmethod
+    def _write_records(self, records: List[Dict]):
+        """写入一批记录"""
+
+    def _sync(self):
+        pass
+
+    @abstractmethod
+    def _size(self) -> int:
+        """当前分片已写入的字节数"""
+
+    @abstractmethod
+    def _close(self):
+        """关闭当前分片"""
+
+
+class _TextSink(RecordSink):
+    """文本格式输出"""
+
+    def _open(self, path: str):
+        append = self.append and self.appendable and os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8', newline='')
+        if not append:
+            self._header()
+
+    def _header(self):
+        pass
+
+    def _footer(self):
+        pass
+
+    def _sync(self):
+        self._file.flush()
+        if self.on_flush:  # 回调会提交页面状态，先确保数据写入磁盘
+            os.fsync(self._file.fileno())
+
+    def _size(self) -> int:
+        return self._file.tell()
+
+    def _close(self):
+        self._footer()
+        self._file.close()
+
+
+class JsonlSink(_TextSink):
+    """JSON Lines，每行一条记录"""
+
+    def _write_records(self, records: List[Dict]):
+        self._file.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records))
+
+
+class JsonSink(_TextSink):
+    """JSON数组（与 json.dump(indent=2) 输出一致，文件在关闭时才完整）"""
+
+    streaming = False
+    appendable = False
+
+    def _header(self):
+        self._items = 0
+
+    def _write_records(self, records: List[Dict]):
+        parts = []
+        for record in records:
+            item = json.dumps(record, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+            parts.append(('[\n  ' if self._items == 0 else ',\n  ') + item)
+            self._items += 1
+        self._file.write(''.join(parts))
+
+    def _footer(self):
+        self._file.write('\n]' if self._items else '[]')
+
+
+class CsvSink(_TextSink):
+    """CSV，每个文件都带表头"""
+
+    def _open(self, path: str):
+        super()._open(path)
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+
+    def _header(self):
+        csv.writer(self._file).writerow(self.fieldnames)
+
+    def _write_records(self, records: List[Dict]):
+        self._writer.writerows(records)
+
+
+class TxtSink(_TextSink):
+    """纯文本"""
+
+    def _write_records(self, records: List[Dict]):
+        self._file.write(''.join(f"{r['text']}\n  来源: {r['url']}\n\n" for r in records))
+
+
+class ParquetSink(RecordSink):
+    """Parquet列式存储（需要pyarrow），每次刷新写入一个行组"""
+
+    default_buffer_size = 10000
+    streaming = False   # 文件尾（元数据）在关闭时写入
+    appendable = False
+
+    def __init__(self, path: str, **kwargs):
+        if not HAS_PYARROW:
+            raise RuntimeError("Parquet输出需要pyarrow，请运行: pip install pyarrow")
+        super().__init__(path, **kwargs)
+        self.schema = pa.schema([(name, pa.string()) for name in self.fieldnames])
+
+    def _open(self, path: str):
+        self._path = path
+        self._file = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def _write_records(self, records: List[Dict]):
+        self._file.write_table(pa.Table.from_pylist(records, schema=self.schema))
+
+    def _size(self) -> int:
+        return os.path.getsize(self._path)
+
+    def _close(self):
+        self._file.close()
+        if self.on_flush:
+            with open(self._path, 'rb') as f:
+                os.fsync(f.fileno())
+
+
+SINKS = {
+    'json': JsonSink,
+    'jsonl': JsonlSink,
+    'csv': CsvSink,
+    'txt': TxtSink,
+    'parquet': ParquetSink,
+}
+
+
+def open_sink(format: str, path: str, **kwargs) -> RecordSink:
+    """按格式创建输出"""
+    if format not in SINKS:
+        raise ValueError(f"不支持的输出格式: {format}")
+    return SINKS[format](path, **kwargs)
+
+
+class CrawlFrontier:
+    """
+    持久化采集队列（SQLite）
+
+    - pages 表：每个URL的状态、HTTP状态码、ETag/Last-Modified、内容哈希、提取配置与所属轮次
+    - 只有提取配置（选择器、条数、清洗）与上次相同时才发送条件请求、按内容哈希跳过解析
+    - records 表：已输出记录的8字节哈希（WITHOUT ROWID，按主键去重），跨轮次去重
+    - 每轮采集有一个轮次号；中途崩溃后再次运行会继续未完成的轮次，只采集尚未完成和失败的URL
+    - 页面状态与该页记录的去重哈希在同一事务中提交，恢复时不会丢记录或重复输出
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS pages (
+        url TEXT PRIMARY KEY,
+        state TEXT NOT NULL DEFAULT 'new',
+        http_status INTEGER,
+        etag TEXT,
+        last_modified TEXT,
+        content_hash TEXT,
+        extractor TEXT,
+        fetched_at REAL,
+        run_id INTEGER,
+        error TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_pages_run ON pages (run_id);
+    CREATE TABLE IF NOT EXISTS records (digest BLOB PRIMARY KEY) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+    """
+
+    def __init__(self, db_path: str = "crawl_state.db"):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(pages)")}
+        if 'extractor' not in columns:  # 旧版本的状态库
+            self.conn.execute("ALTER TABLE pages ADD COLUMN extractor TEXT")
+        self.run_id = self._meta('current_run', 0)
+        self.resumed = False
+        self.extractor: Optional[str] = None
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def _meta(self, key: str, default: int) -> int:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value: int):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def is_open(self) -> bool:
+        """上一轮是否未完成（再次运行将继续上一轮）"""
+        return bool(self._meta('run_open', 0))
+
+    def start(self, urls: List[str], extractor: Optional[str] = None) -> List[str]:
+        """
+        开始一轮采集（上一轮未完成时继续上一轮）
+
+        Args:
+            urls: 本轮的URL
+            extractor: 提取配置的标识，与页面上次的不同时重新下载解析
+
+        Returns:
+            本轮尚未完成的URL（保持原顺序，失败的页面会重试）
+        """
+        self.extractor = extractor
+        self.resumed = self.is_open()
+        if not self.resumed:
+            self.run_id += 1
+            self._set_meta('current_run', self.run_id)
+            self._set_meta('run_open', 1)
+
+        self.conn.executemany("INSERT OR IGNORE INTO pages (url) VALUES (?)", ((url,) for url in urls))
+        self.conn.commit()
+
+        done = {row[0] for row in self.conn.execute(
+            "SELECT url FROM pages WHERE run_id = ? AND state != 'failed'", (self.run_id,)
+        )}
+        return [url for url in urls if url not in done]
+
+    def finish(self):
+        """结束本轮采集"""
+        self._set_meta('run_open', 0)
+        self.conn.commit()
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """条件请求头（If-None-Match / If-Modified-Since），提取配置变化时不发送"""
+        row = self.conn.execute(
+            "SELECT etag, last_modified FROM pages WHERE url = ? AND extractor IS ?", (url, self.extractor)
+        ).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers['If-None-Match'] = row[0]
+        if row and row[1]:
+            headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def is_changed(self, url: str, content_hash: str) -> bool:
+        """内容哈希或提取配置与上次是否不同（服务器不支持条件请求时仍可跳过解析）"""
+        row = self.conn.execute(
+            "SELECT content_hash, extractor FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        return not row or row[0] != content_hash or row[1] != self.extractor
+
+    def add_record(self, text: str) -> bool:
+        """登记一条记录，已出现过返回False（在 mark 时提交）"""
+        digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+        cursor = self.conn.execute("INSERT OR IGNORE INTO records (digest) VALUES (?)", (digest,))
+        return cursor.rowcount == 1
+
+    def mark(self, url: str, page: Dict, commit: bool = True):
+        """记录页面结果并提交（同时提交该页登记的记录哈希）；commit=False时等待 commit()"""
+        if page.get('error'):
+            state = 'failed'
+        elif page.get('changed'):
+            state = 'fetched'
+        else:
+            state = 'unchanged'
+        if state == 'failed':  # 保留上次成功的验证信息，恢复时重试
+            self.conn.execute(
+                "UPDATE pages SET state = ?, http_status = ?, fetched_at = ?, run_id = ?, error = ? "
+                "WHERE url = ?",
+                (state, page.get('status'), time.time(), self.run_id, page.get('error'), url)
+            )
+        else:
+            self.conn.execute(
+                "UPDATE pages SET state = ?, http_status = ?, etag = COALESCE(?, etag), "
+                "last_modified = COALESCE(?, last_modified), content_hash = COALESCE(?, content_hash), "
+                "extractor = ?, fetched_at = ?, run_id = ?, error = NULL WHERE url = ?",
+                (state, page.get('status'), page.get('etag'), page.get('last_modified'),
+                 page.get('content_hash'), self.extractor, time.time(), self.run_id, url)
+            )
+        if commit:
+            self.conn.commit()
+
+    def commit(self):
+        """提交已记录的页面状态"""
+        self.conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """本轮各状态的页面数"""
+        rows = self.conn.execute(
+            "SELECT state, COUNT(*) FROM pages WHERE run_id = ? GROUP BY state", (self.run_id,)
+        ).fetchall()
+        return dict(rows)
+
+
+class AsyncCrawler:
+    """
+    异步采集引擎
+
+    - 全局并发上限，连接由aiohttp连接池复用（keep-alive）
+    - 按主机调度：同一主机最多 per_host 个并发请求，相邻两次请求至少间隔 delay 秒，
+      不同主机之间互不等待
+    - 连接错误、超时与429/5xx按指数退避重试，优先使用Retry-After
+    - 解析在进程池中执行，不阻塞事件循环；去重与采集状态记录仍由DataCollector在主进程完成
+    """
+
+    def __init__(self, collector: 'DataCollector', concurrency: int = 32, per_host: int = 2,
+                 retries: int = 3, backoff: float = 0.5, parse_workers: Optional[int] = None):
+        """
+        Args:
+            collector: 提供延迟、超时、清洗与去重配置的采集器
+            concurrency: 全局最大并发请求数
+            per_host: 单个主机的最大并发请求数
+            retries: 最大重试次数
+            backoff: 退避基数（秒），第n次重试等待 backoff * 2^n（含随机抖动）
+            parse_workers: 解析进程数，0表示在线程中解析，None表示CPU核数
+        """
+        if not HAS_AIOHTTP:
+            raise RuntimeError("异步采集需要aiohttp，请运行: pip install aiohttp")
+
+        self.collector = collector
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.retries = retries
+        self.backoff = backoff
+        self.parse_workers = (os.cpu_count() or 1) if parse_workers is None else parse_workers
+        self.errors: List[Tuple[str, BaseException]] = []   # 最近一次采集中处理失败的 (url, 异常)
+
+    def run(self, urls: List[str], selector: str, limit: int = 100,
+            on_page: Optional[Callable[[str, List[Dict]], None]] = None) -> List[Dict]:
+        """同步入口，返回全部数据（按页面完成顺序）"""
+        return asyncio.run(self.crawl(urls, selector, limit, on_page))
+
+    async def crawl(self, urls: List[str], selector: str, limit: int = 100,
+                    on_page: Optional[Callable[[str, List[Dict]], None]] = None) -> List[Dict]:
+        """
+        采集URL列表
+
+        Args:
+            urls: URL列表
+            selector: CSS选择器
+            limit: 每页最多提取数量
+            on_page: 每个页面完成时回调 on_page(url, records)；指定时数据只交给回调，不在内存中累积
+
+        Returns:
+            全部数据（指定on_page时为空列表）；个别页面处理出错时记录到 self.errors，
+            其余页面的数据照常返回，出错页面不记为已完成，续采时会重新请求
+        """
+        self.errors = []
+        all_data: List[Dict] = []
+        total = len(urls)
+        done = 0
+
+        def handle(url: str, texts: List[str], page: Dict):
+            nonlocal done
+            done += 1
+            records = self.collector.collect_texts(texts, url)
+            print(f"采集 {done}/{total}: {url}")
+            if page['changed']:
+                print(f"  -> 提取 {len(records)} 条数据")
+            elif not page['error']:
+                print("  -> 页面未变化，跳过")
+            if on_page:
+                on_page(url, records)
+            else:
+                all_data.extend(records)
+            self.collector.page_done(url, page)
+
+        executor = ProcessPoolExecutor(self.parse_workers) if self.parse_workers > 0 else None
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host,
+                                         ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=self.collector.timeout)
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                             headers={'User-Agent': USER_AGENT}) as session:
+                await self._schedule(urls, session, executor, selector, limit, handle)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        return all_data
+
+    async def _schedule(self, urls, session, executor, selector, limit, handle):
+        """按主机调度请求：就绪主机按可请求时间排成小顶堆"""
+        loop = asyncio.get_running_loop()
+        delay = self.collector.delay
+
+        queues: Dict[str, deque] = {}
+        for url in urls:
+            queues.setdefault(urlparse(url).netloc, deque()).append(url)
+
+        ready = [(0.0, host) for host in queues]
+        heapq.heapify(ready)
+        scheduled = set(queues)          # 已在堆中的主机
+        next_time = dict.fromkeys(queues, 0.0)
+        in_flight = dict.fromkeys(queues, 0)
+        pending = 0
+        changed = asyncio.Event()
+        tasks = set()                    # 保持对运行中任务的引用
+
+        def reschedule(host: str):
+            if host not in scheduled and queues[host] and in_flight[host] < self.per_host:
+                heapq.heappush(ready, (next_time[host], host))
+                scheduled.add(host)
+
+        def finished(task: asyncio.Task, host: str, url: str):
+            nonlocal pending
+            pending -= 1
+            in_flight[host] -= 1
+            tasks.discard(task)
+            if task.exception() is not None:
+                self.errors.append((url, task.exception()))
+                print(f"警告: 处理 {url} 出错: {task.exception()!r}")
+            else:
+                handle(url, *task.result())
+            reschedule(host)
+            changed.set()
+
+        while ready or pending:
+            now = loop.time()
+            if ready and ready[0][0] <= now and pending < self.concurrency:
+                _, host = heapq.heappop(ready)
+                scheduled.discard(host)
+                url = queues[host].popleft()
+                in_flight[host] += 1
+                pending += 1
+                next_time[host] = now + delay
+
+                task = asyncio.ensure_future(self._process(session, executor, url, selector, limit))
+                task.add_done_callback(lambda t, h=host, u=url: finished(t, h, u))
+                tasks.add(task)
+                reschedule(host)
+                continue
+
+            # 等待下一个主机到点，或有请求完成（可能释放并发名额或主机）
+            timeout = max(ready[0][0] - now, 0) if ready and pending < self.concurrency else None
+            changed.clear()
+            try:
+                await asyncio.wait_for(changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        # 意外异常不中断整个采集（网络错误已在_fetch中处理），已采集的数据照常保留
+        if self.errors:
+            print(f"警告: {len(self.errors)} 个页面处理出错，已跳过")
+
+    async def _process(self, session, executor, url: str, selector: str, limit: int):
+        """下载并解析单个页面，返回 (文本列表, 页面状态)"""
+        content, encoding, page = await self._fetch(session, url)
+        if not page['changed']:
+            return [], page
+        loop = asyncio.get_running_loop()
+        texts = await loop.run_in_executor(executor, parse_page, content, selector, limit,
+                                           self.collector.clean, encoding)
+        return texts, page
+
+    async def _fetch(self, session, url: str):
+        """带重试的条件请求，返回 (内容, 编码, 页面状态)"""
+        headers = self.collector.request_headers(url)
+        for attempt in range(self.retries + 1):
+            wait = None
+            status = None
+            try:
+                async with session.get(url, headers=headers) as response:
+                    status = response.status
+                    if status < 400:
+                        content = await response.read() if status != 304 else b''
+                        page = self.collector.check_response(url, status, response.headers, content)
+                        return content, response.charset, page
+                    error = f"HTTP {status}"
+                    if status not in RETRY_STATUS:
+                        break
+                    retry_after = response.headers.get('Retry-After', '')
+                    if retry_after.isdigit():
+                        wait = float(retry_after)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+
+            if attempt < self.retries:
+                if wait is None:
+                    wait = self.backoff * (2 ** attempt) * (1 + random.random())
+                await asyncio.sleep(wait)
+
+        print(f"警告: 无法获取 {url}: {error}")
+        return b'', None, failed_page(status, error)
+
+
+def failed_page(status: Optional[int], error: str) -> Dict:
+    """下载失败时的页面状态"""
+    return {'status': status, 'etag': None, 'last_modified': None, 'content_hash': None,
+            'changed': False, 'error': error}
+
 
 class DataCollector:
     """数据采集器"""
 
-    def __init__(self, delay: float = 1, timeout: int = 30, dedupe: bool = True, clean: bool = True):
+    def __init__(self, delay: float = 1, timeout: int = 30, dedupe: bool = True, clean: bool = True,
+                 concurrency: int = 1, per_host: int = 2, retries: int = 3,
+                 parse_workers: Optional[int] = None, state: Optional[str] = None):
         self.delay = delay
         self.timeout = timeout
         self.dedupe = dedupe
         self.clean = clean
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.retries = retries
+        self.parse_workers = parse_workers
+        # 增量采集：持久化URL状态与去重集合
+        self.frontier = CrawlFrontier(state) if state else None
+        # 流式输出时页面状态等数据落盘后再提交
+        self.defer_commit = False
         self.seen: Set[str] = set()  # 用于去重
         self.session = requests.Session()
         self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            'User-Agent': USER_AGENT
         })
 
     def fetch_url(self, url: str) -> str:
         """获取网页内容"""
+        return self.fetch_page(url)[0]
+
+    def fetch_page(self, url: str):
+        """获取网页内容与页面状态（未变化或失败时内容为空）"""
         try:
-            response = self.session.get(url, timeout=self.timeout)
+            response = self.session.get(url, timeout=self.timeout, headers=self.request_headers(url))
             response.raise_for_status()
+            page = self.check_response(url, response.status_code, response.headers, response.content)
+            if not page['changed']:
+                return "", page
             response.encoding = response.apparent_encoding
-            return response.text
+            return response.text, page
         except requests.RequestException as e:
             print(f"警告: 无法获取 {url}: {e}")
-            return ""
-
-    def extract_data(self, html: str, selector: str, url: str, limit: int = 100) -> List[Dict]:
-        """从HTML中提取数据"""
-        if not html:
-            return []
+            status = e.response.status_code if getattr(e, 'response', None) is not None else None
+            return "", failed_page(status, str(e))
 
-        soup = BeautifulSoup(html, 'lxml')
-        elements = soup.select(selector)
+    def request_headers(self, url: str) -> Dict[str, str]:
+        """请求头（增量采集时附带条件请求头）"""
+        return self.frontier.validators(url) if self.frontier else {}
 
-        data = []
-        for elem in elements[:limit]:
-            text = elem.get_text(strip=True)
+    def check_response(self, url: str, status: int, headers, content: bytes) -> Dict:
+        """根据响应生成页面状态，changed为False（304或内容哈希未变）时无需解析"""
+        page = {
+            'status': status,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'content_hash': None,
+            'changed': status != 304,
+            'error': None,
+        }
+        if page['changed']:
+            page['content_hash'] = hashlib.sha256(content).hexdigest()
+            if self.frontier and not self.frontier.is_changed(url, page['content_hash']):
+                page['changed'] = False
+        return page
 
-            if not text:
-                continue
+    def page_done(self, url: str, page: Dict):
+        """页面数据已输出，记录页面状态"""
+        if self.frontier:
+            self.frontier.mark(url, page, commit=not self.defer_commit)
 
-            # 数据清洗
-            if self.clean:
-                text = re.sub(r'\s+', ' ', text)
-                text = text.strip()
+    def extract_data(self, html: str, selector: str, url: str, limit: int = 100) -> List[Dict]:
+        """从HTML中提取数据"""
+        return self.collect_texts(parse_page(html, selector, limit, self.clean), url)
 
-            # 去重
-            if self.dedupe and text in self.seen:
-                continue
-            if self.dedupe:
+    def collect_texts(self, texts: List[str], url: str) -> List[Dict]:
+        """对解析出的文本去重并生成数据记录"""
+        data = []
+        for text in texts:
+            # 去重（增量采集时使用持久化的去重集合）
+            if self.dedupe and self.frontier:
+                if not self.frontier.add_record(text):
+                    continue
+            elif self.dedupe:
+                if text in self.seen:
+                    continue
                 self.seen.add(text)
 
             data.append({
@@ -95,50 +802,118 @@ class DataCollector:
         return filtered
 
     def collect_from_urls(self, urls: List[str], selector: str, limit: int = 100) -> List[Dict]:
-        """从多个URL采集数据"""
+        """从多个URL采集数据（concurrency>1且安装了aiohttp时使用异步引擎）"""
         all_data = []
+        self._crawl(urls, selector, limit, lambda url, records: all_data.extend(records))
+        self._finish_run()
+        return all_data
+
+    def collect_to_sink(self, urls: List[str], selector: str, sink: RecordSink, limit: int = 100,
+                        keyword: Optional[str] = None) -> int:
+        """
+        采集并把每个页面的数据直接写入sink，不在内存中累积
+
+        增量采集时页面状态在数据落盘后才提交；恢复中断的一轮时sink续写已有输出，不会丢数据。
+        结束时关闭sink。
+
+        Returns:
+            写入的记录数（过滤后）
+        """
+        written = 0
+
+        def on_page(url: str, records: List[Dict]):
+            nonlocal written
+            records = self.filter_data(records, keyword)
+            sink.write(records)
+            written += len(records)
+
+        if self.frontier:
+            self.defer_commit = True
+            sink.on_flush = self.frontier.commit
+            sink.append = self.frontier.is_open()
+        try:
+            self._crawl(urls, selector, limit, on_page)
+            sink.close()
+        finally:
+            self.defer_commit = False
+        self._finish_run()
+        return written
+
+    def _crawl(self, urls: List[str], selector: str, limit: int,
+               on_page: Callable[[str, List[Dict]], None]):
+        """选择采集引擎，每个页面完成时回调 on_page(url, records)"""
+        if self.frontier:
+            total = len(urls)
+            extractor = f"{selector}\x00{limit}\x00{int(self.clean)}"
+            urls = self.frontier.start(urls, extractor)
+            if self.frontier.resumed:
+                print(f"继续第 {self.frontier.run_id} 轮采集，剩余 {len(urls)}/{total} 个URL")
+
+        if self.concurrency > 1 and HAS_AIOHTTP:
+            crawler = AsyncCrawler(self, concurrency=self.concurrency, per_host=self.per_host,
+                                   retries=self.retries, parse_workers=self.parse_workers)
+            crawler.run(urls, selector, limit, on_page)
+        else:
+            self._collect_sequential(urls, selector, limit, on_page)
+
+    def _finish_run(self):
+        """结束增量采集的一轮并打印统计"""
+        if self.frontier:
+            self.frontier.finish()
+            stats = self.frontier.stats()
+            print(f"本轮: 更新 {stats.get('fetched', 0)} 页，未变化 {stats.get('unchanged', 0)} 页，"
+                  f"失败 {stats.get('failed', 0)} 页")
+
+    def _collect_sequential(self, urls: List[str], selector: str, limit: int,
+                            on_page: Callable[[str, List[Dict]], None]):
+        """顺序采集"""
+        last_request: Dict[str, float] = {}
 
         for i, url in enumerate(urls):
+            # 延迟，避免对同一主机请求过快（不同主机无需等待）
+            host = urlparse(url).netloc
+            if host in last_request:
+                wait = last_request[host] + self.delay - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+            last_request[host] = time.monotonic()
+
             print(f"采集 {i+1}/{len(urls)}: {url}")
 
-            html = self.fetch_url(url)
+            html, page = self.fetch_page(url)
+            data = []
             if html:
                 data = self.extract_data(html, selector, url, limit)
-                all_data.extend(data)
                 print(f"  -> 提取 {len(data)} 条数据")
-
-            # 延迟，避免请求过快
-            if i < len(urls) - 1:
-                time.sleep(self.delay)
-
-        return all_data
+            elif not page['changed'] and not page['error']:
+                print("  -> 页面未变化，跳过")
+            on_page(url, data)
+            self.page_done(url, page)
 
     def save_as_json(self, data: List[Dict], output: str):
         """保存为JSON格式"""
-        with open(output, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"已保存 {len(data)} 条数据到 {output}")
+        self._save(JsonSink, data, output)
 
     def save_as_csv(self, data: List[Dict], output: str):
         """保存为CSV格式"""
-        with open(output, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=['text', 'url'])
-            writer.writeheader()
-            writer.writerows(data)
-        print(f"已保存 {len(data)} 条数据到 {output}")
+        self._save(CsvSink, data, output)
 
     def save_as_txt(self, data: List[Dict], output: str):
         """保存为TXT格式"""
-        with open(output, 'w', encoding='utf-8') as f:
-            for item in data:
-                f.write(f"{item['text']}\n")
-                f.write(f"  来源: {item['url']}\n\n")
+        self._save(TxtSink, data, output)
+
+    def _save(self, sink_class, data: List[Dict], output: str):
+        with sink_class(output, buffer_size=max(len(data), 1)) as sink:
+            sink.write(data)
         print(f"已保存 {len(data)} 条数据到 {output}")
 
     def print_data(self, data: List[Dict], format: str = 'txt'):
         """打印数据到控制台"""
         if format == 'json':
             print(json.dumps(data, ensure_ascii=False, indent=2))
+        elif format == 'jsonl':
+            for item in data:
+                print(json.dumps(item, ensure_ascii=False))
         elif format == 'csv':
             writer = csv.DictWriter(sys.stdout, fieldnames=['text', 'url'])
             writer.writeheader()
@@ -170,11 +945,18 @@ def main():
     parser.add_argument('--urls', help='包含URL列表的文件')
     parser.add_argument('--selector', required=True, help='CSS选择器')
     parser.add_argument('--filter', help='关键词过滤')
-    parser.add_argument('--format', choices=['json', 'csv', 'txt'], default='txt', help='输出格式')
-    parser.add_argument('--output', help='输出文件路径')
+    parser.add_argument('--format', choices=list(SINKS), default='txt', help='输出格式（parquet需要pyarrow）')
+    parser.add_argument('--output', help='输出文件路径（指定后边采集边写入）')
+    parser.add_argument('--max-file-mb', type=float, help='单个输出文件的最大MB数，超过后轮转到新文件')
+    parser.add_argument('--flush-interval', type=float, default=5.0, help='输出缓冲的最长刷新间隔秒数')
     parser.add_argument('--limit', type=int, default=100, help='每页最多提取数量')
-    parser.add_argument('--delay', type=float, default=1, help='请求间隔秒数')
+    parser.add_argument('--delay', type=float, default=1, help='同一主机的请求间隔秒数')
+    parser.add_argument('--concurrency', type=int, default=8, help='全局并发请求数（>1时使用异步引擎，需要aiohttp）')
+    parser.add_argument('--per-host', type=int, default=2, help='单个主机的最大并发请求数')
+    parser.add_argument('--retries', type=int, default=3, help='失败重试次数')
+    parser.add_argument('--parse-workers', type=int, default=None, help='解析进程数（0表示线程内解析，默认CPU核数）')
     parser.add_argument('--timeout', type=int, default=30, help='请求超时秒数')
+    parser.add_argument('--state', help='增量采集状态库路径（SQLite），记录URL状态、条件请求信息与去重集合')
     parser.add_argument('--no-dedupe', action='store_true', help='禁用去重')
     parser.add_argument('--no-clean', action='store_true', help='禁用数据清洗')
     parser.add_argument('--install', action='store_true', help='安装依赖')
@@ -185,7 +967,7 @@ def main():
     if args.install:
         import subprocess
         print("正在安装依赖...")
-        subprocess.run([sys.executable, '-m', 'pip', 'install', 'beautifulsoup4', 'requests', 'lxml'])
+        subprocess.run([sys.executable, '-m', 'pip', 'install', 'beautifulsoup4', 'requests', 'lxml', 'aiohttp'])
         print("安装完成！")
         return
 
@@ -208,11 +990,32 @@ def main():
         delay=args.delay,
         timeout=args.timeout,
         dedupe=not args.no_dedupe,
-        clean=not args.no_clean
+        clean=not args.no_clean,
+        concurrency=args.concurrency,
+        per_host=args.per_host,
+        retries=args.retries,
+        parse_workers=args.parse_workers,
+        state=args.state
     )
 
+    if args.format == 'parquet' and not args.output:
+        parser.error("parquet格式需要指定 --output")
+
     # 采集数据
     print(f"\n开始采集 {len(urls)} 个URL...")
+
+    if args.output:
+        # 边采集边写入，数据不在内存中累积
+        if args.filter:
+            print(f"应用过滤: {args.filter}")
+        max_bytes = int(args.max_file_mb * 1024 * 1024) if args.max_file_mb else None
+        with open_sink(args.format, args.output, max_bytes=max_bytes,
+                       flush_interval=args.flush_interval) as sink:
+            count = collector.collect_to_sink(urls, args.selector, sink, args.limit, keyword=args.filter)
+        print(f"\n总共采集: {count} 条数据")
+        print(f"已保存 {count} 条数据到 {', '.join(sink.files)}")
+        return
+
     data = collector.collect_from_urls(urls, args.selector, args.limit)
 
     # 过滤数据
@@ -224,16 +1027,7 @@ def main():
 
     # 输出结果
     print(f"\n总共采集: {len(data)} 条数据")
-
-    if args.output:
-        if args.format == 'json':
-            collector.save_as_json(data, args.output)
-        elif args.format == 'csv':
-            collector.save_as_csv(data, args.output)
-        else:
-            collector.save_as_txt(data, args.output)
-    else:
-        collector.print_data(data, args.format)
+    collector.print_data(data, args.format)
 
 
 if __name__ == '__main__':
@@ -115,6 +115,150 @@ python3 data-collector.py \
 echo "✅ 测试6通过: 去重功能正常（无错误）"
 echo ""
 
+# 测试7: 异步并发采集（本地HTTP服务，两个主机名）
+echo "测试7: 异步并发采集"
+if python3 -c "import aiohttp" 2>/dev/null; then
+    mkdir -p "$TEST_DIR/site"
+    : > "$TEST_DIR/local_urls.txt"
+    for i in $(seq 1 10); do
+        echo "<html><body><h1>Page $i</h1></body></html>" > "$TEST_DIR/site/page$i.html"
+        echo "http://127.0.0.1:18765/page$i.html" >> "$TEST_DIR/local_urls.txt"
+        echo "http://localhost:18765/page$i.html" >> "$TEST_DIR/local_urls.txt"
+    done
+    echo "http://127.0.0.1:18765/missing.html" >> "$TEST_DIR/local_urls.txt"
+
+    python3 -m http.server 18765 --bind 127.0.0.1 --directory "$TEST_DIR/site" > /dev/null 2>&1 &
+    SERVER_PID=$!
+    sleep 1
+
+    python3 data-collector.py \
+        --urls "$TEST_DIR/local_urls.txt" \
+        --selector "h1" \
+        --format json \
+        --output "$TEST_DIR/async.json" \
+        --concurrency 8 \
+        --per-host 2 \
+        --delay 0.1 \
+        --retries 1 \
+        > /tmp/test7.log 2>&1
+    kill $SERVER_PID
+
+    COUNT=$(python3 -c "import json; print(len(json.load(open('$TEST_DIR/async.json'))))" 2>/dev/null)
+    if [ "$COUNT" = "10" ] && grep -q "missing.html" /tmp/test7.log; then
+        echo "✅ 测试7通过: 异步采集成功（去重后 $COUNT 条，失败页面已跳过）"
+    else
+        echo "❌ 测试7失败: 异步采集结果异常"
+        cat /tmp/test7.log
+        exit 1
+    fi
+else
+    echo "⚠️  跳过测试7: 未安装aiohttp"
+fi
+echo ""
+
+# 测试8: 增量采集（条件请求，未变化页面不重复输出）
+echo "测试8: 增量采集"
+mkdir -p "$TEST_DIR/site2"
+echo "<html><body><h1>Incremental</h1><p>Paragraph</p></body></html>" > "$TEST_DIR/site2/index.html"
+python3 -m http.server 18766 --bind 127.0.0.1 --directory "$TEST_DIR/site2" > /dev/null 2>&1 &
+SERVER_PID=$!
+sleep 1
+
+# 第三轮换了选择器，页面虽未变化也要重新解析
+for RUN in 1 2 3; do
+    SELECTOR="h1"
+    [ "$RUN" -eq 3 ] && SELECTOR="p"
+    python3 data-collector.py \
+        --url "http://127.0.0.1:18766/index.html" \
+        --selector "$SELECTOR" \
+        --format json \
+        --output "$TEST_DIR/incremental$RUN.json" \
+        --concurrency 1 \
+        --state "$TEST_DIR/state.db" \
+        > /tmp/test8_$RUN.log 2>&1
+done
+kill $SERVER_PID
+
+if grep -q "Incremental" "$TEST_DIR/incremental1.json" && grep -q "页面未变化" /tmp/test8_2.log \
+        && grep -q "Paragraph" "$TEST_DIR/incremental3.json"; then
+    echo "✅ 测试8通过: 第二轮未重复下载解析"
+else
+    echo "❌ 测试8失败: 增量采集异常"
+    cat /tmp/test8_1.log /tmp/test8_2.log /tmp/test8_3.log
+    exit 1
+fi
+echo ""
+
+# 测试9: 流式输出与文件轮转（JSONL）
+echo "测试9: 流式输出与文件轮转"
+mkdir -p "$TEST_DIR/site3"
+: > "$TEST_DIR/stream_urls.txt"
+for i in $(seq 1 5); do
+    echo "<html><body><h1>Stream $i</h1></body></html>" > "$TEST_DIR/site3/page$i.html"
+    echo "http://127.0.0.1:18767/page$i.html" >> "$TEST_DIR/stream_urls.txt"
+done
+python3 -m http.server 18767 --bind 127.0.0.1 --directory "$TEST_DIR/site3" > /dev/null 2>&1 &
+SERVER_PID=$!
+sleep 1
+
+python3 data-collector.py \
+    --urls "$TEST_DIR/stream_urls.txt" \
+    --selector "h1" \
+    --format jsonl \
+    --output "$TEST_DIR/stream.jsonl" \
+    --concurrency 1 \
+    --delay 0 \
+    --flush-interval 0 \
+    --max-file-mb 0.0001 \
+    > /tmp/test9.log 2>&1
+kill $SERVER_PID
+
+FILES=$(ls "$TEST_DIR"/stream-*.jsonl 2>/dev/null | wc -l)
+LINES=$(cat "$TEST_DIR"/stream-*.jsonl 2>/dev/null | wc -l)
+if [ "$FILES" -gt 1 ] && [ "$LINES" -eq 5 ]; then
+    echo "✅ 测试9通过: 边采集边写入，轮转为 $FILES 个文件"
+else
+    echo "❌ 测试9失败: 流式输出异常"
+    cat /tmp/test9.log
+    exit 1
+fi
+echo ""
+
+# 测试10: 中断后恢复（续写已有输出，不丢数据）
+echo "测试10: 中断后恢复"
+mkdir -p "$TEST_DIR/site4"
+: > "$TEST_DIR/resume_urls.txt"
+for i in $(seq 1 4); do
+    echo "<html><body><h1>Resume $i</h1></body></html>" > "$TEST_DIR/site4/page$i.html"
+    echo "http://127.0.0.1:18768/page$i.html" >> "$TEST_DIR/resume_urls.txt"
+done
+python3 -m http.server 18768 --bind 127.0.0.1 --directory "$TEST_DIR/site4" > /dev/null 2>&1 &
+SERVER_PID=$!
+sleep 1
+
+RESUME_ARGS="--urls $TEST_DIR/resume_urls.txt --selector h1 --format jsonl --output $TEST_DIR/resume.jsonl --concurrency 1 --flush-interval 0 --state $TEST_DIR/resume.db"
+python3 -u data-collector.py $RESUME_ARGS --delay 1 > /tmp/test10_1.log 2>&1 &
+COLLECTOR_PID=$!
+for _ in $(seq 1 100); do
+    grep -q "采集 3/4" /tmp/test10_1.log && break
+    sleep 0.1
+done
+kill -9 $COLLECTOR_PID 2>/dev/null
+wait $COLLECTOR_PID 2>/dev/null
+python3 data-collector.py $RESUME_ARGS --delay 0 > /tmp/test10_2.log 2>&1
+kill $SERVER_PID
+
+LINES=$(wc -l < "$TEST_DIR/resume.jsonl")
+UNIQUE=$(sort -u "$TEST_DIR/resume.jsonl" | wc -l)
+if [ "$LINES" -eq 4 ] && [ "$UNIQUE" -eq 4 ] && grep -q "继续第" /tmp/test10_2.log; then
+    echo "✅ 测试10通过: 恢复后输出完整且不重复"
+else
+    echo "❌ 测试10失败: 恢复后输出 $LINES 行（去重后 $UNIQUE 行）"
+    cat /tmp/test10_1.log /tmp/test10_2.log "$TEST_DIR/resume.jsonl"
+    exit 1
+fi
+echo ""
+
 # 清理测试文件
 echo "清理测试文件..."
 rm -rf "$TEST_DIR"
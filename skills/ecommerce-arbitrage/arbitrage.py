@@ -6,6 +6,7 @@
 import requests
 from bs4 import BeautifulSoup
 import json
+import math
 import time
 from datetime import datetime
 from typing import List, Dict, Optional
@@ -88,21 +89,157 @@ class PriceMonitor:
         return all_products
 
 
+def tokenize_title(title: str) -> frozenset:
+    """标题分词（按空白切分的关键词集合）"""
+    return frozenset(title.split())
+
+
+def jaccard(tokens1: frozenset, tokens2: frozenset) -> float:
+    """两个关键词集合的Jaccard相似度"""
+    if not tokens1 and not tokens2:
+        return 0.0
+    common = len(tokens1 & tokens2)
+    return common / (len(tokens1) + len(tokens2) - common)
+
+
+def _ceil(value: float) -> int:
+    """向上取整（容忍浮点误差，避免把 7.0000001 取成 8 导致漏匹配）"""
+    return math.ceil(value - 1e-9)
+
+
+class _UnionFind:
+    """并查集（路径压缩 + 按大小合并）"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, x: int) -> int:
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+
+class ProductMatcher:
+    """
+    商品标题匹配引擎
+
+    - 每个标题只分词一次
+    - 候选对由倒排索引前缀过滤产生：关键词按全局出现次数从少到多排序，
+      Jaccard > t 的两个集合必然在各自的前缀关键词中有交集，再配合长度过滤（t*|x| <= |y|）
+      与位置过滤（剩余关键词不足以达到最小重合数时跳过），不会漏掉相似对，也不需要两两比较
+    - 只对候选对计算Jaccard，相似的商品用并查集合并成组
+    """
+
+    def __init__(self, threshold: float = 0.5):
+        """
+        Args:
+            threshold: 相似度阈值（Jaccard严格大于该值视为同一商品）
+        """
+        self.threshold = threshold
+        self.stats = {"products": 0, "candidates": 0, "matches": 0}
+
+    def match(self, titles: List[str]) -> List[List[int]]:
+        """
+        对标题聚类
+
+        Returns:
+            相似商品的下标分组（只包含2个及以上的组，组内与组间均按下标排序）
+        """
+        token_sets = [tokenize_title(title) for title in titles]
+
+        # 关键词全局频次，稀有词排在前面，使前缀尽量落在区分度高的词上
+        frequency: Dict[str, int] = {}
+        for tokens in token_sets:
+            for token in tokens:
+                frequency[token] = frequency.get(token, 0) + 1
+
+        # 按集合大小升序处理，已入索引的集合都不比当前集合大
+        order = sorted((i for i, tokens in enumerate(token_sets) if tokens), key=lambda i: len(token_sets[i]))
+        threshold = self.threshold
+        index: Dict[str, List[tuple]] = {}
+        starts: Dict[str, int] = {}
+        union_find = _UnionFind(len(titles))
+        candidates = 0
+        matches = 0
+
+        for i in order:
+            tokens = token_sets[i]
+            size = len(tokens)
+            ordered = sorted(tokens, key=lambda t: (frequency[t], t))
+            probe_length = size - _ceil(threshold * size) + 1
+            # 之后入索引的集合都不比当前小，只需收录更短的前缀
+            index_length = size - _ceil(2 * threshold / (1 + threshold) * size) + 1
+            min_size = threshold * size
+
+            seen = set()
+            for position, token in enumerate(ordered[:probe_length]):
+                postings = index.get(token)
+                if postings is None:
+                    continue
+                # 倒排表按集合大小升序，过短的集合对之后更长的集合也不可能相似
+                start = starts[token]
+                while start < len(postings) and len(token_sets[postings[start][0]]) < min_size:
+                    start += 1
+                starts[token] = start
+                for k in range(start, len(postings)):
+                    j, j_position = postings[k]
+                    if j in seen:
+                        continue
+                    # 位置过滤：从当前关键词往后能重合的数量不足以达到阈值
+                    other_size = len(token_sets[j])
+                    required = _ceil(threshold / (1 + threshold) * (size + other_size))
+                    if 1 + min(size - position - 1, other_size - j_position - 1) < required:
+                        continue
+                    seen.add(j)
+                    if jaccard(tokens, token_sets[j]) > threshold:
+                        union_find.union(i, j)
+                        matches += 1
+            candidates += len(seen)
+
+            for position, token in enumerate(ordered[:index_length]):
+                if token not in index:
+                    index[token] = []
+                    starts[token] = 0
+                index[token].append((i, position))
+
+        groups: Dict[int, List[int]] = {}
+        for i in range(len(titles)):
+            groups.setdefault(union_find.find(i), []).append(i)
+
+        self.stats = {"products": len(titles), "candidates": candidates, "matches": matches}
+        return sorted((g for g in groups.values() if len(g) > 1), key=lambda g: g[0])
+
+
 class ArbitrageAnalyzer:
     """套利分析器"""
 
-    def __init__(self, min_profit_rate: float = 10.0):
+    def __init__(self, min_profit_rate: float = 10.0, similarity_threshold: float = 0.5):
         """
         Args:
             min_profit_rate: 最低利润率（百分比）
+            similarity_threshold: 标题相似度阈值（Jaccard）
         """
         self.min_profit_rate = min_profit_rate
+        self.matcher = ProductMatcher(similarity_threshold)
 
     def find_arbitrage(self, products: List[Dict]) -> List[Dict]:
         """发现套利机会"""
         opportunities = []
 
-        # 按商品标题相似度分组（简化版）
+        # 按商品标题相似度分组
         groups = self._group_by_similarity(products)
 
         for group in groups:
@@ -129,43 +266,13 @@ class ArbitrageAnalyzer:
         return opportunities
 
     def _group_by_similarity(self, products: List[Dict]) -> List[List[Dict]]:
-        """按相似度分组商品"""
-        groups = []
-        used = [False] * len(products)
-
-        for i, p1 in enumerate(products):
-            if used[i]:
-                continue
-
-            group = [p1]
-            used[i] = True
-
-            for j, p2 in enumerate(products):
-                if used[j]:
-                    continue
-
-                # 简单相似度计算：标题包含相同关键词
-                if self._is_similar(p1["title"], p2["title"]):
-                    group.append(p2)
-                    used[j] = True
-
-            if len(group) > 1:
-                groups.append(group)
-
-        return groups
+        """按相似度分组商品（相似关系传递：A~B、B~C 时三者同组）"""
+        groups = self.matcher.match([p["title"] for p in products])
+        return [[products[i] for i in group] for group in groups]
 
     def _is_similar(self, title1: str, title2: str) -> bool:
         """判断商品是否相似"""
-        # 提取关键词
-        words1 = set(title1.split())
-        words2 = set(title2.split())
-
-        # 计算交集
-        common = words1 & words2
-        total = words1 | words2
-
-        # 相似度>50%
-        return len(common) / len(total) > 0.5 if total else False
+        return jaccard(tokenize_title(title1), tokenize_title(title2)) > self.matcher.threshold
 
 
 class ArbitrageSystem:
@@ -3,9 +3,11 @@
 测试电商套利系统
 """
 
+import os
 import sys
 import json
-from arbitrage import ArbitrageSystem, ArbitrageAnalyzer, PriceMonitor
+import tempfile
+from arbitrage import ArbitrageSystem, ArbitrageAnalyzer, PriceMonitor, ProductMatcher
 
 
 def test_price_monitor():
@@ -92,18 +94,19 @@ def test_arbitrage_system():
 
     print(f"✓ 监控 {len(keywords)} 个关键词，发现 {len(opportunities)} 个机会")
 
-    # 测试保存功能
+    # 测试保存功能（写入临时目录，不在工作目录留下文件）
     if opportunities:
-        system.save_opportunities(opportunities, "test_opportunities.json")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "test_opportunities.json")
+            system.save_opportunities(opportunities, path)
 
-        # 验证文件存在
-        import os
-        assert os.path.exists("test_opportunities.json"), "应该创建保存文件"
+            # 验证文件存在
+            assert os.path.exists(path), "应该创建保存文件"
 
-        # 验证文件内容
-        with open("test_opportunities.json", "r") as f:
-            saved_data = json.load(f)
-        assert len(saved_data) == len(opportunities), "保存的数据应一致"
+            # 验证文件内容
+            with open(path, "r") as f:
+                saved_data = json.load(f)
+            assert len(saved_data) == len(opportunities), "保存的数据应一致"
 
         print("✓ 保存功能正常")
 
@@ -146,12 +149,73 @@ def test_edge_cases():
     print("✓ 边界情况测试通过！\n")
 
 
+def test_product_matcher():
+    """测试商品匹配引擎"""
+    print("\n" + "=" * 60)
+    print("测试5: 商品匹配引擎")
+    print("=" * 60)
+
+    matcher = ProductMatcher(threshold=0.5)
+
+    # 相似关系可传递：A~B、B~C 时三者同组
+    titles = [
+        "Apple iPhone 15 Pro 256G",
+        "华为 Mate 60 Pro",
+        "Apple iPhone 15 Pro 256G 黑色",
+        "iPhone 15 Pro 256G 黑色 国行",
+        "",
+        "华为 Mate 60 Pro",
+        "小米 14",
+    ]
+    groups = matcher.match(titles)
+    assert groups == [[0, 2, 3], [1, 5]], f"分组结果不正确: {groups}"
+    print(f"✓ 相似商品分组: {groups}")
+
+    # 与两两比较的结果一致，且候选对远少于 n²
+    import random
+    from itertools import combinations
+    random.seed(7)
+    vocab = [f"词{i}" for i in range(200)]
+    titles = []
+    for _ in range(150):
+        words = random.sample(vocab, random.randint(2, 8))
+        for _ in range(random.randint(1, 3)):
+            variant = list(words)
+            if random.random() < 0.5:
+                variant.pop(random.randrange(len(variant)))
+            if random.random() < 0.5:
+                variant.append(random.choice(vocab))
+            titles.append(" ".join(variant))
+
+    analyzer = ArbitrageAnalyzer()
+    parent = list(range(len(titles)))
+
+    def find(x):
+        while parent[x] != x:
+            x = parent[x]
+        return x
+
+    for i, j in combinations(range(len(titles)), 2):
+        if analyzer._is_similar(titles[i], titles[j]):
+            parent[find(i)] = find(j)
+    expected = {}
+    for i in range(len(titles)):
+        expected.setdefault(find(i), []).append(i)
+    expected = sorted((g for g in expected.values() if len(g) > 1), key=lambda g: g[0])
+
+    assert matcher.match(titles) == expected, "匹配结果应与两两比较一致"
+    pairs = len(titles) * (len(titles) - 1) // 2
+    assert matcher.stats["candidates"] < pairs / 10, "候选对应远少于两两比较"
+    print(f"✓ 与两两比较一致，候选对 {matcher.stats['candidates']} / {pairs}")
+
+    print("✓ 商品匹配引擎测试通过！\n")
+
+
 def cleanup():
     """清理测试文件"""
     import os
 
     test_files = [
-        "test_opportunities.json",
         "arbitrage_opportunities.json",
     ]
 
@@ -172,6 +236,7 @@ def main():
         test_arbitrage_analyzer()
         test_arbitrage_system()
         test_edge_cases()
+        test_product_matcher()
 
         print("\n" + "=" * 60)
         print("✓✓✓ 所有测试通过！ ✓✓✓")
@@ -4,44 +4,75 @@ Financial Analysis System - 金融数据分析系统
 提供股票分析、技术指标计算、趋势预测和投资建议生成
 """
 
+import os
+import csv
 import json
+import time
+import heapq
 import argparse
+import multiprocessing
+from abc import ABC, abstractmethod
+from array import array
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, Iterator, List, Tuple, Optional
 import math
 import random
+from collections import deque
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
 
 
 class StockData:
-    """股票数据容器"""
+    """股票数据容器（按行的字典列表，或按列存储的OHLCV）"""
 
-    def __init__(self, symbol: str, data: List[Dict]):
+    def __init__(self, symbol: str, data: Optional[List[Dict]] = None,
+                 columns: Optional[Dict[str, List]] = None):
         self.symbol = symbol
-        self.data = data
+        self.data = data if data is not None else []
+        self.columns = columns
+
+    @classmethod
+    def from_columns(cls, symbol: str, columns: Dict[str, List]) -> 'StockData':
+        """由列式数据构造，不再展开成逐行字典"""
+        return cls(symbol, columns=columns)
+
+    def __len__(self) -> int:
+        if self.columns is not None:
+            return len(self.columns['close'])
+        return len(self.data)
+
+    def _column(self, name: str) -> List:
+        if self.columns is not None:
+            return self.columns[name]
+        return [d[name] for d in self.data]
 
     @property
     def dates(self) -> List[str]:
-        return [d['date'] for d in self.data]
+        return self._column('date')
 
     @property
     def prices(self) -> List[float]:
-        return [d['close'] for d in self.data]
+        return self._column('close')
 
     @property
     def opens(self) -> List[float]:
-        return [d['open'] for d in self.data]
+        return self._column('open')
 
     @property
     def highs(self) -> List[float]:
-        return [d['high'] for d in self.data]
+        return self._column('high')
 
     @property
     def lows(self) -> List[float]:
-        return [d['low'] for d in self.data]
+        return self._column('low')
 
     @property
     def volumes(self) -> List[int]:
-        return [d['volume'] for d in self.data]
+        return self._column('volume')
 
 
 class TechnicalIndicators:
@@ -49,14 +80,17 @@ class TechnicalIndicators:
 
     @staticmethod
     def calculate_sma(prices: List[float], period: int = 20) -> List[float]:
-        """计算简单移动平均线"""
+        """计算简单移动平均线（滑动窗口累加，O(n)）"""
         sma = []
+        window_sum = 0.0
         for i in range(len(prices)):
+            window_sum += prices[i]
+            if i >= period:
+                window_sum -= prices[i - period]
             if i < period - 1:
                 sma.append(None)
             else:
-                avg = sum(prices[i - period + 1:i + 1]) / period
-                sma.append(avg)
+                sma.append(window_sum / period)
         return sma
 
     @staticmethod
@@ -100,7 +134,7 @@ class TechnicalIndicators:
 
     @staticmethod
     def calculate_rsi(prices: List[float], period: int = 14) -> List[float]:
-        """计算RSI相对强弱指数"""
+        """计算RSI相对强弱指数（滑动窗口累加，O(n)）"""
         rsi = []
         gains = []
         losses = []
@@ -114,26 +148,35 @@ class TechnicalIndicators:
                 gains.append(0)
                 losses.append(abs(change))
 
+        # gain_sum/loss_sum 始终是 gains[i-period:i] / losses[i-period:i] 之和
+        gain_sum = sum(gains[:period])
+        loss_sum = sum(losses[:period])
+
         for i in range(len(prices)):
             if i < period:
                 rsi.append(None)
-            else:
-                avg_gain = sum(gains[i - period:i]) / period
-                avg_loss = sum(losses[i - period:i]) / period
+                continue
 
-                if avg_loss == 0:
-                    rsi.append(100)
-                else:
-                    rs = avg_gain / avg_loss
-                    rsi_val = 100 - (100 / (1 + rs))
-                    rsi.append(rsi_val)
+            if i > period:
+                gain_sum += gains[i - 1] - gains[i - period - 1]
+                loss_sum += losses[i - 1] - losses[i - period - 1]
+
+            avg_gain = gain_sum / period
+            avg_loss = loss_sum / period
+
+            if avg_loss <= 0:
+                rsi.append(100)
+            else:
+                rs = avg_gain / avg_loss
+                rsi_val = 100 - (100 / (1 + rs))
+                rsi.append(rsi_val)
 
         return rsi
 
     @staticmethod
     def calculate_kdj(highs: List[float], lows: List[float], closes: List[float],
                      period: int = 9) -> Dict:
-        """计算KDJ随机指标"""
+        """计算KDJ随机指标（单调队列求窗口最高/最低价，O(n)）"""
         k_values = []
         d_values = []
         j_values = []
@@ -141,14 +184,30 @@ class TechnicalIndicators:
         prev_k = 50
         prev_d = 50
 
+        # 队列中保存下标，max_queue 对应的最高价单调递减，min_queue 对应的最低价单调递增
+        max_queue = deque()
+        min_queue = deque()
+
         for i in range(len(closes)):
+            while max_queue and highs[max_queue[-1]] <= highs[i]:
+                max_queue.pop()
+            max_queue.append(i)
+            while min_queue and lows[min_queue[-1]] >= lows[i]:
+                min_queue.pop()
+            min_queue.append(i)
+
+            if max_queue[0] <= i - period:
+                max_queue.popleft()
+            if min_queue[0] <= i - period:
+                min_queue.popleft()
+
             if i < period - 1:
                 k_values.append(None)
                 d_values.append(None)
                 j_values.append(None)
             else:
-                high_n = max(highs[i - period + 1:i + 1])
-                low_n = min(lows[i - period + 1:i + 1])
+                high_n = highs[max_queue[0]]
+                low_n = lows[min_queue[0]]
 
                 if high_n == low_n:
                     rsv = 50
@@ -170,18 +229,39 @@ class TechnicalIndicators:
 
     @staticmethod
     def calculate_boll(prices: List[float], period: int = 20, std_dev: int = 2) -> Dict:
-        """计算布林线"""
+        """计算布林线（滑动窗口累加均值与平方和，O(n)）"""
         sma = TechnicalIndicators.calculate_sma(prices, period)
 
         upper_band = []
         lower_band = []
 
+        # 每隔period根K线以当前价格为新基准重算一次窗口和，
+        # 既避免平方和大数相减的精度损失，又不让滑动累加误差随序列长度增长（摊还O(1)）
+        base = 0.0
+        window_sum = 0.0
+        window_sq = 0.0
+
         for i in range(len(prices)):
+            if i % period == 0:
+                base = prices[i]
+                window = [x - base for x in prices[max(0, i - period + 1):i]]
+                window_sum = sum(window)
+                window_sq = sum(x * x for x in window)
+            elif i >= period:
+                dropped = prices[i - period] - base
+                window_sum -= dropped
+                window_sq -= dropped * dropped
+
+            shifted = prices[i] - base
+            window_sum += shifted
+            window_sq += shifted * shifted
+
             if i < period - 1:
                 upper_band.append(None)
                 lower_band.append(None)
             else:
-                std = math.sqrt(sum((x - sma[i]) ** 2 for x in prices[i - period + 1:i + 1]) / period)
+                mean = window_sum / period
+                std = math.sqrt(max(window_sq / period - mean * mean, 0.0))
                 upper_band.append(sma[i] + std_dev * std)
                 lower_band.append(sma[i] - std_dev * std)
 
@@ -192,6 +272,572 @@ class TechnicalIndicators:
         }
 
 
+class VectorIndicators:
+    """
+    向量化技术指标引擎（NumPy）
+
+    - 输入可以是一维价格序列，也可以是二维矩阵（每行一个标的、每列一根K线）
+    - 窗口类指标（SMA/RSI/BOLL）用分块前缀/后缀和，KDJ的窗口最高/最低价用分块前缀/后缀极值（van Herk/Gil-Werman），均为O(n)
+    - 递推类指标（EMA/MACD/KDJ平滑）按时间循环、在标的维度上向量化
+    - 数据不足的位置用NaN填充，而不是None
+    """
+
+    @staticmethod
+    def _asarray(values) -> 'np.ndarray':
+        if not HAS_NUMPY:
+            raise ImportError('向量化指标需要numpy，请运行: pip install numpy')
+        arr = np.asarray(values, dtype=np.float64)
+        if arr.ndim not in (1, 2):
+            raise ValueError(f'只支持一维或二维输入，实际维度: {arr.ndim}')
+        return arr
+
+    @staticmethod
+    def _nan_like(arr: 'np.ndarray') -> 'np.ndarray':
+        return np.full(arr.shape, np.nan)
+
+    # 滑动窗口统一按period分块：窗口 [i, i+period-1] 最多跨两个块，
+    # 等于左块从i开始的后缀 + 右块到i+period-1为止的前缀。
+    # 块内前缀/后缀用一次累积运算得到，整体O(n)，累加误差只与period有关
+
+    @staticmethod
+    def _block_scan(arr: 'np.ndarray', period: int, fill: float, accumulate) -> Tuple['np.ndarray', 'np.ndarray']:
+        """分块前缀/后缀累积，返回与补齐后序列等长的 (prefix, suffix)"""
+        lead = arr.shape[:-1]
+        blocks = -(-arr.shape[-1] // period)
+        pad = blocks * period - arr.shape[-1]
+        padded = np.concatenate(
+            [arr, np.full(lead + (pad,), fill)], axis=-1
+        ).reshape(lead + (blocks, period))
+        prefix = accumulate(padded, axis=-1).reshape(lead + (-1,))
+        suffix = accumulate(padded[..., ::-1], axis=-1)[..., ::-1].reshape(lead + (-1,))
+        return prefix, suffix
+
+    @staticmethod
+    def _window_layout(n: int, period: int) -> Tuple['np.ndarray', 'np.ndarray']:
+        """每个窗口是否有右半部分（恰好是一整块时没有），以及右半部分的长度"""
+        end = np.arange(period - 1, n)
+        has_right = (end + 1) % period != 0
+        return has_right, np.where(has_right, end % period + 1, 0)
+
+    @staticmethod
+    def _rolling_sum(arr: 'np.ndarray', period: int) -> 'np.ndarray':
+        """窗口和，返回长度为 n-period+1 的有效部分"""
+        n = arr.shape[-1]
+        prefix, suffix = VectorIndicators._block_scan(arr, period, 0.0, np.cumsum)
+        has_right, _ = VectorIndicators._window_layout(n, period)
+        return suffix[..., :n - period + 1] + np.where(has_right, prefix[..., period - 1:n], 0.0)
+
+    @staticmethod
+    def _rolling_max(arr: 'np.ndarray', period: int) -> 'np.ndarray':
+        """窗口最大值，返回长度为 n-period+1 的有效部分"""
+        n = arr.shape[-1]
+        # 取最大值可重复覆盖，整块窗口时左右两部分重叠也无妨
+        prefix, suffix = VectorIndicators._block_scan(arr, period, -np.inf, np.maximum.accumulate)
+        return np.maximum(suffix[..., :n - period + 1], prefix[..., period - 1:n])
+
+    @staticmethod
+    def _rolling_var(arr: 'np.ndarray', period: int) -> Tuple['np.ndarray', 'np.ndarray']:
+        """窗口均值与总体方差，返回长度为 n-period+1 的有效部分"""
+        n = arr.shape[-1]
+        valid = n - period + 1
+
+        # 每块以块内第一个有效价格为基准求偏差的和与平方和，避免大数相减的精度损失；
+        # 基准跳过NaN，否则块首的缺失值会让整块窗口都变成NaN
+        lead = arr.shape[:-1]
+        blocks = -(-n // period)
+        padded = np.concatenate(
+            [arr, np.full(lead + (blocks * period - n,), np.nan)], axis=-1
+        ).reshape(lead + (blocks, period))
+        finite = np.isfinite(padded)
+        first = np.take_along_axis(padded, finite.argmax(axis=-1)[..., None], axis=-1)[..., 0]
+        first = np.where(finite.any(axis=-1), first, 0.0)
+        base = np.repeat(first, period, axis=-1)[..., :n]
+        dev = arr - base
+        prefix1, suffix1 = VectorIndicators._block_scan(dev, period, 0.0, np.cumsum)
+        prefix2, suffix2 = VectorIndicators._block_scan(dev * dev, period, 0.0, np.cumsum)
+        has_right, right_count = VectorIndicators._window_layout(n, period)
+        left_count = period - right_count
+
+        left_base = base[..., :valid]
+        right_base = base[..., period - 1:n]
+        left_sum, left_sq = suffix1[..., :valid], suffix2[..., :valid]
+        right_sum = np.where(has_right, prefix1[..., period - 1:n], 0.0)
+        right_sq = np.where(has_right, prefix2[..., period - 1:n], 0.0)
+
+        # 左右两部分分别换算到窗口均值：sum((x-m)^2) = sq + 2*(b-m)*sum + count*(b-m)^2
+        mean = left_base + (left_sum + right_sum + right_count * (right_base - left_base)) / period
+        left_shift = left_base - mean
+        right_shift = right_base - mean
+        m2 = (left_sq + 2 * left_shift * left_sum + left_count * left_shift ** 2
+              + right_sq + 2 * right_shift * right_sum + right_count * right_shift ** 2)
+        return mean, np.clip(m2 / period, 0, None)
+
+    @staticmethod
+    def _smooth(arr: 'np.ndarray', alpha: float, seed) -> 'np.ndarray':
+        """一阶递推平滑 y[t] = y[t-1] + alpha * (x[t] - y[t-1])"""
+        if arr.ndim == 1:
+            # 单个标的时逐个标量递推，Python浮点比NumPy标量快得多
+            out = []
+            prev = float(seed)
+            for value in arr.tolist():
+                prev += alpha * (value - prev)
+                out.append(prev)
+            return np.array(out)
+
+        # 多个标的时转为按时间连续存储，每一步在所有标的上向量化
+        columns = np.ascontiguousarray(arr.T)
+        out = np.empty_like(columns)
+        prev = np.broadcast_to(np.asarray(seed, dtype=np.float64), columns.shape[1:]).copy()
+        for t in range(columns.shape[0]):
+            prev += alpha * (columns[t] - prev)
+            out[t] = prev
+        return np.ascontiguousarray(out.T)
+
+    @staticmethod
+    def calculate_sma(prices, period: int = 20) -> 'np.ndarray':
+        """简单移动平均线"""
+        arr = VectorIndicators._asarray(prices)
+        out = VectorIndicators._nan_like(arr)
+        if arr.shape[-1] >= period:
+            out[..., period - 1:] = VectorIndicators._rolling_sum(arr, period) / period
+        return out
+
+    @staticmethod
+    def calculate_ema(prices, period: int = 12) -> 'np.ndarray':
+        """指数移动平均线（以首个价格为初值）"""
+        arr = VectorIndicators._asarray(prices)
+        if arr.shape[-1] == 0:
+            return arr.copy()
+        return VectorIndicators._smooth(arr, 2 / (period + 1), arr[..., 0])
+
+    @staticmethod
+    def calculate_macd(prices, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict:
+        """MACD指标"""
+        arr = VectorIndicators._asarray(prices)
+        macd_line = VectorIndicators.calculate_ema(arr, fast) - VectorIndicators.calculate_ema(arr, slow)
+        signal_line = VectorIndicators.calculate_ema(macd_line, signal)
+        return {
+            'macd': macd_line,
+            'signal': signal_line,
+            'histogram': macd_line - signal_line
+        }
+
+    @staticmethod
+    def calculate_rsi(prices, period: int = 14) -> 'np.ndarray':
+        """RSI相对强弱指数"""
+        arr = VectorIndicators._asarray(prices)
+        out = VectorIndicators._nan_like(arr)
+        if arr.shape[-1] <= period:
+            return out
+
+        change = np.diff(arr, axis=-1)
+        avg_gain = VectorIndicators._rolling_sum(np.clip(change, 0, None), period) / period
+        avg_loss = VectorIndicators._rolling_sum(np.clip(-change, 0, None), period) / period
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+        out[..., period:] = np.where(avg_loss == 0, 100.0, rsi)
+        return out
+
+    @staticmethod
+    def calculate_kdj(highs, lows, closes, period: int = 9) -> Dict:
+        """KDJ随机指标"""
+        high_arr = VectorIndicators._asarray(highs)
+        low_arr = VectorIndicators._asarray(lows)
+        close_arr = VectorIndicators._asarray(closes)
+
+        k = VectorIndicators._nan_like(close_arr)
+        d = VectorIndicators._nan_like(close_arr)
+        if close_arr.shape[-1] >= period:
+            high_n = VectorIndicators._rolling_max(high_arr, period)
+            low_n = -VectorIndicators._rolling_max(-low_arr, period)
+            spread = high_n - low_n
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rsv = (close_arr[..., period - 1:] - low_n) / spread * 100
+            rsv = np.where(spread == 0, 50.0, rsv)
+
+            k[..., period - 1:] = VectorIndicators._smooth(rsv, 1 / 3, 50.0)
+            d[..., period - 1:] = VectorIndicators._smooth(k[..., period - 1:], 1 / 3, 50.0)
+
+        return {'k': k, 'd': d, 'j': 3 * k - 2 * d}
+
+    @staticmethod
+    def calculate_boll(prices, period: int = 20, std_dev: int = 2) -> Dict:
+        """布林线（总体标准差）"""
+        arr = VectorIndicators._asarray(prices)
+        middle = VectorIndicators._nan_like(arr)
+        width = VectorIndicators._nan_like(arr)
+        if arr.shape[-1] >= period:
+            mean, variance = VectorIndicators._rolling_var(arr, period)
+            middle[..., period - 1:] = mean
+            width[..., period - 1:] = std_dev * np.sqrt(variance)
+
+        return {
+            'middle': middle,
+            'upper': middle + width,
+            'lower': middle - width
+        }
+
+    @staticmethod
+    def calculate_all(highs, lows, closes) -> Dict:
+        """一次计算全部指标（批量筛选时使用）"""
+        return {
+            'sma': VectorIndicators.calculate_sma(closes),
+            'macd': VectorIndicators.calculate_macd(closes),
+            'rsi': VectorIndicators.calculate_rsi(closes),
+            'kdj': VectorIndicators.calculate_kdj(highs, lows, closes),
+            'boll': VectorIndicators.calculate_boll(closes)
+        }
+
+
+class StreamingIndicator(ABC):
+    """
+    增量指标基类
+
+    每根新K线调用 update()，摊还O(1)更新内部状态并返回当前值（数据不足时为None），
+    结果与 TechnicalIndicators 对完整历史计算的最后一个值一致。
+    snapshot() 返回可JSON序列化的状态，from_snapshot() 据此恢复。
+    """
+
+    def __init__(self, **params):
+        self.params = params
+        self.value = None
+
+    @abstractmethod
+    def update(self, *args):
+        """输入一根K线的数据，返回当前指标值"""
+
+    @abstractmethod
+    def get_state(self) -> Dict:
+        """可JSON序列化的内部状态"""
+
+    @abstractmethod
+    def set_state(self, state: Dict):
+        """从 get_state() 的结果恢复内部状态"""
+
+    def snapshot(self) -> Dict:
+        return {'type': type(self).__name__, 'params': dict(self.params), 'state': self.get_state()}
+
+    @staticmethod
+    def from_snapshot(snapshot: Dict) -> 'StreamingIndicator':
+        cls = STREAMING_INDICATORS.get(snapshot.get('type'))
+        if cls is None:
+            raise ValueError(f"未知的指标类型: {snapshot.get('type')}")
+        indicator = cls(**snapshot['params'])
+        indicator.set_state(snapshot['state'])
+        return indicator
+
+
+class StreamingSMA(StreamingIndicator):
+    """增量简单移动平均"""
+
+    def __init__(self, period: int = 20):
+        super().__init__(period=period)
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.count = 0
+
+    def update(self, price: float) -> Optional[float]:
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(price)
+        self.total += price
+        self.count += 1
+        # 每隔period根重算一次窗口和，避免滑动累加误差随时间增长
+        if self.count % self.period == 0:
+            self.total = sum(self.window)
+        self.value = self.total / self.period if len(self.window) == self.period else None
+        return self.value
+
+    def get_state(self) -> Dict:
+        return {'window': list(self.window), 'count': self.count, 'value': self.value}
+
+    def set_state(self, state: Dict):
+        self.window = deque(state['window'], maxlen=self.period)
+        self.total = sum(self.window)
+        self.count = state['count']
+        self.value = state['value']
+
+
+class StreamingEMA(StreamingIndicator):
+    """增量指数移动平均（以首个价格为初值）"""
+
+    def __init__(self, period: int = 12):
+        super().__init__(period=period)
+        self.multiplier = 2 / (period + 1)
+
+    def update(self, price: float) -> float:
+        if self.value is None:
+            self.value = price
+        else:
+            self.value = (price - self.value) * self.multiplier + self.value
+        return self.value
+
+    def get_state(self) -> Dict:
+        return {'value': self.value}
+
+    def set_state(self, state: Dict):
+        self.value = state['value']
+
+
+class StreamingRSI(StreamingIndicator):
+    """增量RSI（最近period次涨跌的简单平均）"""
+
+    def __init__(self, period: int = 14):
+        super().__init__(period=period)
+        self.period = period
+        self.prev_price = None
+        self.gains = deque(maxlen=period)
+        self.losses = deque(maxlen=period)
+        self.gain_sum = 0.0
+        self.loss_sum = 0.0
+        self.count = 0
+
+    def update(self, price: float) -> Optional[float]:
+        if self.prev_price is not None:
+            change = price - self.prev_price
+            if len(self.gains) == self.period:
+                self.gain_sum -= self.gains[0]
+                self.loss_sum -= self.losses[0]
+            gain, loss = (change, 0) if change > 0 else (0, -change)
+            self.gains.append(gain)
+            self.losses.append(loss)
+            self.gain_sum += gain
+            self.loss_sum += loss
+            self.count += 1
+            if self.count % self.period == 0:
+                self.gain_sum = sum(self.gains)
+                self.loss_sum = sum(self.losses)
+        self.prev_price = price
+
+        if len(self.gains) < self.period:
+            self.value = None
+        elif self.loss_sum <= 0:
+            self.value = 100
+        else:
+            rs = self.gain_sum / self.loss_sum
+            self.value = 100 - (100 / (1 + rs))
+        return self.value
+
+    def get_state(self) -> Dict:
+        return {
+            'prev_price': self.prev_price, 'gains': list(self.gains), 'losses': list(self.losses),
+            'count': self.count, 'value': self.value
+        }
+
+    def set_state(self, state: Dict):
+        self.prev_price = state['prev_price']
+        self.gains = deque(state['gains'], maxlen=self.period)
+        self.losses = deque(state['losses'], maxlen=self.period)
+        self.gain_sum = sum(self.gains)
+        self.loss_sum = sum(self.losses)
+        self.count = state['count']
+        self.value = state['value']
+
+
+class StreamingMACD(StreamingIndicator):
+    """增量MACD"""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        super().__init__(fast=fast, slow=slow, signal=signal)
+        self.ema_fast = StreamingEMA(fast)
+        self.ema_slow = StreamingEMA(slow)
+        self.ema_signal = StreamingEMA(signal)
+
+    def update(self, price: float) -> Dict:
+        macd = self.ema_fast.update(price) - self.ema_slow.update(price)
+        signal = self.ema_signal.update(macd)
+        self.value = {'macd': macd, 'signal': signal, 'histogram': macd - signal}
+        return self.value
+
+    def get_state(self) -> Dict:
+        return {
+            'fast': self.ema_fast.value, 'slow': self.ema_slow.value,
+            'signal': self.ema_signal.value, 'value': self.value
+        }
+
+    def set_state(self, state: Dict):
+        self.ema_fast.value = state['fast']
+        self.ema_slow.value = state['slow']
+        self.ema_signal.value = state['signal']
+        self.value = state['value']
+
+
+class StreamingKDJ(StreamingIndicator):
+    """增量KDJ（单调队列维护窗口最高/最低价）"""
+
+    def __init__(self, period: int = 9):
+        super().__init__(period=period)
+        self.period = period
+        self.index = 0
+        # 元素为 (下标, 价格)
+        self.max_queue = deque()
+        self.min_queue = deque()
+        self.k = 50
+        self.d = 50
+
+    def update(self, high: float, low: float, close: float) -> Optional[Dict]:
+        i = self.index
+        self.index += 1
+
+        while self.max_queue and self.max_queue[-1][1] <= high:
+            self.max_queue.pop()
+        self.max_queue.append((i, high))
+        while self.min_queue and self.min_queue[-1][1] >= low:
+            self.min_queue.pop()
+        self.min_queue.append((i, low))
+        if self.max_queue[0][0] <= i - self.period:
+            self.max_queue.popleft()
+        if self.min_queue[0][0] <= i - self.period:
+            self.min_queue.popleft()
+
+        if i < self.period - 1:
+            self.value = None
+            return None
+
+        high_n = self.max_queue[0][1]
+        low_n = self.min_queue[0][1]
+        rsv = 50 if high_n == low_n else (close - low_n) / (high_n - low_n) * 100
+
+        self.k = (2 * self.k + rsv) / 3
+        self.d = (2 * self.d + self.k) / 3
+        self.value = {'k': self.k, 'd': self.d, 'j': 3 * self.k - 2 * self.d}
+        return self.value
+
+    def get_state(self) -> Dict:
+        return {
+            'index': self.index, 'max_queue': [list(item) for item in self.max_queue],
+            'min_queue': [list(item) for item in self.min_queue],
+            'k': self.k, 'd': self.d, 'value': self.value
+        }
+
+    def set_state(self, state: Dict):
+        self.index = state['index']
+        self.max_queue = deque(tuple(item) for item in state['max_queue'])
+        self.min_queue = deque(tuple(item) for item in state['min_queue'])
+        self.k = state['k']
+        self.d = state['d']
+        self.value = state['value']
+
+
+class StreamingBOLL(StreamingIndicator):
+    """增量布林线"""
+
+    def __init__(self, period: int = 20, std_dev: int = 2):
+        super().__init__(period=period, std_dev=std_dev)
+        self.period = period
+        self.std_dev = std_dev
+        self.window = deque(maxlen=period)
+        self.count = 0
+        self._rebase(0.0)
+
+    def _rebase(self, base: float):
+        # 以最近的价格为基准重算偏差和与平方和，与 calculate_boll 一致
+        self.base = base
+        self.dev_sum = sum(x - base for x in self.window)
+        self.dev_sq = sum((x - base) ** 2 for x in self.window)
+
+    def update(self, price: float) -> Optional[Dict]:
+        if len(self.window) == self.period:
+            dropped = self.window.popleft() - self.base
+            self.dev_sum -= dropped
+            self.dev_sq -= dropped * dropped
+        if self.count % self.period == 0:
+            self._rebase(price)
+
+        self.window.append(price)
+        shifted = price - self.base
+        self.dev_sum += shifted
+        self.dev_sq += shifted * shifted
+        self.count += 1
+
+        if len(self.window) < self.period:
+            self.value = None
+            return None
+
+        mean = self.dev_sum / self.period
+        std = math.sqrt(max(self.dev_sq / self.period - mean * mean, 0.0))
+        middle = self.base + mean
+        self.value = {
+            'middle': middle,
+            'upper': middle + self.std_dev * std,
+            'lower': middle - self.std_dev * std
+        }
+        return self.value
+
+    def get_state(self) -> Dict:
+        return {'window': list(self.window), 'count': self.count, 'base': self.base, 'value': self.value}
+
+    def set_state(self, state: Dict):
+        self.window = deque(state['window'], maxlen=self.period)
+        self.count = state['count']
+        self._rebase(state['base'])
+        self.value = state['value']
+
+
+STREAMING_INDICATORS = {
+    cls.__name__: cls
+    for cls in (StreamingSMA, StreamingEMA, StreamingRSI, StreamingMACD, StreamingKDJ, StreamingBOLL)
+}
+
+
+class StreamingIndicators:
+    """
+    单个标的的一组增量指标
+
+    update() 接收一根新K线（最高/最低价缺省时取收盘价），返回全部指标的当前值。
+    某个指标的参数设为None时不计算该指标（回测时只保留策略用到的指标）。
+    """
+
+    def __init__(self, sma_periods: Tuple[int, ...] = (5, 20), ema_period: Optional[int] = 12,
+                 rsi_period: Optional[int] = 14, macd: Optional[Tuple[int, int, int]] = (12, 26, 9),
+                 kdj_period: Optional[int] = 9, boll: Optional[Tuple[int, int]] = (20, 2)):
+        self.indicators: Dict[str, StreamingIndicator] = {
+            f'sma_{period}': StreamingSMA(period) for period in sma_periods
+        }
+        if ema_period is not None:
+            self.indicators['ema'] = StreamingEMA(ema_period)
+        if rsi_period is not None:
+            self.indicators['rsi'] = StreamingRSI(rsi_period)
+        if macd is not None:
+            self.indicators['macd'] = StreamingMACD(*macd)
+        if kdj_period is not None:
+            self.indicators['kdj'] = StreamingKDJ(kdj_period)
+        if boll is not None:
+            self.indicators['boll'] = StreamingBOLL(*boll)
+        self.bars = 0
+
+    def update(self, close: float, high: Optional[float] = None, low: Optional[float] = None) -> Dict:
+        high = close if high is None else high
+        low = close if low is None else low
+        for name, indicator in self.indicators.items():
+            if name == 'kdj':
+                indicator.update(high, low, close)
+            else:
+                indicator.update(close)
+        self.bars += 1
+        return self.values()
+
+    def values(self) -> Dict:
+        return {name: indicator.value for name, indicator in self.indicators.items()}
+
+    def snapshot(self) -> Dict:
+        return {
+            'bars': self.bars,
+            'indicators': {name: indicator.snapshot() for name, indicator in self.indicators.items()}
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict) -> 'StreamingIndicators':
+        restored = cls.__new__(cls)
+        restored.indicators = {
+            name: StreamingIndicator.from_snapshot(item) for name, item in snapshot['indicators'].items()
+        }
+        restored.bars = snapshot['bars']
+        return restored
+
+
 class TrendAnalyzer:
     """趋势分析器"""
 
@@ -543,7 +1189,12 @@ class DataGenerator:
 def analyze_stock(symbol: str, days: int = 30) -> Dict:
     """分析股票"""
     data = DataGenerator.generate_stock_data(symbol, days)
-    stock = StockData(symbol, data)
+    return analyze_stock_data(StockData(symbol, data))
+
+
+def analyze_stock_data(stock: StockData) -> Dict:
+    """对已加载的行情数据做完整分析"""
+    symbol = stock.symbol
 
     # 计算技术指标
     indicators = TechnicalIndicators()
@@ -584,7 +1235,7 @@ def analyze_stock(symbol: str, days: int = 30) -> Dict:
     return {
         'symbol': symbol,
         'date': datetime.now().strftime('%Y-%m-%d'),
-        'data': data,
+        'data': stock.data,
         'indicators': {
             'macd': macd,
             'rsi': rsi,
@@ -599,15 +1250,272 @@ def analyze_stock(symbol: str, days: int = 30) -> Dict:
     }
 
 
+# 筛选用的行情列与常见别名（如tushare的 trade_date / vol）
+OHLCV_COLUMNS = ('date', 'open', 'high', 'low', 'close', 'volume')
+COLUMN_ALIASES = {
+    'trade_date': 'date', 'datetime': 'date', 'time': 'date', 'timestamp': 'date',
+    'vol': 'volume',
+}
+MIN_SCREEN_BARS = 20
+SCREEN_RISK_WEIGHT = 0.2
+
+
+class OHLCVLoader:
+    """
+    本地行情文件加载器（列式读取）
+
+    数据目录下每个标的一个文件：<SYMBOL>.csv 或 <SYMBOL>.parquet。
+    只读取OHLCV所需的列，数值列存为紧凑的 array('d')，不展开成逐行字典；
+    文件按日期降序存储时自动翻转为升序，并只保留最近 days 根K线。
+    """
+
+    EXTENSIONS = ('.parquet', '.csv')
+
+    def __init__(self, data_dir: str, days: Optional[int] = None):
+        self.data_dir = data_dir
+        self.days = days
+
+    def path_for(self, symbol: str) -> Optional[str]:
+        for ext in self.EXTENSIONS:
+            path = os.path.join(self.data_dir, symbol + ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def list_symbols(self) -> List[str]:
+        """数据目录下的全部标的"""
+        symbols = set()
+        for name in os.listdir(self.data_dir):
+            stem, ext = os.path.splitext(name)
+            if ext in self.EXTENSIONS:
+                symbols.add(stem)
+        return sorted(symbols)
+
+    def load(self, symbol: str) -> StockData:
+        path = self.path_for(symbol)
+        if path is None:
+            raise FileNotFoundError(f'找不到 {symbol} 的行情文件: {self.data_dir}')
+        return self.load_file(path, symbol, self.days)
+
+    @staticmethod
+    def load_file(path: str, symbol: Optional[str] = None, days: Optional[int] = None) -> StockData:
+        """加载单个行情文件（.csv / .parquet）"""
+        if symbol is None:
+            symbol = os.path.splitext(os.path.basename(path))[0]
+        if path.endswith('.parquet'):
+            columns = OHLCVLoader._load_parquet(path)
+        else:
+            columns = OHLCVLoader._load_csv(path)
+        return StockData.from_columns(symbol, OHLCVLoader._finalize(columns, days))
+
+    @staticmethod
+    def _column_map(names: List[str]) -> Dict[str, str]:
+        """文件列名 -> 标准列名"""
+        mapping = {}
+        for name in names:
+            key = name.strip().lower()
+            key = COLUMN_ALIASES.get(key, key)
+            if key in OHLCV_COLUMNS and key not in mapping.values():
+                mapping[name] = key
+        missing = [c for c in OHLCV_COLUMNS if c not in mapping.values()]
+        if missing:
+            raise ValueError(f'行情文件缺少列: {", ".join(missing)}')
+        return mapping
+
+    @staticmethod
+    def _load_csv(path: str) -> Dict[str, object]:
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                raise ValueError(f'行情文件为空: {path}')
+            mapping = OHLCVLoader._column_map(header)
+            indexes = {key: header.index(name) for name, key in mapping.items()}
+
+            columns: Dict[str, object] = {'date': []}
+            for key in OHLCV_COLUMNS[1:]:
+                columns[key] = array('d')
+            for row in reader:
+                if not row:
+                    continue
+                columns['date'].append(row[indexes['date']])
+                for key in OHLCV_COLUMNS[1:]:
+                    columns[key].append(float(row[indexes[key]]))
+        return columns
+
+    @staticmethod
+    def _load_parquet(path: str) -> Dict[str, object]:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('读取Parquet需要pyarrow，请运行: pip install pyarrow')
+
+        names = pq.ParquetFile(path).schema_arrow.names
+        mapping = OHLCVLoader._column_map(names)
+        table = pq.read_table(path, columns=list(mapping))
+
+        columns: Dict[str, object] = {}
+        for name, key in mapping.items():
+            values = table.column(name).to_pylist()
+            if key == 'date':
+                columns[key] = [str(v) for v in values]
+            else:
+                columns[key] = array('d', values)
+        return columns
+
+    @staticmethod
+    def _finalize(columns: Dict[str, object], days: Optional[int]) -> Dict[str, object]:
+        dates = columns['date']
+        if len(dates) > 1 and dates[0] > dates[-1]:
+            for values in columns.values():
+                values.reverse()
+        if days:
+            columns = {key: values[-days:] for key, values in columns.items()}
+        return columns
+
+
+def load_universe(path: str) -> List[str]:
+    """读取股票池文件：每行一个或逗号分隔，# 开头为注释"""
+    symbols = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            symbols.extend(s.strip() for s in line.split(',') if s.strip())
+    return list(dict.fromkeys(symbols))
+
+
+def screen_stock(stock: StockData) -> Dict:
+    """分析单个标的并压缩为筛选结果"""
+    if len(stock) < MIN_SCREEN_BARS:
+        raise ValueError(f'数据不足: {len(stock)} 根K线，至少需要 {MIN_SCREEN_BARS} 根')
+
+    result = analyze_stock_data(stock)
+    signal = result['signal']
+    risk = result['risk']
+    trend = result['trend']
+
+    # 买入信号按置信度加分、卖出信号减分，再按风险分数扣分
+    direction = {'buy': 1, 'sell': -1}.get(signal['signal'], 0)
+    score = direction * signal['confidence'] - risk['risk_score'] * SCREEN_RISK_WEIGHT
+
+    return {
+        'symbol': stock.symbol,
+        'date': stock.dates[-1],
+        'bars': len(stock),
+        'price': signal['current_price'],
+        'score': round(score, 2),
+        'signal': signal['signal'],
+        'confidence': signal['confidence'],
+        'trend': trend['trend'],
+        'trend_strength': trend['strength'],
+        'risk_level': risk['risk_level'],
+        'volatility': risk['volatility'],
+        'max_drawdown': risk['max_drawdown'],
+        'action': result['suggestion']['action'],
+    }
+
+
+def _screen_worker(job: Tuple[str, Optional[str], int]) -> Dict:
+    """进程池任务：在子进程内加载行情并分析，只把压缩结果传回主进程"""
+    symbol, data_dir, days = job
+    try:
+        if data_dir:
+            stock = OHLCVLoader(data_dir, days).load(symbol)
+        else:
+            stock = StockData(symbol, DataGenerator.generate_stock_data(symbol, days))
+        return screen_stock(stock)
+    except Exception as e:
+        return {'symbol': symbol, 'error': str(e)}
+
+
+class StockScreener:
+    """
+    多标的并行筛选
+
+    子进程按标的读取本地行情（未指定数据目录时使用模拟数据）、计算指标与信号，
+    结果按完成顺序流式返回；排名时只保留前N名。
+    """
+
+    def __init__(self, data_dir: Optional[str] = None, days: int = 120,
+                 workers: Optional[int] = None, chunksize: int = 16):
+        self.data_dir = data_dir
+        self.days = days
+        self.workers = workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+
+    def universe(self, symbols: Optional[List[str]] = None) -> List[str]:
+        if symbols:
+            return list(dict.fromkeys(symbols))
+        if self.data_dir:
+            return OHLCVLoader(self.data_dir).list_symbols()
+        raise ValueError('需要指定股票池或数据目录')
+
+    def screen(self, symbols: Optional[List[str]] = None) -> Iterator[Dict]:
+        """逐个产出筛选结果（按完成顺序，失败的标的带 error 字段）"""
+        jobs = [(symbol, self.data_dir, self.days) for symbol in self.universe(symbols)]
+
+        if self.workers <= 1 or len(jobs) <= 1:
+            for job in jobs:
+                yield _screen_worker(job)
+            return
+
+        with multiprocessing.Pool(min(self.workers, len(jobs))) as pool:
+            yield from pool.imap_unordered(_screen_worker, jobs, chunksize=self.chunksize)
+
+    def rank(self, symbols: Optional[List[str]] = None, top: Optional[int] = None,
+             on_result: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        筛选并按得分排名
+
+        Args:
+            symbols: 股票池，为空时使用数据目录下的全部标的
+            top: 只保留得分最高的前N名
+            on_result: 每完成一个标的时回调（用于流式输出）
+        """
+        start = time.time()
+        heap: List[Tuple[float, int, Dict]] = []
+        failed = []
+        screened = 0
+
+        for seq, result in enumerate(self.screen(symbols)):
+            if on_result:
+                on_result(result)
+            if 'error' in result:
+                failed.append(result)
+                continue
+            screened += 1
+            item = (result['score'], -seq, result)
+            if top is None or len(heap) < top:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+        ranking = [item[2] for item in sorted(heap, reverse=True)]
+        for rank, result in enumerate(ranking, 1):
+            result['rank'] = rank
+
+        return {
+            'ranking': ranking,
+            'screened': screened,
+            'failed': failed,
+            'elapsed': round(time.time() - start, 2)
+        }
+
+
 def main():
     parser = argparse.ArgumentParser(description='Financial Analysis System')
-    parser.add_argument('action', choices=['analyze', 'indicators', 'trend', 'suggest', 'risk', 'batch'],
+    parser.add_argument('action', choices=['analyze', 'indicators', 'trend', 'suggest', 'risk', 'batch', 'screen'],
                        help='Action to perform')
     parser.add_argument('--symbol', help='Stock symbol (e.g., AAPL)')
     parser.add_argument('--symbols', help='Comma-separated symbols for batch analysis')
     parser.add_argument('--days', type=int, default=30, help='Number of days to analyze')
     parser.add_argument('--output', choices=['json', 'markdown'], default='json', help='Output format')
     parser.add_argument('--strategy', help='Strategy for backtesting')
+    parser.add_argument('--universe', help='File with symbols to screen (one per line or comma-separated)')
+    parser.add_argument('--data-dir', help='Directory of <SYMBOL>.csv / <SYMBOL>.parquet OHLCV files')
+    parser.add_argument('--workers', type=int, help='Worker processes for screening (default: CPU count)')
+    parser.add_argument('--top', type=int, help='Keep only the top N screened symbols')
+    parser.add_argument('--stream', action='store_true', help='Print each screened symbol as a JSON line when done')
 
     args = parser.parse_args()
 
@@ -645,6 +1553,22 @@ def main():
             })
         result = {'results': results}
 
+    elif args.action == 'screen':
+        symbols = None
+        if args.universe:
+            symbols = load_universe(args.universe)
+        elif args.symbols:
+            symbols = [s.strip() for s in args.symbols.split(',') if s.strip()]
+        if not symbols and not args.data_dir:
+            print('Error: --universe, --symbols or --data-dir is required for screening')
+            return
+
+        screener = StockScreener(args.data_dir, args.days, args.workers)
+        on_result = None
+        if args.stream:
+            on_result = lambda r: print(json.dumps(r, ensure_ascii=False), flush=True)
+        result = screener.rank(symbols, top=args.top, on_result=on_result)
+
     # 输出结果
     if args.output == 'json':
         print(json.dumps(result, indent=2, default=str))
@@ -654,6 +1578,19 @@ def main():
 
 def format_markdown(data: Dict) -> str:
     """格式化为Markdown"""
+    if 'ranking' in data:  # 筛选结果
+        lines = [
+            '# 筛选结果\n',
+            f"共筛选 {data['screened']} 只，失败 {len(data['failed'])} 只，耗时 {data['elapsed']} 秒\n",
+            '| 排名 | 代码 | 得分 | 信号 | 置信度 | 趋势 | 风险 | 价格 |',
+            '|------|------|------|------|--------|------|------|------|',
+        ]
+        for r in data['ranking']:
+            lines.append(
+                f"| {r['rank']} | {r['symbol']} | {r['score']} | {r['signal']} | {r['confidence']}% "
+                f"| {r['trend']} | {r['risk_level']} | {r['price']} |"
+            )
+        return '\n'.join(lines)
     if 'results' in data:  # 批量结果
         lines = ['# 批量分析结果\n']
         for r in data['results']:
@@ -454,6 +454,148 @@ def test_full_analysis():
     return True
 
 
+def test_vector_indicators():
+    """测试向量化指标引擎"""
+    print('测试17: 向量化指标引擎...')
+
+    if not HAS_NUMPY:
+        print('  - 未安装numpy，跳过')
+        return True
+
+    stocks = [StockData('TEST', DataGenerator.generate_stock_data('TEST', 60)) for _ in range(3)]
+    highs = np.array([s.highs for s in stocks])
+    lows = np.array([s.lows for s in stocks])
+    closes = np.array([s.prices for s in stocks])
+
+    result = VectorIndicators.calculate_all(highs, lows, closes)
+    assert result['rsi'].shape == closes.shape, '批量输入应该返回同形状的矩阵'
+
+    def same(expected, actual):
+        for e, a in zip(expected, actual):
+            if e is None:
+                assert np.isnan(a), 'None的位置应该是NaN'
+            else:
+                assert abs(e - a) < 1e-6, f'向量化结果应该与逐点计算一致: {e} != {a}'
+
+    # 每一行都应该与逐个标的计算的结果一致
+    indicators = TechnicalIndicators()
+    for i, stock in enumerate(stocks):
+        same(indicators.calculate_sma(stock.prices, 20), result['sma'][i])
+        same(indicators.calculate_rsi(stock.prices), result['rsi'][i])
+        same(indicators.calculate_macd(stock.prices)['histogram'], result['macd']['histogram'][i])
+        kdj = indicators.calculate_kdj(stock.highs, stock.lows, stock.prices)
+        for key in ('k', 'd', 'j'):
+            same(kdj[key], result['kdj'][key][i])
+        boll = indicators.calculate_boll(stock.prices)
+        for key in ('middle', 'upper', 'lower'):
+            same(boll[key], result['boll'][key][i])
+
+    # 一维输入、长度不足周期时全部为NaN
+    assert np.isnan(VectorIndicators.calculate_sma([1, 2, 3], 5)).all(), '数据不足时应该全部为NaN'
+
+    # 窗口恰好跨块边界、以及价格不变时标准差为0
+    flat = VectorIndicators.calculate_boll([10.0] * 50, period=7)
+    assert np.allclose(flat['upper'][6:], 10.0), '价格不变时布林带宽度应该为0'
+
+    # 前面补NaN时，块首为NaN不应影响之后完整的窗口
+    padded = np.arange(1, 61, dtype=float)
+    padded[:23] = np.nan
+    sma = VectorIndicators.calculate_sma(padded, 20)
+    boll = VectorIndicators.calculate_boll(padded, period=20)
+    assert np.array_equal(np.isnan(boll['middle']), np.isnan(sma)), '布林带的NaN位置应该与SMA一致'
+    expected = [np.std(padded[i - 19:i + 1]) for i in range(42, 60)]
+    assert np.allclose((boll['upper'][42:] - boll['middle'][42:]) / 2, expected), '补NaN后的标准差应该正确'
+
+    print('  ✓ 向量化指标引擎测试通过')
+    return True
+
+
+def test_stock_screener():
+    """测试多标的筛选"""
+    print('测试18: 多标的筛选...')
+
+    import csv
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        for i in range(6):
+            data = DataGenerator.generate_stock_data('TEST', 60)
+            # 一半文件按日期降序存储（如tushare导出格式），列名使用别名
+            rows = data[::-1] if i % 2 else data
+            with open(os.path.join(data_dir, f'60000{i}.SH.csv'), 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['trade_date', 'open', 'high', 'low', 'close', 'vol'])
+                for r in rows:
+                    writer.writerow([r['date'], r['open'], r['high'], r['low'], r['close'], r['volume']])
+
+        loader = OHLCVLoader(data_dir, days=40)
+        assert len(loader.list_symbols()) == 6, '应该找到6个标的'
+        stock = loader.load('600001.SH')
+        assert len(stock) == 40, '应该只保留最近40根K线'
+        assert stock.dates[0] < stock.dates[-1], '降序文件应该翻转为升序'
+
+        screener = StockScreener(data_dir, days=40, workers=2, chunksize=1)
+        streamed = []
+        result = screener.rank(loader.list_symbols() + ['MISSING'], top=3, on_result=streamed.append)
+
+        assert len(streamed) == 7, '每个标的完成时都应该回调'
+        assert result['screened'] == 6, '应该成功筛选6个标的'
+        assert [r['symbol'] for r in result['failed']] == ['MISSING'], '缺少数据的标的应该记为失败'
+        assert len(result['ranking']) == 3, '应该只保留前3名'
+        scores = [r['score'] for r in result['ranking']]
+        assert scores == sorted(scores, reverse=True), '应该按得分降序排列'
+        assert [r['rank'] for r in result['ranking']] == [1, 2, 3], '排名应该从1开始'
+
+    print('  ✓ 多标的筛选测试通过')
+    return True
+
+
+def test_streaming_indicators():
+    """测试增量指标"""
+    print('测试19: 增量指标...')
+
+    import json
+
+    data = DataGenerator.generate_stock_data('TEST', 60)
+    stock = StockData('TEST', data)
+    prices, highs, lows = stock.prices, stock.highs, stock.lows
+
+    live = StreamingIndicators(sma_periods=(5,), rsi_period=6, kdj_period=5, boll=(10, 2))
+    for i in range(len(prices)):
+        # 中途做一次快照并恢复，结果应该不受影响
+        if i == 30:
+            live = StreamingIndicators.from_snapshot(json.loads(json.dumps(live.snapshot())))
+        values = live.update(prices[i], highs[i], lows[i])
+
+    indicators = TechnicalIndicators()
+    assert abs(values['sma_5'] - indicators.calculate_sma(prices, 5)[-1]) < 1e-6, 'SMA应该与批量计算一致'
+    assert abs(values['ema'] - indicators.calculate_ema(prices, 12)[-1]) < 1e-6, 'EMA应该与批量计算一致'
+    assert abs(values['rsi'] - indicators.calculate_rsi(prices, 6)[-1]) < 1e-6, 'RSI应该与批量计算一致'
+    macd = indicators.calculate_macd(prices)
+    assert abs(values['macd']['histogram'] - macd['histogram'][-1]) < 1e-6, 'MACD应该与批量计算一致'
+    kdj = indicators.calculate_kdj(highs, lows, prices, 5)
+    for key in ('k', 'd', 'j'):
+        assert abs(values['kdj'][key] - kdj[key][-1]) < 1e-6, f'KDJ的{key}应该与批量计算一致'
+    boll = indicators.calculate_boll(prices, 10, 2)
+    for key in ('middle', 'upper', 'lower'):
+        assert abs(values['boll'][key] - boll[key][-1]) < 1e-6, f'BOLL的{key}应该与批量计算一致'
+
+    # 预热期返回None
+    sma = StreamingSMA(3)
+    assert sma.update(1) is None and sma.update(2) is None, '数据不足时应该返回None'
+    assert sma.update(3) == 2, '第3个值应该是2'
+
+    # 基类是抽象类
+    try:
+        StreamingIndicator()
+        assert False, '增量指标基类不应该能直接实例化'
+    except TypeError:
+        pass
+
+    print('  ✓ 增量指标测试通过')
+    return True
+
+
 def run_all_tests():
     """运行所有测试"""
     print('=' * 60)
@@ -476,7 +618,10 @@ def run_all_tests():
         test_position_suggestion,
         test_stop_loss,
         test_investment_advisor,
-        test_full_analysis
+        test_full_analysis,
+        test_vector_indicators,
+        test_stock_screener,
+        test_streaming_indicators
     ]
 
     passed = 0
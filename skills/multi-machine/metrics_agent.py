@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Metrics Agent
+主机指标代理 - 在被管理的机器上常驻，提供紧凑的指标快照（CPU、内存、磁盘、负载）
+
+只依赖Python标准库，可由 multi-machine.py agent deploy 分发并启动：
+  python3 metrics_agent.py --port 9109              按请求返回快照（GET /metrics）
+  MMC_AGENT_TOKEN=令牌 python3 metrics_agent.py       设置令牌后才对外监听（否则只监听127.0.0.1）
+  python3 metrics_agent.py --push http://控制机:9110/metrics --name server1   定时推送
+  python3 metrics_agent.py --once                   输出一次快照后退出
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import shutil
+import socket
+import argparse
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+DEFAULT_PORT = 9109
+DEFAULT_COLLECTOR_PORT = 9110
+TOKEN_HEADER = 'X-Agent-Token'
+TOKEN_ENV = 'MMC_AGENT_TOKEN'
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+
+def default_host(token: Optional[str]) -> str:
+    """未设置令牌时只监听本机，设置了令牌才监听所有地址"""
+    return '0.0.0.0' if token else '127.0.0.1'
+
+
+def token_matches(provided: Optional[str], token: str) -> bool:
+    """常数时间比较请求携带的令牌，避免逐字节比较泄露时序信息"""
+    return hmac.compare_digest((provided or '').encode(), token.encode())
+
+
+class MetricsSampler:
+    """后台按间隔读取 /proc/stat 计算CPU使用率，快照时只读取其余指标"""
+
+    def __init__(self, interval: float = 2.0, disk_path: str = '/'):
+        self.interval = interval
+        self.disk_path = disk_path
+        self.cpu: Optional[float] = None
+        self._previous = self._cpu_times()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'MetricsSampler':
+        if self._previous is not None:
+            self._thread = threading.Thread(target=self._run, name='cpu-sampler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample_cpu()
+
+    @staticmethod
+    def _cpu_times():
+        """(空闲, 总计) jiffies，非Linux返回None"""
+        try:
+            with open('/proc/stat', 'rb') as f:
+                fields = f.readline().split()[1:]
+        except OSError:
+            return None
+        values = [int(v) for v in fields]
+        idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+        return idle, sum(values)
+
+    def sample_cpu(self):
+        current = self._cpu_times()
+        if current is None or self._previous is None:
+            return
+        idle = current[0] - self._previous[0]
+        total = current[1] - self._previous[1]
+        if total > 0:
+            self.cpu = round(100.0 * (total - idle) / total, 1)
+        self._previous = current
+
+    @staticmethod
+    def _memory() -> Optional[dict]:
+        try:
+            with open('/proc/meminfo', 'rb') as f:
+                info = {}
+                for line in f:
+                    key, value = line.split(b':', 1)
+                    info[key] = int(value.split()[0]) * 1024
+        except (OSError, ValueError):
+            return None
+        total = info.get(b'MemTotal', 0)
+        available = info.get(b'MemAvailable', info.get(b'MemFree', 0))
+        return {
+            'total': total,
+            'available': available,
+            'percent': round(100.0 * (total - available) / total, 1) if total else None
+        }
+
+    def snapshot(self) -> dict:
+        """当前指标快照"""
+        try:
+            load = [round(v, 2) for v in os.getloadavg()]
+        except OSError:
+            load = None
+        try:
+            usage = shutil.disk_usage(self.disk_path)
+            disk = {
+                'total': usage.total,
+                'used': usage.used,
+                'percent': round(100.0 * usage.used / usage.total, 1) if usage.total else None
+            }
+        except OSError:
+            disk = None
+        try:
+            with open('/proc/uptime', 'rb') as f:
+                uptime = int(float(f.read().split()[0]))
+        except (OSError, ValueError):
+            uptime = None
+
+        return {
+            'host': socket.gethostname(),
+            'ts': round(time.time(), 3),
+            'cpu': self.cpu,
+            'load': load,
+            'mem': self._memory(),
+            'disk': disk,
+            'uptime': uptime
+        }
+
+
+def make_server(sampler: MetricsSampler, host: Optional[str] = None, port: int = DEFAULT_PORT,
+                token: Optional[str] = None) -> ThreadingHTTPServer:
+    """创建HTTP服务（GET /metrics 返回JSON快照），host默认见 default_host"""
+    host = default_host(token) if host is None else host
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            if token and not token_matches(self.headers.get(TOKEN_HEADER, ''), token):
+                self.send_error(403)
+                return
+            body = json.dumps(sampler.snapshot(), separators=(',', ':')).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def push_once(sampler: MetricsSampler, url: str, name: str,
+              token: Optional[str] = None, timeout: float = 5) -> bool:
+    """推送一次快照到控制机"""
+    snapshot = sampler.snapshot()
+    snapshot['name'] = name
+    request = urllib.request.Request(
+        url, data=json.dumps(snapshot, separators=(',', ':')).encode(),
+        headers={'Content-Type': 'application/json', **({TOKEN_HEADER: token} if token else {})},
+        method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='主机指标代理')
+    parser.add_argument('--host', help='监听地址（默认：有令牌时0.0.0.0，否则127.0.0.1）')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='监听端口')
+    parser.add_argument('--token', default=os.environ.get(TOKEN_ENV),
+                        help=f'访问令牌（建议用环境变量 {TOKEN_ENV}，命令行参数在ps中可见）')
+    parser.add_argument('--interval', type=float, default=2.0, help='CPU采样/推送间隔（秒）')
+    parser.add_argument('--push', help='推送模式：控制机的接收地址')
+    parser.add_argument('--name', default=socket.gethostname(), help='推送时使用的机器名')
+    parser.add_argument('--once', action='store_true', help='输出一次快照后退出')
+    args = parser.parse_args()
+    if args.host and args.host not in LOCAL_HOSTS and not args.token and not (args.once or args.push):
+        parser.error(f"监听非本机地址时必须设置 --token 或环境变量 {TOKEN_ENV}")
+    args.host = args.host or default_host(args.token)
+
+    sampler = MetricsSampler(interval=args.interval).start()
+
+    if args.once:
+        time.sleep(min(args.interval, 0.5))
+        sampler.sample_cpu()
+        print(json.dumps(sampler.snapshot(), separators=(',', ':')))
+        return
+
+    if args.push:
+        while True:
+            time.sleep(args.interval)
+            push_once(sampler, args.push, args.name, args.token)
+
+    server = make_server(sampler, args.host, args.port, args.token)
+    print(f"指标代理已启动: http://{args.host}:{args.port}/metrics", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
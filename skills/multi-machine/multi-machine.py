@@ -9,13 +9,91 @@ import json
 import os
 import sys
 import time
+import shlex
+import shutil
+import hashlib
+import runpy
+import select
+import selectors
+import subprocess
 import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from contextlib import contextmanager
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 import paramiko
 from pathlib import Path
 
 
+# 输出回调：(机器名, 'stdout'/'stderr', 一行文本)
+OutputCallback = Callable[[str, str, str], None]
+
+READ_CHUNK = 32768
+TRANSFER_BLOCK = 1024 * 1024
+
+
+SKILLS_DIR = Path(__file__).resolve().parent.parent
+load_module = runpy.run_path(str(SKILLS_DIR / '_shared' / 'module_loader.py'))['load_module']
+
+AGENT_PATH = Path(__file__).parent / 'metrics_agent.py'
+AGENT_REMOTE_PATH = '.mmc_metrics_agent.py'
+# 端口、令牌等约定与代理共用
+metrics_agent = load_module('metrics_agent', AGENT_PATH)
+
+# SSH回退只用shell命令读取指标（被管理机器无需python3）
+STATUS_COMMAND = (
+    "head -1 /proc/stat 2>/dev/null; sleep 0.5; head -1 /proc/stat 2>/dev/null; "
+    "echo load $(cat /proc/loadavg 2>/dev/null || uptime); "
+    "echo uptime $(cut -d' ' -f1 /proc/uptime 2>/dev/null); "
+    "grep -E '^(MemTotal|MemAvailable|MemFree):' /proc/meminfo 2>/dev/null; "
+    "echo disk $(df -Pk / | tail -1)"
+)
+
+DEFAULT_RELAY_COMMAND = (
+    "scp -q -o BatchMode=yes -o StrictHostKeyChecking=accept-new "
+    "-P {target_port} {source_path} {target_user}@{target_host}:{target_path}"
+)
+
+
+def file_checksum(path: str) -> str:
+    """本地文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(TRANSFER_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _OutputStreams:
+    """累积stdout/stderr，并按行回调（未换行的尾部在结束时回调）"""
+
+    def __init__(self, name: str, on_output: Optional[OutputCallback] = None):
+        self.name = name
+        self.on_output = on_output
+        self.chunks = {'stdout': [], 'stderr': []}
+        self.partial = {'stdout': b'', 'stderr': b''}
+
+    def feed(self, stream: str, data: bytes):
+        self.chunks[stream].append(data)
+        if self.on_output is None:
+            return
+        *lines, self.partial[stream] = (self.partial[stream] + data).split(b'\n')
+        for line in lines:
+            self.on_output(self.name, stream, line.decode('utf-8', errors='ignore'))
+
+    def finish(self) -> Tuple[str, str]:
+        if self.on_output is not None:
+            for stream, rest in self.partial.items():
+                if rest:
+                    self.on_output(self.name, stream, rest.decode('utf-8', errors='ignore'))
+                self.partial[stream] = b''
+        return tuple(
+            b''.join(self.chunks[stream]).decode('utf-8', errors='ignore')
+            for stream in ('stdout', 'stderr')
+        )
+
+
 class Machine:
     """单台机器配置"""
 
@@ -23,13 +101,30 @@ class Machine:
         self.name = config['name']
         self.host = config['host']
         self.port = config.get('port', 22)
-        self.username = config['username']
+        self.username = config.get('username', os.environ.get('USER', ''))
         self.auth = config['auth']
+        self.agent_port = config.get('agent_port')
         self.ssh = None
         self.sftp = None
-
-    def connect(self) -> bool:
-        """建立SSH连接"""
+        self.local_session = False
+
+    @property
+    def is_local(self) -> bool:
+        """auth.type为local时直接在控制机上执行（不经过SSH）"""
+        return self.auth['type'] == 'local'
+
+    def is_connected(self) -> bool:
+        """SSH会话是否仍然可用"""
+        if self.is_local:
+            return self.local_session
+        transport = self.ssh.get_transport() if self.ssh else None
+        return transport is not None and transport.is_active()
+
+    def connect(self, open_sftp: bool = True) -> bool:
+        """建立SSH连接（open_sftp=False时SFTP在首次传输文件时再打开）"""
+        if self.is_local:
+            self.local_session = True
+            return True
         try:
             self.ssh = paramiko.SSHClient()
             self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
@@ -56,7 +151,8 @@ class Machine:
                 raise ValueError(f"不支持的认证类型: {self.auth['type']}")
 
             # 建立SFTP连接
-            self.sftp = self.ssh.open_sftp()
+            if open_sftp:
+                self.sftp = self.ssh.open_sftp()
             return True
         except Exception as e:
             print(f"[{self.name}] 连接失败: {e}")
@@ -64,6 +160,7 @@ class Machine:
 
     def disconnect(self):
         """断开连接"""
+        self.local_session = False
         if self.sftp:
             self.sftp.close()
             self.sftp = None
@@ -71,26 +168,113 @@ class Machine:
             self.ssh.close()
             self.ssh = None
 
-    def execute(self, command: str, timeout: int = 30) -> Tuple[bool, str, str]:
+    def open_sftp(self):
+        """返回SFTP客户端，未打开时在现有SSH会话上打开"""
+        if self.sftp is None and self.ssh is not None:
+            self.sftp = self.ssh.open_sftp()
+        return self.sftp
+
+    def execute(self, command: str, timeout: int = 30,
+                on_output: Optional[OutputCallback] = None) -> Tuple[bool, str, str]:
         """执行命令"""
+        exit_code, output, error = self.run_command(command, timeout, on_output)
+        return exit_code == 0, output, error
+
+    def run_command(self, command: str, timeout: float = 30,
+                    on_output: Optional[OutputCallback] = None) -> Tuple[int, str, str]:
+        """
+        执行命令并边执行边读取输出
+
+        在已建立的会话上新开一个channel，同一连接可并发执行多条命令。
+
+        Args:
+            command: 命令
+            timeout: 超时（秒），超时后关闭channel
+            on_output: 每收到一行输出调用一次
+
+        Returns:
+            (退出码, stdout, stderr)，未能执行或超时时退出码为-1
+        """
+        if self.is_local:
+            return self._run_local(command, timeout, on_output)
         if not self.ssh:
-            return False, "", "SSH连接未建立"
+            return -1, "", "SSH连接未建立"
 
+        streams = _OutputStreams(self.name, on_output)
         try:
-            stdin, stdout, stderr = self.ssh.exec_command(command, timeout=timeout)
-            exit_status = stdout.channel.recv_exit_status()
-            output = stdout.read().decode('utf-8', errors='ignore')
-            error = stderr.read().decode('utf-8', errors='ignore')
+            channel = self.ssh.get_transport().open_session(timeout=timeout)
+        except Exception as e:
+            return -1, "", f"执行命令失败: {e}"
 
-            return exit_status == 0, output, error
+        try:
+            channel.exec_command(command)
+            deadline = time.monotonic() + timeout
+            while True:
+                while channel.recv_ready():
+                    streams.feed('stdout', channel.recv(READ_CHUNK))
+                while channel.recv_stderr_ready():
+                    streams.feed('stderr', channel.recv_stderr(READ_CHUNK))
+                if channel.exit_status_ready() and not channel.recv_ready() \
+                        and not channel.recv_stderr_ready():
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    output, error = streams.finish()
+                    return -1, output, error + "命令超时"
+                select.select([channel], [], [], min(remaining, 1.0))
+
+            exit_status = channel.recv_exit_status()
+            output, error = streams.finish()
+            return exit_status, output, error
         except paramiko.SSHException as e:
-            return False, "", f"执行命令失败: {e}"
+            output, error = streams.finish()
+            return -1, output, error + f"执行命令失败: {e}"
         except Exception as e:
-            return False, "", f"未知错误: {e}"
+            output, error = streams.finish()
+            return -1, output, error + f"未知错误: {e}"
+        finally:
+            channel.close()
+
+    def _run_local(self, command: str, timeout: float,
+                   on_output: Optional[OutputCallback]) -> Tuple[int, str, str]:
+        """在控制机上执行命令（auth.type为local）"""
+        streams = _OutputStreams(self.name, on_output)
+        try:
+            process = subprocess.Popen(
+                command, shell=True, stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+        except OSError as e:
+            return -1, "", f"执行命令失败: {e}"
+
+        deadline = time.monotonic() + timeout
+        with selectors.DefaultSelector() as selector:
+            selector.register(process.stdout, selectors.EVENT_READ, 'stdout')
+            selector.register(process.stderr, selectors.EVENT_READ, 'stderr')
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    process.kill()
+                    process.wait()
+                    output, error = streams.finish()
+                    return -1, output, error + "命令超时"
+                for key, _ in selector.select(remaining):
+                    data = os.read(key.fileobj.fileno(), READ_CHUNK)
+                    if data:
+                        streams.feed(key.data, data)
+                    else:
+                        selector.unregister(key.fileobj)
+                        key.fileobj.close()
+
+        exit_code = process.wait()
+        output, error = streams.finish()
+        return exit_code, output, error
 
     def upload(self, local_path: str, remote_path: str) -> Tuple[bool, str]:
         """上传文件"""
-        if not self.sftp:
+        if self.is_local:
+            return self._copy_local(local_path, remote_path, "上传")
+        if not self.open_sftp():
             return False, "SFTP连接未建立"
 
         try:
@@ -101,7 +285,9 @@ class Machine:
 
     def download(self, remote_path: str, local_path: str) -> Tuple[bool, str]:
         """下载文件"""
-        if not self.sftp:
+        if self.is_local:
+            return self._copy_local(remote_path, local_path, "下载")
+        if not self.open_sftp():
             return False, "SFTP连接未建立"
 
         try:
@@ -110,55 +296,289 @@ class Machine:
         except Exception as e:
             return False, f"下载失败: {e}"
 
-    def get_status(self) -> dict:
-        """获取机器状态"""
+    @staticmethod
+    def _copy_local(source: str, target: str, action: str) -> Tuple[bool, str]:
+        try:
+            shutil.copyfile(source, target)
+            return True, f"{action}成功"
+        except Exception as e:
+            return False, f"{action}失败: {e}"
+
+    @contextmanager
+    def remote_file(self, path: str, mode: str = 'rb', dedicated: bool = False):
+        """
+        打开远程文件（local类型直接打开本地文件）
+
+        Args:
+            dedicated: 新开一个SFTP会话，多个线程可各自用一个会话并发读写同一文件
+        """
+        if self.is_local:
+            with open(path, mode) as f:
+                yield f
+            return
+
         if not self.ssh:
-            return {
-                'name': self.name,
-                'status': 'offline',
-                'load': None,
-                'disk': None
+            raise ConnectionError("SSH连接未建立")
+        sftp = self.ssh.open_sftp() if dedicated else self.open_sftp()
+        try:
+            with sftp.open(path, mode) as f:
+                f.set_pipelined(True)  # 写入不逐块等待确认，错误在关闭时抛出
+                yield f
+        finally:
+            if dedicated:
+                sftp.close()
+
+    def checksum(self, path: str, timeout: float = 600) -> Optional[str]:
+        """远程文件的SHA-256，文件不存在或无法计算时返回None"""
+        quoted = shlex.quote(path)
+        exit_code, output, _ = self.run_command(
+            f"sha256sum {quoted} 2>/dev/null || shasum -a 256 {quoted}", timeout
+        )
+        if exit_code != 0 or not output.strip():
+            return None
+        return output.split()[0].lower()
+
+    def get_status(self, timeout: float = 15) -> dict:
+        """
+        用一次exec读取主机指标（只需要shell命令，快照格式与指标代理一致）
+
+        Returns:
+            dict: {name, status, cpu, load, mem, disk, uptime, error}，
+                  status为 online / offline（未连接） / error（命令失败或输出无法解析）
+        """
+        if not self.is_connected():
+            return {'name': self.name, 'status': 'offline', 'error': "未连接"}
+
+        exit_code, output, error = self.run_command(STATUS_COMMAND, timeout)
+        snapshot = self._parse_status(output)
+        if exit_code != 0 or (snapshot['load'] is None and snapshot['disk'] is None):
+            return dict(snapshot, name=self.name, status='error',
+                        error=error.strip() or "无法读取指标")
+        return dict(snapshot, name=self.name, status='online')
+
+    @staticmethod
+    def _parse_status(output: str) -> dict:
+        """解析 STATUS_COMMAND 的输出，缺失的指标为None"""
+        cpu_times, memory = [], {}
+        snapshot = {'cpu': None, 'load': None, 'mem': None, 'disk': None, 'uptime': None}
+        for line in output.splitlines():
+            label, _, rest = line.partition(' ')
+            try:
+                if label == 'cpu':
+                    values = [int(v) for v in rest.split()]
+                    cpu_times.append((values[3] + (values[4] if len(values) > 4 else 0), sum(values)))
+                elif label == 'load' and rest:
+                    # /proc/loadavg 或 uptime 的 "load average(s): 0.08, 0.06, 0.05"
+                    fields = rest.rsplit(':', 1)[-1].replace(',', ' ').split()
+                    snapshot['load'] = [round(float(v), 2) for v in fields[:3]]
+                elif label == 'uptime' and rest:
+                    snapshot['uptime'] = int(float(rest))
+                elif label.endswith(':') and rest:
+                    memory[label[:-1]] = int(rest.split()[0]) * 1024
+                elif label == 'disk' and rest:
+                    blocks, used = (int(v) * 1024 for v in rest.split()[1:3])
+                    snapshot['disk'] = {
+                        'total': blocks,
+                        'used': used,
+                        'percent': round(100.0 * used / blocks, 1) if blocks else None
+                    }
+            except (ValueError, IndexError):
+                continue
+
+        if len(cpu_times) == 2:
+            idle = cpu_times[1][0] - cpu_times[0][0]
+            total = cpu_times[1][1] - cpu_times[0][1]
+            snapshot['cpu'] = round(100.0 * (total - idle) / total, 1) if total > 0 else 0.0
+        if memory.get('MemTotal'):
+            total = memory['MemTotal']
+            available = memory.get('MemAvailable', memory.get('MemFree', 0))
+            snapshot['mem'] = {
+                'total': total,
+                'available': available,
+                'percent': round(100.0 * (total - available) / total, 1)
             }
-
-        success, output, _ = self.execute('uptime && df -h / | tail -1 | awk \'{print $5}\'')
-        if not success:
+        return snapshot
+
+
+class MetricsCache:
+    """
+    主机指标快照的TTL缓存
+
+    快照来自指标代理（拉取或推送）或SSH回退，过期前的读取不访问机器。
+    """
+
+    def __init__(self, ttl: float = 15.0):
+        self.ttl = ttl
+        self.stats = {'hits': 0, 'misses': 0}
+        self._entries: Dict[str, Tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, name: str, snapshot: dict):
+        with self._lock:
+            self._entries[name] = (time.monotonic(), snapshot)
+
+    def get(self, name: str, max_age: Optional[float] = None) -> Optional[dict]:
+        """未过期的快照，过期或不存在返回None"""
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and time.monotonic() - entry[0] <= max_age:
+                self.stats['hits'] += 1
+                return entry[1]
+            self.stats['misses'] += 1
+            return None
+
+    def entries(self) -> Dict[str, dict]:
+        """全部快照（含过期的），附带 age 秒数"""
+        now = time.monotonic()
+        with self._lock:
             return {
-                'name': self.name,
-                'status': 'online',
-                'load': None,
-                'disk': None
+                name: dict(snapshot, age=round(now - stored, 1))
+                for name, (stored, snapshot) in self._entries.items()
             }
 
-        # 解析uptime获取负载
-        lines = output.strip().split('\n')
-        load = None
-        disk = None
-
-        if len(lines) > 0:
-            uptime_line = lines[0]
-            # 提取负载平均值（如 load average: 0.08, 0.06, 0.05）
-            if 'load average:' in uptime_line:
-                load_part = uptime_line.split('load average:')[-1].strip()
-                load = float(load_part.split(',')[0].strip())
-
-        if len(lines) > 1:
-            disk = lines[1].strip() + ' 使用率'
+    def aggregate(self, names: Optional[List[str]] = None) -> dict:
+        """
+        集群汇总视图
+
+        Returns:
+            dict: hosts/online/offline/error/stale，cpu、load、mem、disk 的 avg/max，
+                  以及CPU最高的5台机器 hottest
+        """
+        entries = self.entries()
+        if names is not None:
+            entries = {name: entries[name] for name in names if name in entries}
+        online = {name: e for name, e in entries.items() if e.get('status') == 'online'}
+
+        def summary(values):
+            values = [v for v in values if v is not None]
+            if not values:
+                return {'avg': None, 'max': None}
+            return {'avg': round(sum(values) / len(values), 2), 'max': max(values)}
 
         return {
-            'name': self.name,
-            'status': 'online',
-            'load': load,
-            'disk': disk
+            'hosts': len(entries),
+            'online': len(online),
+            'offline': sum(1 for e in entries.values() if e.get('status') == 'offline'),
+            'error': sum(1 for e in entries.values() if e.get('status') == 'error'),
+            'stale': sum(1 for e in entries.values() if e['age'] > self.ttl),
+            'cpu': summary(e.get('cpu') for e in online.values()),
+            'load': summary((e.get('load') or [None])[0] for e in online.values()),
+            'mem': summary((e.get('mem') or {}).get('percent') for e in online.values()),
+            'disk': summary((e.get('disk') or {}).get('percent') for e in online.values()),
+            'hottest': [
+                (name, e['cpu']) for name, e in sorted(
+                    ((n, e) for n, e in online.items() if e.get('cpu') is not None),
+                    key=lambda item: item[1]['cpu'], reverse=True
+                )[:5]
+            ]
         }
 
 
+class SessionPool:
+    """
+    SSH会话池
+
+    每台机器保持一个已认证的连接（带keepalive），命令以channel的形式复用该连接，
+    只在首次使用或连接断开时握手；每台机器同时打开的channel数受max_channels限制
+    （sshd默认MaxSessions为10）。
+    """
+
+    def __init__(self, max_channels: int = 8, keepalive: int = 30, idle_timeout: float = 600):
+        self.max_channels = max_channels
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self.stats = {'connects': 0, 'reuses': 0, 'failures': 0}
+        self._lock = threading.Lock()
+        self._connect_locks: Dict[str, threading.Lock] = {}
+        self._channels: Dict[str, threading.BoundedSemaphore] = {}
+        self._machines: Dict[str, Machine] = {}
+        self._last_used: Dict[str, float] = {}
+
+    def _slot(self, machine: Machine) -> Tuple[threading.Lock, threading.BoundedSemaphore]:
+        with self._lock:
+            if machine.name not in self._connect_locks:
+                self._connect_locks[machine.name] = threading.Lock()
+                self._channels[machine.name] = threading.BoundedSemaphore(self.max_channels)
+            self._machines[machine.name] = machine
+            return self._connect_locks[machine.name], self._channels[machine.name]
+
+    def acquire(self, machine: Machine) -> bool:
+        """确保机器已连接（复用现有会话或重新握手）"""
+        connect_lock, _ = self._slot(machine)
+        with connect_lock:
+            if machine.is_connected():
+                with self._lock:
+                    self.stats['reuses'] += 1
+                return True
+
+            machine.disconnect()
+            connected = machine.connect(open_sftp=False)
+            with self._lock:
+                self.stats['connects' if connected else 'failures'] += 1
+            if connected and machine.ssh is not None and self.keepalive:
+                machine.ssh.get_transport().set_keepalive(self.keepalive)
+            return connected
+
+    @contextmanager
+    def session(self, machine: Machine):
+        """占用机器的一个channel；连接失败时抛出ConnectionError"""
+        if not self.acquire(machine):
+            raise ConnectionError("连接失败")
+        _, channels = self._slot(machine)
+        with channels:
+            try:
+                yield machine
+            finally:
+                self._last_used[machine.name] = time.monotonic()
+
+    def close_idle(self) -> int:
+        """断开空闲超过idle_timeout的会话"""
+        now = time.monotonic()
+        idle = [
+            name for name, used in list(self._last_used.items())
+            if now - used > self.idle_timeout
+        ]
+        for name in idle:
+            self.close(self._machines[name])
+        return len(idle)
+
+    def close(self, machine: Optional[Machine] = None):
+        """断开指定机器或全部机器的会话"""
+        machines = [machine] if machine else list(self._machines.values())
+        for m in machines:
+            connect_lock, _ = self._slot(m)
+            with connect_lock:
+                m.disconnect()
+            self._last_used.pop(m.name, None)
+
+
 class MultiMachineController:
     """多机器控制器"""
 
-    def __init__(self, config_path: str = 'machines.json'):
+    def __init__(self, config_path: str = 'machines.json', max_channels: int = 8):
         self.config_path = config_path
         self.machines: List[Machine] = []
+        self.pool = SessionPool(max_channels=max_channels)
+        self.agent = {'port': metrics_agent.DEFAULT_PORT, 'token': None, 'ttl': 15.0, 'retry': 60.0}
         self.load_config()
+        self.metrics = MetricsCache(ttl=self.agent['ttl'])
+        self.collector: Optional[ThreadingHTTPServer] = None
+        self._agent_retry: Dict[str, float] = {}
+
+    def close(self):
+        """断开所有会话并停止指标接收服务"""
+        self.pool.close()
+        if self.collector:
+            self.collector.shutdown()
+            self.collector.server_close()
+            self.collector = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
     def load_config(self):
         """加载机器配置"""
@@ -167,6 +587,7 @@ class MultiMachineController:
                 config = json.load(f)
 
             self.machines = [Machine(m) for m in config.get('machines', [])]
+            self.agent.update(config.get('agent', {}))
             print(f"✓ 加载了 {len(self.machines)} 台机器配置")
         except FileNotFoundError:
             print(f"⚠ 配置文件不存在: {self.config_path}")
@@ -205,20 +626,21 @@ class MultiMachineController:
         return None
 
     def run_single(self, machine_name: str, command: str, timeout: int = 30) -> bool:
-        """在单台机器上执行命令"""
+        """在单台机器上执行命令（复用会话池中的连接）"""
         machine = self.get_machine(machine_name)
         if not machine:
             print(f"✗ 机器不存在: {machine_name}")
             return False
 
         print(f"[{machine_name}] 连接中...")
-        if not machine.connect():
+        try:
+            with self.pool.session(machine):
+                print(f"[{machine_name}] 执行命令: {command}")
+                success, output, error = machine.execute(command, timeout)
+        except ConnectionError:
             print(f"[{machine_name}] ✗ 连接失败")
             return False
 
-        print(f"[{machine_name}] 执行命令: {command}")
-        success, output, error = machine.execute(command, timeout)
-
         if success:
             print(f"[{machine_name}] ✓ 执行成功")
             if output:
@@ -228,74 +650,284 @@ class MultiMachineController:
             if error:
                 print(f"错误: {error}")
 
-        machine.disconnect()
         return success
 
-    def run_parallel(self, command: str, timeout: int = 30, max_workers: int = 5):
-        """在所有机器上并行执行命令"""
-        results = {}
-
-        def execute_on_machine(machine):
-            if not machine.connect():
-                return machine.name, False, "连接失败"
-
-            success, output, error = machine.execute(command, timeout)
-            machine.disconnect()
-            return machine.name, success, output if success else error
-
+    def run_parallel(self, command: str, timeout: int = 30, max_workers: int = 64,
+                     stream: bool = False):
+        """在所有机器上并行执行命令（stream=True时逐行输出）"""
         print(f"并行执行命令: {command}")
         print(f"目标机器: {len(self.machines)} 台")
 
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_machine = {
-                executor.submit(execute_on_machine, m): m
-                for m in self.machines
-            }
+        def on_output(name, stream_name, line):
+            print(f"[{name}]{' (stderr)' if stream_name == 'stderr' else ''} {line}")
 
-            for future in as_completed(future_to_machine):
-                machine_name, success, result = future.result()
-                results[machine_name] = {'success': success, 'output': result}
+        def on_result(name, result):
+            success = result['success']
+            print(f"[{name}] {'✓ 成功' if success else '✗ 失败'}")
+            if not stream and success and result['output']:
+                print(f"  输出: {result['output'][:200]}")  # 限制输出长度
 
-                status = "✓" if success else "✗"
-                print(f"[{machine_name}] {status} {'成功' if success else '失败'}")
+        results = self.run_fanout(
+            command, timeout=timeout, concurrency=max_workers,
+            on_output=on_output if stream else None, on_result=on_result
+        )
+        return {
+            name: {
+                'success': r['success'],
+                'output': r['output'] if r['success'] else (r['error'] or r['status'])
+            }
+            for name, r in results.items()
+        }
 
-                if result and success:
-                    print(f"  输出: {result[:200]}")  # 限制输出长度
+    def run_fanout(
+        self,
+        command: str,
+        machines: Optional[List[Machine]] = None,
+        timeout: float = 30,
+        concurrency: int = 64,
+        batch_size: Optional[int] = None,
+        max_failure_rate: Optional[float] = None,
+        on_output: Optional[OutputCallback] = None,
+        on_result: Optional[Callable[[str, dict], None]] = None
+    ) -> Dict[str, dict]:
+        """
+        向多台机器分发命令
+
+        Args:
+            command: 命令
+            machines: 目标机器（默认全部）
+            timeout: 单台机器的命令超时（秒）
+            concurrency: 同时执行的机器数
+            batch_size: 滚动执行，每批N台，上一批结束后才开始下一批
+            max_failure_rate: 累计失败率超过该值（0~1）时停止后续批次
+            on_output: 逐行输出回调 (机器名, stream, 行)
+            on_result: 每台机器完成时回调 (机器名, 结果)
+
+        Returns:
+            Dict[str, dict]: 机器名 -> {status, success, exit_code, output, error, duration}，
+            status为 success / failed / unreachable / skipped
+        """
+        machines = self.machines if machines is None else machines
+        batch_size = batch_size or len(machines) or 1
+        batches = [machines[i:i + batch_size] for i in range(0, len(machines), batch_size)]
+        results: Dict[str, dict] = {}
+
+        def execute_on_machine(machine: Machine) -> dict:
+            started = time.monotonic()
+            try:
+                with self.pool.session(machine):
+                    exit_code, output, error = machine.run_command(command, timeout, on_output)
+                status = 'success' if exit_code == 0 else 'failed'
+            except ConnectionError as e:
+                exit_code, output, error, status = -1, "", str(e), 'unreachable'
+            return {
+                'status': status,
+                'success': status == 'success',
+                'exit_code': exit_code,
+                'output': output,
+                'error': error,
+                'duration': time.monotonic() - started
+            }
 
+        finished = failed = 0
+        aborted = False
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(machines)))) as executor:
+            for batch in batches:
+                if aborted:
+                    for machine in batch:
+                        results[machine.name] = {
+                            'status': 'skipped', 'success': False, 'exit_code': None,
+                            'output': "", 'error': "失败率超限，已停止", 'duration': 0.0
+                        }
+                    continue
+
+                futures = {executor.submit(execute_on_machine, m): m for m in batch}
+                for future in as_completed(futures):
+                    machine = futures[future]
+                    result = future.result()
+                    results[machine.name] = result
+                    finished += 1
+                    failed += not result['success']
+                    if on_result:
+                        on_result(machine.name, result)
+
+                if max_failure_rate is not None and failed / finished > max_failure_rate:
+                    aborted = True
+
+        return {m.name: results[m.name] for m in machines}
+
+    def collect_metrics(
+        self,
+        machines: Optional[List[Machine]] = None,
+        max_age: Optional[float] = None,
+        concurrency: int = 64,
+        timeout: float = 2.0
+    ) -> Dict[str, dict]:
+        """
+        获取主机指标快照（优先使用缓存）
+
+        缓存过期的机器先请求指标代理（GET /metrics），代理不可用时通过SSH
+        用一次exec读取（Machine.get_status）；结果（包括离线）写入缓存。
+        代理请求失败的机器在 agent.retry 秒内直接走SSH，不再等待代理超时。
+
+        Args:
+            machines: 目标机器（默认全部）
+            max_age: 可接受的缓存时长（秒，默认为缓存TTL）
+            concurrency: 同时请求的机器数
+            timeout: 代理请求超时（秒）
+
+        Returns:
+            Dict[str, dict]: 机器名 -> 快照 {status, source, cpu, load, mem, disk, uptime, ...}
+        """
+        machines = self.machines if machines is None else machines
+        stale = [m for m in machines if self.metrics.get(m.name, max_age) is None]
+
+        def refresh(machine: Machine):
+            snapshot = None
+            if self._agent_retry.get(machine.name, 0.0) <= time.monotonic():
+                snapshot = self._fetch_agent(machine, timeout)
+                if snapshot is None:
+                    self._agent_retry[machine.name] = time.monotonic() + self.agent['retry']
+            self.metrics.put(machine.name, snapshot or self._fetch_over_ssh(machine))
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(stale)))) as executor:
+                list(executor.map(refresh, stale))
+
+        entries = self.metrics.entries()
+        return {m.name: entries[m.name] for m in machines if m.name in entries}
+
+    def _fetch_agent(self, machine: Machine, timeout: float) -> Optional[dict]:
+        """请求机器上的指标代理，失败返回None"""
+        port = machine.agent_port or self.agent['port']
+        request = urllib.request.Request(f"http://{machine.host}:{port}/metrics")
+        if self.agent.get('token'):
+            request.add_header(metrics_agent.TOKEN_HEADER, self.agent['token'])
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                snapshot = json.loads(response.read())
+        except (OSError, ValueError):
+            return None
+        return dict(snapshot, status='online', source='agent')
+
+    def _fetch_over_ssh(self, machine: Machine) -> dict:
+        """SSH回退：在会话池的连接上读取一次指标，连接失败记为离线"""
+        try:
+            with self.pool.session(machine):
+                snapshot = machine.get_status()
+        except ConnectionError as e:
+            snapshot = {'name': machine.name, 'status': 'offline', 'error': str(e)}
+        snapshot.pop('name')
+        return dict(snapshot, source='ssh')
+
+    def start_collector(self, host: Optional[str] = None,
+                        port: int = metrics_agent.DEFAULT_COLLECTOR_PORT) -> ThreadingHTTPServer:
+        """
+        启动指标接收服务（推送模式）
+
+        代理以 --push http://<控制机>:<port>/metrics --name <机器名> 运行时，
+        每个间隔POST一次快照，直接写入缓存。未配置 agent.token 时默认只监听127.0.0.1。
+        """
+        cache, token = self.metrics, self.agent.get('token')
+        host = metrics_agent.default_host(token) if host is None else host
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                provided = self.headers.get(metrics_agent.TOKEN_HEADER, '')
+                if token and not metrics_agent.token_matches(provided, token):
+                    self.send_error(403)
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    snapshot = json.loads(self.rfile.read(length))
+                    name = snapshot.pop('name')
+                except (ValueError, KeyError, AttributeError):
+                    self.send_error(400)
+                    return
+                cache.put(name, dict(snapshot, status='online', source='push'))
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.collector = ThreadingHTTPServer((host, port), Handler)
+        self.collector.daemon_threads = True
+        threading.Thread(target=self.collector.serve_forever, daemon=True).start()
+        return self.collector
+
+    def deploy_agent(self, machines: Optional[List[Machine]] = None, port: Optional[int] = None,
+                     interval: float = 2.0) -> Dict[str, dict]:
+        """
+        分发指标代理并在后台启动（已运行的代理会先停止）
+
+        需要配置 agent.token：代理对外监听时必须校验令牌。令牌通过环境变量传给代理，
+        不出现在代理进程的命令行中；停止旧代理前核对PID确实属于代理，避免误杀复用了该PID的进程。
+        """
+        machines = self.machines if machines is None else machines
+        token = self.agent.get('token')
+        if not token:
+            return {
+                m.name: {'status': 'failed', 'success': False,
+                         'error': "未配置 agent.token，代理无法对外提供指标"}
+                for m in machines
+            }
+
+        distributed = self.distribute(str(AGENT_PATH), AGENT_REMOTE_PATH, machines=machines)
+        ready = [m for m in machines if distributed[m.name]['success']]
+
+        pid_file = AGENT_REMOTE_PATH.replace('.py', '.pid')
+        command = (
+            f"pid=$(cat {pid_file} 2>/dev/null); "
+            f"[ -n \"$pid\" ] && ps -p \"$pid\" -o args= 2>/dev/null | grep -qF {AGENT_REMOTE_PATH} "
+            f"&& kill \"$pid\"; "
+            f"{metrics_agent.TOKEN_ENV}={shlex.quote(token)} "
+            f"nohup python3 {AGENT_REMOTE_PATH} --port {port or self.agent['port']} "
+            f"--interval {interval} > /dev/null 2>&1 & echo $! > {pid_file}"
+        )
+        results = self.run_fanout(command, machines=ready)
+        for machine in machines:
+            self._agent_retry.pop(machine.name, None)
+            if machine.name not in results:
+                results[machine.name] = dict(distributed[machine.name], status='failed')
         return results
 
-    def status(self):
-        """查看所有机器状态"""
+    def status(self, max_age: Optional[float] = None):
+        """查看所有机器状态（指标代理 + TTL缓存）"""
         print("\n" + "=" * 60)
         print("集群状态")
         print("=" * 60)
 
-        results = []
-        lock = threading.Lock()
-
-        def check_machine(machine):
-            result = machine.get_status()
-            with lock:
-                results.append(result)
-
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            list(executor.map(check_machine, self.machines))
-
-        for r in results:
-            status_icon = "●" if r['status'] == 'online' else "○"
-            print(f"\n{status_icon} {r['name']}")
-            print(f"  状态: {r['status']}")
-            if r['load'] is not None:
-                print(f"  负载: {r['load']}")
-            if r['disk']:
-                print(f"  磁盘: {r['disk']}")
-
-        online = sum(1 for r in results if r['status'] == 'online')
-        offline = len(results) - online
+        results = self.collect_metrics(max_age=max_age)
+
+        for name, r in results.items():
+            status_icon = {'online': "●", 'error': "!"}.get(r['status'], "○")
+            print(f"\n{status_icon} {name}")
+            print(f"  状态: {r['status']} ({r['source']}, {r['age']}秒前)")
+            if r.get('cpu') is not None:
+                print(f"  CPU: {r['cpu']}%")
+            if r.get('load'):
+                print(f"  负载: {r['load'][0]}")
+            if r.get('mem'):
+                print(f"  内存: {r['mem']['percent']}% 使用率")
+            if r.get('disk'):
+                print(f"  磁盘: {r['disk']['percent']}% 使用率")
+            if r.get('error'):
+                print(f"  错误: {r['error']}")
+
+        fleet = self.metrics.aggregate(list(results))
 
         print("\n" + "=" * 60)
-        print(f"总计: {len(results)} 台 (在线: {online}, 离线: {offline})")
+        print(f"总计: {fleet['hosts']} 台 (在线: {fleet['online']}, 离线: {fleet['offline']}, 异常: {fleet['error']})")
+        if fleet['cpu']['avg'] is not None:
+            print(f"CPU: 平均 {fleet['cpu']['avg']}% / 最高 {fleet['cpu']['max']}%")
+        if fleet['mem']['avg'] is not None:
+            print(f"内存: 平均 {fleet['mem']['avg']}% / 最高 {fleet['mem']['max']}%")
+        if fleet['disk']['max'] is not None:
+            print(f"磁盘: 最高 {fleet['disk']['max']}%")
         print("=" * 60 + "\n")
+        return fleet
 
     def upload_single(self, machine_name: str, local_path: str, remote_path: str) -> bool:
         """上传文件到单机"""
@@ -309,21 +941,203 @@ class MultiMachineController:
             return False
 
         print(f"[{machine_name}] 连接中...")
-        if not machine.connect():
+        try:
+            with self.pool.session(machine):
+                print(f"[{machine_name}] 上传文件: {local_path} -> {remote_path}")
+                success, message = machine.upload(local_path, remote_path)
+        except ConnectionError:
             print(f"[{machine_name}] ✗ 连接失败")
             return False
 
-        print(f"[{machine_name}] 上传文件: {local_path} -> {remote_path}")
-        success, message = machine.upload(local_path, remote_path)
-
         if success:
             print(f"[{machine_name}] ✓ {message}")
         else:
             print(f"[{machine_name}] ✗ {message}")
 
-        machine.disconnect()
         return success
 
+    def distribute(
+        self,
+        local_path: str,
+        remote_path: str,
+        machines: Optional[List[Machine]] = None,
+        concurrency: int = 16,
+        streams: int = 4,
+        chunk_size: int = 64 * 1024 * 1024,
+        relay_fanout: int = 0,
+        relay_command: str = DEFAULT_RELAY_COMMAND,
+        timeout: float = 3600,
+        on_result: Optional[Callable[[str, dict], None]] = None
+    ) -> Dict[str, dict]:
+        """
+        把一个文件分发到多台机器
+
+        远程文件的SHA-256与本地一致的机器直接跳过；其余机器先写入 `<remote_path>.part`，
+        校验通过后再改名，传输中断不会留下不完整的目标文件。
+
+        Args:
+            local_path: 本地文件
+            remote_path: 远程路径，可包含 {name}（机器名）
+            machines: 目标机器（默认全部）
+            concurrency: 同时传输的机器数
+            streams: 每台机器的并行SFTP会话数，大文件按chunk_size分块并行写入
+            chunk_size: 分块大小（字节）
+            relay_fanout: 大于0时树状中转：控制机只上传给前N台，
+                已有文件的机器再各自推送给N台，后续每轮翻倍（需要机器之间能SSH）
+            relay_command: 在源机器上执行的推送命令模板，可用占位符
+                {source_path} {target_host} {target_port} {target_user} {target_path}
+            timeout: 单台机器的校验/中转超时（秒）
+            on_result: 每台机器完成时回调 (机器名, 结果)
+
+        Returns:
+            Dict[str, dict]: 机器名 -> {status, success, bytes, duration, error, source}，
+            status为 skipped / uploaded / relayed / failed
+        """
+        machines = self.machines if machines is None else machines
+        size = os.path.getsize(local_path)
+        digest = file_checksum(local_path)
+        streams = max(1, min(streams, self.pool.max_channels - 1))
+        results: Dict[str, dict] = {}
+        lock = threading.Lock()
+
+        def finish(machine: Machine, status: str, started: float,
+                   error: Optional[str] = None, source: Optional[str] = None) -> bool:
+            result = {
+                'status': status,
+                'success': status != 'failed',
+                'bytes': size if status in ('uploaded', 'relayed') else 0,
+                'duration': time.monotonic() - started,
+                'error': error,
+                'source': source
+            }
+            with lock:
+                results[machine.name] = result
+            if on_result:
+                on_result(machine.name, result)
+            return result['success']
+
+        def path_of(machine: Machine) -> str:
+            return remote_path.format(name=machine.name)
+
+        def check(machine: Machine) -> Optional[bool]:
+            """远程文件已是最新返回True，需要传输返回False，连接失败返回None"""
+            started = time.monotonic()
+            try:
+                with self.pool.session(machine):
+                    current = machine.checksum(path_of(machine), timeout)
+            except ConnectionError as e:
+                finish(machine, 'failed', started, str(e))
+                return None
+            if current == digest:
+                finish(machine, 'skipped', started)
+                return True
+            return False
+
+        def push(machine: Machine) -> bool:
+            """控制机直接上传"""
+            started = time.monotonic()
+            target = path_of(machine)
+            try:
+                with self.pool.session(machine):
+                    self._upload_chunks(machine, local_path, target + '.part', size, streams, chunk_size)
+                    error = self._commit_upload(machine, target, digest, timeout)
+            except Exception as e:
+                error = f"上传失败: {e}"
+            return finish(machine, 'failed' if error else 'uploaded', started, error)
+
+        def relay(source: Machine, machine: Machine) -> bool:
+            """由已有文件的机器推送，失败时回退为控制机直接上传"""
+            started = time.monotonic()
+            target = path_of(machine)
+            command = relay_command.format(
+                source_path=shlex.quote(path_of(source)),
+                target_host=shlex.quote(machine.host),
+                target_port=machine.port,
+                target_user=shlex.quote(machine.username),
+                target_path=shlex.quote(target + '.part')
+            )
+            try:
+                with self.pool.session(source):
+                    exit_code, _, _ = source.run_command(command, timeout)
+                if exit_code == 0:
+                    with self.pool.session(machine):
+                        if self._commit_upload(machine, target, digest, timeout) is None:
+                            return finish(machine, 'relayed', started, source=source.name)
+            except ConnectionError:
+                pass
+            return push(machine)
+
+        print(f"分发文件: {local_path} ({size / 1024 / 1024:.1f} MB) -> {len(machines)} 台机器")
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(machines)))) as executor:
+            pending = [m for m, state in zip(machines, executor.map(check, machines)) if state is False]
+
+            if relay_fanout <= 0:
+                list(executor.map(push, pending))
+            else:
+                sources = [m for m in machines if results.get(m.name, {}).get('status') == 'skipped']
+                if not sources:
+                    seeds, pending = pending[:relay_fanout], pending[relay_fanout:]
+                    sources = [m for m, ok in zip(seeds, executor.map(push, seeds)) if ok]
+                while pending:
+                    if not sources:
+                        list(executor.map(push, pending))
+                        break
+                    batch = pending[:len(sources) * relay_fanout]
+                    pending = pending[len(batch):]
+                    pairs = [(sources[i // relay_fanout], m) for i, m in enumerate(batch)]
+                    done = executor.map(lambda pair: relay(*pair), pairs)
+                    sources += [m for (_, m), ok in zip(pairs, done) if ok]
+
+        return {m.name: results[m.name] for m in machines}
+
+    @staticmethod
+    def _upload_chunks(machine: Machine, local_path: str, remote_path: str,
+                       size: int, streams: int, chunk_size: int):
+        """按块并行写入远程文件，每个线程使用独立的SFTP会话"""
+        ranges = [(offset, min(chunk_size, size - offset)) for offset in range(0, size, chunk_size)]
+        workers = min(streams, len(ranges))
+        with machine.remote_file(remote_path, 'wb') as remote:
+            if workers <= 1:
+                with open(local_path, 'rb') as local:
+                    shutil.copyfileobj(local, remote, TRANSFER_BLOCK)
+                return
+            remote.truncate(size)
+
+        pending = iter(ranges)
+        lock = threading.Lock()
+
+        def worker():
+            with machine.remote_file(remote_path, 'r+b', dedicated=True) as remote, \
+                    open(local_path, 'rb') as local:
+                while True:
+                    with lock:
+                        item = next(pending, None)
+                    if item is None:
+                        return
+                    offset, length = item
+                    local.seek(offset)
+                    remote.seek(offset)
+                    while length > 0:
+                        block = local.read(min(TRANSFER_BLOCK, length))
+                        remote.write(block)
+                        length -= len(block)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(worker) for _ in range(workers)]:
+                future.result()
+
+    @staticmethod
+    def _commit_upload(machine: Machine, remote_path: str, digest: str, timeout: float) -> Optional[str]:
+        """校验 .part 文件并改名为目标文件，返回错误信息"""
+        part = remote_path + '.part'
+        if machine.checksum(part, timeout) != digest:
+            machine.run_command(f"rm -f {shlex.quote(part)}", timeout)
+            return "校验失败"
+        exit_code, _, error = machine.run_command(
+            f"mv -f {shlex.quote(part)} {shlex.quote(remote_path)}", timeout
+        )
+        return None if exit_code == 0 else f"改名失败: {error.strip()}"
+
     def download_single(self, machine_name: str, remote_path: str, local_path: str) -> bool:
         """从单机下载文件"""
         machine = self.get_machine(machine_name)
@@ -332,19 +1146,19 @@ class MultiMachineController:
             return False
 
         print(f"[{machine_name}] 连接中...")
-        if not machine.connect():
+        try:
+            with self.pool.session(machine):
+                print(f"[{machine_name}] 下载文件: {remote_path} -> {local_path}")
+                success, message = machine.download(remote_path, local_path)
+        except ConnectionError:
             print(f"[{machine_name}] ✗ 连接失败")
             return False
 
-        print(f"[{machine_name}] 下载文件: {remote_path} -> {local_path}")
-        success, message = machine.download(remote_path, local_path)
-
         if success:
             print(f"[{machine_name}] ✓ {message}")
         else:
             print(f"[{machine_name}] ✗ {message}")
 
-        machine.disconnect()
         return success
 
 
@@ -355,10 +1169,13 @@ Multi-Machine Controller - 多机器控制能力
 
 用法:
   python3 multi-machine.py run <machine_name> "<command>"      单机执行
-  python3 multi-machine.py parallel "<command>"                并行执行
+  python3 multi-machine.py parallel "<command>"                并行执行（逐行输出）
+  python3 multi-machine.py rolling <batch_size> "<command>"    滚动执行（每批N台）
   python3 multi-machine.py status                              查看状态
+  python3 multi-machine.py agent deploy [--port N]             部署指标代理
   python3 multi-machine.py upload <machine_name> <local> <remote>  上传文件
   python3 multi-machine.py download <machine_name> <remote> <local>  下载文件
+  python3 multi-machine.py distribute <local> <remote>         分发文件到所有机器
 
 配置:
   编辑 machines.json 配置机器列表
@@ -366,11 +1183,25 @@ Multi-Machine Controller - 多机器控制能力
 示例:
   python3 multi-machine.py run server1 "ls -la"
   python3 multi-machine.py parallel "uptime"
+  python3 multi-machine.py parallel "uptime" --concurrency 200
+  python3 multi-machine.py rolling 10 "systemctl restart app" --max-failure-rate 0.1
   python3 multi-machine.py status
   python3 multi-machine.py upload server1 ./test.txt /tmp/test.txt
+  python3 multi-machine.py distribute ./model.bin /data/model.bin --streams 8 --relay 4
     """)
 
 
+def _pop_option(args: List[str], name: str, convert, default):
+    """从参数列表中取出 `name value` 形式的选项"""
+    if name in args:
+        index = args.index(name)
+        if index + 1 < len(args):
+            value = convert(args[index + 1])
+            del args[index:index + 2]
+            return value
+    return default
+
+
 def main():
     if len(sys.argv) < 2:
         print_usage()
@@ -395,17 +1226,54 @@ def main():
         sys.exit(0 if success else 1)
 
     elif action == 'parallel':
-        if len(sys.argv) < 3:
-            print("用法: python3 multi-machine.py parallel <command>")
+        args = sys.argv[2:]
+        concurrency = _pop_option(args, '--concurrency', int, 64)
+        if not args:
+            print("用法: python3 multi-machine.py parallel <command> [--concurrency N]")
             sys.exit(1)
-        command = ' '.join(sys.argv[2:])
-        controller.run_parallel(command)
+        command = ' '.join(args)
+        controller.run_parallel(command, max_workers=concurrency, stream=True)
         sys.exit(0)
 
+    elif action == 'rolling':
+        args = sys.argv[2:]
+        concurrency = _pop_option(args, '--concurrency', int, 64)
+        max_failure_rate = _pop_option(args, '--max-failure-rate', float, 0.0)
+        if len(args) < 2 or not args[0].isdigit():
+            print("用法: python3 multi-machine.py rolling <batch_size> <command> "
+                  "[--max-failure-rate R] [--concurrency N]")
+            sys.exit(1)
+        batch_size = int(args[0])
+        command = ' '.join(args[1:])
+        print(f"滚动执行命令: {command}（每批 {batch_size} 台，失败率上限 {max_failure_rate:.0%}）")
+        results = controller.run_fanout(
+            command, concurrency=concurrency, batch_size=batch_size,
+            max_failure_rate=max_failure_rate,
+            on_output=lambda name, stream, line: print(f"[{name}] {line}"),
+            on_result=lambda name, r: print(f"[{name}] {'✓ 成功' if r['success'] else '✗ ' + r['status']}")
+        )
+        counts = {}
+        for r in results.values():
+            counts[r['status']] = counts.get(r['status'], 0) + 1
+        print("汇总: " + ", ".join(f"{k} {v}" for k, v in sorted(counts.items())))
+        sys.exit(0 if counts.get('success', 0) == len(results) else 1)
+
     elif action == 'status':
         controller.status()
         sys.exit(0)
 
+    elif action == 'agent':
+        args = sys.argv[2:]
+        port = _pop_option(args, '--port', int, None)
+        interval = _pop_option(args, '--interval', float, 2.0)
+        if args != ['deploy']:
+            print("用法: python3 multi-machine.py agent deploy [--port N] [--interval S]")
+            sys.exit(1)
+        results = controller.deploy_agent(port=port, interval=interval)
+        for name, r in results.items():
+            print(f"[{name}] {'✓ 已启动' if r['success'] else '✗ ' + (r.get('error') or r['status'])}")
+        sys.exit(0 if all(r['success'] for r in results.values()) else 1)
+
     elif action == 'upload':
         if len(sys.argv) < 5:
             print("用法: python3 multi-machine.py upload <machine_name> <local> <remote>")
@@ -426,6 +1294,30 @@ def main():
         success = controller.download_single(machine_name, remote_path, local_path)
         sys.exit(0 if success else 1)
 
+    elif action == 'distribute':
+        args = sys.argv[2:]
+        concurrency = _pop_option(args, '--concurrency', int, 16)
+        streams = _pop_option(args, '--streams', int, 4)
+        relay_fanout = _pop_option(args, '--relay', int, 0)
+        if len(args) < 2:
+            print("用法: python3 multi-machine.py distribute <local> <remote> "
+                  "[--streams N] [--relay N] [--concurrency N]")
+            sys.exit(1)
+        if not os.path.exists(args[0]):
+            print(f"✗ 本地文件不存在: {args[0]}")
+            sys.exit(1)
+
+        def on_result(name, r):
+            icon = "✓" if r['success'] else "✗"
+            detail = f" ({r['error']})" if r['error'] else (f" <- {r['source']}" if r['source'] else "")
+            print(f"[{name}] {icon} {r['status']} {r['duration']:.1f}s{detail}")
+
+        results = controller.distribute(
+            args[0], args[1], concurrency=concurrency, streams=streams,
+            relay_fanout=relay_fanout, on_result=on_result
+        )
+        sys.exit(0 if all(r['success'] for r in results.values()) else 1)
+
     else:
         print(f"未知操作: {action}")
         print_usage()
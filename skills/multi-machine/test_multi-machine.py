@@ -8,7 +8,12 @@ Multi-Machine Controller 测试用例
 import os
 import sys
 import json
+import shutil
+import signal
+import socket
+import subprocess
 import tempfile
+import threading
 import time
 from pathlib import Path
 
@@ -266,6 +271,19 @@ class TestMultiMachineController:
             status = machine.get_status()
             assert 'name' in status, "status字典缺少name字段"
             assert 'status' in status, "status字典缺少status字段"
+            assert status['status'] == 'offline', "未连接的机器应为offline"
+
+            # 解析SSH回退的shell输出（/proc 与 uptime 两种负载格式）
+            parsed = Machine._parse_status(
+                "cpu  100 0 100 800 0 0 0 0 0 0\ncpu  150 0 150 850 0 0 0 0 0 0\n"
+                "load 10:00 up 3 days, 2 users, load averages: 1.20 1.30 1.40\n"
+                "uptime 3600.5\nMemTotal: 1000 kB\nMemAvailable: 250 kB\n"
+                "disk /dev/sda1 1000 400 600 40% /\n"
+            )
+            assert parsed['cpu'] == 66.7 and parsed['load'] == [1.2, 1.3, 1.4]
+            assert parsed['uptime'] == 3600 and parsed['mem']['percent'] == 75.0
+            assert parsed['disk'] == {'total': 1024000, 'used': 409600, 'percent': 40.0}
+            assert Machine._parse_status("sh: garbage")['load'] is None
 
             print("✓ 测试通过: Machine类基本功能正常")
             self.test_passed += 1
@@ -274,6 +292,288 @@ class TestMultiMachineController:
             print(f"✗ 测试失败: {e}")
             self.test_failed += 1
 
+    def test_7_pooled_fanout(self):
+        """测试7: 会话池复用、逐行输出与滚动执行（本地执行代替SSH）"""
+        print("\n测试7: 会话池与批量分发")
+        print("-" * 50)
+
+        config_file = self.skill_dir / 'test-local-machines.json'
+        try:
+            config = {
+                "machines": [
+                    {"name": f"local_{i}", "host": "127.0.0.1", "auth": {"type": "local"}}
+                    for i in range(20)
+                ]
+            }
+            with open(config_file, 'w', encoding='utf-8') as f:
+                json.dump(config, f)
+
+            with MultiMachineController(str(config_file)) as controller:
+                lines = []
+                results = controller.run_fanout(
+                    "echo first; echo oops >&2; printf tail", concurrency=8,
+                    on_output=lambda name, stream, line: lines.append((name, stream, line))
+                )
+                assert list(results) == [m.name for m in controller.machines], "结果应按机器顺序"
+                assert all(r['status'] == 'success' and r['output'] == "first\ntail" for r in results.values())
+                assert ('local_3', 'stderr', 'oops') in lines and ('local_3', 'stdout', 'tail') in lines
+                assert len(lines) == 60, "每台机器3行输出"
+
+                # 第二次执行复用已有会话
+                controller.run_fanout("true", concurrency=8)
+                assert controller.pool.stats['connects'] == 20, "每台机器只应连接一次"
+                assert controller.pool.stats['reuses'] == 20, "第二次应复用会话"
+
+                # 滚动执行：第一批全部失败后停止
+                results = controller.run_fanout("exit 3", batch_size=5, max_failure_rate=0.5)
+                statuses = [r['status'] for r in results.values()]
+                assert statuses == ['failed'] * 5 + ['skipped'] * 15, "失败率超限后应跳过后续批次"
+                assert results['local_0']['exit_code'] == 3
+
+                # 超时
+                started = time.time()
+                result = controller.run_fanout("sleep 5", machines=controller.machines[:2], timeout=0.5)
+                assert time.time() - started < 3, "超时应及时返回"
+                assert all(r['exit_code'] == -1 and '超时' in r['error'] for r in result.values())
+
+            print("✓ 测试通过: 会话池与批量分发正常")
+            self.test_passed += 1
+
+        except Exception as e:
+            print(f"✗ 测试失败: {e}")
+            self.test_failed += 1
+
+        finally:
+            if config_file.exists():
+                config_file.unlink()
+
+    def test_8_distribute(self):
+        """测试8: 文件分发（分块并行、校验跳过、树状中转）"""
+        print("\n测试8: 文件分发")
+        print("-" * 50)
+
+        config_file = self.skill_dir / 'test-local-machines.json'
+        work_dir = tempfile.mkdtemp()
+        try:
+            config = {
+                "machines": [
+                    {"name": f"local_{i}", "host": "127.0.0.1", "auth": {"type": "local"}}
+                    for i in range(8)
+                ]
+            }
+            with open(config_file, 'w', encoding='utf-8') as f:
+                json.dump(config, f)
+
+            source = os.path.join(work_dir, 'artifact.bin')
+            payload = os.urandom(300 * 1024 + 17)
+            with open(source, 'wb') as f:
+                f.write(payload)
+            remote = os.path.join(work_dir, '{name}.bin')
+
+            # local_0 已是最新，local_1 内容过期
+            with open(remote.format(name='local_0'), 'wb') as f:
+                f.write(payload)
+            with open(remote.format(name='local_1'), 'wb') as f:
+                f.write(b'stale')
+
+            with MultiMachineController(str(config_file)) as controller:
+                results = controller.distribute(source, remote, streams=4, chunk_size=64 * 1024)
+                statuses = {name: r['status'] for name, r in results.items()}
+                assert statuses['local_0'] == 'skipped', "校验一致的机器应跳过"
+                assert list(statuses.values()).count('uploaded') == 7, "其余机器应上传"
+                for name in statuses:
+                    with open(remote.format(name=name), 'rb') as f:
+                        assert f.read() == payload, f"{name} 文件内容不一致"
+                assert not any(n.endswith('.part') for n in os.listdir(work_dir)), "不应残留临时文件"
+
+                # 树状中转：删掉目标文件后由local_0（已有文件）逐轮推送
+                for i in range(1, 8):
+                    os.unlink(remote.format(name=f'local_{i}'))
+                results = controller.distribute(
+                    source, remote, relay_fanout=2,
+                    relay_command="cp {source_path} {target_path}"
+                )
+                relayed = [r for r in results.values() if r['status'] == 'relayed']
+                assert len(relayed) == 7 and results['local_1']['source'] == 'local_0', "应全部通过中转"
+                with open(remote.format(name='local_7'), 'rb') as f:
+                    assert f.read() == payload
+
+                # 中转失败时回退为直接上传
+                os.unlink(remote.format(name='local_5'))
+                results = controller.distribute(source, remote, relay_fanout=2, relay_command="false")
+                assert results['local_5']['status'] == 'uploaded', "中转失败应回退为直接上传"
+                assert sum(r['status'] == 'skipped' for r in results.values()) == 7
+
+            print("✓ 测试通过: 文件分发正常")
+            self.test_passed += 1
+
+        except Exception as e:
+            print(f"✗ 测试失败: {e}")
+            self.test_failed += 1
+
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            if config_file.exists():
+                config_file.unlink()
+
+    def test_9_metrics_agent(self):
+        """测试9: 指标代理、TTL缓存、SSH回退与推送"""
+        print("\n测试9: 指标代理与缓存")
+        print("-" * 50)
+
+        spec = importlib.util.spec_from_file_location("metrics_agent", skill_dir / "metrics_agent.py")
+        agent = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(agent)
+
+        assert agent.token_matches('secret', 'secret')
+        assert not agent.token_matches('', 'secret') and not agent.token_matches(None, 'secret')
+        assert not agent.token_matches('sécret', 'secret'), "非ASCII令牌应被拒绝而不是抛异常"
+
+        config_file = self.skill_dir / 'test-local-machines.json'
+        sampler = agent.MetricsSampler(interval=0.1).start()
+        server = agent.make_server(sampler, '127.0.0.1', 0, token='secret')
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        requests = []
+        original = agent.MetricsSampler.snapshot
+        sampler.snapshot = lambda: requests.append(1) or original(sampler)
+
+        try:
+            port = server.server_address[1]
+            config = {
+                "agent": {"token": "secret", "ttl": 30},
+                "machines": [
+                    {"name": f"agent_{i}", "host": "127.0.0.1", "agent_port": port, "auth": {"type": "local"}}
+                    for i in range(4)
+                ] + [
+                    # 代理端口不可用，回退为SSH（本地执行）
+                    {"name": "fallback", "host": "127.0.0.1", "agent_port": 1, "auth": {"type": "local"}},
+                    # 代理与SSH都不可用
+                    {"name": "down", "host": "127.0.0.1", "port": 1, "agent_port": 1,
+                     "auth": {"type": "password", "password": "x"}}
+                ]
+            }
+            with open(config_file, 'w', encoding='utf-8') as f:
+                json.dump(config, f)
+
+            time.sleep(0.3)
+            with MultiMachineController(str(config_file)) as controller:
+                metrics = controller.collect_metrics()
+                assert [metrics[f"agent_{i}"]['source'] for i in range(4)] == ['agent'] * 4
+                assert metrics['fallback']['source'] == 'ssh' and metrics['fallback']['status'] == 'online'
+                assert metrics['fallback']['load'] and metrics['fallback']['disk']['total'] > 0
+                assert metrics['down']['status'] == 'offline' and metrics['down']['error']
+                assert set(controller._agent_retry) == {'fallback', 'down'}, "代理失败的机器应暂停代理请求"
+                snapshot = metrics['agent_0']
+                assert snapshot['cpu'] is not None and 0 <= snapshot['mem']['percent'] <= 100
+                assert len(snapshot['load']) == 3 and snapshot['disk']['total'] > 0
+                assert len(requests) == 4, "每台机器一次请求"
+
+                # TTL内的刷新只读缓存
+                controller.collect_metrics()
+                fleet = controller.status()
+                assert len(requests) == 4, "缓存未过期时不应请求代理"
+                assert fleet['hosts'] == 6 and fleet['online'] == 5
+                assert fleet['offline'] == 1 and fleet['error'] == 0
+                assert fleet['mem']['max'] >= fleet['mem']['avg'] and len(fleet['hottest']) == 5
+
+                controller.collect_metrics(max_age=0)
+                assert len(requests) == 8, "max_age=0应强制刷新"
+
+                # 推送模式
+                collector = controller.start_collector('127.0.0.1', 0)
+                url = f"http://127.0.0.1:{collector.server_address[1]}/metrics"
+                assert not agent.push_once(sampler, url, 'agent_0', token='wrong'), "令牌错误应被拒绝"
+                assert agent.push_once(sampler, url, 'agent_0', token='secret')
+                assert controller.metrics.get('agent_0')['source'] == 'push'
+
+            print("✓ 测试通过: 指标代理与缓存正常")
+            self.test_passed += 1
+
+        except Exception as e:
+            print(f"✗ 测试失败: {e}")
+            self.test_failed += 1
+
+        finally:
+            sampler.stop()
+            server.shutdown()
+            server.server_close()
+            if config_file.exists():
+                config_file.unlink()
+
+    def test_10_agent_deploy(self):
+        """测试10: 部署指标代理（令牌经环境变量传递，不误杀复用了PID的进程）"""
+        print("\n测试10: 部署指标代理")
+        print("-" * 50)
+
+        work_dir = Path(tempfile.mkdtemp())
+        config_file = work_dir / 'machines.json'
+        cwd = os.getcwd()
+        bystander = subprocess.Popen(['sleep', '30'])
+        agent_pid = None
+
+        try:
+            with socket.socket() as probe:
+                probe.bind(('127.0.0.1', 0))
+                port = probe.getsockname()[1]
+            machines = [{"name": "local", "host": "127.0.0.1", "auth": {"type": "local"}}]
+            with open(config_file, 'w', encoding='utf-8') as f:
+                json.dump({"machines": machines}, f)
+
+            os.chdir(work_dir)  # local类型的相对路径落在当前目录
+            with MultiMachineController(str(config_file)) as controller:
+                results = controller.deploy_agent(port=port)
+                assert not results['local']['success'] and 'token' in results['local']['error'], \
+                    "未配置令牌时不应部署"
+
+            with open(config_file, 'w', encoding='utf-8') as f:
+                json.dump({"agent": {"token": "secret", "port": port}, "machines": machines}, f)
+            # pid文件指向一个无关进程
+            (work_dir / '.mmc_metrics_agent.pid').write_text(str(bystander.pid))
+
+            with MultiMachineController(str(config_file)) as controller:
+                results = controller.deploy_agent(interval=0.2)
+                assert results['local']['success'], results['local']
+                agent_pid = int((work_dir / '.mmc_metrics_agent.pid').read_text())
+                assert bystander.poll() is None, "不应杀死PID文件中的无关进程"
+
+                with open(f'/proc/{agent_pid}/cmdline', 'rb') as f:
+                    assert b'secret' not in f.read(), "令牌不应出现在命令行"
+
+                deadline = time.monotonic() + 5
+                snapshot = None
+                while time.monotonic() < deadline:
+                    snapshot = controller.collect_metrics(max_age=0)['local']
+                    if snapshot['source'] == 'agent':
+                        break
+                    controller._agent_retry.clear()
+                    time.sleep(0.2)
+                assert snapshot['source'] == 'agent' and snapshot['status'] == 'online'
+
+                # 重新部署会停止旧代理
+                controller.deploy_agent(interval=0.2)
+                time.sleep(0.2)
+                assert not os.path.exists(f'/proc/{agent_pid}') or \
+                    open(f'/proc/{agent_pid}/stat').read().split()[2] == 'Z', "旧代理应被停止"
+                agent_pid = int((work_dir / '.mmc_metrics_agent.pid').read_text())
+
+            print("✓ 测试通过: 指标代理部署正常")
+            self.test_passed += 1
+
+        except Exception as e:
+            print(f"✗ 测试失败: {e}")
+            self.test_failed += 1
+
+        finally:
+            os.chdir(cwd)
+            bystander.kill()
+            bystander.wait()
+            if agent_pid:
+                try:
+                    os.kill(agent_pid, signal.SIGTERM)
+                except OSError:
+                    pass
+            shutil.rmtree(work_dir, ignore_errors=True)
+
     def run_all_tests(self):
         """运行所有测试"""
         print("\n" + "=" * 60)
@@ -286,6 +586,10 @@ class TestMultiMachineController:
         self.test_4_file_operations()
         self.test_5_error_handling()
         self.test_6_machine_class()
+        self.test_7_pooled_fanout()
+        self.test_8_distribute()
+        self.test_9_metrics_agent()
+        self.test_10_agent_deploy()
 
         print("\n" + "=" * 60)
         print("测试结果汇总")
@@ -6,13 +6,46 @@
 
 import socket
 import time
+import errno
+import struct
+import asyncio
+import ipaddress
+import ssl
 import subprocess
 import json
+import base64
 import threading
-from typing import Dict, List, Any, Optional, Tuple
+import http.client
+import urllib.request
+from urllib.parse import unquote, urljoin, urlsplit
+from typing import AsyncIterator, Callable, Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, field
+from array import array
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    psutil = None
+    HAS_PSUTIL = False
+
+
+COMMON_SERVICES = {
+    21: "ftp", 22: "ssh", 23: "telnet", 25: "smtp",
+    53: "dns", 80: "http", 110: "pop3", 143: "imap",
+    443: "https", 445: "smb", 993: "imaps", 995: "pop3s",
+    3306: "mysql", 3389: "rdp", 5432: "postgresql",
+    5900: "vnc", 6379: "redis", 8080: "http-alt",
+    8443: "https-alt", 8888: "http-alt", 9000: "http-alt",
+    9200: "elasticsearch", 27017: "mongodb"
+}
 
 
 @dataclass
@@ -81,6 +114,17 @@ class TracerouteResult:
     total_duration: float
 
 
+@dataclass
+class HTTPTimings:
+    """HTTP请求各阶段耗时（毫秒）"""
+    dns: float = 0.0  # 域名解析
+    connect: float = 0.0  # TCP连接
+    tls: float = 0.0  # TLS握手
+    ttfb: float = 0.0  # 发出请求到收到首字节
+    total: float = 0.0  # 整个请求（含读取响应体）
+    reused: bool = False  # 是否复用了keep-alive连接（复用时dns/connect/tls为0）
+
+
 @dataclass
 class HTTPTestResult:
     """HTTP测试结果"""
@@ -91,6 +135,18 @@ class HTTPTestResult:
     headers: Dict[str, str]
     success: bool
     error: Optional[str] = None
+    timings: Optional[HTTPTimings] = None
+
+
+@dataclass
+class HTTPEndpointReport:
+    """单个端点多轮探测的汇总"""
+    url: str
+    requests: int
+    failures: int
+    success_rate: float  # 百分比
+    status_codes: Dict[int, int]
+    latency: Dict[str, Dict[str, float]]  # 阶段 -> {avg, p50, p90, p95, p99, max}（毫秒）
 
 
 @dataclass
@@ -101,6 +157,936 @@ class NetworkMonitorData:
     connections: int
     active_connections: int
     duration: float
+    peak_in: float = 0.0  # KB/s，单个采样间隔的最大值
+    peak_out: float = 0.0
+    samples: int = 0
+
+
+@dataclass
+class PortScanEvent:
+    """单个端口的扫描结果（流式输出）"""
+    host: str
+    port: int
+    state: str  # open, closed, filtered
+    rtt: Optional[float] = None  # 毫秒，仅open/closed有值
+
+
+def expand_targets(targets) -> List[str]:
+    """
+    展开扫描目标
+
+    Args:
+        targets: 主机名/IP、逗号分隔的字符串、CIDR网段（如 10.0.0.0/24）或它们组成的列表
+
+    Returns:
+        List[str]: 主机列表（保持顺序、去重）
+    """
+    if isinstance(targets, str):
+        targets = [t.strip() for t in targets.split(',') if t.strip()]
+
+    hosts = []
+    for target in targets:
+        if '/' in target:
+            network = ipaddress.ip_network(target, strict=False)
+            addresses = network.hosts() if network.num_addresses > 2 else network
+            hosts.extend(str(address) for address in addresses)
+        else:
+            hosts.append(target)
+    return list(dict.fromkeys(hosts))
+
+
+class _RTTEstimator:
+    """按主机估计连接RTT（RFC 6298的SRTT/RTTVAR），给出自适应超时"""
+
+    __slots__ = ('srtt', 'rttvar', 'silent')
+
+    def __init__(self):
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.silent = 0  # 连续无响应的探测数
+
+    def update(self, rtt: float):
+        self.silent = 0
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    def timeout(self, min_timeout: float, max_timeout: float) -> float:
+        if self.srtt is None:
+            return max_timeout
+        return min(max(self.srtt + 4 * self.rttvar, min_timeout), max_timeout)
+
+
+class AsyncPortScanner:
+    """
+    异步TCP connect扫描引擎
+
+    - 非阻塞connect + 事件循环可写通知，同时保持数千个进行中的连接，不占用线程（需要selector事件循环）
+    - 按主机测量SYN/ACK与RST的往返时间，超时取 SRTT + 4*RTTVAR（夹在 min_timeout 与 timeout 之间），
+      超时后以加倍的超时重试，避免把慢响应误判为filtered
+    - 多个主机按端口交错探测，分散单个主机的压力；结果边扫描边产出
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 2000,
+        timeout: float = 1.0,
+        min_timeout: float = 0.1,
+        retries: int = 1,
+        give_up_after: Optional[int] = None
+    ):
+        """
+        Args:
+            concurrency: 最大同时进行的连接数（受文件描述符上限约束）
+            timeout: 最大连接超时（秒），尚未测得RTT时使用
+            min_timeout: 自适应超时的下限（秒）
+            retries: 超时后的重试次数
+            give_up_after: 主机连续这么多个端口无任何响应时跳过其剩余端口（None表示不跳过）
+        """
+        self.concurrency = self._limit_concurrency(concurrency)
+        self.timeout = timeout
+        self.min_timeout = min(min_timeout, timeout)
+        self.retries = retries
+        self.give_up_after = give_up_after
+        self.unresolved: List[str] = []
+
+    @staticmethod
+    def _limit_concurrency(concurrency: int) -> int:
+        """并发数不超过文件描述符软上限（预留一部分）"""
+        if resource is not None:
+            soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+            if soft != resource.RLIM_INFINITY:
+                concurrency = min(concurrency, max(soft - 64, 1))
+        return max(concurrency, 1)
+
+    async def scan_iter(self, targets, ports: List[int]) -> AsyncIterator[PortScanEvent]:
+        """
+        扫描并按完成顺序逐个产出结果
+
+        Args:
+            targets: 扫描目标（见 expand_targets）
+            ports: 端口列表
+        """
+        loop = asyncio.get_running_loop()
+        hosts = expand_targets(targets)
+        ports = list(dict.fromkeys(ports))
+
+        resolved = await asyncio.gather(*(self._resolve(loop, host) for host in hosts))
+        addresses = {host: address for host, address in zip(hosts, resolved) if address}
+        self.unresolved = [host for host, address in zip(hosts, resolved) if not address]
+        hosts = [host for host in hosts if host in addresses]
+
+        estimators = {host: _RTTEstimator() for host in hosts}
+        probes = ((host, port) for port in ports for host in hosts)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+        errors: List[BaseException] = []
+
+        async def worker():
+            for host, port in probes:
+                estimator = estimators[host]
+                if self.give_up_after and estimator.srtt is None and estimator.silent >= self.give_up_after:
+                    event = PortScanEvent(host, port, "filtered")
+                else:
+                    event = await self._probe(loop, host, addresses[host], port, estimator)
+                await queue.put(event)
+
+        async def run_workers():
+            try:
+                count = max(min(self.concurrency, len(hosts) * len(ports)), 1)
+                await asyncio.gather(*(worker() for _ in range(count)))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                await queue.put(None)
+
+        runner = asyncio.ensure_future(run_workers())
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            if not runner.done():
+                runner.cancel()
+                try:
+                    await runner
+                except asyncio.CancelledError:
+                    pass
+
+        if errors:
+            raise errors[0]
+
+    async def _resolve(self, loop, host: str):
+        try:
+            infos = await loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except socket.gaierror:
+            return None
+        family, _, _, _, sockaddr = infos[0]
+        return family, sockaddr
+
+    async def _probe(self, loop, host: str, address, port: int, estimator: _RTTEstimator) -> PortScanEvent:
+        """探测单个端口（非阻塞connect + 可写事件，不为每个端口创建Task）"""
+        family, sockaddr = address
+        sockaddr = (sockaddr[0], port) + tuple(sockaddr[2:])
+        timeout = estimator.timeout(self.min_timeout, self.timeout)
+
+        for attempt in range(self.retries + 1):
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            # 关闭时直接发送RST，避免大量TIME_WAIT
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            start = loop.time()
+            try:
+                error = sock.connect_ex(sockaddr)
+                if error in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+                    error = await self._wait_connected(loop, sock, timeout)
+            finally:
+                sock.close()
+
+            if error is None:
+                timeout = min(timeout * 2, self.timeout)
+                continue
+            if error == 0 or error == errno.ECONNREFUSED:
+                rtt = loop.time() - start
+                estimator.update(rtt)
+                return PortScanEvent(host, port, "open" if error == 0 else "closed", rtt * 1000)
+            # 主机/网络不可达等
+            break
+
+        estimator.silent += 1
+        return PortScanEvent(host, port, "filtered")
+
+    @staticmethod
+    async def _wait_connected(loop, sock: socket.socket, timeout: float) -> Optional[int]:
+        """等待连接完成，返回SO_ERROR（0表示成功），超时返回None"""
+        future = loop.create_future()
+
+        def finish(connected: bool):
+            if not future.done():
+                future.set_result(connected)
+
+        fd = sock.fileno()
+        loop.add_writer(fd, finish, True)
+        timer = loop.call_later(timeout, finish, False)
+        try:
+            connected = await future
+        finally:
+            loop.remove_writer(fd)
+            timer.cancel()
+
+        if not connected:
+            return None
+        return sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+
+    def scan(
+        self,
+        targets,
+        ports: List[int],
+        on_result: Optional[Callable[[PortScanEvent], None]] = None
+    ) -> Dict[str, "ScanResult"]:
+        """
+        同步扫描，返回每个主机的ScanResult
+
+        Args:
+            targets: 扫描目标（见 expand_targets）
+            ports: 端口列表
+            on_result: 每个端口完成时的回调
+
+        在已运行的事件循环中调用时（asyncio.run不可嵌套），改在工作线程的
+        独立事件循环中执行，此时on_result在该工作线程中回调；异步代码请直接
+        await scan_async。
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.scan_async(targets, ports, on_result))
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(
+                asyncio.run, self.scan_async(targets, ports, on_result)
+            ).result()
+
+    async def scan_async(
+        self,
+        targets,
+        ports: List[int],
+        on_result: Optional[Callable[[PortScanEvent], None]] = None
+    ) -> Dict[str, "ScanResult"]:
+        """异步扫描，参数与返回值同 scan"""
+        start_time = time.time()
+        states: Dict[str, Dict[str, list]] = {}
+
+        async for event in self.scan_iter(targets, ports):
+            if on_result:
+                on_result(event)
+            host_states = states.setdefault(event.host, {"open": [], "closed": [], "filtered": []})
+            host_states[event.state].append(event.port)
+
+        duration = time.time() - start_time
+        return {
+            host: ScanResult(
+                host=host,
+                scanned_ports=list(ports),
+                open_ports=[
+                    PortInfo(port=port, service=COMMON_SERVICES.get(port, "unknown"), state="open")
+                    for port in sorted(host_states["open"])
+                ],
+                closed_ports=sorted(host_states["closed"]),
+                filtered_ports=sorted(host_states["filtered"]),
+                scan_duration=duration
+            )
+            for host, host_states in states.items()
+        }
+
+
+HTTP_PHASES = ("dns", "connect", "tls", "ttfb", "total")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """分位数（线性插值），sorted_values需已排序"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class _TimedHTTPConnection(http.client.HTTPConnection):
+    """分阶段计时建立连接（DNS、TCP、TLS），可经HTTP代理（HTTPS走CONNECT隧道）"""
+
+    def __init__(self, host: str, port: int, timeout: float, tls_context: Optional[ssl.SSLContext],
+                 proxy: Optional[Tuple[str, int, Dict[str, str]]] = None):
+        """
+        Args:
+            proxy: (代理主机, 代理端口, 代理请求头)，None表示直连
+        """
+        if proxy is None:
+            super().__init__(host, port, timeout=timeout)
+        else:
+            super().__init__(proxy[0], proxy[1], timeout=timeout)
+            if tls_context is not None:
+                self.set_tunnel(host, port, proxy[2])
+        # Host头按目标协议的默认端口省略端口号
+        self.default_port = 443 if tls_context is not None else 80
+        self.tls_context = tls_context
+        # 经代理的明文HTTP请求使用绝对URL并携带代理请求头
+        self.proxy_headers = proxy[2] if proxy is not None and tls_context is None else None
+        self.timings = HTTPTimings()
+
+    def connect(self):
+        start = time.perf_counter()
+        family, socktype, proto, _, sockaddr = socket.getaddrinfo(
+            self.host, self.port, type=socket.SOCK_STREAM
+        )[0]
+        resolved = time.perf_counter()
+
+        sock = socket.socket(family, socktype, proto)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(sockaddr)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self._tunnel_host:
+                # 代理隧道建立计入TCP连接阶段
+                self.sock = sock
+                self._tunnel()
+            connected = time.perf_counter()
+
+            handshaken = connected
+            if self.tls_context is not None:
+                sock = self.tls_context.wrap_socket(sock, server_hostname=self._tunnel_host or self.host)
+                handshaken = time.perf_counter()
+        except Exception:
+            sock.close()
+            raise
+
+        self.sock = sock
+        self.timings.dns = (resolved - start) * 1000
+        self.timings.connect = (connected - resolved) * 1000
+        self.timings.tls = (handshaken - connected) * 1000
+
+
+class HTTPProber:
+    """
+    并发HTTP探测
+
+    - 有界线程池并发请求，结果保持输入顺序
+    - 按 (协议, 主机, 端口) 复用keep-alive连接，多轮探测时后续请求不再重复DNS/TCP/TLS
+    - 每个请求记录DNS、TCP连接、TLS握手、首字节（TTFB）与总耗时
+    - 与requests一致：默认跟随重定向（结果为最终响应，总耗时含整条重定向链），
+      读取环境变量中的代理（http_proxy / https_proxy / no_proxy）
+    """
+
+    def __init__(self, workers: int = 32, timeout: float = 10, verify: bool = True,
+                 max_idle_per_host: int = 8, user_agent: str = "network-tools/1.0",
+                 follow_redirects: bool = True, max_redirects: int = 10,
+                 proxies: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            workers: 并发线程数
+            timeout: 单个请求的超时（秒）
+            verify: 是否校验HTTPS证书
+            max_idle_per_host: 每个主机保留的空闲连接数
+            user_agent: User-Agent请求头
+            follow_redirects: 是否跟随3xx重定向（不跟随时3xx视为成功）
+            max_redirects: 最多跟随的重定向次数
+            proxies: 代理配置（{"http": ..., "https": ..., "no": "host1,host2"}），
+                None表示读取环境变量，{}表示不使用代理
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self.user_agent = user_agent
+        self.follow_redirects = follow_redirects
+        self.max_redirects = max_redirects
+        self.proxies = urllib.request.getproxies() if proxies is None else proxies
+        self.tls_context = ssl.create_default_context()
+        if not verify:
+            self.tls_context.check_hostname = False
+            self.tls_context.verify_mode = ssl.CERT_NONE
+        self._idle: Dict[Tuple[str, str, int], List[_TimedHTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def close(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            connections = [conn for idle in self._idle.values() for conn in idle]
+            self._idle.clear()
+        for conn in connections:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def probe_all(self, urls: List[str]) -> List[HTTPTestResult]:
+        """并发探测一轮，结果与urls顺序一致"""
+        if not urls:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(urls))) as executor:
+            return list(executor.map(self.probe, urls))
+
+    def probe(self, url: str) -> HTTPTestResult:
+        """探测单个URL，按需跟随重定向（结果的url保持为传入的url）"""
+        start = time.perf_counter()
+        target = url
+        for _ in range(self.max_redirects + 1):
+            result = self._probe_once(url, target, start)
+            location = None
+            if self.follow_redirects and result.status_code in (301, 302, 303, 307, 308):
+                location = next((v for k, v in result.headers.items() if k.lower() == "location"), None)
+            if not location:
+                return result
+            target = urljoin(target, location)
+        return self._failure(url, f"重定向超过{self.max_redirects}次", (time.perf_counter() - start) * 1000)
+
+    def _probe_once(self, url: str, target: str, start: float) -> HTTPTestResult:
+        """请求一次（复用的连接已被服务器关闭时自动换新连接重试一次）"""
+        parts = urlsplit(target)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https") or not parts.hostname:
+            return self._failure(url, f"不支持的URL: {target}", 0)
+
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == "https" else 80))
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        for attempt in range(2):
+            conn = self._acquire(key)
+            reused = conn.sock is not None
+            try:
+                return self._request(conn, key, url, path, reused, start)
+            except socket.timeout:
+                conn.close()
+                return self._failure(url, "Request timeout", self.timeout * 1000)
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                if not reused:
+                    return self._failure(url, str(e) or type(e).__name__, (time.perf_counter() - start) * 1000)
+        return self._failure(url, "连接被关闭", (time.perf_counter() - start) * 1000)
+
+    def _acquire(self, key) -> _TimedHTTPConnection:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        scheme, host, port = key
+        tls_context = self.tls_context if scheme == "https" else None
+        return _TimedHTTPConnection(host, port, self.timeout, tls_context, self._proxy_for(scheme, host))
+
+    def _proxy_for(self, scheme: str, host: str) -> Optional[Tuple[str, int, Dict[str, str]]]:
+        """按代理配置（含no_proxy）选择代理，返回 (主机, 端口, 代理请求头)"""
+        proxy = self.proxies.get(scheme)
+        if not proxy or urllib.request.proxy_bypass_environment(host, self.proxies):
+            return None
+        parts = urlsplit(proxy if "://" in proxy else "http://" + proxy)
+        headers = {}
+        if parts.username:
+            credentials = f"{unquote(parts.username)}:{unquote(parts.password or '')}"
+            headers["Proxy-Authorization"] = "Basic " + base64.b64encode(credentials.encode()).decode()
+        return parts.hostname, parts.port or 80, headers
+
+    def _release(self, key, conn: _TimedHTTPConnection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _request(self, conn: _TimedHTTPConnection, key, url: str, path: str,
+                 reused: bool, start: float) -> HTTPTestResult:
+        conn.timings = HTTPTimings(reused=reused)
+        if not reused:
+            conn.connect()
+
+        headers = {"User-Agent": self.user_agent, "Accept": "*/*"}
+        if conn.proxy_headers is not None:
+            # 明文HTTP经代理：请求行使用绝对URL
+            scheme, host, port = key
+            if ":" in host:
+                host = f"[{host}]"
+            netloc = host if port == 80 else f"{host}:{port}"
+            path = f"{scheme}://{netloc}{path}"
+            headers.update(conn.proxy_headers)
+
+        sent = time.perf_counter()
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        first_byte = time.perf_counter()
+        body = response.read()
+        finished = time.perf_counter()
+
+        timings = conn.timings
+        timings.ttfb = (first_byte - sent) * 1000
+        timings.total = (finished - start) * 1000
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+
+        return HTTPTestResult(
+            url=url,
+            status_code=response.status,
+            response_time=timings.total,
+            size=len(body),
+            headers=dict(response.getheaders()),
+            success=response.status < 400,
+            timings=timings
+        )
+
+    @staticmethod
+    def _failure(url: str, error: str, elapsed: float) -> HTTPTestResult:
+        return HTTPTestResult(
+            url=url,
+            status_code=0,
+            response_time=elapsed,
+            size=0,
+            headers={},
+            success=False,
+            error=error
+        )
+
+    def benchmark(self, urls: List[str], rounds: int = 5, interval: float = 0.0,
+                  on_round: Optional[Callable[[int, List[HTTPTestResult]], None]] = None
+                  ) -> Dict[str, HTTPEndpointReport]:
+        """
+        多轮探测并按端点汇总
+
+        Args:
+            urls: URL列表
+            rounds: 轮数
+            interval: 相邻两轮开始时间的间隔（秒），一轮耗时超过间隔时立即开始下一轮
+            on_round: 每轮结束时回调 on_round(轮次, 结果)
+        """
+        history: Dict[str, List[HTTPTestResult]] = {url: [] for url in urls}
+        for round_index in range(rounds):
+            round_start = time.monotonic()
+            results = self.probe_all(urls)
+            for result in results:
+                history[result.url].append(result)
+            if on_round:
+                on_round(round_index, results)
+            if round_index < rounds - 1 and interval > 0:
+                time.sleep(max(0.0, interval - (time.monotonic() - round_start)))
+        return {url: self.summarize(url, results) for url, results in history.items()}
+
+    @staticmethod
+    def summarize(url: str, results: List[HTTPTestResult]) -> HTTPEndpointReport:
+        """汇总同一端点的多次结果（耗时分位数只统计成功拿到响应的请求）"""
+        status_codes: Dict[int, int] = {}
+        for result in results:
+            status_codes[result.status_code] = status_codes.get(result.status_code, 0) + 1
+
+        timed = [r.timings for r in results if r.timings is not None]
+        latency = {}
+        for phase in HTTP_PHASES:
+            values = sorted(getattr(t, phase) for t in timed)
+            latency[phase] = {
+                "avg": sum(values) / len(values) if values else 0.0,
+                "p50": percentile(values, 50),
+                "p90": percentile(values, 90),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+                "max": values[-1] if values else 0.0,
+            }
+
+        failures = sum(1 for r in results if not r.success)
+        return HTTPEndpointReport(
+            url=url,
+            requests=len(results),
+            failures=failures,
+            success_rate=(len(results) - failures) / len(results) * 100 if results else 0.0,
+            status_codes=status_codes,
+            latency=latency
+        )
+
+
+NET_FIELDS = ("rx_bytes", "tx_bytes", "rx_packets", "tx_packets")
+
+CONN_STATES = (
+    "ESTABLISHED", "SYN_SENT", "SYN_RECV", "FIN_WAIT1", "FIN_WAIT2", "TIME_WAIT",
+    "CLOSE", "CLOSE_WAIT", "LAST_ACK", "LISTEN", "CLOSING", "NONE", "OTHER"
+)
+
+
+def _psutil_io_counters():
+    return psutil.net_io_counters(pernic=True)
+
+
+def _psutil_connection_states():
+    return (conn.status for conn in psutil.net_connections(kind="inet"))
+
+
+class NetworkSampler:
+    """
+    后台网络采样器
+
+    按固定间隔把每个网卡的收发字节/包累计值和各状态连接数写入预分配的环形缓冲区，
+    采样时只覆盖数组元素、不增长任何容器；速率、窗口统计和突发检测都在查询时计算。
+    缓冲区写满后覆盖最旧的样本，容量 × 间隔即可查询的最长时间窗口。
+    """
+
+    def __init__(
+        self,
+        interval: float = 1.0,
+        capacity: int = 3600,
+        interfaces: Optional[List[str]] = None,
+        connections: bool = True,
+        connection_every: int = 1,
+        io_counters: Optional[Callable[[], Dict[str, Any]]] = None,
+        connection_states: Optional[Callable[[], Any]] = None
+    ):
+        """
+        Args:
+            interval: 采样间隔（秒）
+            capacity: 环形缓冲区样本数
+            interfaces: 只采样这些网卡（默认首次采样时的全部网卡）
+            connections: 是否统计连接状态
+            connection_every: 每隔几次采样统计一次连接（连接多时遍历较慢）
+            io_counters: 返回 {网卡: 计数} 的函数（默认psutil）
+            connection_states: 返回连接状态序列的函数（默认psutil）
+        """
+        if interval <= 0:
+            raise ValueError("采样间隔必须大于0")
+        if capacity < 2:
+            raise ValueError("缓冲区容量至少为2")
+        if io_counters is None and not HAS_PSUTIL:
+            raise RuntimeError("网络采样需要psutil，请运行: pip install psutil")
+
+        self.interval = interval
+        self.capacity = capacity
+        self.connection_every = max(1, connection_every)
+        self._io_counters = io_counters or _psutil_io_counters
+        if connections:
+            self._connection_states = connection_states or _psutil_connection_states
+        else:
+            self._connection_states = None
+        self._wanted = list(interfaces) if interfaces else None
+
+        self._names: Optional[List[str]] = None
+        self._stride = 0
+        self._values = array("d")
+        self._mono = array("d", [0.0]) * capacity
+        self._wall = array("d", [0.0]) * capacity
+        self._conns = array("l", [-1]) * (capacity * len(CONN_STATES))
+        self._scratch = array("l", [0]) * len(CONN_STATES)
+        self._state_index = {state: i for i, state in enumerate(CONN_STATES)}
+
+        self._head = 0
+        self._count = 0
+        self.ticks = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def interfaces(self) -> List[str]:
+        return list(self._names or [])
+
+    def __len__(self) -> int:
+        return self._count
+
+    # 采样
+    def start(self) -> "NetworkSampler":
+        """立即采样一次并启动后台线程"""
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name="network-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _run(self):
+        next_tick = time.monotonic() + self.interval
+        while not self._stop.wait(max(0.0, next_tick - time.monotonic())):
+            try:
+                self.sample()
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+            next_tick += self.interval
+            behind = time.monotonic() - next_tick
+            if behind > 0:  # 采样耗时超过间隔时跳过错过的时刻，保持相位
+                next_tick += (int(behind / self.interval) + 1) * self.interval
+
+    def sample(self):
+        """采样一次（后台线程每个间隔调用，也可手动驱动）"""
+        counters = self._io_counters()
+        count_connections = (
+            self._connection_states is not None and self.ticks % self.connection_every == 0
+        )
+        if count_connections:
+            scratch = self._scratch
+            for i in range(len(scratch)):
+                scratch[i] = 0
+            other = len(CONN_STATES) - 1
+            index = self._state_index
+            for state in self._connection_states():
+                scratch[index.get(state, other)] += 1
+
+        with self._lock:
+            if self._names is None:
+                self._allocate(counters)
+            slot = self._head
+            stride = self._stride
+            values = self._values
+            base = slot * stride
+            previous = ((slot - 1) % self.capacity) * stride
+            for offset, name in zip(range(base, base + stride, 4), self._names):
+                counter = counters.get(name)
+                if counter is None:  # 网卡暂时消失：沿用上次的累计值
+                    if self._count:
+                        values[offset:offset + 4] = values[previous:previous + 4]
+                    previous += 4
+                    continue
+                values[offset] = counter.bytes_recv
+                values[offset + 1] = counter.bytes_sent
+                values[offset + 2] = counter.packets_recv
+                values[offset + 3] = counter.packets_sent
+                previous += 4
+
+            states = len(CONN_STATES)
+            if count_connections:
+                self._conns[slot * states:(slot + 1) * states] = self._scratch
+            else:
+                self._conns[slot * states] = -1
+
+            self._mono[slot] = time.monotonic()
+            self._wall[slot] = time.time()
+            self._head = (slot + 1) % self.capacity
+            if self._count < self.capacity:
+                self._count += 1
+            self.ticks += 1
+
+    def _allocate(self, counters: Dict[str, Any]):
+        names = sorted(counters)
+        if self._wanted is not None:
+            names = [name for name in self._wanted if name in counters]
+        self._names = names
+        self._stride = len(names) * len(NET_FIELDS)
+        self._values = array("d", [0.0]) * (self.capacity * self._stride)
+
+    # 查询
+    def _window(self, seconds: Optional[float]) -> List[int]:
+        """窗口内的样本槽位（从旧到新），调用方需持有锁"""
+        slots = [(self._head - self._count + i) % self.capacity for i in range(self._count)]
+        if seconds is not None and slots:
+            cutoff = self._mono[slots[-1]] - seconds
+            slots = [slot for slot in slots if self._mono[slot] >= cutoff - 1e-9]
+        return slots
+
+    def _columns(self, field_name: str, interface: Optional[str]) -> List[int]:
+        if field_name not in NET_FIELDS:
+            raise ValueError(f"未知指标: {field_name}，可选 {', '.join(NET_FIELDS)}")
+        names = self._names or []
+        if interface is None:
+            indexes = range(len(names))
+        elif interface in names:
+            indexes = [names.index(interface)]
+        else:
+            raise ValueError(f"未采样的网卡: {interface}")
+        column = NET_FIELDS.index(field_name)
+        return [i * len(NET_FIELDS) + column for i in indexes]
+
+    def _deltas(self, slots: List[int], columns: List[int]) -> List[Tuple[float, float, float]]:
+        """相邻样本间的 (时间戳, 间隔秒数, 增量)；计数器回绕/重置时以当前值为增量"""
+        values, stride = self._values, self._stride
+        deltas = []
+        for prev, slot in zip(slots, slots[1:]):
+            elapsed = self._mono[slot] - self._mono[prev]
+            if elapsed <= 0:
+                continue
+            total = 0.0
+            for column in columns:
+                current = values[slot * stride + column]
+                delta = current - values[prev * stride + column]
+                total += delta if delta >= 0 else current
+            deltas.append((self._wall[slot], elapsed, total))
+        return deltas
+
+    def series(
+        self,
+        field_name: str = "rx_bytes",
+        seconds: Optional[float] = None,
+        interface: Optional[str] = None
+    ) -> List[Tuple[float, float]]:
+        """
+        逐个采样间隔的速率序列
+
+        Args:
+            field_name: rx_bytes / tx_bytes / rx_packets / tx_packets
+            seconds: 最近多少秒（默认整个缓冲区）
+            interface: 网卡名（默认所有网卡之和）
+
+        Returns:
+            List[Tuple[float, float]]: (时间戳, 每秒速率)
+        """
+        with self._lock:
+            columns = self._columns(field_name, interface)
+            deltas = self._deltas(self._window(seconds), columns)
+        return [(stamp, delta / elapsed) for stamp, elapsed, delta in deltas]
+
+    def rates(self, seconds: Optional[float] = None, interface: Optional[str] = None) -> Dict[str, float]:
+        """窗口内的平均速率（每秒），键为 NET_FIELDS"""
+        result = {}
+        with self._lock:
+            slots = self._window(seconds)
+            for field_name in NET_FIELDS:
+                deltas = self._deltas(slots, self._columns(field_name, interface))
+                elapsed = sum(d[1] for d in deltas)
+                result[field_name] = sum(d[2] for d in deltas) / elapsed if elapsed > 0 else 0.0
+        return result
+
+    def connections(self) -> Dict[str, int]:
+        """最近一次统计的各状态连接数"""
+        states = len(CONN_STATES)
+        with self._lock:
+            for slot in reversed(self._window(None)):
+                if self._conns[slot * states] >= 0:
+                    counts = self._conns[slot * states:(slot + 1) * states]
+                    return {state: counts[i] for i, state in enumerate(CONN_STATES) if counts[i]}
+        return {}
+
+    def connection_series(self, state: str = "ESTABLISHED", seconds: Optional[float] = None) -> List[Tuple[float, int]]:
+        """某状态连接数的时间序列（跳过未统计连接的采样）"""
+        if state not in self._state_index:
+            raise ValueError(f"未知连接状态: {state}")
+        states, column = len(CONN_STATES), self._state_index[state]
+        with self._lock:
+            return [
+                (self._wall[slot], self._conns[slot * states + column])
+                for slot in self._window(seconds)
+                if self._conns[slot * states] >= 0
+            ]
+
+    def bursts(
+        self,
+        field_name: str = "rx_bytes",
+        seconds: Optional[float] = None,
+        interface: Optional[str] = None,
+        q: float = 95.0
+    ) -> Dict[str, Any]:
+        """
+        突发检测：速率超过窗口内q分位数的连续区间
+
+        Returns:
+            dict: threshold（分位数速率）、mean、peak，以及bursts列表，
+                  每项为 {start, end, peak, total}（时间戳、峰值速率、区间内总量）
+        """
+        points = self.series(field_name, seconds, interface)
+        if not points:
+            return {"threshold": 0.0, "mean": 0.0, "peak": 0.0, "bursts": []}
+
+        rates = sorted(rate for _, rate in points)
+        threshold = percentile(rates, q)
+        bursts = []
+        current = None
+        previous_stamp = points[0][0] - self.interval
+        for stamp, rate in points:
+            if rate > threshold:
+                volume = rate * (stamp - previous_stamp)
+                if current is None:
+                    current = {"start": previous_stamp, "end": stamp, "peak": rate, "total": volume}
+                    bursts.append(current)
+                else:
+                    current["end"] = stamp
+                    current["peak"] = max(current["peak"], rate)
+                    current["total"] += volume
+            else:
+                current = None
+            previous_stamp = stamp
+
+        return {
+            "threshold": threshold,
+            "mean": sum(rates) / len(rates),
+            "peak": rates[-1],
+            "bursts": bursts
+        }
+
+    def snapshot(self, seconds: Optional[float] = None, interface: Optional[str] = None) -> "NetworkMonitorData":
+        """窗口汇总（KB/s），与 start_network_monitor 的返回值相同"""
+        rates = self.rates(seconds, interface)
+        peaks = {
+            field_name: max((rate for _, rate in self.series(field_name, seconds, interface)), default=0.0)
+            for field_name in ("rx_bytes", "tx_bytes")
+        }
+        with self._lock:
+            slots = self._window(seconds)
+            duration = self._mono[slots[-1]] - self._mono[slots[0]] if slots else 0.0
+        counts = self.connections()
+        return NetworkMonitorData(
+            bandwidth_in=rates["rx_bytes"] / 1024,
+            bandwidth_out=rates["tx_bytes"] / 1024,
+            connections=sum(counts.values()),
+            active_connections=counts.get("ESTABLISHED", 0),
+            duration=duration,
+            peak_in=peaks["rx_bytes"] / 1024,
+            peak_out=peaks["tx_bytes"] / 1024,
+            samples=len(slots)
+        )
 
 
 class NetworkTools:
@@ -118,7 +1104,7 @@ class NetworkTools:
         self,
         host: str,
         ports: Optional[List[int]] = None,
-        thread_count: int = 50
+        thread_count: int = 500
     ) -> ScanResult:
         """
         扫描端口
@@ -126,59 +1112,55 @@ class NetworkTools:
         Args:
             host: 目标主机
             ports: 端口列表（可选，默认扫描常用端口）
-            thread_count: 线程数
+            thread_count: 同时进行的连接数（异步引擎，不创建线程）
 
         Returns:
-            ScanResult: 扫描结果
+            ScanResult: 扫描结果（超时或不可达的端口记为filtered）
         """
         if ports is None:
             ports = self.common_ports
 
         start_time = time.time()
+        scanner = AsyncPortScanner(concurrency=thread_count, timeout=self.timeout)
+        result = scanner.scan([host], ports).get(host)
+
+        if result is None:
+            # 无法解析主机名
+            return ScanResult(
+                host=host,
+                scanned_ports=ports,
+                open_ports=[],
+                closed_ports=[],
+                filtered_ports=list(dict.fromkeys(ports)),
+                scan_duration=time.time() - start_time
+            )
 
-        open_ports = []
-        closed_ports = []
-        filtered_ports = []
+        result.scanned_ports = ports
+        return result
 
-        def check_port(port: int) -> Optional[PortInfo]:
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(self.timeout)
-                result = sock.connect_ex((host, port))
-
-                if result == 0:
-                    service = self._get_service_name(port)
-                    sock.close()
-                    return PortInfo(port=port, service=service, state="open")
-                else:
-                    sock.close()
-                    return None
-            except socket.timeout:
-                return None
-            except Exception:
-                return None
-
-        # 多线程扫描
-        with ThreadPoolExecutor(max_workers=thread_count) as executor:
-            future_to_port = {executor.submit(check_port, port): port for port in ports}
-
-            for future in as_completed(future_to_port):
-                port_info = future.result()
-                if port_info:
-                    open_ports.append(port_info)
-                else:
-                    closed_ports.append(future_to_port[future])
+    def scan_hosts(
+        self,
+        targets,
+        ports: Optional[List[int]] = None,
+        concurrency: int = 2000,
+        on_result: Optional[Callable[[PortScanEvent], None]] = None
+    ) -> Dict[str, ScanResult]:
+        """
+        扫描多个主机
 
-        scan_duration = time.time() - start_time
+        Args:
+            targets: 主机名/IP、逗号分隔列表或CIDR网段（如 10.0.0.0/24）
+            ports: 端口列表（可选，默认扫描常用端口）
+            concurrency: 同时进行的连接数
+            on_result: 每个端口完成时的回调（流式结果）
 
-        return ScanResult(
-            host=host,
-            scanned_ports=ports,
-            open_ports=open_ports,
-            closed_ports=closed_ports,
-            filtered_ports=filtered_ports,
-            scan_duration=scan_duration
-        )
+        Returns:
+            Dict[str, ScanResult]: 每个主机的扫描结果
+        """
+        if ports is None:
+            ports = self.common_ports
+        scanner = AsyncPortScanner(concurrency=concurrency, timeout=self.timeout)
+        return scanner.scan(targets, ports, on_result)
 
     def scan_common_ports(self, host: str) -> ScanResult:
         """扫描常用端口"""
@@ -186,16 +1168,7 @@ class NetworkTools:
 
     def _get_service_name(self, port: int) -> str:
         """获取端口对应的服务名"""
-        common_services = {
-            21: "ftp", 22: "ssh", 23: "telnet", 25: "smtp",
-            53: "dns", 80: "http", 110: "pop3", 143: "imap",
-            443: "https", 445: "smb", 993: "imaps", 995: "pop3s",
-            3306: "mysql", 3389: "rdp", 5432: "postgresql",
-            5900: "vnc", 6379: "redis", 8080: "http-alt",
-            8443: "https-alt", 8888: "http-alt", 9000: "http-alt",
-            9200: "elasticsearch", 27017: "mongodb"
-        }
-        return common_services.get(port, "unknown")
+        return COMMON_SERVICES.get(port, "unknown")
 
     def ping(self, host: str, count: int = 4) -> PingResult:
         """
@@ -417,25 +1390,46 @@ class NetworkTools:
     def batch_http_test(
         self,
         urls: List[str],
-        timeout: int = 10
+        timeout: int = 10,
+        workers: int = 32
     ) -> List[HTTPTestResult]:
         """
-        批量HTTP测试
+        批量HTTP测试（并发，按主机复用连接）
 
         Args:
             urls: URL列表
             timeout: 超时时间
+            workers: 并发线程数
 
         Returns:
-            List[HTTPTestResult]: 测试结果列表
+            List[HTTPTestResult]: 测试结果列表（与urls顺序一致，timings为各阶段耗时）
+        """
+        with HTTPProber(workers=workers, timeout=timeout) as prober:
+            return prober.probe_all(urls)
+
+    def http_benchmark(
+        self,
+        urls: List[str],
+        rounds: int = 5,
+        interval: float = 0.0,
+        timeout: int = 10,
+        workers: int = 32
+    ) -> Dict[str, HTTPEndpointReport]:
         """
-        results = []
+        多轮HTTP探测，按端点汇总成功率与各阶段耗时分位数
 
-        for url in urls:
-            result = self.http_test(url, timeout)
-            results.append(result)
+        Args:
+            urls: URL列表
+            rounds: 轮数
+            interval: 相邻两轮的间隔（秒）
+            timeout: 超时时间
+            workers: 并发线程数
 
-        return results
+        Returns:
+            Dict[str, HTTPEndpointReport]: 每个URL的汇总
+        """
+        with HTTPProber(workers=workers, timeout=timeout) as prober:
+            return prober.benchmark(urls, rounds=rounds, interval=interval)
 
     def start_network_monitor(
         self,
@@ -443,44 +1437,25 @@ class NetworkTools:
         interval: int = 1
     ) -> NetworkMonitorData:
         """
-        启动网络监控
+        启动网络监控（阻塞采样duration秒后返回汇总）
 
         Args:
             duration: 监控时长（秒）
             interval: 采样间隔（秒）
 
         Returns:
-            NetworkMonitorData: 监控数据
+            NetworkMonitorData: 监控数据（平均带宽、单个间隔的峰值带宽、连接数）
         """
-        # 这里简化实现，实际应该使用psutil监控网络
         try:
-            import psutil
-
-            initial_stats = psutil.net_io_counters()
+            sampler = NetworkSampler(interval=interval, capacity=int(duration / interval) + 2)
+            sampler.start()
             time.sleep(duration)
-            final_stats = psutil.net_io_counters()
+            sampler.stop()
+            sampler.sample()
 
-            # 计算带宽
-            bytes_sent = final_stats.bytes_sent - initial_stats.bytes_sent
-            bytes_recv = final_stats.bytes_recv - initial_stats.bytes_recv
-
-            bandwidth_out = (bytes_sent / duration) / 1024  # KB/s
-            bandwidth_in = (bytes_recv / duration) / 1024  # KB/s
-
-            # 获取连接数
-            connections = len(psutil.net_connections())
-            active_connections = sum(
-                1 for conn in psutil.net_connections()
-                if conn.status == 'ESTABLISHED'
-            )
-
-            return NetworkMonitorData(
-                bandwidth_in=bandwidth_in,
-                bandwidth_out=bandwidth_out,
-                connections=connections,
-                active_connections=active_connections,
-                duration=duration
-            )
+            result = sampler.snapshot()
+            result.duration = duration
+            return result
 
         except Exception as e:
             return NetworkMonitorData(
@@ -491,6 +1466,32 @@ class NetworkTools:
                 duration=duration
             )
 
+    def start_network_sampler(
+        self,
+        interval: float = 1.0,
+        capacity: int = 3600,
+        interfaces: Optional[List[str]] = None,
+        connection_every: int = 1
+    ) -> NetworkSampler:
+        """
+        启动后台网络采样器（非阻塞），随时查询最近窗口的速率、序列与突发
+
+        Args:
+            interval: 采样间隔（秒）
+            capacity: 环形缓冲区样本数（默认1秒间隔保留1小时）
+            interfaces: 只采样这些网卡
+            connection_every: 每隔几次采样统计一次连接状态
+
+        Returns:
+            NetworkSampler: 已启动的采样器，用完调用stop()
+        """
+        return NetworkSampler(
+            interval=interval,
+            capacity=capacity,
+            interfaces=interfaces,
+            connection_every=connection_every
+        ).start()
+
     def test_throughput(
         self,
         host: str,
@@ -3,8 +3,12 @@
 网络工具集测试
 """
 
+import asyncio
 import socket
 import sys
+import time
+import threading
+import http.server
 from network_tools import (
     NetworkTools,
     ScanResult,
@@ -12,8 +16,13 @@ from network_tools import (
     DNSResult,
     TracerouteResult,
     HTTPTestResult,
+    HTTPProber,
+    AsyncPortScanner,
+    NetworkSampler,
     NetworkMonitorData
 )
+from collections import namedtuple
+from urllib.parse import urlsplit
 
 
 class TestNetworkTools:
@@ -260,6 +269,200 @@ class TestNetworkTools:
             print(f"错误: {e}")
             return False
 
+    def test_async_port_scanner(self):
+        """测试13: 异步扫描引擎（本地监听端口）"""
+        print("\n[测试13] 异步扫描引擎...")
+
+        listeners = []
+        try:
+            for _ in range(3):
+                listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                listener.bind(("127.0.0.1", 0))
+                listener.listen()
+                listeners.append(listener)
+            open_ports = sorted(l.getsockname()[1] for l in listeners)
+
+            # 取一个刚释放的端口作为关闭端口
+            probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            probe.bind(("127.0.0.1", 0))
+            closed_port = probe.getsockname()[1]
+            probe.close()
+
+            events = []
+            results = self.tools.scan_hosts(
+                "127.0.0.1,localhost", open_ports + [closed_port], on_result=events.append
+            )
+
+            assert set(results) == {"127.0.0.1", "localhost"}, "应返回两个主机的结果"
+            for result in results.values():
+                assert [p.port for p in result.open_ports] == open_ports, "开放端口不正确"
+                assert result.closed_ports == [closed_port], "关闭端口不正确"
+            assert len(events) == 8, "应流式返回每个端口的结果"
+            assert all(e.rtt is not None for e in events), "开放/关闭端口应有RTT"
+
+            result = self.tools.scan_ports("127.0.0.1", open_ports)
+            assert len(result.open_ports) == 3, "scan_ports应使用异步引擎"
+
+            # 在已运行的事件循环中调用同步接口，以及直接await异步接口
+            async def scan_in_loop():
+                sync_result = self.tools.scan_ports("127.0.0.1", open_ports)
+                async_results = await AsyncPortScanner(timeout=2).scan_async("127.0.0.1", open_ports)
+                return sync_result, async_results["127.0.0.1"]
+
+            sync_result, async_result = asyncio.run(scan_in_loop())
+            assert len(sync_result.open_ports) == 3, "事件循环中调用scan_ports应可用"
+            assert len(async_result.open_ports) == 3, "scan_async结果不正确"
+
+            print(f"✅ 异步扫描完成，开放端口: {open_ports}")
+            self.test_results.append(("异步扫描引擎", "✅ 通过", f"{len(events)}个结果"))
+            return True
+
+        except Exception as e:
+            self.test_results.append(("异步扫描引擎", "❌ 失败", str(e)))
+            print(f"错误: {e}")
+            return False
+
+        finally:
+            for listener in listeners:
+                listener.close()
+
+    def test_http_prober(self):
+        """测试14: 并发HTTP探测（本地服务，keep-alive与分位数汇总）"""
+        print("\n[测试14] 并发HTTP探测...")
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                # 经代理时请求行为绝对URL
+                path = urlsplit(self.path).path.strip("/")
+                body = b"ok"
+                if path == "redirect":
+                    self.send_response(302)
+                    self.send_header("Location", "/200")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                self.send_response(int(path or 200))
+                self.send_header("X-Host", self.headers.get("Host", ""))
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        try:
+            urls = [f"{base}/200", f"{base}/404", "http://127.0.0.1:1/"] * 5
+            results = self.tools.batch_http_test(urls, timeout=2, workers=8)
+
+            assert [r.url for r in results] == urls, "结果应保持输入顺序"
+            assert all(r.status_code == 200 and r.success for r in results[0::3]), "200应成功"
+            assert all(r.status_code == 404 and not r.success for r in results[1::3]), "404应失败"
+            assert all(r.error and r.timings is None for r in results[2::3]), "连接失败应有错误信息"
+            assert all(r.timings.total >= r.timings.ttfb for r in results[0::3]), "总耗时应不小于TTFB"
+
+            reports = self.tools.http_benchmark([f"{base}/200", f"{base}/500"], rounds=4, workers=2)
+            report = reports[f"{base}/200"]
+            assert report.requests == 4 and report.success_rate == 100.0, "成功率统计错误"
+            assert report.latency["total"]["p50"] <= report.latency["total"]["p99"], "分位数应单调"
+            assert reports[f"{base}/500"].status_codes == {500: 4}, "状态码统计错误"
+
+            # keep-alive：同一主机的后续请求复用连接
+            with HTTPProber(workers=1) as prober:
+                first = prober.probe(f"{base}/200")
+                second = prober.probe(f"{base}/200")
+            assert not first.timings.reused and second.timings.reused, "应复用连接"
+            assert second.timings.connect == 0, "复用连接不应有连接耗时"
+
+            # 默认跟随重定向，结果为最终响应；关闭后3xx原样返回
+            with HTTPProber(workers=1, proxies={}) as prober:
+                followed = prober.probe(f"{base}/redirect")
+            assert followed.status_code == 200 and followed.url == f"{base}/redirect", "应跟随重定向"
+            with HTTPProber(workers=1, proxies={}, follow_redirects=False) as prober:
+                assert prober.probe(f"{base}/redirect").status_code == 302, "不跟随时应返回3xx"
+
+            # 明文HTTP经代理使用绝对URL，no_proxy中的主机直连
+            with HTTPProber(workers=1, proxies={"http": base}) as prober:
+                proxied = prober.probe("http://example.invalid/200")
+            assert proxied.status_code == 200 and proxied.headers["X-Host"] == "example.invalid", "应经代理请求"
+            with HTTPProber(workers=1, proxies={"http": "http://127.0.0.1:1", "no": "127.0.0.1"}) as prober:
+                assert prober.probe(f"{base}/200").success, "no_proxy中的主机应直连"
+
+            print(f"✅ 探测完成，p95总耗时 {report.latency['total']['p95']:.2f}ms")
+            self.test_results.append(("并发HTTP探测", "✅ 通过", f"{len(results)}个请求"))
+            return True
+
+        except Exception as e:
+            self.test_results.append(("并发HTTP探测", "❌ 失败", str(e)))
+            print(f"错误: {e}")
+            return False
+
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_network_sampler(self):
+        """测试15: 后台网络采样器（环形缓冲区、速率与突发检测）"""
+        print("\n[测试15] 网络采样器...")
+
+        try:
+            Counter = namedtuple("Counter", "bytes_recv bytes_sent packets_recv packets_sent")
+            # eth0每次采样收1000字节，第6次突发收11000字节；lo保持不变
+            received = [0]
+            steps = iter([1000] * 5 + [11000] + [1000] * 4)
+
+            def io_counters():
+                value = received[0]
+                received[0] += next(steps, 1000)
+                return {"eth0": Counter(value, value // 2, value // 100, 0), "lo": Counter(5, 5, 1, 1)}
+
+            sampler = NetworkSampler(
+                interval=1.0, capacity=8, io_counters=io_counters,
+                connection_states=lambda: ["ESTABLISHED", "ESTABLISHED", "LISTEN", "BOUND"]
+            )
+            for _ in range(11):
+                sampler.sample()
+                time.sleep(0.01)
+
+            assert sampler.interfaces == ["eth0", "lo"], "网卡列表错误"
+            assert len(sampler) == 8 and sampler.ticks == 11, "环形缓冲区应只保留最近8个样本"
+            series = sampler.series("rx_bytes", interface="eth0")
+            assert len(series) == 7, "7个采样间隔"
+            assert sampler.series("rx_bytes", interface="lo")[0][1] == 0, "lo无流量"
+
+            rates = sampler.rates()
+            assert rates["rx_bytes"] > 0 and rates["tx_packets"] == 0, "速率计算错误"
+            assert abs(rates["tx_bytes"] * 2 - rates["rx_bytes"]) < rates["rx_bytes"] * 0.01, "发送应为接收的一半"
+
+            bursts = sampler.bursts("rx_bytes", interface="eth0")
+            assert len(bursts["bursts"]) == 1, "应检测到一次突发"
+            assert bursts["peak"] == bursts["bursts"][0]["peak"] > bursts["threshold"], "突发峰值应超过p95"
+
+            assert sampler.connections() == {"ESTABLISHED": 2, "LISTEN": 1, "OTHER": 1}, "连接状态统计错误"
+            assert [count for _, count in sampler.connection_series("ESTABLISHED")] == [2] * 8
+
+            # psutil实时采样
+            with self.tools.start_network_sampler(interval=0.05, capacity=100) as live:
+                time.sleep(0.3)
+            snapshot = live.snapshot()
+            assert live.errors == 0 and snapshot.samples >= 4, "后台线程应持续采样"
+            assert snapshot.bandwidth_in >= 0 and snapshot.peak_in >= snapshot.bandwidth_in * 0.99
+
+            print(f"✅ 采样完成，{snapshot.samples}个样本，p95阈值 {bursts['threshold']:.0f} B/s")
+            self.test_results.append(("网络采样器", "✅ 通过", f"{len(series)}个间隔"))
+            return True
+
+        except Exception as e:
+            self.test_results.append(("网络采样器", "❌ 失败", str(e)))
+            print(f"错误: {e}")
+            return False
+
     def run_all_tests(self):
         """运行所有测试"""
         print("="*60)
@@ -279,6 +482,9 @@ class TestNetworkTools:
         self.test_network_monitor()
         self.test_scan_filtered_ports()
         self.test_ping_packet_loss()
+        self.test_async_port_scanner()
+        self.test_http_prober()
+        self.test_network_sampler()
 
         # 打印结果汇总
         print("\n" + "="*60)
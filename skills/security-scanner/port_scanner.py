@@ -4,14 +4,34 @@
 快速发现开放端口和服务
 """
 
+import os
 import socket
 import threading
 import argparse
 import json
 import sys
+import runpy
 from datetime import datetime
 
 
+SKILLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+load_module = runpy.run_path(os.path.join(SKILLS_DIR, "_shared", "module_loader.py"))["load_module"]
+
+# 异步扫描引擎来自同仓库的 network-tools 技能
+NETWORK_TOOLS_PATH = os.path.join(SKILLS_DIR, "network-tools", "network_tools.py")
+
+try:
+    network_tools = load_module("network_tools", NETWORK_TOOLS_PATH)
+    AsyncPortScanner = network_tools.AsyncPortScanner
+    expand_targets = network_tools.expand_targets
+    HAS_ASYNC_ENGINE = True
+except (OSError, ImportError, AttributeError):
+    network_tools = None
+    AsyncPortScanner = None
+    expand_targets = None
+    HAS_ASYNC_ENGINE = False
+
+
 class PortScanner:
     """端口扫描器"""
 
@@ -20,12 +40,13 @@ class PortScanner:
         初始化扫描器
 
         Args:
-            target: 目标IP或域名
+            target: 目标IP或域名（异步引擎可用时也支持逗号分隔列表和CIDR网段）
             ports: 端口范围
-            timeout: 超时时间（秒）
-            threads: 线程数
+            timeout: 超时时间（秒），异步引擎按测得的RTT自适应缩短
+            threads: 并发数（异步引擎为同时进行的连接数）
         """
         self.target = target
+        self.targets = expand_targets(target) if HAS_ASYNC_ENGINE else [target]
         self.timeout = timeout
         self.threads = threads
         self.open_ports = []
@@ -79,12 +100,47 @@ class PortScanner:
         """执行扫描"""
         print(f"\n正在扫描 {self.target}...")
         print(f"端口范围: {min(self.port_range)}-{max(self.port_range)}")
-        print(f"线程数: {self.threads}")
+        print(f"{'并发连接' if HAS_ASYNC_ENGINE else '线程数'}: {self.threads}")
         print(f"超时: {self.timeout}秒\n")
 
         start_time = datetime.now()
 
-        # 创建线程
+        if HAS_ASYNC_ENGINE:
+            self._scan_async()
+        else:
+            self._scan_threads()
+
+        end_time = datetime.now()
+        duration = (end_time - start_time).total_seconds()
+
+        print(f"\n扫描完成！用时: {duration:.2f}秒")
+
+        return self.open_ports
+
+    def _scan_async(self):
+        """异步引擎扫描，发现开放端口立即输出"""
+        multi_host = len(self.targets) > 1
+
+        def on_result(event):
+            if event.state != "open":
+                return
+            try:
+                service = socket.getservbyport(event.port)
+            except OSError:
+                service = "unknown"
+            port_info = {"port": event.port, "service": service, "status": "open"}
+            if multi_host:
+                port_info = {"host": event.host, **port_info}
+            self.open_ports.append(port_info)
+            print(f"  [+] {event.host}:{event.port} 开放 ({service}, {event.rtt:.1f}ms)")
+
+        scanner = AsyncPortScanner(concurrency=self.threads, timeout=self.timeout)
+        scanner.scan(self.targets, list(self.port_range), on_result=on_result)
+        for host in scanner.unresolved:
+            print(f"警告: 无法解析目标 {host}")
+
+    def _scan_threads(self):
+        """线程扫描（异步引擎不可用时）"""
         threads = []
         for port in self.port_range:
             t = threading.Thread(target=self.scan_port, args=(port,))
@@ -104,13 +160,6 @@ class PortScanner:
         for thread in threads:
             thread.join()
 
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
-
-        print(f"\n扫描完成！用时: {duration:.2f}秒")
-
-        return self.open_ports
-
     def print_results(self):
         """打印结果"""
         if not self.open_ports:
@@ -119,11 +168,12 @@ class PortScanner:
 
         print(f"\n发现 {len(self.open_ports)} 个开放端口:")
         print("=" * 60)
-        print(f"{'端口':<10} {'服务':<20} {'状态':<10}")
+        print(f"{'主机':<18} {'端口':<10} {'服务':<20} {'状态':<10}")
         print("-" * 60)
 
-        for port_info in sorted(self.open_ports, key=lambda x: x["port"]):
-            print(f"{port_info['port']:<10} {port_info['service']:<20} {port_info['status']:<10}")
+        for port_info in sorted(self.open_ports, key=lambda x: (x.get("host", self.target), x["port"])):
+            host = port_info.get("host", self.target)
+            print(f"{host:<18} {port_info['port']:<10} {port_info['service']:<20} {port_info['status']:<10}")
 
     def save_results(self, output_file, format="json"):
         """
@@ -149,29 +199,32 @@ class PortScanner:
                 f.write(f"目标: {self.target}\n")
                 f.write(f"扫描时间: {datetime.now()}\n")
                 f.write(f"\n开放端口:\n")
-                for port_info in sorted(self.open_ports, key=lambda x: x["port"]):
-                    f.write(f"  {port_info['port']}: {port_info['service']}\n")
+                for port_info in sorted(self.open_ports, key=lambda x: (x.get("host", ""), x["port"])):
+                    prefix = f"{port_info['host']}:" if "host" in port_info else ""
+                    f.write(f"  {prefix}{port_info['port']}: {port_info['service']}\n")
 
         print(f"\n结果已保存到: {output_file}")
 
 
 def main():
     parser = argparse.ArgumentParser(description="端口扫描工具")
-    parser.add_argument("--target", required=True, help="目标IP或域名")
+    parser.add_argument("--target", required=True, help="目标IP或域名（支持逗号分隔列表和CIDR网段，如 10.0.0.0/24）")
     parser.add_argument("--ports", default="1-1024", help="端口范围（默认1-1024）")
-    parser.add_argument("--timeout", type=int, default=1, help="超时时间（秒）")
-    parser.add_argument("--threads", type=int, default=100, help="线程数")
+    parser.add_argument("--timeout", type=float, default=1, help="最大超时时间（秒）")
+    parser.add_argument("--threads", type=int, default=1000, help="并发连接数")
     parser.add_argument("--output", help="输出文件")
     parser.add_argument("--format", default="json", choices=["json", "txt"], help="输出格式")
 
     args = parser.parse_args()
 
-    # 解析目标
-    try:
-        target = socket.gethostbyname(args.target)
-    except socket.gaierror:
-        print(f"错误: 无法解析目标 {args.target}")
-        sys.exit(1)
+    # 解析目标（多目标由扫描引擎逐个解析）
+    target = args.target
+    if "/" not in target and "," not in target:
+        try:
+            target = socket.gethostbyname(target)
+        except socket.gaierror:
+            print(f"错误: 无法解析目标 {args.target}")
+            sys.exit(1)
 
     # 创建扫描器
     scanner = PortScanner(
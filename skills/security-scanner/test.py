@@ -63,6 +63,42 @@ def test_port_range_parsing():
         return False
 
 
+def test_port_scanner_scan():
+    """测试2b: 扫描本地监听端口"""
+    print("\n测试2b: 扫描本地监听端口")
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        from port_scanner import PortScanner, HAS_ASYNC_ENGINE
+
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        port = listener.getsockname()[1]
+
+        scanner = PortScanner(target="127.0.0.1", ports=f"{port - 5}-{port + 5}", timeout=1)
+        open_ports = scanner.scan()
+        assert [p["port"] for p in open_ports if p["port"] == port] == [port], "应发现监听端口"
+        print(f"  ✓ 发现监听端口 {port}（异步引擎: {HAS_ASYNC_ENGINE}）")
+
+        # 多目标
+        if HAS_ASYNC_ENGINE:
+            scanner = PortScanner(target="127.0.0.1,localhost", ports=str(port))
+            hosts = sorted(p["host"] for p in scanner.scan())
+            assert hosts == ["127.0.0.1", "localhost"], "多目标扫描结果错误"
+            print("  ✓ 多目标扫描")
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    finally:
+        listener.close()
+
+
 def test_vuln_scanner_init():
     """测试3: 漏洞扫描器初始化"""
     print("\n测试3: 漏洞扫描器初始化")
@@ -256,6 +292,39 @@ def test_api_structure():
         return False
 
 
+def test_module_loader():
+    """测试2c: 跨技能模块加载失败时不留下半初始化的模块"""
+    print("\n测试2c: 跨技能模块加载")
+
+    try:
+        from port_scanner import load_module
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "broken_engine.py")
+            with open(path, "w") as f:
+                f.write("VALUE = 1\nraise ImportError('missing dependency')\n")
+            try:
+                load_module("broken_engine", path)
+                assert False, "加载失败应抛出异常"
+            except ImportError:
+                pass
+            assert "broken_engine" not in sys.modules, "加载失败后不应保留模块"
+            print("  ✓ 加载失败时撤销登记")
+
+            with open(path, "w") as f:
+                f.write("VALUE = 2\n")
+            module = load_module("broken_engine", path)
+            assert module.VALUE == 2 and load_module("broken_engine", path) is module
+            print("  ✓ 同一文件只加载一次")
+            sys.modules.pop("broken_engine", None)
+
+        return True
+
+    except Exception as e:
+        print(f"  ✗ 测试失败: {e}")
+        return False
+
+
 def test_import():
     """测试0: 模块导入"""
     print("\n测试0: 模块导入")
@@ -282,6 +351,8 @@ def run_all_tests():
         test_import,
         test_port_scanner_init,
         test_port_range_parsing,
+        test_port_scanner_scan,
+        test_module_loader,
         test_vuln_scanner_init,
         test_common_vuln_detection,
         test_save_results,
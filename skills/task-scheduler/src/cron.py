@@ -0,0 +1,385 @@
+"""
+Cron表达式引擎
+
+支持标准5字段格式（分 时 日 月 周）：
+- 通配符 `*`/`?`、范围 `9-17`、步长 `*/5`、`10-50/10`、`5/15`、列表 `1,3,5`
+- 月份与星期名称（JAN-DEC、SUN-SAT），星期 0 和 7 都表示周日
+- 宏：@yearly、@annually、@monthly、@weekly、@daily、@midnight、@hourly
+- 日与周同时受限时按 Vixie cron 语义取并集，否则取交集
+
+每个字段预编译为位集，并预先算好“不小于v的下一个合法值”查找表，
+计算下次触发时间时每个字段只需一次查表，日期按月批量匹配。
+"""
+
+import calendar
+from datetime import datetime, timedelta, timezone as dt_timezone, tzinfo
+from functools import lru_cache
+from typing import Iterator, List, Optional, Union
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+
+MACROS = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+MONTH_NAMES = {
+    name: index
+    for index, name in enumerate(
+        ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN',
+         'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC'],
+        start=1
+    )
+}
+
+DAY_NAMES = {
+    name: index
+    for index, name in enumerate(['SUN', 'MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT'])
+}
+
+# (字段名, 最小值, 最大值, 名称表)
+FIELDS = (
+    ('minute', 0, 59, None),
+    ('hour', 0, 23, None),
+    ('day', 1, 31, None),
+    ('month', 1, 12, MONTH_NAMES),
+    ('day_of_week', 0, 7, DAY_NAMES),
+)
+
+# 搜索上限：日/周组合（如2月29日且为周一）最长约28年出现一次，留足余量
+MAX_SEARCH_YEARS = 400
+
+
+class CronField:
+    """单个字段：位集 + 下一个合法值查找表"""
+
+    __slots__ = ('name', 'low', 'high', 'bits', 'wildcard', 'values', 'next_value')
+
+    def __init__(self, name: str, low: int, high: int, bits: int, wildcard: bool):
+        self.name = name
+        self.low = low
+        self.high = high
+        self.bits = bits
+        self.wildcard = wildcard
+        self.values = [v for v in range(low, high + 1) if bits >> v & 1]
+
+        # next_value[v]: 不小于v的最小合法值，没有则为None
+        table = [None] * (high + 2)
+        upcoming = None
+        for v in range(high, low - 1, -1):
+            if bits >> v & 1:
+                upcoming = v
+            table[v] = upcoming
+        self.next_value = table
+
+    def __contains__(self, value: int) -> bool:
+        return bool(self.bits >> value & 1)
+
+
+def _parse_value(token: str, names: Optional[dict], field: str) -> int:
+    token = token.strip().upper()
+    if names and token in names:
+        return names[token]
+    try:
+        return int(token)
+    except ValueError:
+        raise ValueError(f"Cron字段 {field} 的值无效: {token}")
+
+
+def _parse_field(expr: str, name: str, low: int, high: int, names: Optional[dict]) -> CronField:
+    """将单个字段编译为位集"""
+    bits = 0
+    wildcard = expr in ('*', '?')
+
+    for part in expr.split(','):
+        if not part:
+            raise ValueError(f"Cron字段 {name} 存在空项: {expr}")
+
+        step = 1
+        if '/' in part:
+            part, step_str = part.split('/', 1)
+            step = _parse_value(step_str, None, name)
+            if step <= 0:
+                raise ValueError(f"Cron字段 {name} 的步长必须为正数: {expr}")
+
+        if part in ('*', '?'):
+            start, end = low, high
+        elif '-' in part:
+            start_str, end_str = part.split('-', 1)
+            start = _parse_value(start_str, names, name)
+            end = _parse_value(end_str, names, name)
+        else:
+            start = _parse_value(part, names, name)
+            # "5/15" 表示从5开始每15个单位
+            end = high if step > 1 else start
+
+        if not (low <= start <= high and low <= end <= high):
+            raise ValueError(f"Cron字段 {name} 超出范围 [{low}, {high}]: {expr}")
+        if start > end:
+            raise ValueError(f"Cron字段 {name} 范围起点大于终点: {expr}")
+
+        for value in range(start, end + 1, step):
+            bits |= 1 << value
+
+    if name == 'day_of_week':
+        # 7 与 0 都表示周日
+        if bits >> 7 & 1:
+            bits = (bits | 1) & ~(1 << 7)
+        high = 6
+
+    return CronField(name, low, high, bits, wildcard)
+
+
+def _resolve_timezone(tz: Union[str, tzinfo, None]) -> Optional[tzinfo]:
+    if tz is None or isinstance(tz, tzinfo):
+        return tz
+    if tz.upper() == 'UTC':
+        return dt_timezone.utc
+    if ZoneInfo is None:
+        raise ValueError("按名称指定时区需要Python 3.9+（zoneinfo）")
+    return ZoneInfo(tz)
+
+
+class CronExpression:
+    """预编译的Cron表达式
+
+    Args:
+        expr: Cron表达式或宏
+        tz: 时区（名称或tzinfo）。指定后按该时区的墙上时间匹配，
+            返回带时区的datetime；否则按本地naive时间计算。
+
+    夏令时处理：
+    - 跳过的时间段（春季拨快）内的触发顺延一个时差（如 2:30 → 3:30）
+    - 重复的时间段（秋季拨慢）内，固定小时的任务只在第一次出现时触发，
+      小时为 `*` 的任务按真实时间在两段中都触发
+    """
+
+    def __init__(self, expr: str, tz: Union[str, tzinfo, None] = None):
+        self.expr = expr
+        source = MACROS.get(expr.strip().lower(), expr)
+        parts = source.split()
+        if len(parts) != 5:
+            raise ValueError(f"Invalid cron expression: {expr}")
+
+        (self.minute, self.hour, self.day,
+         self.month, self.day_of_week) = [
+            _parse_field(part, name, low, high, names)
+            for part, (name, low, high, names) in zip(parts, FIELDS)
+        ]
+
+        for field in (self.minute, self.hour, self.day, self.month, self.day_of_week):
+            if not field.bits:
+                raise ValueError(f"Cron字段 {field.name} 没有合法值: {expr}")
+
+        self.tz = _resolve_timezone(tz)
+
+        # 日与周都受限时取并集（Vixie cron 语义）
+        self._day_or = not self.day.wildcard and not self.day_of_week.wildcard
+        self._day_mask = lru_cache(maxsize=64)(self._compute_day_mask)
+
+        if self._next_day(datetime(2000, 1, 1).date(), 2000 + MAX_SEARCH_YEARS) is None:
+            raise ValueError(f"Cron表达式永远不会触发: {expr}")
+
+    def __repr__(self) -> str:
+        return f"CronExpression({self.expr!r}, tz={self.tz!r})"
+
+    def _compute_day_mask(self, year: int, month: int) -> int:
+        """某年某月中合法日期的位集（bit d 表示 d 号）"""
+        first_weekday, days = calendar.monthrange(year, month)
+        month_bits = (1 << (days + 1)) - 2
+
+        # calendar 的周一为0，cron 的周日为0
+        offset = (first_weekday + 1) % 7
+        dow_bits = 0
+        for day in range(1, days + 1):
+            if self.day_of_week.bits >> ((offset + day - 1) % 7) & 1:
+                dow_bits |= 1 << day
+
+        dom_bits = self.day.bits & month_bits
+        if self._day_or:
+            return dom_bits | dow_bits
+        if self.day.wildcard:
+            return dow_bits
+        if self.day_of_week.wildcard:
+            return dom_bits
+        return dom_bits & dow_bits
+
+    def _next_day(self, date, year_limit: int):
+        """不早于date的下一个合法日期，按月跳跃"""
+        year, month, day = date.year, date.month, date.day
+        while year < year_limit:
+            next_month = self.month.next_value[month]
+            if next_month is None:
+                year, month, day = year + 1, 1, 1
+                continue
+            if next_month != month:
+                month, day = next_month, 1
+
+            mask = self._day_mask(year, month) >> day
+            if mask:
+                day += (mask & -mask).bit_length() - 1
+                return date.replace(year=year, month=month, day=day)
+
+            if month == 12:
+                year, month, day = year + 1, 1, 1
+            else:
+                month, day = month + 1, 1
+        return None
+
+    def _next_wall(self, start: datetime) -> datetime:
+        """不早于start（naive墙上时间，精确到分钟）的下一个匹配时间"""
+        current = start
+        year_limit = start.year + MAX_SEARCH_YEARS
+        while True:
+            date = self._next_day(current.date(), year_limit)
+            if date is None:
+                raise ValueError(f"Cron表达式在{MAX_SEARCH_YEARS}年内不会触发: {self.expr}")
+            if date != current.date():
+                current = datetime(date.year, date.month, date.day)
+
+            hour = self.hour.next_value[current.hour]
+            if hour is None:
+                current = datetime(date.year, date.month, date.day) + timedelta(days=1)
+                continue
+            if hour != current.hour:
+                current = current.replace(hour=hour, minute=0)
+
+            minute = self.minute.next_value[current.minute]
+            if minute is None:
+                current = current.replace(minute=0) + timedelta(hours=1)
+                continue
+            return current.replace(minute=minute)
+
+    def _localize(self, wall: datetime) -> List[datetime]:
+        """墙上时间对应的真实时刻（重复时段返回两个，跳过时段顺延）"""
+        tz = self.tz
+        first = wall.replace(tzinfo=tz, fold=0)
+        second = wall.replace(tzinfo=tz, fold=1)
+        if first.utcoffset() == second.utcoffset():
+            return [first]
+
+        utc = dt_timezone.utc
+        first_utc = first.astimezone(utc)
+        second_utc = second.astimezone(utc)
+        if first_utc.astimezone(tz).replace(tzinfo=None) != wall:
+            # 不存在的时间（春季拨快）：按切换前的偏移换算，即顺延一个时差
+            return [max(first_utc, second_utc).astimezone(tz)]
+        return sorted([first_utc.astimezone(tz), second_utc.astimezone(tz)])
+
+    def next(self, after: Optional[datetime] = None) -> datetime:
+        """严格晚于after的下一次触发时间"""
+        if self.tz is None:
+            if after is None:
+                after = datetime.now()
+            if after.tzinfo is not None:
+                after = after.astimezone().replace(tzinfo=None)
+            start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+            return self._next_wall(start)
+
+        if after is None:
+            after = datetime.now(self.tz)
+        elif after.tzinfo is None:
+            after = after.astimezone()
+        after = after.astimezone(self.tz)
+
+        # 同一时区内的datetime比较会忽略fold，统一用时间戳比较
+        after_ts = after.timestamp()
+        wall = after.replace(tzinfo=None, fold=0)
+        start = wall.replace(second=0, microsecond=0)
+        # 重复时段的第二次出现中，同一墙上分钟可能仍在after之后
+        if not after.fold:
+            start += timedelta(minutes=1)
+
+        while True:
+            candidate = self._next_wall(start)
+            instants = self._localize(candidate)
+            if len(instants) == 2 and not self.hour.wildcard:
+                instants = instants[:1]
+            for instant in instants:
+                if instant.timestamp() > after_ts:
+                    if self.hour.wildcard and instant.utcoffset() < after.utcoffset():
+                        return self._repeated_candidate(after, instant) or instant
+                    return instant
+            start = candidate + timedelta(minutes=1)
+
+    def _repeated_candidate(self, after: datetime, instant: datetime) -> Optional[datetime]:
+        """after与instant之间发生了时钟回拨时，查找重复时段中的触发时间
+
+        墙上时间搜索会直接越过重复的那一段，这里二分定位切换时刻，
+        再在重复时段（第二次出现）内查找匹配。
+        """
+        utc = dt_timezone.utc
+        old_offset = after.utcoffset()
+        lo = int(after.timestamp()) // 60
+        hi = int(instant.timestamp()) // 60 + 1
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            moment = datetime.fromtimestamp(mid * 60, utc).astimezone(self.tz)
+            if moment.utcoffset() == old_offset:
+                lo = mid
+            else:
+                hi = mid
+
+        transition = datetime.fromtimestamp(hi * 60, utc).astimezone(self.tz)
+        gap = old_offset - transition.utcoffset()
+        repeated_start = transition.replace(tzinfo=None, fold=0)
+        candidate = self._next_wall(repeated_start)
+        if candidate >= repeated_start + gap:
+            return None
+        fire_time = candidate.replace(tzinfo=self.tz, fold=1)
+        if after.timestamp() < fire_time.timestamp() < instant.timestamp():
+            return fire_time
+        return None
+
+    def iter(self, after: Optional[datetime] = None) -> Iterator[datetime]:
+        """从after之后依次生成触发时间"""
+        current = self.next(after)
+        while True:
+            yield current
+            current = self.next(current)
+
+    def next_n(self, n: int, after: Optional[datetime] = None) -> List[datetime]:
+        """批量获取接下来n次触发时间"""
+        result = []
+        if n <= 0:
+            return result
+        for fire_time in self.iter(after):
+            result.append(fire_time)
+            if len(result) >= n:
+                break
+        return result
+
+    def match(self, when: datetime) -> bool:
+        """判断某时刻（精确到分钟）是否匹配"""
+        if self.tz is not None and when.tzinfo is not None:
+            when = when.astimezone(self.tz)
+        return (
+            when.minute in self.minute
+            and when.hour in self.hour
+            and when.month in self.month
+            and bool(self._day_mask(when.year, when.month) >> when.day & 1)
+        )
+
+
+@lru_cache(maxsize=1024)
+def compile_cron(expr: str, tz: Union[str, tzinfo, None] = None) -> CronExpression:
+    """编译并缓存Cron表达式（相同表达式的任务共享同一份位集）"""
+    return CronExpression(expr, tz)
+
+
+def is_valid_cron(expr: str) -> bool:
+    """判断Cron表达式是否合法"""
+    try:
+        compile_cron(expr)
+        return True
+    except (ValueError, TypeError, AttributeError):
+        return False
@@ -0,0 +1,408 @@
+"""
+依赖管理：DAG定义与执行
+
+- 拓扑排序与环检测
+- 无依赖关系的分支在线程池中并行执行
+- 上游结果可传递给下游节点
+- 从失败节点开始局部重跑，已成功节点的结果直接复用
+"""
+
+import time
+import uuid
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from .utils import calculate_backoff_time
+
+
+class DAGNode:
+    """DAG节点"""
+
+    def __init__(
+        self,
+        task_id: str,
+        func: Callable,
+        dependencies: Iterable[str] = (),
+        args: tuple = (),
+        kwargs: dict = None,
+        max_retries: int = 0,
+        retry_delay: float = 1.0,
+        pass_results: bool = False,
+        task: Any = None
+    ):
+        """
+        Args:
+            task_id: 节点ID（与调度器中的任务ID一致）
+            func: 节点函数
+            dependencies: 上游节点ID列表
+            args: 位置参数
+            kwargs: 关键字参数
+            max_retries: 节点失败后的重试次数
+            retry_delay: 重试基础延迟（指数退避）
+            pass_results: 为True时以 upstream={上游ID: 结果} 关键字参数调用func
+            task: 关联的Task对象，运行时同步更新其统计信息
+        """
+        self.task_id = task_id
+        self.func = func
+        self.dependencies = list(dependencies)
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.pass_results = pass_results
+        self.task = task
+
+    @classmethod
+    def from_task(cls, task, dependencies: Iterable[str] = (), pass_results: bool = False) -> 'DAGNode':
+        """由调度器中的Task创建节点"""
+        return cls(
+            task_id=task.task_id,
+            func=task.func,
+            dependencies=dependencies,
+            args=task.args,
+            kwargs=task.kwargs,
+            max_retries=task.max_retries,
+            retry_delay=task.retry_delay,
+            pass_results=pass_results,
+            task=task
+        )
+
+    def execute(self, upstream: Dict[str, Any]) -> Any:
+        """执行节点（含重试），在工作线程中调用"""
+        kwargs = dict(self.kwargs)
+        if self.pass_results:
+            kwargs['upstream'] = upstream
+
+        attempt = 0
+        while True:
+            if self.task is not None:
+                self.task.mark_running()
+            try:
+                result = self.func(*self.args, **kwargs)
+            except Exception as e:
+                if self.task is not None:
+                    self.task.mark_failure(e)
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(calculate_backoff_time(attempt, base_delay=self.retry_delay))
+                attempt += 1
+                continue
+
+            if self.task is not None:
+                self.task.mark_success(result)
+            return result
+
+
+class DAG:
+    """有向无环图"""
+
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self.nodes: Dict[str, DAGNode] = {}
+        self.lock = threading.RLock()
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self.nodes
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def add_node(self, node: DAGNode) -> DAGNode:
+        """添加（或替换）节点，产生环时回滚并抛出ValueError"""
+        with self.lock:
+            previous = self.nodes.get(node.task_id)
+            self.nodes[node.task_id] = node
+            cycle = self.find_cycle()
+            if cycle:
+                if previous is None:
+                    del self.nodes[node.task_id]
+                else:
+                    self.nodes[node.task_id] = previous
+                raise ValueError(f"依赖存在环: {' -> '.join(cycle)}")
+            return node
+
+    def remove_node(self, task_id: str) -> bool:
+        """移除节点，有下游依赖时抛出ValueError"""
+        with self.lock:
+            if task_id not in self.nodes:
+                return False
+            dependents = self.dependents().get(task_id)
+            if dependents:
+                raise ValueError(f"任务 {task_id} 仍被依赖: {', '.join(sorted(dependents))}")
+            del self.nodes[task_id]
+            return True
+
+    def dependents(self) -> Dict[str, Set[str]]:
+        """反向邻接表：节点ID -> 直接下游节点ID集合"""
+        graph = {task_id: set() for task_id in self.nodes}
+        for node in self.nodes.values():
+            for dep in node.dependencies:
+                graph.setdefault(dep, set()).add(node.task_id)
+        return graph
+
+    def find_cycle(self) -> Optional[List[str]]:
+        """查找一个环，返回环上的节点路径（前者依赖后者）；无环返回None"""
+        WHITE, GRAY, BLACK = 0, 1, 2
+        color = {task_id: WHITE for task_id in self.nodes}
+
+        for root in self.nodes:
+            if color[root] != WHITE:
+                continue
+            color[root] = GRAY
+            stack = [(root, iter(self.nodes[root].dependencies))]
+            while stack:
+                current, deps = stack[-1]
+                for dep in deps:
+                    if dep not in self.nodes:
+                        continue
+                    if color[dep] == GRAY:
+                        path = [task_id for task_id, _ in stack]
+                        return path[path.index(dep):] + [dep]
+                    if color[dep] == WHITE:
+                        color[dep] = GRAY
+                        stack.append((dep, iter(self.nodes[dep].dependencies)))
+                        break
+                else:
+                    color[current] = BLACK
+                    stack.pop()
+        return None
+
+    def ancestors(self, targets: Iterable[str]) -> Set[str]:
+        """目标节点及其全部上游"""
+        seen = set()
+        queue = deque(targets)
+        while queue:
+            task_id = queue.popleft()
+            if task_id in seen:
+                continue
+            if task_id not in self.nodes:
+                raise ValueError(f"依赖任务不存在: {task_id}")
+            seen.add(task_id)
+            queue.extend(self.nodes[task_id].dependencies)
+        return seen
+
+    def descendants(self, sources: Iterable[str]) -> Set[str]:
+        """源节点及其全部下游"""
+        graph = self.dependents()
+        seen = set()
+        queue = deque(sources)
+        while queue:
+            task_id = queue.popleft()
+            if task_id in seen:
+                continue
+            seen.add(task_id)
+            queue.extend(graph.get(task_id, ()))
+        return seen
+
+    def topological_order(self, subset: Optional[Iterable[str]] = None) -> List[str]:
+        """拓扑排序（Kahn算法），存在环或缺失依赖时抛出ValueError"""
+        with self.lock:
+            selected = set(self.nodes) if subset is None else set(subset)
+            indegree = {task_id: 0 for task_id in selected}
+            graph: Dict[str, List[str]] = {task_id: [] for task_id in selected}
+            for task_id in selected:
+                for dep in self.nodes[task_id].dependencies:
+                    if dep not in self.nodes:
+                        raise ValueError(f"依赖任务不存在: {dep}")
+                    if dep in selected:
+                        indegree[task_id] += 1
+                        graph[dep].append(task_id)
+
+            queue = deque(sorted(t for t, d in indegree.items() if d == 0))
+            order = []
+            while queue:
+                task_id = queue.popleft()
+                order.append(task_id)
+                for child in graph[task_id]:
+                    indegree[child] -= 1
+                    if indegree[child] == 0:
+                        queue.append(child)
+
+            if len(order) != len(selected):
+                cycle = self.find_cycle()
+                raise ValueError(f"依赖存在环: {' -> '.join(cycle or sorted(selected - set(order)))}")
+            return order
+
+    def levels(self, subset: Optional[Iterable[str]] = None) -> List[List[str]]:
+        """按层分组，同一层的节点互不依赖，可并行执行"""
+        order = self.topological_order(subset)
+        selected = set(order)
+        depth: Dict[str, int] = {}
+        for task_id in order:
+            deps = [d for d in self.nodes[task_id].dependencies if d in selected]
+            depth[task_id] = max((depth[d] + 1 for d in deps), default=0)
+
+        result: List[List[str]] = []
+        for task_id in order:
+            while len(result) <= depth[task_id]:
+                result.append([])
+            result[depth[task_id]].append(task_id)
+        return [sorted(level) for level in result]
+
+
+class DAGRun:
+    """一次DAG运行的结果"""
+
+    def __init__(self, dag_name: str, nodes: Iterable[str], run_id: Optional[str] = None):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.dag_name = dag_name
+        self.states: Dict[str, str] = {task_id: 'pending' for task_id in nodes}
+        self.results: Dict[str, Any] = {}
+        self.errors: Dict[str, str] = {}
+        self.durations: Dict[str, float] = {}
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.status = 'pending'  # pending, running, success, failed
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status == 'success'
+
+    def failed_nodes(self) -> List[str]:
+        """失败的节点"""
+        return [t for t, state in self.states.items() if state == 'failed']
+
+    def skipped_nodes(self) -> List[str]:
+        """因上游失败被跳过的节点"""
+        return [t for t, state in self.states.items() if state == 'skipped']
+
+    def to_dict(self) -> dict:
+        return {
+            'run_id': self.run_id,
+            'dag_name': self.dag_name,
+            'status': self.status,
+            'states': dict(self.states),
+            'errors': dict(self.errors),
+            'durations': dict(self.durations),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class DAGRunner:
+    """DAG执行器：就绪节点提交到线程池并行执行"""
+
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+
+    def run(
+        self,
+        dag: DAG,
+        targets: Optional[Iterable[str]] = None,
+        previous: Optional[DAGRun] = None,
+        rerun_from: Optional[Iterable[str]] = None
+    ) -> DAGRun:
+        """
+        执行DAG
+
+        Args:
+            dag: 要执行的DAG
+            targets: 只执行这些节点及其上游，默认执行全部节点
+            previous: 上一次运行结果，提供时只重跑其中失败/跳过的节点
+            rerun_from: 与previous配合，强制从这些节点开始（含全部下游）重跑
+
+        Returns:
+            DAGRun
+        """
+        with dag.lock:
+            if targets is None:
+                selected = set(previous.states) if previous else set(dag.nodes)
+            else:
+                selected = dag.ancestors(targets)
+            order = dag.topological_order(selected)
+            nodes = {task_id: dag.nodes[task_id] for task_id in order}
+
+        run = DAGRun(dag.name, order)
+
+        # 局部重跑：复用上次成功节点的结果
+        if previous is not None:
+            forced = dag.descendants(rerun_from) if rerun_from else set()
+            for task_id in order:
+                if previous.states.get(task_id) == 'success' and task_id not in forced:
+                    run.states[task_id] = 'reused'
+                    run.results[task_id] = previous.results.get(task_id)
+
+        run.status = 'running'
+        run.started_at = datetime.now()
+
+        remaining = {
+            task_id: sum(1 for d in nodes[task_id].dependencies if d in nodes)
+            for task_id in order
+        }
+        children: Dict[str, List[str]] = {task_id: [] for task_id in order}
+        for task_id in order:
+            for dep in nodes[task_id].dependencies:
+                if dep in children:
+                    children[dep].append(task_id)
+
+        ready = deque()
+
+        def settle(task_id: str):
+            """节点结束（成功/复用/失败/跳过）后更新下游计数"""
+            for child in children[task_id]:
+                remaining[child] -= 1
+                if remaining[child] == 0:
+                    ready.append(child)
+
+        for task_id in order:
+            if remaining[task_id] == 0:
+                ready.append(task_id)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='dag-worker') as pool:
+            futures = {}
+            while ready or futures:
+                while ready:
+                    task_id = ready.popleft()
+                    node = nodes[task_id]
+                    deps = [d for d in node.dependencies if d in nodes]
+
+                    if run.states[task_id] == 'reused':
+                        settle(task_id)
+                        continue
+                    if any(run.states[d] not in ('success', 'reused') for d in deps):
+                        run.states[task_id] = 'skipped'
+                        run.errors[task_id] = '上游任务失败'
+                        settle(task_id)
+                        continue
+
+                    upstream = {d: run.results.get(d) for d in deps}
+                    run.states[task_id] = 'running'
+                    futures[pool.submit(self._execute, node, upstream)] = task_id
+
+                if not futures:
+                    break
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task_id = futures.pop(future)
+                    ok, value, duration = future.result()
+                    run.durations[task_id] = duration
+                    if ok:
+                        run.states[task_id] = 'success'
+                        run.results[task_id] = value
+                    else:
+                        run.states[task_id] = 'failed'
+                        run.errors[task_id] = value
+                    settle(task_id)
+
+        run.finished_at = datetime.now()
+        run.status = 'success' if all(
+            state in ('success', 'reused') for state in run.states.values()
+        ) else 'failed'
+        return run
+
+    def rerun(self, dag: DAG, previous: DAGRun, from_nodes: Optional[Iterable[str]] = None) -> DAGRun:
+        """从失败节点（或指定节点）开始局部重跑"""
+        return self.run(dag, previous=previous, rerun_from=from_nodes)
+
+    @staticmethod
+    def _execute(node: DAGNode, upstream: Dict[str, Any]):
+        started = time.time()
+        try:
+            result = node.execute(upstream)
+            return True, result, time.time() - started
+        except Exception as e:
+            return False, str(e), time.time() - started
@@ -0,0 +1,480 @@
+"""
+分布式调度：Broker + 租约领取 + 工作进程
+
+- 调度器只负责在触发时把任务发布到 Broker，工作进程领取后执行
+- 每次触发以 "task_id@触发时间戳" 作为 fire_id 入队，多个调度器重复发布同一次触发时只会入队一次
+- 工作进程领取任务时获得带期限的租约（可见性超时），执行期间定期续约；
+  进程崩溃后租约过期，任务重新可见并被其他工作进程领取
+- 确认/失败/续约都校验租约令牌，过期租约的迟到结果会被丢弃
+
+Broker 接口与存储无关，当前提供基于 SQLite（WAL）的本地实现；
+多主机部署时各主机运行 `python task_scheduler.py worker --broker <路径>` 即可。
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import sqlite3
+import argparse
+import threading
+import tempfile
+import subprocess
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+from .store import resolve_function
+from .utils import calculate_backoff_time
+
+# 未指定Broker时（use_redis=True 的回退）使用的本机共享队列
+DEFAULT_BROKER_PATH = os.path.join(tempfile.gettempdir(), 'task_scheduler_broker.db')
+
+# 工作进程入口（同目录模块使用相对导入，由主模块加载后运行 main）
+WORKER_ENTRY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'task_scheduler.py')
+
+
+class Lease:
+    """一次领取得到的任务租约"""
+
+    __slots__ = ('fire_id', 'task_id', 'func_ref', 'args', 'kwargs',
+                 'attempt', 'max_retries', 'token', 'expires_at')
+
+    def __init__(self, fire_id, task_id, func_ref, args, kwargs,
+                 attempt, max_retries, token, expires_at):
+        self.fire_id = fire_id
+        self.task_id = task_id
+        self.func_ref = func_ref
+        self.args = args
+        self.kwargs = kwargs
+        self.attempt = attempt
+        self.max_retries = max_retries
+        self.token = token
+        self.expires_at = expires_at
+
+
+class Broker(ABC):
+    """任务队列接口"""
+
+    @abstractmethod
+    def publish(
+        self,
+        fire_id: str,
+        task_id: str,
+        func_ref: str,
+        args: tuple = (),
+        kwargs: dict = None,
+        scheduled_time: Optional[float] = None,
+        max_retries: int = 3
+    ) -> bool:
+        """发布一次触发，fire_id已存在时返回False"""
+
+    @abstractmethod
+    def claim(self, worker_id: str, visibility_timeout: float = 30.0, limit: int = 1) -> List[Lease]:
+        """领取可执行的任务（含租约已过期的任务）"""
+
+    @abstractmethod
+    def heartbeat(self, lease: Lease, visibility_timeout: float = 30.0) -> bool:
+        """续约，租约已失效时返回False"""
+
+    @abstractmethod
+    def ack(self, lease: Lease, result: Any = None) -> bool:
+        """确认执行成功"""
+
+    @abstractmethod
+    def nack(self, lease: Lease, error: str, retry_delay: float = 0.0) -> bool:
+        """报告执行失败，未超过重试次数时延迟后重新可见"""
+
+    @abstractmethod
+    def get(self, fire_id: str) -> Optional[dict]:
+        """单次触发的记录，不存在时返回None"""
+
+    @abstractmethod
+    def stats(self, task_id: Optional[str] = None) -> Dict[str, int]:
+        """各状态的任务数"""
+
+    @abstractmethod
+    def purge(self, before: float) -> int:
+        """删除早于指定时间结束的任务"""
+
+    def close(self):
+        pass
+
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    fire_id TEXT PRIMARY KEY,
+    task_id TEXT NOT NULL,
+    func_ref TEXT NOT NULL,
+    args TEXT NOT NULL,
+    kwargs TEXT NOT NULL,
+    scheduled_time REAL,
+    status TEXT NOT NULL DEFAULT 'ready',
+    available_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_retries INTEGER NOT NULL DEFAULT 3,
+    lease_owner TEXT,
+    lease_token TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_queue_ready ON queue (status, available_at);
+CREATE INDEX IF NOT EXISTS idx_queue_lease ON queue (status, lease_expires);
+CREATE INDEX IF NOT EXISTS idx_queue_task ON queue (task_id, status);
+"""
+
+
+# 租约过期且已达最大重试次数时记录的错误
+LEASE_EXHAUSTED_ERROR = "租约过期且已达最大重试次数（工作进程可能已崩溃）"
+
+
+class SQLiteBroker(Broker):
+    """基于SQLite的本地Broker，可被同一主机（或共享存储）上的多个进程同时使用"""
+
+    def __init__(self, db_path: str = "broker.db"):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.executescript(QUEUE_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def publish(self, fire_id, task_id, func_ref, args=(), kwargs=None,
+                scheduled_time=None, max_retries=3) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO queue (fire_id, task_id, func_ref, args, kwargs, "
+                "scheduled_time, available_at, max_retries, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (fire_id, task_id, func_ref, json.dumps(list(args)), json.dumps(kwargs or {}),
+                 scheduled_time, now, max_retries, now)
+            )
+        return cursor.rowcount > 0
+
+    def claim(self, worker_id, visibility_timeout=30.0, limit=1) -> List[Lease]:
+        now = time.time()
+        expires = now + visibility_timeout
+        leases = []
+        with self._lock:
+            # IMMEDIATE 事务先拿写锁，保证多个进程不会领取到同一条任务
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 租约过期且重试次数已用完的任务（执行者多半已崩溃）直接判为失败，不再领取
+                self.conn.execute(
+                    "UPDATE queue SET status = 'failed', error = ?, finished_at = ?, lease_token = NULL "
+                    "WHERE status = 'leased' AND lease_expires <= ? AND attempts > max_retries",
+                    (LEASE_EXHAUSTED_ERROR, now, now)
+                )
+                rows = self.conn.execute(
+                    "SELECT * FROM queue WHERE status = 'ready' AND available_at <= ? "
+                    "ORDER BY available_at LIMIT ?",
+                    (now, limit)
+                ).fetchall()
+                if len(rows) < limit:
+                    rows += self.conn.execute(
+                        "SELECT * FROM queue WHERE status = 'leased' AND lease_expires <= ? "
+                        "ORDER BY lease_expires LIMIT ?",
+                        (now, limit - len(rows))
+                    ).fetchall()
+
+                for row in rows:
+                    token = uuid.uuid4().hex
+                    self.conn.execute(
+                        "UPDATE queue SET status = 'leased', lease_owner = ?, lease_token = ?, "
+                        "lease_expires = ?, attempts = attempts + 1 WHERE fire_id = ?",
+                        (worker_id, token, expires, row['fire_id'])
+                    )
+                    leases.append(Lease(
+                        fire_id=row['fire_id'],
+                        task_id=row['task_id'],
+                        func_ref=row['func_ref'],
+                        args=tuple(json.loads(row['args'])),
+                        kwargs=json.loads(row['kwargs']),
+                        attempt=row['attempts'] + 1,
+                        max_retries=row['max_retries'],
+                        token=token,
+                        expires_at=expires
+                    ))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return leases
+
+    def _update_leased(self, lease: Lease, sql: str, params: tuple) -> bool:
+        with self._lock:
+            cursor = self.conn.execute(
+                f"{sql} WHERE fire_id = ? AND lease_token = ? AND status = 'leased'",
+                params + (lease.fire_id, lease.token)
+            )
+        return cursor.rowcount > 0
+
+    def heartbeat(self, lease, visibility_timeout=30.0) -> bool:
+        expires = time.time() + visibility_timeout
+        if self._update_leased(lease, "UPDATE queue SET lease_expires = ?", (expires,)):
+            lease.expires_at = expires
+            return True
+        return False
+
+    def ack(self, lease, result=None) -> bool:
+        try:
+            encoded = json.dumps(result)
+        except (TypeError, ValueError):
+            encoded = json.dumps(str(result))
+        return self._update_leased(
+            lease,
+            "UPDATE queue SET status = 'done', result = ?, error = NULL, finished_at = ?",
+            (encoded, time.time())
+        )
+
+    def nack(self, lease, error, retry_delay=0.0) -> bool:
+        now = time.time()
+        if lease.attempt <= lease.max_retries:
+            return self._update_leased(
+                lease,
+                "UPDATE queue SET status = 'ready', available_at = ?, error = ?, lease_token = NULL",
+                (now + retry_delay, error)
+            )
+        return self._update_leased(
+            lease,
+            "UPDATE queue SET status = 'failed', error = ?, finished_at = ?",
+            (error, now)
+        )
+
+    def get(self, fire_id) -> Optional[dict]:
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM queue WHERE fire_id = ?", (fire_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_fires(self, task_id: str, limit: int = 100) -> List[dict]:
+        """某任务最近的触发记录"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM queue WHERE task_id = ? ORDER BY created_at DESC LIMIT ?",
+                (task_id, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self, task_id=None) -> Dict[str, int]:
+        sql = "SELECT status, COUNT(*) AS n FROM queue"
+        params: tuple = ()
+        if task_id is not None:
+            sql += " WHERE task_id = ?"
+            params = (task_id,)
+        sql += " GROUP BY status"
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        result = {'ready': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        result.update({row['status']: row['n'] for row in rows})
+        return result
+
+    def purge(self, before) -> int:
+        with self._lock:
+            cursor = self.conn.execute(
+                "DELETE FROM queue WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (before,)
+            )
+        return cursor.rowcount
+
+
+def create_broker(url) -> Broker:
+    """
+    根据URL创建Broker
+
+    - Broker实例：原样返回
+    - "sqlite:///path/to/broker.db" 或文件路径：SQLiteBroker
+    """
+    if isinstance(url, Broker):
+        return url
+    if url.startswith('redis://'):
+        raise ValueError("暂未提供Redis Broker实现，请使用SQLite Broker（文件路径）")
+    if url.startswith('sqlite:///'):
+        url = url[len('sqlite:///'):]
+    return SQLiteBroker(url)
+
+
+class Worker:
+    """工作进程主循环：领取 → 执行（定期续约）→ 确认/失败"""
+
+    def __init__(
+        self,
+        broker: Broker,
+        worker_id: Optional[str] = None,
+        visibility_timeout: float = 30.0,
+        poll_interval: float = 0.5,
+        retry_delay: float = 1.0
+    ):
+        self.broker = broker
+        self.worker_id = worker_id or f"{os.uname().nodename if hasattr(os, 'uname') else 'host'}-{os.getpid()}"
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.stop_event = threading.Event()
+        self.processed = 0
+        self._functions: Dict[str, Callable] = {}
+
+    def _resolve(self, func_ref: str) -> Callable:
+        func = self._functions.get(func_ref)
+        if func is None:
+            func = self._functions[func_ref] = resolve_function(func_ref)
+        return func
+
+    def execute(self, lease: Lease) -> bool:
+        """执行一条租约，返回是否成功确认"""
+        stop_heartbeat = threading.Event()
+
+        def keep_alive():
+            interval = max(self.visibility_timeout / 3, 0.05)
+            while not stop_heartbeat.wait(interval):
+                if not self.broker.heartbeat(lease, self.visibility_timeout):
+                    return
+
+        heartbeat = threading.Thread(target=keep_alive, daemon=True)
+        heartbeat.start()
+        try:
+            result = self._resolve(lease.func_ref)(*lease.args, **lease.kwargs)
+        except Exception as e:
+            stop_heartbeat.set()
+            heartbeat.join()
+            delay = calculate_backoff_time(lease.attempt - 1, base_delay=self.retry_delay)
+            self.broker.nack(lease, f"{type(e).__name__}: {e}", retry_delay=delay)
+            return False
+        stop_heartbeat.set()
+        heartbeat.join()
+        return self.broker.ack(lease, result)
+
+    def run_once(self) -> int:
+        """领取并执行一条任务，返回处理数量"""
+        leases = self.broker.claim(self.worker_id, self.visibility_timeout)
+        for lease in leases:
+            self.execute(lease)
+            self.processed += 1
+        return len(leases)
+
+    def run_forever(self, max_tasks: Optional[int] = None):
+        """持续运行直到stop()或处理完max_tasks条任务"""
+        while not self.stop_event.is_set():
+            if max_tasks is not None and self.processed >= max_tasks:
+                break
+            try:
+                handled = self.run_once()
+            except sqlite3.OperationalError as e:
+                print(f"Broker暂不可用: {e}")
+                handled = 0
+            if not handled:
+                self.stop_event.wait(self.poll_interval)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class WorkerProcessPool:
+    """在本机启动并管理N个工作进程"""
+
+    def __init__(
+        self,
+        broker_path: str,
+        visibility_timeout: float = 30.0,
+        poll_interval: float = 0.5
+    ):
+        self.broker_path = broker_path
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.processes: List[subprocess.Popen] = []
+
+    def _spawn(self) -> subprocess.Popen:
+        env = dict(os.environ)
+        # 工作进程需要能导入任务函数所在的模块
+        paths = [os.getcwd()] + [p for p in sys.path if p]
+        env['PYTHONPATH'] = os.pathsep.join(dict.fromkeys(paths))
+        return subprocess.Popen(
+            [
+                sys.executable, WORKER_ENTRY, 'worker',
+                '--broker', self.broker_path,
+                '--visibility-timeout', str(self.visibility_timeout),
+                '--poll-interval', str(self.poll_interval),
+            ],
+            env=env
+        )
+
+    def alive(self) -> int:
+        self.processes = [p for p in self.processes if p.poll() is None]
+        return len(self.processes)
+
+    def scale(self, count: int):
+        """调整工作进程数量"""
+        self.alive()
+        while len(self.processes) < count:
+            self.processes.append(self._spawn())
+        while len(self.processes) > count:
+            process = self.processes.pop()
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    def stop(self, timeout: float = 5.0):
+        """通知所有工作进程退出（正在执行的任务完成后退出）"""
+        for process in self.processes:
+            if process.poll() is None:
+                process.terminate()
+        deadline = time.time() + timeout
+        for process in self.processes:
+            try:
+                process.wait(timeout=max(deadline - time.time(), 0.1))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        self.processes = []
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Task Scheduler 分布式工作进程")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    worker_parser = sub.add_parser("worker", help="启动工作进程")
+    worker_parser.add_argument("--broker", required=True, help="SQLite Broker 路径")
+    worker_parser.add_argument("--worker-id", default=None)
+    worker_parser.add_argument("--visibility-timeout", type=float, default=30.0)
+    worker_parser.add_argument("--poll-interval", type=float, default=0.5)
+
+    stats_parser = sub.add_parser("stats", help="查看队列状态")
+    stats_parser.add_argument("--broker", required=True)
+    stats_parser.add_argument("--task-id", default=None)
+
+    args = parser.parse_args(argv)
+    broker = create_broker(args.broker)
+
+    if args.command == "stats":
+        print(json.dumps(broker.stats(args.task_id), ensure_ascii=False))
+        return
+
+    worker = Worker(
+        broker,
+        worker_id=args.worker_id,
+        visibility_timeout=args.visibility_timeout,
+        poll_interval=args.poll_interval
+    )
+    # SIGTERM：处理完当前任务后退出
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker.close()
+
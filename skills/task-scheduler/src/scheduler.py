@@ -3,10 +3,16 @@
 """
 
 import time
+import heapq
+import itertools
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from typing import Dict, List, Optional, Callable, Any
 from datetime import datetime
 
+from .utils import calculate_backoff_time
+
 
 # 由于循环导入问题，这些类在运行时动态获取
 Task = None
@@ -22,6 +28,21 @@ def set_task_classes(task_cls, cron_task_cls, interval_task_cls):
     IntervalTask = interval_task_cls
 
 
+class TaskRun:
+    """一次提交到执行器的任务运行"""
+
+    __slots__ = ('task', 'retry', 'future', 'started', 'finished', 'scheduled', 'attempt')
+
+    def __init__(self, task: Task, retry: bool, scheduled: Optional[float] = None):
+        self.task = task
+        self.retry = retry
+        self.future = None
+        self.started = time.time()
+        self.finished = False
+        self.scheduled = scheduled
+        self.attempt = task.retry_attempt
+
+
 def generate_task_id(func: Callable, *args, **kwargs) -> str:
     """生成任务ID"""
     import hashlib
@@ -49,9 +70,27 @@ def format_duration(seconds: float) -> str:
 
 
 class Scheduler:
-    """任务调度器"""
+    """任务调度器
+
+    调度线程只负责按截止时间出堆并提交任务，任务函数在线程池/进程池中执行；
+    失败重试以指数退避重新入堆，不会阻塞其他到期任务。
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        executor: str = 'thread',
+        max_concurrency: Optional[int] = None
+    ):
+        """
+        Args:
+            max_workers: 执行器池大小
+            executor: 'thread' 或 'process'（进程池要求任务函数可被pickle）
+            max_concurrency: 全局同时运行的任务数上限，默认等于max_workers
+        """
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"不支持的执行器类型: {executor}")
 
-    def __init__(self):
         self.tasks: Dict[str, Task] = {}
         self.running = False
         self.thread = None
@@ -59,6 +98,69 @@ class Scheduler:
         self.on_task_start = None
         self.on_task_success = None
         self.on_task_failure = None
+        # 运行结束监听器：listener(task, record)，用于持久化运行日志
+        self.run_listeners: List[Callable[[Task, dict], None]] = []
+
+        self.max_workers = max_workers
+        self.executor_type = executor
+        self.max_concurrency = max_concurrency or max_workers
+        self.executor = None
+
+        # 定时堆：(触发时间戳, 序号, task_id)，按 next_run_time 排序
+        # 移除/重排任务时不在堆中删除，而是通过 _entries 做惰性失效
+        self._heap: List[tuple] = []
+        self._entries: Dict[str, int] = {}
+        self._retrying = set()
+        self._counter = itertools.count()
+        self._wakeup = threading.Condition(self.lock)
+
+        # 运行中的任务与超时堆：(超时时间戳, 序号, TaskRun)
+        self._active: Dict[str, int] = {}
+        self._active_total = 0
+        self._timeouts: List[tuple] = []
+        # 因并发上限暂缓的任务（值为是否重试）：按任务上限阻塞 / 按全局上限排队
+        self._blocked: Dict[str, bool] = {}
+        self._queued: Dict[str, bool] = {}
+        self._waiting = deque()
+
+    def _push(self, task_id: str, deadline: float, retry: bool = False):
+        """压入定时堆（调用方需持有锁），O(log n)"""
+        seq = next(self._counter)
+        self._entries[task_id] = seq
+        if retry:
+            self._retrying.add(task_id)
+        else:
+            self._retrying.discard(task_id)
+        heapq.heappush(self._heap, (deadline, seq, task_id))
+
+        # 失效条目过多时重建堆，避免频繁增删后堆无限膨胀
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [
+                entry for entry in self._heap
+                if self._entries.get(entry[2]) == entry[1]
+            ]
+            heapq.heapify(self._heap)
+
+        # 新条目可能早于当前等待的截止时间，唤醒调度线程重新计算
+        if self._heap[0][1] == seq:
+            self._wakeup.notify()
+
+    def _schedule(self, task: Task):
+        """将任务按下次运行时间压入定时堆（调用方需持有锁）"""
+        if task.next_run_time is None:
+            self._entries.pop(task.task_id, None)
+            self._retrying.discard(task.task_id)
+            return
+        self._push(task.task_id, task.next_run_time.timestamp())
+
+    def reschedule(self, task_id: str) -> bool:
+        """任务的 next_run_time 被外部修改后重新排入定时堆"""
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if not task:
+                return False
+            self._schedule(task)
+            return True
 
     def add_task(
         self,
@@ -67,6 +169,7 @@ class Scheduler:
         """添加任务"""
         with self.lock:
             self.tasks[task.task_id] = task
+            self._schedule(task)
             return task.task_id
 
     def add_cron_task(
@@ -76,7 +179,10 @@ class Scheduler:
         args: tuple = (),
         kwargs: dict = None,
         max_retries: int = 3,
-        task_id: Optional[str] = None
+        task_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_concurrency: int = 1,
+        timezone: Optional[str] = None
     ) -> str:
         """添加Cron任务"""
         if not task_id:
@@ -88,7 +194,10 @@ class Scheduler:
             cron_expr=cron_expr,
             args=args,
             kwargs=kwargs,
-            max_retries=max_retries
+            max_retries=max_retries,
+            timeout=timeout,
+            max_concurrency=max_concurrency,
+            timezone=timezone
         )
 
         return self.add_task(task)
@@ -100,7 +209,9 @@ class Scheduler:
         args: tuple = (),
         kwargs: dict = None,
         max_retries: int = 3,
-        task_id: Optional[str] = None
+        task_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_concurrency: int = 1
     ) -> str:
         """添加间隔任务"""
         if not task_id:
@@ -112,7 +223,9 @@ class Scheduler:
             interval_seconds=interval_seconds,
             args=args,
             kwargs=kwargs,
-            max_retries=max_retries
+            max_retries=max_retries,
+            timeout=timeout,
+            max_concurrency=max_concurrency
         )
 
         return self.add_task(task)
@@ -122,6 +235,10 @@ class Scheduler:
         with self.lock:
             if task_id in self.tasks:
                 del self.tasks[task_id]
+                self._entries.pop(task_id, None)
+                self._retrying.discard(task_id)
+                self._blocked.pop(task_id, None)
+                self._queued.pop(task_id, None)
                 return True
             return False
 
@@ -141,66 +258,280 @@ class Scheduler:
             return
 
         self.running = True
+        self._get_executor()
         self.thread = threading.Thread(target=self._run_loop, daemon=True)
         self.thread.start()
 
-    def stop(self):
-        """停止调度器"""
-        self.running = False
+    def stop(self, wait: bool = True):
+        """停止调度器
+
+        Args:
+            wait: 是否等待执行器中正在运行的任务结束
+        """
+        with self.lock:
+            self.running = False
+            self._wakeup.notify_all()
         if self.thread:
             self.thread.join(timeout=5.0)
 
+        executor, self.executor = self.executor, None
+        if executor:
+            executor.shutdown(wait=wait)
+
+    def _get_executor(self):
+        """获取（必要时创建）执行器"""
+        if self.executor is None:
+            if self.executor_type == 'process':
+                self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='task-worker'
+                )
+        return self.executor
+
+    def next_deadline(self) -> Optional[float]:
+        """返回最近一个任务的触发时间戳，没有任务时返回None"""
+        with self.lock:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def _discard_stale(self):
+        """弹出堆顶已失效的条目（调用方需持有锁）"""
+        heap = self._heap
+        while heap and self._entries.get(heap[0][2]) != heap[0][1]:
+            heapq.heappop(heap)
+        timeouts = self._timeouts
+        while timeouts and timeouts[0][2].finished:
+            heapq.heappop(timeouts)
+
     def _run_loop(self):
-        """调度循环"""
+        """调度循环：睡眠到最近的截止时间（任务触发或运行超时），或被新任务唤醒"""
         while self.running:
             try:
+                with self.lock:
+                    self._discard_stale()
+                    deadlines = []
+                    if self._heap:
+                        deadlines.append(self._heap[0][0])
+                    if self._timeouts:
+                        deadlines.append(self._timeouts[0][0])
+                    timeout = min(deadlines) - time.time() if deadlines else None
+                    if timeout is None or timeout > 0:
+                        self._wakeup.wait(timeout)
+                        continue
+
                 self._check_and_run_tasks()
-                time.sleep(1)  # 每秒检查一次
             except Exception as e:
                 print(f"调度器错误: {e}")
 
+    def _pop_due_tasks(self, now: Optional[float] = None) -> List[tuple]:
+        """弹出所有已到期的任务（调用方需持有锁），返回 [(task, 是否重试)]"""
+        if now is None:
+            now = time.time()
+
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, seq, task_id = heapq.heappop(heap)
+            if self._entries.get(task_id) != seq:
+                continue
+            del self._entries[task_id]
+            retry = task_id in self._retrying
+            self._retrying.discard(task_id)
+            due.append((self.tasks[task_id], retry))
+        return due
+
+    def _pop_expired_runs(self, now: float) -> List[TaskRun]:
+        """弹出已超时且尚未结束的运行（调用方需持有锁）"""
+        expired = []
+        timeouts = self._timeouts
+        while timeouts and timeouts[0][0] <= now:
+            run = heapq.heappop(timeouts)[2]
+            if not run.finished:
+                run.finished = True
+                expired.append(run)
+        return expired
+
     def _check_and_run_tasks(self):
         """检查并运行任务"""
+        now = time.time()
         with self.lock:
-            tasks_to_run = [
-                task
-                for task in self.tasks.values()
-                if hasattr(task, 'should_run') and task.should_run()
-            ]
-
-        for task in tasks_to_run:
-            self._execute_task(task)
+            tasks_to_run = self._pop_due_tasks(now)
+            expired = self._pop_expired_runs(now)
+
+        for run in expired:
+            # 线程/进程无法被强制终止，这里只取消尚未开始的执行并按失败处理；
+            # 占用的并发名额在函数真正返回后才释放
+            run.future.cancel()
+            self._finish_run(
+                run, None,
+                TimeoutError(f"任务执行超时（{run.task.timeout}s）")
+            )
+
+        for task, retry in tasks_to_run:
+            self._execute_task(task, retry)
+
+    def _execute_task(self, task: Task, retry: bool = False):
+        """提交任务到执行器
+
+        超过任务或全局并发上限时暂缓，待有运行结束后重新入堆。
+        """
+        task_id = task.task_id
+        with self.lock:
+            if self.tasks.get(task_id) is not task:
+                return
+            if self._active.get(task_id, 0) >= task.max_concurrency:
+                self._blocked[task_id] = retry
+                return
+            if self._active_total >= self.max_concurrency:
+                self._queued[task_id] = retry
+                self._waiting.append(task_id)
+                return
+
+            self._active[task_id] = self._active.get(task_id, 0) + 1
+            self._active_total += 1
+
+            if not retry:
+                # 新的一次触发：重置重试计数，并立即排入下一个周期
+                task.retry_attempt = 0
+                task.scheduled_time = task.next_run_time
+                if getattr(task, 'missed_runs', None):
+                    # 补跑错过的触发：下一次立即执行，计划时间取下一个错过的触发时间
+                    task.next_run_time = task.missed_runs.pop(0)
+                    self._push(task_id, time.time())
+                else:
+                    if hasattr(task, 'after_run'):
+                        task.after_run()
+                    self._schedule(task)
+
+            task.mark_running()
+            scheduled = getattr(task, 'scheduled_time', None)
+            run = TaskRun(task, retry, scheduled.timestamp() if scheduled else None)
 
-    def _execute_task(self, task: Task):
-        """执行任务"""
         # 触发任务开始回调
         if self.on_task_start:
             self.on_task_start(task)
 
         try:
-            # 执行任务
-            result = task.run()
+            # 直接提交任务函数，进程池只需序列化函数本身及其参数
+            run.future = self._get_executor().submit(
+                task.func, *task.args, **task.kwargs
+            )
+        except Exception as e:
+            # 执行器已关闭或任务不可序列化
+            with self.lock:
+                run.finished = True
+                self._release(task_id)
+            self._finish_run(run, None, e, force=True)
+            return
 
-            # 更新状态
-            if hasattr(task, 'after_run'):
-                task.after_run()
+        if task.timeout:
+            with self.lock:
+                heapq.heappush(
+                    self._timeouts,
+                    (run.started + task.timeout, next(self._counter), run)
+                )
+                if self._timeouts[0][2] is run:
+                    self._wakeup.notify()
+
+        run.future.add_done_callback(lambda future: self._on_run_done(run, future))
+
+    def _release(self, task_id: str):
+        """释放并发名额，并把被阻塞的任务重新入堆（调用方需持有锁）"""
+        count = self._active.get(task_id, 0) - 1
+        if count > 0:
+            self._active[task_id] = count
+        else:
+            self._active.pop(task_id, None)
+        self._active_total -= 1
+
+        now = time.time()
+        if task_id in self._blocked:
+            self._push(task_id, now, self._blocked.pop(task_id))
+        while self._waiting:
+            waiting_id = self._waiting.popleft()
+            if waiting_id in self._queued:
+                self._push(waiting_id, now, self._queued.pop(waiting_id))
+                break
+
+    def _on_run_done(self, run: TaskRun, future):
+        """执行器回调：运行结束（成功、失败或已被取消）"""
+        with self.lock:
+            self._release(run.task.task_id)
+            if run.finished:
+                return
+            run.finished = True
+
+        try:
+            result, error = future.result(), None
+        except BaseException as e:
+            result, error = None, e
+        self._finish_run(run, result, error)
+
+    def _finish_run(self, run: TaskRun, result: Any, error: Optional[BaseException], force: bool = False):
+        """记录运行结果，失败时按指数退避重新入堆"""
+        task = run.task
+        self._notify_run(run, error)
+
+        if error is None:
+            task.mark_success(result)
+            with self.lock:
+                self._restore_schedule(task)
 
             # 触发成功回调
             if self.on_task_success:
                 self.on_task_success(task, result)
+            return
 
-        except Exception as e:
-            print(f"任务执行失败: {task.task_id}, 错误: {e}")
+        task.mark_failure(error)
+        print(f"任务执行失败: {task.task_id}, 错误: {error}")
+
+        # 检查是否需要重试
+        if task.should_retry() and not force:
+            delay = calculate_backoff_time(task.retry_attempt, base_delay=task.retry_delay)
+            task.retry_attempt += 1
+            print(f"任务 {task.task_id} 将在 {delay:.2f}s 后重试")
+            with self.lock:
+                if self.tasks.get(task.task_id) is task:
+                    self._push(task.task_id, time.time() + delay, retry=True)
+            return
 
-            # 检查是否需要重试
-            if task.should_retry():
-                print(f"任务 {task.task_id} 将在 {task.retry_delay}s 后重试")
-                time.sleep(task.retry_delay)
-                self._execute_task(task)
-            else:
-                # 触发失败回调
-                if self.on_task_failure:
-                    self.on_task_failure(task, e)
+        with self.lock:
+            self._restore_schedule(task)
+
+        # 触发失败回调
+        if self.on_task_failure:
+            self.on_task_failure(task, error)
+
+    def _notify_run(self, run: TaskRun, error: Optional[BaseException]):
+        """通知运行结束监听器"""
+        if not self.run_listeners:
+            return
+
+        finished = time.time()
+        record = {
+            'task_id': run.task.task_id,
+            'scheduled_time': run.scheduled,
+            'started_at': run.started,
+            'finished_at': finished,
+            'duration': finished - run.started,
+            'status': 'success' if error is None else 'failed',
+            'attempt': run.attempt,
+            'error': str(error) if error is not None else None,
+        }
+        for listener in self.run_listeners:
+            try:
+                listener(run.task, record)
+            except Exception as e:
+                print(f"运行记录监听器错误: {e}")
+
+    def _restore_schedule(self, task: Task):
+        """重试结束后恢复周期调度（调用方需持有锁）"""
+        task_id = task.task_id
+        if self.tasks.get(task_id) is task and task_id not in self._entries \
+                and task_id not in self._blocked and task_id not in self._queued:
+            self._schedule(task)
 
     def get_statistics(self) -> dict:
         """获取统计信息"""
@@ -213,6 +544,9 @@ class Scheduler:
             return {
                 'total_tasks': total_tasks,
                 'running_tasks': running_tasks,
+                'active_runs': self._active_total,
+                'blocked_tasks': len(self._blocked) + len(self._queued),
+                'pending_retries': len(self._retrying),
                 'total_runs': sum(t.run_count for t in self.tasks.values()),
                 'total_successes': success_tasks,
                 'total_failures': failure_tasks,
@@ -223,3 +557,9 @@ class Scheduler:
         """清空所有任务"""
         with self.lock:
             self.tasks.clear()
+            self._entries.clear()
+            self._retrying.clear()
+            self._blocked.clear()
+            self._queued.clear()
+            self._waiting.clear()
+            self._heap = []
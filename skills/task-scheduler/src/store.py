@@ -0,0 +1,283 @@
+"""
+持久化任务存储（SQLite / WAL）
+
+- jobs 表：任务定义与下次触发时间，重启后据此恢复调度
+- runs 表：只追加的运行日志（计划时间、开始/结束时间、耗时、结果、错误）
+- 运行日志按 (task_id, started_at)、(status, started_at)、(duration) 建索引
+"""
+
+import json
+import time
+import sqlite3
+import importlib
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    task_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    func_ref TEXT,
+    args TEXT,
+    kwargs TEXT,
+    cron_expr TEXT,
+    timezone TEXT,
+    interval_seconds REAL,
+    max_retries INTEGER NOT NULL DEFAULT 3,
+    retry_delay REAL NOT NULL DEFAULT 1.0,
+    timeout REAL,
+    max_concurrency INTEGER NOT NULL DEFAULT 1,
+    misfire_policy TEXT NOT NULL DEFAULT 'run_once',
+    next_run_time REAL,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL,
+    scheduled_time REAL,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    status TEXT NOT NULL,
+    attempt INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_runs_task_started ON runs (task_id, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_status_started ON runs (status, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_duration ON runs (duration);
+"""
+
+JOB_FIELDS = (
+    'task_id', 'kind', 'func_ref', 'args', 'kwargs', 'cron_expr', 'timezone',
+    'interval_seconds', 'max_retries', 'retry_delay', 'timeout', 'max_concurrency',
+    'misfire_policy', 'next_run_time', 'updated_at'
+)
+
+RUN_FIELDS = (
+    'id', 'task_id', 'scheduled_time', 'started_at', 'finished_at',
+    'duration', 'status', 'attempt', 'error'
+)
+
+
+def function_reference(func: Callable) -> Optional[str]:
+    """函数的导入路径（module:qualname），lambda/闭包等无法导入的返回None"""
+    module = getattr(func, '__module__', None)
+    qualname = getattr(func, '__qualname__', None)
+    if not module or not qualname or '<' in qualname:
+        return None
+    return f"{module}:{qualname}"
+
+
+def resolve_function(func_ref: str) -> Callable:
+    """按导入路径加载函数"""
+    module_name, _, qualname = func_ref.partition(':')
+    target: Any = importlib.import_module(module_name)
+    for part in qualname.split('.'):
+        target = getattr(target, part)
+    return target
+
+
+def _to_json(value: Any) -> Optional[str]:
+    try:
+        return json.dumps(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_timestamp(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+
+class JobStore:
+    """基于SQLite的任务存储"""
+
+    def __init__(self, db_path: str = "scheduler.db"):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    # 任务定义
+    def save_job(self, task, misfire_policy: Optional[str] = None):
+        """保存（或覆盖）任务定义"""
+        if hasattr(task, 'cron_expr'):
+            kind = 'cron'
+        elif hasattr(task, 'interval_seconds'):
+            kind = 'interval'
+        else:
+            kind = 'task'
+
+        row = {
+            'task_id': task.task_id,
+            'kind': kind,
+            'func_ref': function_reference(task.func),
+            'args': _to_json(list(task.args)),
+            'kwargs': _to_json(task.kwargs),
+            'cron_expr': getattr(task, 'cron_expr', None),
+            'timezone': getattr(task, 'timezone', None),
+            'interval_seconds': getattr(task, 'interval_seconds', None),
+            'max_retries': task.max_retries,
+            'retry_delay': task.retry_delay,
+            'timeout': task.timeout,
+            'max_concurrency': task.max_concurrency,
+            'misfire_policy': misfire_policy or getattr(task, 'misfire_policy', 'run_once'),
+            'next_run_time': _to_timestamp(task.next_run_time),
+            'updated_at': time.time(),
+        }
+        placeholders = ', '.join('?' for _ in JOB_FIELDS)
+        with self._lock:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(JOB_FIELDS)}) VALUES ({placeholders})",
+                [row[field] for field in JOB_FIELDS]
+            )
+
+    def update_next_run_time(self, task_id: str, next_run_time: Optional[datetime]):
+        with self._lock:
+            self.conn.execute(
+                "UPDATE jobs SET next_run_time = ?, updated_at = ? WHERE task_id = ?",
+                (_to_timestamp(next_run_time), time.time(), task_id)
+            )
+
+    def get_job(self, task_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE task_id = ?", (task_id,)).fetchone()
+        return self._job_dict(row) if row else None
+
+    def load_jobs(self) -> List[dict]:
+        with self._lock:
+            rows = self.conn.execute("SELECT * FROM jobs ORDER BY task_id").fetchall()
+        return [self._job_dict(row) for row in rows]
+
+    def delete_job(self, task_id: str) -> bool:
+        with self._lock:
+            cursor = self.conn.execute("DELETE FROM jobs WHERE task_id = ?", (task_id,))
+        return cursor.rowcount > 0
+
+    def clear_jobs(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM jobs")
+
+    @staticmethod
+    def _job_dict(row) -> dict:
+        job = dict(row)
+        job['args'] = tuple(json.loads(job['args'])) if job['args'] is not None else None
+        job['kwargs'] = json.loads(job['kwargs']) if job['kwargs'] is not None else None
+        return job
+
+    # 运行日志
+    def record_run(self, record: dict, next_run_time: Optional[datetime] = None):
+        """追加一条运行记录，并在同一事务中更新任务的下次触发时间"""
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.execute(
+                    "INSERT INTO runs (task_id, scheduled_time, started_at, finished_at, "
+                    "duration, status, attempt, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        record['task_id'], record.get('scheduled_time'),
+                        record['started_at'], record['finished_at'],
+                        record['duration'], record['status'],
+                        record.get('attempt', 0), record.get('error')
+                    )
+                )
+                if next_run_time is not None:
+                    self.conn.execute(
+                        "UPDATE jobs SET next_run_time = ?, updated_at = ? WHERE task_id = ?",
+                        (next_run_time.timestamp(), time.time(), record['task_id'])
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def query_runs(
+        self,
+        task_id: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        min_duration: Optional[float] = None,
+        order_by: str = 'started_at',
+        limit: int = 10
+    ) -> List[dict]:
+        """
+        按条件查询运行记录
+
+        Args:
+            task_id: 任务ID
+            status: 运行结果（success / failed）
+            since/until: 开始时间范围（时间戳）
+            min_duration: 最小耗时（秒）
+            order_by: 'started_at'（最近优先）或 'duration'（最慢优先）
+            limit: 返回条数
+        """
+        if order_by not in ('started_at', 'duration'):
+            raise ValueError(f"不支持的排序字段: {order_by}")
+
+        clauses, params = [], []
+        if task_id is not None:
+            clauses.append("task_id = ?")
+            params.append(task_id)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if since is not None:
+            clauses.append("started_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("started_at < ?")
+            params.append(until)
+        if min_duration is not None:
+            clauses.append("duration >= ?")
+            params.append(min_duration)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT * FROM runs {where} ORDER BY {order_by} DESC, id DESC LIMIT ?"
+        with self._lock:
+            rows = self.conn.execute(sql, params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def run_statistics(self, task_id: str, since: Optional[float] = None) -> dict:
+        """某任务的运行次数、失败次数与耗时统计"""
+        sql = (
+            "SELECT COUNT(*) AS runs, "
+            "SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) AS failures, "
+            "AVG(duration) AS avg_duration, MAX(duration) AS max_duration "
+            "FROM runs WHERE task_id = ?"
+        )
+        params: List[Any] = [task_id]
+        if since is not None:
+            sql += " AND started_at >= ?"
+            params.append(since)
+        with self._lock:
+            row = self.conn.execute(sql, params).fetchone()
+        return {
+            'runs': row['runs'],
+            'failures': row['failures'] or 0,
+            'avg_duration': row['avg_duration'] or 0.0,
+            'max_duration': row['max_duration'] or 0.0,
+        }
+
+    def prune_runs(self, before: float) -> int:
+        """删除早于指定时间的运行记录"""
+        with self._lock:
+            cursor = self.conn.execute("DELETE FROM runs WHERE started_at < ?", (before,))
+        return cursor.rowcount
+
+    def explain(self, sql: str, params: tuple = ()) -> List[str]:
+        """查询计划（用于确认历史查询命中索引）"""
+        with self._lock:
+            rows = self.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        return [row['detail'] for row in rows]
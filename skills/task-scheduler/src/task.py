@@ -3,9 +3,11 @@
 """
 
 import time
-from typing import Callable, Any, Optional, Dict
+from typing import Callable, Any, Optional, Dict, List
 from datetime import datetime
 
+from . import cron as cron_module
+
 
 def validate_task_function(func: Callable) -> bool:
     """验证任务函数是否有效"""
@@ -14,31 +16,7 @@ def validate_task_function(func: Callable) -> bool:
 
 def validate_cron_expression(cron_expr: str) -> bool:
     """验证Cron表达式是否有效"""
-    try:
-        parts = cron_expr.split()
-        if len(parts) != 5:
-            return False
-
-        # 检查每部分是否为*或数字
-        for part in parts:
-            if part != '*':
-                try:
-                    # 检查是否为数字或范围（如1-5）或列表（如1,3,5）
-                    if '-' in part:
-                        start, end = part.split('-')
-                        int(start)
-                        int(end)
-                    elif ',' in part:
-                        for item in part.split(','):
-                            int(item)
-                    else:
-                        int(part)
-                except ValueError:
-                    return False
-
-        return True
-    except Exception:
-        return False
+    return cron_module.is_valid_cron(cron_expr)
 
 
 def generate_task_id(func: Callable, *args, **kwargs) -> str:
@@ -69,7 +47,8 @@ class Task:
         kwargs: dict = None,
         max_retries: int = 3,
         retry_delay: float = 1.0,
-        timeout: Optional[float] = None
+        timeout: Optional[float] = None,
+        max_concurrency: int = 1
     ):
         self.task_id = task_id
         self.func = func
@@ -78,6 +57,11 @@ class Task:
         self.max_retries = max_retries
         self.retry_delay = retry_delay
         self.timeout = timeout
+        self.max_concurrency = max(1, max_concurrency)
+        self.retry_attempt = 0
+        self.misfire_policy = 'run_once'  # run_once, skip, catch_up
+        self.missed_runs: List[datetime] = []  # catch_up 策略下待补跑的各次触发时间
+        self.scheduled_time = None
         self.created_at = datetime.now()
         self.last_run_time = None
         self.next_run_time = None
@@ -92,29 +76,41 @@ class Task:
         if not validate_task_function(self.func):
             raise ValueError(f"Invalid task function: {self.func}")
 
-        self.status = 'running'
-        self.last_run_time = datetime.now()
-        self.run_count += 1
+        self.mark_running()
 
         try:
             result = self.func(*self.args, **self.kwargs)
-            self.status = 'success'
-            self.success_count += 1
-            self.last_error = None
+            self.mark_success(result)
             return result
         except Exception as e:
-            self.status = 'failed'
-            self.failure_count += 1
-            self.last_error = str(e)
+            self.mark_failure(e)
             raise
 
+    def mark_running(self):
+        """记录一次运行开始（由调度器在提交到执行器前调用）"""
+        self.status = 'running'
+        self.last_run_time = datetime.now()
+        self.run_count += 1
+
+    def mark_success(self, result: Any = None):
+        """记录一次运行成功"""
+        self.status = 'success'
+        self.success_count += 1
+        self.last_error = None
+
+    def mark_failure(self, error: BaseException):
+        """记录一次运行失败"""
+        self.status = 'failed'
+        self.failure_count += 1
+        self.last_error = str(error)
+
     def after_run(self):
         """运行后更新状态（可被子类重写）"""
         pass
 
     def should_retry(self) -> bool:
-        """判断是否应该重试"""
-        return self.failure_count < self.max_retries
+        """判断本次触发是否还应该重试"""
+        return self.retry_attempt < self.max_retries
 
     def to_dict(self) -> dict:
         """转换为字典"""
@@ -126,6 +122,8 @@ class Task:
             'max_retries': self.max_retries,
             'retry_delay': self.retry_delay,
             'timeout': self.timeout,
+            'max_concurrency': self.max_concurrency,
+            'retry_attempt': self.retry_attempt,
             'created_at': self.created_at.isoformat(),
             'last_run_time': self.last_run_time.isoformat() if self.last_run_time else None,
             'next_run_time': self.next_run_time.isoformat() if self.next_run_time else None,
@@ -148,41 +146,36 @@ class CronTask(Task):
         args: tuple = (),
         kwargs: dict = None,
         max_retries: int = 3,
-        retry_delay: float = 1.0
+        retry_delay: float = 1.0,
+        timeout: Optional[float] = None,
+        max_concurrency: int = 1,
+        timezone: Optional[str] = None
     ):
-        super().__init__(task_id, func, args, kwargs, max_retries, retry_delay)
+        super().__init__(
+            task_id, func, args, kwargs, max_retries, retry_delay,
+            timeout, max_concurrency
+        )
         self.cron_expr = cron_expr
+        self.timezone = timezone
 
-        if not validate_cron_expression(cron_expr):
+        try:
+            self.cron = cron_module.compile_cron(cron_expr, timezone)
+        except (ValueError, TypeError, AttributeError):
             raise ValueError(f"Invalid cron expression: {cron_expr}")
 
         # 计算下次运行时间
         self.update_next_run_time()
 
-    def update_next_run_time(self):
-        """更新下次运行时间"""
-        def calculate_next_run_time_simple(cron_expr, current_time=None):
-            """简化版的下次运行时间计算"""
-            from datetime import timedelta
-
-            if current_time is None:
-                current_time = datetime.now()
-
-            # 解析Cron表达式
-            parts = cron_expr.split()
-            minute = int(parts[0]) if parts[0] != '*' else current_time.minute
-            hour = int(parts[1]) if parts[1] != '*' else current_time.hour
+    def _now(self) -> datetime:
+        return datetime.now(self.cron.tz) if self.cron.tz else datetime.now()
 
-            # 构建下次运行时间
-            next_time = current_time.replace(minute=minute, hour=hour, second=0, microsecond=0)
-
-            # 如果已经过了这个时间，设置为明天
-            if next_time <= current_time:
-                next_time += timedelta(days=1)
-
-            return next_time
+    def update_next_run_time(self):
+        """更新下次运行时间（指定时区时为带时区的datetime）"""
+        self.next_run_time = self.cron.next(self._now())
 
-        self.next_run_time = calculate_next_run_time_simple(self.cron_expr)
+    def next_fire_times(self, n: int = 5, after: Optional[datetime] = None) -> List[datetime]:
+        """批量获取接下来n次触发时间"""
+        return self.cron.next_n(n, after or self._now())
 
     def should_run(self) -> bool:
         """判断是否应该运行"""
@@ -191,13 +184,20 @@ class CronTask(Task):
         if self.next_run_time is None:
             return False
 
-        return datetime.now() >= self.next_run_time
+        return self._now() >= self.next_run_time
 
     def after_run(self):
         """运行后更新状态"""
         super().after_run()
         self.update_next_run_time()
 
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        data = super().to_dict()
+        data['cron_expr'] = self.cron_expr
+        data['timezone'] = self.timezone
+        return data
+
 
 class IntervalTask(Task):
     """间隔任务"""
@@ -210,16 +210,36 @@ class IntervalTask(Task):
         args: tuple = (),
         kwargs: dict = None,
         max_retries: int = 3,
-        retry_delay: float = 1.0
+        retry_delay: float = 1.0,
+        timeout: Optional[float] = None,
+        max_concurrency: int = 1
     ):
-        super().__init__(task_id, func, args, kwargs, max_retries, retry_delay)
+        super().__init__(
+            task_id, func, args, kwargs, max_retries, retry_delay,
+            timeout, max_concurrency
+        )
         self.interval_seconds = interval_seconds
         self.update_next_run_time()
 
     def update_next_run_time(self):
-        """更新下次运行时间"""
+        """更新下次运行时间
+
+        按上一次计划时间固定步进，避免执行耗时导致的累积漂移；
+        若已错过多个周期则直接对齐到当前时间之后的下一个周期。
+        """
         from datetime import timedelta
-        self.next_run_time = datetime.now() + timedelta(seconds=self.interval_seconds)
+        now = datetime.now()
+        interval = timedelta(seconds=self.interval_seconds)
+
+        if self.next_run_time is None or self.interval_seconds <= 0:
+            self.next_run_time = now + interval
+            return
+
+        next_time = self.next_run_time + interval
+        if next_time <= now:
+            missed = (now - self.next_run_time) // interval
+            next_time = self.next_run_time + interval * (missed + 1)
+        self.next_run_time = next_time
 
     def should_run(self) -> bool:
         """判断是否应该运行"""
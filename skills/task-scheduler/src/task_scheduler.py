@@ -2,21 +2,54 @@
 Task Scheduler Optimizer - 主类
 """
 
-from typing import Dict, List, Optional, Callable, Any
+from typing import Dict, List, Optional, Callable, Any, Union
+from collections import OrderedDict
+from datetime import datetime, timedelta
 import os
-import importlib.util
+import json
+import math
+import sys
+import time
+import types
+import importlib
+
+# 同目录模块之间使用相对导入，统一从一个包里加载：
+# 作为包导入时（from src import TaskScheduler）就是所在的包；按文件路径加载或作为脚本运行时，
+# 登记一个私有包名指向本目录，不占用 cron/utils/store 等通用的顶层模块名
+src_dir = os.path.dirname(os.path.abspath(__file__))
 
-# 动态导入模块（避免相对导入问题）
-def load_module(name, file_path):
-    spec = importlib.util.spec_from_file_location(name, file_path)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
-    return module
 
-src_dir = os.path.dirname(os.path.abspath(__file__))
-utils_module = load_module("utils", os.path.join(src_dir, "utils.py"))
-task_module = load_module("task", os.path.join(src_dir, "task.py"))
-scheduler_module = load_module("scheduler", os.path.join(src_dir, "scheduler.py"))
+def _sibling_package() -> str:
+    if __package__:
+        return __package__
+    index = 0
+    while True:
+        name = '_task_scheduler' if index == 0 else f'_task_scheduler_{index}'
+        package = sys.modules.get(name)
+        if package is None:
+            package = types.ModuleType(name)
+            package.__path__ = [src_dir]
+            package.__package__ = name
+            sys.modules[name] = package
+            return name
+        if list(getattr(package, '__path__', [])) == [src_dir]:
+            return name
+        # 已被其他目录的同名包占用，不覆盖
+        index += 1
+
+
+def load_module(name):
+    """加载同目录模块（包内子模块，每个文件只执行一次）"""
+    return importlib.import_module(f"{_sibling_package()}.{name}")
+
+
+cron_module = load_module("cron")
+utils_module = load_module("utils")
+store_module = load_module("store")
+task_module = load_module("task")
+scheduler_module = load_module("scheduler")
+dependency_module = load_module("dependency")
+distributed_module = load_module("distributed")
 
 # 设置循环引用
 scheduler_module.set_task_classes(
@@ -29,6 +62,24 @@ Scheduler = scheduler_module.Scheduler
 Task = task_module.Task
 CronTask = task_module.CronTask
 IntervalTask = task_module.IntervalTask
+CronExpression = cron_module.CronExpression
+DAG = dependency_module.DAG
+DAGNode = dependency_module.DAGNode
+DAGRun = dependency_module.DAGRun
+DAGRunner = dependency_module.DAGRunner
+JobStore = store_module.JobStore
+Broker = distributed_module.Broker
+SQLiteBroker = distributed_module.SQLiteBroker
+Worker = distributed_module.Worker
+WorkerProcessPool = distributed_module.WorkerProcessPool
+
+# 错过触发时的处理策略：只补跑一次 / 跳过 / 逐次补跑
+MISFIRE_POLICIES = ('run_once', 'skip', 'catch_up')
+# catch_up 策略最多补跑的次数
+MAX_CATCH_UP = 100
+
+# 保留的DAG运行记录数（用于局部重跑）
+MAX_DAG_RUNS = 100
 validate_task_function = utils_module.validate_task_function
 validate_cron_expression = utils_module.validate_cron_expression
 format_duration = utils_module.format_duration
@@ -37,25 +88,67 @@ format_duration = utils_module.format_duration
 class TaskScheduler:
     """任务调度优化器"""
 
-    def __init__(self, use_redis: bool = False, redis_url: str = None):
+    def __init__(
+        self,
+        use_redis: bool = False,
+        redis_url: str = None,
+        max_workers: int = 8,
+        executor: str = 'thread',
+        max_concurrency: Optional[int] = None,
+        job_store: Union[str, JobStore, None] = None,
+        restore: bool = True,
+        broker: Union[str, Broker, None] = None
+    ):
         """
         初始化任务调度器
 
         Args:
-            use_redis: 是否使用Redis进行分布式调度
+            use_redis: 是否使用Redis作为分布式任务队列（暂未实现，分布式任务改用本机共享的SQLite Broker）
             redis_url: Redis连接URL
+            max_workers: 执行器池大小
+            executor: 执行器类型，'thread' 或 'process'
+            max_concurrency: 全局并发上限（默认等于max_workers）
+            job_store: SQLite任务存储路径（或JobStore实例），提供后持久化任务与运行日志
+            restore: 启动时从任务存储恢复可导入的任务
+            broker: 分布式任务队列（SQLite路径或Broker实例），提供后可使用add_distributed_task
         """
-        self.scheduler = Scheduler()
+        self.scheduler = Scheduler(
+            max_workers=max_workers,
+            executor=executor,
+            max_concurrency=max_concurrency
+        )
         self.use_redis = use_redis
         self.redis_url = redis_url
 
-        if use_redis:
-            print("警告: Redis分布式调度需要额外配置")
+        # 依赖图与DAG执行器
+        self.dag = DAG()
+        self.dag_runner = DAGRunner(max_workers=max_workers)
+        self.dag_runs: "OrderedDict[str, DAGRun]" = OrderedDict()
+
+        # 分布式任务队列与本机工作进程
+        self.broker = distributed_module.create_broker(broker) if broker else None
+        self._fallback_broker = None
+        if use_redis and not broker:
+            # Redis Broker尚未实现：保留构造行为，首次添加分布式任务时再创建本地SQLite Broker
+            self._fallback_broker = distributed_module.DEFAULT_BROKER_PATH
+            print(f"警告: 暂未提供Redis Broker实现，分布式任务将使用本地SQLite Broker: {self._fallback_broker}")
+        self.worker_pool = None
+        self.local_workers = 0
+
+        # 持久化任务存储
+        self.job_store = JobStore(job_store) if isinstance(job_store, str) else job_store
+        self.unresolved_jobs: List[str] = []
+        if self.job_store:
+            self.scheduler.run_listeners.append(self._record_run)
+            if restore:
+                self.restore_jobs()
 
     # 任务管理方法
     def add_task(self, task: Task) -> str:
         """添加任务"""
-        return self.scheduler.add_task(task)
+        task_id = self.scheduler.add_task(task)
+        self._persist(task_id)
+        return task_id
 
     def add_cron_task(
         self,
@@ -64,7 +157,11 @@ class TaskScheduler:
         cron_expr: str,
         args: tuple = (),
         kwargs: dict = None,
-        max_retries: int = 3
+        max_retries: int = 3,
+        timeout: Optional[float] = None,
+        max_concurrency: int = 1,
+        timezone: Optional[str] = None,
+        misfire_policy: str = 'run_once'
     ) -> str:
         """
         添加Cron定时任务
@@ -72,22 +169,33 @@ class TaskScheduler:
         Args:
             task_id: 任务ID
             func: 任务函数
-            cron_expr: Cron表达式（例如：0 2 * * * 表示每天2:00）
+            cron_expr: Cron表达式（例如：0 2 * * * 表示每天2:00，
+                */5 9-17 * * 1-5 表示工作日9-17点每5分钟），也支持@daily等宏
             args: 位置参数
             kwargs: 关键字参数
             max_retries: 最大重试次数
+            timeout: 单次运行超时秒数（超时按失败处理）
+            max_concurrency: 该任务同时运行的实例上限
+            timezone: 时区名称（如 Asia/Shanghai），默认使用本地时间
+            misfire_policy: 重启后错过触发的处理策略（run_once / skip / catch_up）
 
         Returns:
             任务ID
         """
-        return self.scheduler.add_cron_task(
+        self._check_misfire_policy(misfire_policy)
+        task_id = self.scheduler.add_cron_task(
             func=func,
             cron_expr=cron_expr,
             args=args,
             kwargs=kwargs,
             max_retries=max_retries,
-            task_id=task_id
+            task_id=task_id,
+            timeout=timeout,
+            max_concurrency=max_concurrency,
+            timezone=timezone
         )
+        self._persist(task_id, misfire_policy)
+        return task_id
 
     def add_interval_task(
         self,
@@ -96,7 +204,10 @@ class TaskScheduler:
         interval_seconds: float,
         args: tuple = (),
         kwargs: dict = None,
-        max_retries: int = 3
+        max_retries: int = 3,
+        timeout: Optional[float] = None,
+        max_concurrency: int = 1,
+        misfire_policy: str = 'run_once'
     ) -> str:
         """
         添加间隔任务
@@ -108,21 +219,32 @@ class TaskScheduler:
             args: 位置参数
             kwargs: 关键字参数
             max_retries: 最大重试次数
+            timeout: 单次运行超时秒数（超时按失败处理）
+            max_concurrency: 该任务同时运行的实例上限
+            misfire_policy: 重启后错过触发的处理策略（run_once / skip / catch_up）
 
         Returns:
             任务ID
         """
-        return self.scheduler.add_interval_task(
+        self._check_misfire_policy(misfire_policy)
+        task_id = self.scheduler.add_interval_task(
             func=func,
             interval_seconds=interval_seconds,
             args=args,
             kwargs=kwargs,
             max_retries=max_retries,
-            task_id=task_id
+            task_id=task_id,
+            timeout=timeout,
+            max_concurrency=max_concurrency
         )
+        self._persist(task_id, misfire_policy)
+        return task_id
 
     def remove_task(self, task_id: str) -> bool:
-        """移除任务"""
+        """移除任务（仍被其他任务依赖时抛出ValueError）"""
+        self.dag.remove_node(task_id)
+        if self.job_store:
+            self.job_store.delete_job(task_id)
         return self.scheduler.remove_task(task_id)
 
     def get_task(self, task_id: str) -> Optional[dict]:
@@ -136,14 +258,24 @@ class TaskScheduler:
         """列出所有任务"""
         return self.scheduler.list_tasks()
 
+    def get_next_run_times(self, task_id: str, count: int = 5) -> List[datetime]:
+        """获取Cron任务接下来count次触发时间"""
+        task = self.scheduler.get_task(task_id)
+        if not task or not hasattr(task, 'next_fire_times'):
+            return []
+        return task.next_fire_times(count)
+
     # 控制方法
     def start(self):
         """启动调度器"""
         self.scheduler.start()
+        self._scale_workers()
 
-    def stop(self):
+    def stop(self, wait: bool = True):
         """停止调度器"""
-        self.scheduler.stop()
+        self.scheduler.stop(wait=wait)
+        if self.worker_pool:
+            self.worker_pool.stop()
 
     def is_running(self) -> bool:
         """检查调度器是否在运行"""
@@ -170,6 +302,10 @@ class TaskScheduler:
     def clear_tasks(self):
         """清空所有任务"""
         self.scheduler.clear_tasks()
+        if self.job_store:
+            self.job_store.clear_jobs()
+        self.dag = DAG()
+        self.dag_runs.clear()
 
     # 高级功能
     def add_task_with_dependencies(
@@ -181,12 +317,15 @@ class TaskScheduler:
         interval_seconds: Optional[float] = None,
         args: tuple = (),
         kwargs: dict = None,
-        max_retries: int = 3
+        max_retries: int = 3,
+        pass_results: bool = False
     ) -> str:
         """
         添加带依赖的任务
 
-        注意：这是简化版，实际依赖管理需要更复杂的实现
+        任务作为节点加入依赖图（DAG）。提供cron_expr或interval_seconds时，
+        每次触发都会先并行执行其全部上游，再执行该任务；否则只在
+        run_dag() 中按依赖顺序执行。
 
         Args:
             task_id: 任务ID
@@ -196,106 +335,240 @@ class TaskScheduler:
             interval_seconds: 间隔秒数（可选）
             args: 位置参数
             kwargs: 关键字参数
-            max_retries: 最大重试次数
+            max_retries: 节点失败后的最大重试次数
+            pass_results: 为True时以 upstream={依赖ID: 结果} 关键字参数调用func
 
         Returns:
             任务ID
+
+        Raises:
+            ValueError: 依赖不存在或形成环
         """
-        # 检查依赖是否存在
+        # 检查依赖是否存在，普通任务首次被依赖时加入依赖图
         for dep_id in dependencies:
-            if not self.scheduler.get_task(dep_id):
+            if dep_id in self.dag:
+                continue
+            dep_task = self.scheduler.get_task(dep_id)
+            if not dep_task:
                 raise ValueError(f"依赖任务不存在: {dep_id}")
+            self.dag.add_node(DAGNode.from_task(dep_task))
+
+        node = DAGNode(
+            task_id=task_id,
+            func=func,
+            dependencies=dependencies,
+            args=args,
+            kwargs=kwargs,
+            max_retries=max_retries,
+            pass_results=pass_results
+        )
+        self.dag.add_node(node)
 
-        # 添加任务（依赖信息可以存储在task的元数据中）
+        # 节点内部负责重试，触发任务本身不再重试整个上游链
         if cron_expr:
-            task_id = self.add_cron_task(
+            return self.add_cron_task(
                 task_id=task_id,
-                func=func,
+                func=self._make_dag_trigger(task_id, func),
                 cron_expr=cron_expr,
-                args=args,
-                kwargs=kwargs,
-                max_retries=max_retries
+                max_retries=0
             )
-        elif interval_seconds:
-            task_id = self.add_interval_task(
+        if interval_seconds:
+            return self.add_interval_task(
                 task_id=task_id,
-                func=func,
+                func=self._make_dag_trigger(task_id, func),
                 interval_seconds=interval_seconds,
-                args=args,
-                kwargs=kwargs,
-                max_retries=max_retries
+                max_retries=0
             )
-        else:
-            raise ValueError("必须提供cron_expr或interval_seconds")
 
-        return task_id
+        task = Task(task_id=task_id, func=func, args=args, kwargs=kwargs, max_retries=max_retries)
+        node.task = task
+        return self.add_task(task)
+
+    def _make_dag_trigger(self, task_id: str, func: Callable) -> Callable:
+        """生成定时触发函数：运行目标节点及其上游"""
+        def trigger():
+            run = self.run_dag([task_id])
+            if not run.succeeded:
+                raise RuntimeError(f"依赖任务执行失败: {', '.join(run.failed_nodes())}")
+            return run.results.get(task_id)
+
+        trigger.__name__ = getattr(func, '__name__', task_id)
+        return trigger
+
+    def run_dag(self, targets: Optional[List[str]] = None) -> DAGRun:
+        """
+        立即执行依赖图
+
+        Args:
+            targets: 只执行这些任务及其上游，默认执行全部节点
+
+        Returns:
+            DAGRun（各节点状态、结果、错误和耗时）
+        """
+        return self._record_dag_run(self.dag_runner.run(self.dag, targets))
+
+    def rerun_dag(
+        self,
+        run: Union[str, DAGRun],
+        from_tasks: Optional[List[str]] = None
+    ) -> DAGRun:
+        """
+        局部重跑：复用上次成功节点的结果，只执行失败及被跳过的节点
+
+        Args:
+            run: 上次运行的DAGRun或run_id
+            from_tasks: 强制从这些任务（含全部下游）开始重跑
+
+        Returns:
+            新的DAGRun
+        """
+        previous = self.dag_runs.get(run) if isinstance(run, str) else run
+        if previous is None:
+            raise ValueError(f"DAG运行记录不存在: {run}")
+        return self._record_dag_run(self.dag_runner.rerun(self.dag, previous, from_tasks))
+
+    def _record_dag_run(self, run: DAGRun) -> DAGRun:
+        self.dag_runs[run.run_id] = run
+        while len(self.dag_runs) > MAX_DAG_RUNS:
+            self.dag_runs.popitem(last=False)
+        return run
+
+    def get_execution_plan(self, targets: Optional[List[str]] = None) -> List[List[str]]:
+        """按层返回执行计划，同一层内的任务可并行执行"""
+        subset = self.dag.ancestors(targets) if targets else None
+        return self.dag.levels(subset)
 
     def add_distributed_task(
         self,
         task_id: str,
         func: Callable,
-        cron_expr: str,
+        cron_expr: Optional[str] = None,
         args: tuple = (),
         kwargs: dict = None,
         max_retries: int = 3,
-        workers: int = 1
+        workers: int = 1,
+        interval_seconds: Optional[float] = None
     ) -> str:
         """
         添加分布式任务
 
-        注意：这是简化版，需要Redis或类似的分布式队列
+        本地调度器只在触发时把任务发布到Broker，由工作进程领取执行。
+        每次触发以 "task_id@触发时间" 去重，多个调度器添加同一任务时每次触发只入队一次
+        （间隔任务的触发时间按间隔对齐到整点倍数，保证各调度器一致）。
 
         Args:
             task_id: 任务ID
-            func: 任务函数
+            func: 任务函数（必须是可导入的模块级函数，参数可JSON序列化）
             cron_expr: Cron表达式
             args: 位置参数
             kwargs: 关键字参数
-            max_retries: 最大重试次数
-            workers: 工作节点数量
+            max_retries: 工作进程执行失败后的最大重试次数
+            workers: 本机启动的工作进程数量（0表示只依赖其他主机上的工作进程）
+            interval_seconds: 间隔秒数（与cron_expr二选一）
 
         Returns:
             任务ID
         """
-        if not self.use_redis:
-            raise ValueError("分布式任务需要启用Redis支持")
-
-        # 实际应用中，这里应该将任务添加到Redis队列
-        # 简化版仍然添加到本地调度器
-        task_id = self.add_cron_task(
-            task_id=task_id,
-            func=func,
-            cron_expr=cron_expr,
-            args=args,
-            kwargs=kwargs,
-            max_retries=max_retries
-        )
+        if not self.broker and self._fallback_broker:
+            self.broker = distributed_module.create_broker(self._fallback_broker)
+        if not self.broker:
+            raise ValueError("分布式任务需要配置broker（例如 broker='data/broker.db'）")
+
+        func_ref = store_module.function_reference(func)
+        if not func_ref:
+            raise ValueError(f"分布式任务函数必须可按模块路径导入: {func}")
+        try:
+            json.dumps([list(args), kwargs or {}])
+        except (TypeError, ValueError):
+            raise ValueError("分布式任务的参数必须可JSON序列化")
+
+        publisher = self._make_publisher(task_id, func, func_ref, args, kwargs or {}, max_retries)
+        if cron_expr:
+            task_id = self.add_cron_task(task_id=task_id, func=publisher, cron_expr=cron_expr)
+        elif interval_seconds:
+            task_id = self.add_interval_task(
+                task_id=task_id, func=publisher, interval_seconds=interval_seconds
+            )
+            # 对齐到间隔的整数倍，使不同调度器算出相同的触发时间
+            task = self.scheduler.get_task(task_id)
+            aligned = math.ceil(time.time() / interval_seconds) * interval_seconds
+            task.next_run_time = datetime.fromtimestamp(aligned)
+            self.scheduler.reschedule(task_id)
+        else:
+            raise ValueError("必须提供cron_expr或interval_seconds")
 
-        print(f"分布式任务 {task_id} 已添加（workers={workers}）")
+        self.local_workers = max(self.local_workers, workers)
+        if self.scheduler.running:
+            self._scale_workers()
         return task_id
 
+    def _make_publisher(self, task_id, func, func_ref, args, kwargs, max_retries) -> Callable:
+        """生成发布函数：把本次触发写入Broker"""
+        def publish():
+            task = self.scheduler.get_task(task_id)
+            scheduled = task.scheduled_time if task and task.scheduled_time else datetime.now()
+            scheduled_ts = scheduled.timestamp()
+            fire_id = f"{task_id}@{scheduled_ts:.3f}"
+            return self.broker.publish(
+                fire_id, task_id, func_ref, args, kwargs,
+                scheduled_time=scheduled_ts, max_retries=max_retries
+            )
+
+        publish.__name__ = getattr(func, '__name__', task_id)
+        return publish
+
+    def _scale_workers(self):
+        """按需要启动本机工作进程（仅SQLite Broker）"""
+        if not self.local_workers or not isinstance(self.broker, SQLiteBroker):
+            return
+        if self.worker_pool is None:
+            self.worker_pool = WorkerProcessPool(self.broker.db_path)
+        self.worker_pool.scale(self.local_workers)
+
+    def get_distributed_status(self, task_id: Optional[str] = None) -> dict:
+        """分布式队列中各状态的任务数"""
+        if not self.broker:
+            return {}
+        status = self.broker.stats(task_id)
+        status['local_workers'] = self.worker_pool.alive() if self.worker_pool else 0
+        return status
+
     def get_task_history(
         self,
         task_id: str,
-        limit: int = 10
+        limit: int = 10,
+        status: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
     ) -> List[dict]:
         """
-        获取任务执行历史
+        获取任务执行历史（最近优先）
 
-        注意：这是简化版，实际应用中需要持久化历史记录
+        未配置job_store时只能返回任务当前状态
 
         Args:
             task_id: 任务ID
             limit: 返回的记录数量
+            status: 按结果过滤（success / failed）
+            since/until: 开始时间范围
 
         Returns:
             执行历史列表
         """
+        if self.job_store:
+            runs = self.job_store.query_runs(
+                task_id=task_id,
+                status=status,
+                since=since.timestamp() if since else None,
+                until=until.timestamp() if until else None,
+                limit=limit
+            )
+            return [self._format_run(run) for run in runs]
+
         task = self.scheduler.get_task(task_id)
         if not task:
             return []
 
-        # 简化版只返回当前任务信息
         return [
             {
                 'run_time': task.last_run_time,
@@ -304,6 +577,164 @@ class TaskScheduler:
             }
         ]
 
+    def get_slow_runs(
+        self,
+        limit: int = 10,
+        task_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        min_duration: Optional[float] = None
+    ) -> List[dict]:
+        """按耗时从高到低返回运行记录（需要job_store）"""
+        if not self.job_store:
+            raise ValueError("查询运行历史需要配置job_store")
+        runs = self.job_store.query_runs(
+            task_id=task_id,
+            since=since.timestamp() if since else None,
+            min_duration=min_duration,
+            order_by='duration',
+            limit=limit
+        )
+        return [self._format_run(run) for run in runs]
+
+    @staticmethod
+    def _format_run(run: dict) -> dict:
+        return {
+            'run_time': datetime.fromtimestamp(run['started_at']),
+            'scheduled_time': datetime.fromtimestamp(run['scheduled_time']) if run['scheduled_time'] else None,
+            'finished_time': datetime.fromtimestamp(run['finished_at']),
+            'duration': run['duration'],
+            'status': run['status'],
+            'attempt': run['attempt'],
+            'error': run['error']
+        }
+
+    # 持久化
+    def _persist(self, task_id: str, misfire_policy: Optional[str] = None):
+        """保存任务定义；存储中已有同一调度的任务时沿用其触发时间并处理错过的触发"""
+        task = self.scheduler.get_task(task_id)
+        if misfire_policy is not None:
+            task.misfire_policy = misfire_policy
+        if not self.job_store:
+            return
+
+        stored = self.job_store.get_job(task_id)
+        if stored and self._same_schedule(stored, task):
+            self._apply_misfire(task, stored['next_run_time'])
+            self.scheduler.reschedule(task_id)
+        self.job_store.save_job(task)
+
+    @staticmethod
+    def _check_misfire_policy(misfire_policy: str):
+        """校验misfire策略（在任务加入调度器之前）"""
+        if misfire_policy not in MISFIRE_POLICIES:
+            raise ValueError(f"不支持的misfire策略: {misfire_policy}")
+
+    def _record_run(self, task: Task, record: dict):
+        """运行结束监听器：追加运行日志并更新下次触发时间"""
+        self.job_store.record_run(record, task.next_run_time)
+
+    @staticmethod
+    def _same_schedule(stored: dict, task: Task) -> bool:
+        return (
+            stored['cron_expr'] == getattr(task, 'cron_expr', None)
+            and stored['timezone'] == getattr(task, 'timezone', None)
+            and stored['interval_seconds'] == getattr(task, 'interval_seconds', None)
+        )
+
+    def _apply_misfire(self, task: Task, stored_next: Optional[float], now: Optional[float] = None):
+        """根据存储的下次触发时间和misfire策略设置任务的触发时间"""
+        if stored_next is None or task.next_run_time is None:
+            return
+        if now is None:
+            now = time.time()
+
+        tz = getattr(getattr(task, 'cron', None), 'tz', None)
+        stored_time = datetime.fromtimestamp(stored_next, tz) if tz else datetime.fromtimestamp(stored_next)
+
+        if stored_next > now:
+            task.next_run_time = stored_time
+            return
+        if task.misfire_policy == 'skip':
+            # 保留按当前时间计算出的下次触发时间
+            return
+        if task.misfire_policy == 'catch_up':
+            # 第一次错过的触发即 next_run_time，其余按时间顺序逐次补跑
+            task.missed_runs = self._missed_times(task, stored_time, now)[1:]
+        task.next_run_time = stored_time
+
+    @staticmethod
+    def _missed_times(task: Task, stored_time: datetime, now: float) -> List[datetime]:
+        """从stored_time到now之间错过的各次触发时间（至多MAX_CATCH_UP个）"""
+        if hasattr(task, 'interval_seconds') and task.interval_seconds > 0:
+            missed = int((now - stored_time.timestamp()) // task.interval_seconds) + 1
+            step = timedelta(seconds=task.interval_seconds)
+            return [stored_time + step * i for i in range(min(missed, MAX_CATCH_UP))]
+
+        times = [stored_time]
+        if hasattr(task, 'cron'):
+            for fire_time in task.cron.iter(stored_time):
+                if fire_time.timestamp() > now or len(times) >= MAX_CATCH_UP:
+                    break
+                times.append(fire_time)
+        return times
+
+    def restore_jobs(self, functions: Optional[Dict[str, Callable]] = None) -> List[str]:
+        """
+        从任务存储恢复任务
+
+        任务函数按 functions（task_id -> 函数）查找，否则按保存的导入路径加载；
+        无法恢复的任务保留在存储中并记录在 unresolved_jobs，
+        之后用相同task_id重新添加时会沿用其触发时间。
+
+        Returns:
+            恢复的任务ID列表
+        """
+        if not self.job_store:
+            return []
+
+        functions = functions or {}
+        restored, unresolved = [], []
+        for job in self.job_store.load_jobs():
+            task_id = job['task_id']
+            if self.scheduler.get_task(task_id):
+                continue
+
+            func = functions.get(task_id)
+            if func is None and job['func_ref'] and job['args'] is not None and job['kwargs'] is not None:
+                try:
+                    func = store_module.resolve_function(job['func_ref'])
+                except (ImportError, AttributeError):
+                    func = None
+            if func is None:
+                unresolved.append(task_id)
+                continue
+
+            common = dict(
+                task_id=task_id,
+                func=func,
+                args=job['args'] or (),
+                kwargs=job['kwargs'] or {},
+                max_retries=job['max_retries'],
+                retry_delay=job['retry_delay'],
+                timeout=job['timeout'],
+                max_concurrency=job['max_concurrency']
+            )
+            if job['kind'] == 'cron':
+                task = CronTask(cron_expr=job['cron_expr'], timezone=job['timezone'], **common)
+            elif job['kind'] == 'interval':
+                task = IntervalTask(interval_seconds=job['interval_seconds'], **common)
+            else:
+                task = Task(**common)
+
+            task.misfire_policy = job['misfire_policy']
+            self._apply_misfire(task, job['next_run_time'])
+            self.scheduler.add_task(task)
+            self.job_store.save_job(task)
+            restored.append(task_id)
+
+        self.unresolved_jobs = unresolved
+        return restored
+
     def get_failed_tasks(self) -> List[dict]:
         """获取所有失败的任务"""
         return [
@@ -323,3 +754,8 @@ class TaskScheduler:
                 task.status = 'pending'
                 task.last_error = None
                 print(f"任务 {task.task_id} 已重置为待执行状态")
+
+
+if __name__ == "__main__":
+    # 分布式工作进程入口：python task_scheduler.py worker --broker <路径>
+    distributed_module.main()
@@ -5,9 +5,11 @@
 import time
 import hashlib
 import json
-from typing import Any, Callable, Optional
+from typing import Any, Callable, List, Optional
 from datetime import datetime
 
+from . import cron as cron_module
+
 
 def generate_task_id(func: Callable, *args, **kwargs) -> str:
     """生成任务ID"""
@@ -54,22 +56,24 @@ def parse_cron_expression(cron_expr: str) -> dict:
 
 def calculate_next_run_time(
     cron_expr: str,
-    current_time: Optional[datetime] = None
+    current_time: Optional[datetime] = None,
+    timezone: Optional[str] = None
 ) -> datetime:
-    """计算下次运行时间（简化版）
+    """计算下次运行时间
 
-    完整版需要使用croniter库
+    使用内置Cron引擎（支持范围、步长、列表、名称、宏和时区）
     """
-    try:
-        from croniter import croniter
-        if current_time is None:
-            current_time = datetime.now()
-        cron = croniter(cron_expr, current_time)
-        return cron.get_next(datetime)
-    except ImportError:
-        # 如果没有croniter，使用简化计算
-        print("警告: croniter未安装，使用简化计算")
-        return calculate_next_run_time_simple(cron_expr, current_time)
+    return cron_module.compile_cron(cron_expr, timezone).next(current_time)
+
+
+def calculate_next_run_times(
+    cron_expr: str,
+    count: int,
+    current_time: Optional[datetime] = None,
+    timezone: Optional[str] = None
+) -> List[datetime]:
+    """批量计算接下来count次运行时间"""
+    return cron_module.compile_cron(cron_expr, timezone).next_n(count, current_time)
 
 
 def calculate_next_run_time_simple(
@@ -103,31 +107,7 @@ def validate_task_function(func: Callable) -> bool:
 
 def validate_cron_expression(cron_expr: str) -> bool:
     """验证Cron表达式是否有效"""
-    try:
-        parts = cron_expr.split()
-        if len(parts) != 5:
-            return False
-
-        # 检查每部分是否为*或数字
-        for part in parts:
-            if part != '*':
-                try:
-                    # 检查是否为数字或范围（如1-5）或列表（如1,3,5）
-                    if '-' in part:
-                        start, end = part.split('-')
-                        int(start)
-                        int(end)
-                    elif ',' in part:
-                        for item in part.split(','):
-                            int(item)
-                    else:
-                        int(part)
-                except ValueError:
-                    return False
-
-        return True
-    except Exception:
-        return False
+    return cron_module.is_valid_cron(cron_expr)
 
 
 def serialize_task(task: dict) -> str:
@@ -20,15 +20,17 @@ def load_module(name, file_path):
     return module
 
 src_dir = os.path.join(os.path.dirname(__file__), '..', 'src')
-utils_module = load_module("utils", os.path.join(src_dir, "utils.py"))
-task_module = load_module("task", os.path.join(src_dir, "task.py"))
-scheduler_module = load_module("scheduler", os.path.join(src_dir, "scheduler.py"))
 task_scheduler_module = load_module("task_scheduler", os.path.join(src_dir, "task_scheduler.py"))
+# 同目录模块由主模块按包加载（相对导入）
+utils_module = task_scheduler_module.utils_module
+task_module = task_scheduler_module.task_module
+scheduler_module = task_scheduler_module.scheduler_module
 
 TaskScheduler = task_scheduler_module.TaskScheduler
 CronTask = task_module.CronTask
 IntervalTask = task_module.IntervalTask
 Task = task_module.Task
+CronExpression = task_scheduler_module.CronExpression
 
 
 # 测试函数
@@ -99,6 +101,59 @@ def test_cron_task():
     print("✅ Cron任务测试通过")
 
 
+def test_cron_engine():
+    """测试Cron引擎（范围/步长/列表、日与周、时区与夏令时）"""
+    from datetime import datetime
+    from zoneinfo import ZoneInfo
+
+    # 工作日9-17点每5分钟：周五17:50之后是17:55，然后是下周一9:00
+    cron = CronExpression("*/5 9-17 * * 1-5")
+    assert cron.next_n(3, datetime(2026, 10, 16, 17, 50)) == [
+        datetime(2026, 10, 16, 17, 55),
+        datetime(2026, 10, 19, 9, 0),
+        datetime(2026, 10, 19, 9, 5),
+    ]
+
+    # 名称、列表与宏
+    assert CronExpression("0 0 1 JAN,JUL *").next(datetime(2026, 2, 1)) == datetime(2026, 7, 1)
+    assert CronExpression("@hourly").next(datetime(2026, 1, 1, 0, 0)) == datetime(2026, 1, 1, 1, 0)
+    # 日与周同时受限时取并集：13号或周五
+    assert CronExpression("0 0 13 * 5").next(datetime(2026, 10, 18)) == datetime(2026, 10, 23)
+
+    for expr in ["61 * * * *", "*/0 * * * *", "0 0 30 2 *", "* * *"]:
+        assert utils_module.validate_cron_expression(expr) is False
+    assert utils_module.validate_cron_expression("*/5 9-17 * * 1-5") is True
+
+    # 夏令时：跳过的2:30顺延到3:30；回拨的1:30只触发一次
+    ny = ZoneInfo("America/New_York")
+    spring = CronExpression("30 2 * * *", "America/New_York")
+    assert spring.next(datetime(2026, 3, 7, 12, tzinfo=ny)).isoformat() == "2026-03-08T03:30:00-04:00"
+    fall = CronExpression("30 1 * * *", "America/New_York")
+    fires = fall.next_n(2, datetime(2026, 10, 31, 12, tzinfo=ny))
+    assert [f.isoformat() for f in fires] == [
+        "2026-11-01T01:30:00-04:00", "2026-11-02T01:30:00-05:00"
+    ]
+    # 每小时都运行的任务在重复时段按真实时间连续触发
+    hourly = CronExpression("0 * * * *", "America/New_York")
+    fires = hourly.next_n(3, datetime(2026, 11, 1, 0, 30, tzinfo=ny))
+    gaps = [(b.timestamp() - a.timestamp()) for a, b in zip(fires, fires[1:])]
+    assert gaps == [3600, 3600]
+
+    # 接入调度器
+    scheduler = TaskScheduler()
+    scheduler.add_cron_task(
+        task_id="workday",
+        func=simple_task,
+        cron_expr="*/5 9-17 * * 1-5",
+        timezone="Asia/Shanghai"
+    )
+    upcoming = scheduler.get_next_run_times("workday", 10)
+    assert len(upcoming) == 10
+    assert all(t.weekday() < 5 and 9 <= t.hour <= 17 and t.minute % 5 == 0 for t in upcoming)
+
+    print("✅ Cron引擎测试通过")
+
+
 def test_interval_task():
     """测试间隔任务"""
     interval_task = IntervalTask(
@@ -176,6 +231,48 @@ def test_scheduler_run():
     print("✅ 调度器运行测试通过")
 
 
+def test_heap_scheduling():
+    """测试定时堆调度（亚秒级精度、惰性删除）"""
+    scheduler = TaskScheduler()
+    inner = scheduler.scheduler
+
+    # 大量任务只入堆，不需要轮询
+    for i in range(1000):
+        scheduler.add_interval_task(
+            task_id=f"bulk_{i}",
+            func=simple_task,
+            interval_seconds=3600 + i
+        )
+    for i in range(0, 1000, 2):
+        scheduler.remove_task(f"bulk_{i}")
+    assert len(inner.tasks) == 500
+    assert inner.next_deadline() is not None
+
+    fired = []
+    scheduler.add_interval_task(
+        task_id="fast",
+        func=lambda: fired.append(time.time()),
+        interval_seconds=0.05
+    )
+
+    scheduler.start()
+    time.sleep(0.6)
+    scheduler.stop()
+
+    # 50ms 间隔在 0.6s 内应执行多次，且不会被1秒轮询拖慢
+    assert len(fired) >= 5
+    gaps = [b - a for a, b in zip(fired, fired[1:])]
+    assert max(gaps) < 0.5
+
+    # 固定步进：下一次时间基于计划时间而非完成时间
+    task = IntervalTask(task_id="drift", func=simple_task, interval_seconds=0.5)
+    planned = task.next_run_time
+    task.after_run()
+    assert (task.next_run_time - planned).total_seconds() == 0.5
+
+    print("✅ 定时堆调度测试通过")
+
+
 def test_task_retry():
     """测试任务重试"""
     scheduler = TaskScheduler()
@@ -204,6 +301,76 @@ def test_task_retry():
     print("✅ 任务重试测试通过")
 
 
+def test_worker_pool_execution():
+    """测试执行器池：慢任务不阻塞、非阻塞重试、并发上限与超时"""
+    scheduler = TaskScheduler(max_workers=4)
+
+    fast_runs = []
+    scheduler.add_interval_task(
+        task_id="slow",
+        func=time.sleep,
+        args=(1.0,),
+        interval_seconds=0.05
+    )
+    scheduler.add_interval_task(
+        task_id="fast",
+        func=lambda: fast_runs.append(time.time()),
+        interval_seconds=0.05
+    )
+
+    attempts = []
+    def flaky():
+        attempts.append(time.time())
+        if len(attempts) < 3:
+            raise Exception("flaky")
+        return "ok"
+
+    flaky_task = IntervalTask(
+        task_id="flaky",
+        func=flaky,
+        interval_seconds=0.05,
+        max_retries=3,
+        retry_delay=0.05
+    )
+    scheduler.add_task(flaky_task)
+
+    hung = IntervalTask(
+        task_id="hung",
+        func=time.sleep,
+        args=(0.6,),
+        interval_seconds=0.05,
+        max_retries=0,
+        timeout=0.1
+    )
+    scheduler.add_task(hung)
+
+    timeouts = []
+    scheduler.on_task_failure(lambda task, error: timeouts.append(task.task_id))
+
+    scheduler.start()
+    time.sleep(0.5)
+    stats = scheduler.get_statistics()
+    scheduler.stop(wait=False)
+
+    # 慢任务在执行器中运行，快任务照常触发
+    assert len(fast_runs) >= 5
+    # 每个任务默认最多1个实例同时运行
+    assert scheduler.scheduler.get_task("slow").run_count == 1
+    assert stats['active_runs'] <= 4
+
+    # 重试按指数退避重新入堆：0.05s、0.1s
+    assert len(attempts) >= 3
+    assert attempts[1] - attempts[0] >= 0.04
+    assert attempts[2] - attempts[1] >= 0.09
+    assert flaky_task.success_count >= 1
+
+    # 超时按失败处理
+    assert "hung" in timeouts
+    assert "超时" in hung.last_error
+
+    print("✅ 执行器池测试通过")
+
+
 def test_statistics():
     """测试统计信息"""
     scheduler = TaskScheduler()
@@ -269,15 +436,299 @@ def test_task_with_dependencies():
     print("✅ 带依赖的任务测试通过")
 
 
+def test_dag_execution():
+    """测试DAG执行：拓扑顺序、并行分支、结果传递、环检测与局部重跑"""
+    scheduler = TaskScheduler(max_workers=4)
+
+    calls = []
+    flaky_state = {'fail': True}
+
+    def extract():
+        calls.append("extract")
+        return [1, 2, 3]
+
+    def transform_a(upstream):
+        time.sleep(0.3)
+        calls.append("transform_a")
+        return sum(upstream["extract"])
+
+    def transform_b(upstream):
+        time.sleep(0.3)
+        calls.append("transform_b")
+        if flaky_state['fail']:
+            raise Exception("source unavailable")
+        return max(upstream["extract"])
+
+    def load(upstream):
+        calls.append("load")
+        return upstream["transform_a"] + upstream["transform_b"]
+
+    scheduler.add_task_with_dependencies("extract", extract, [])
+    scheduler.add_task_with_dependencies("transform_a", transform_a, ["extract"], pass_results=True, max_retries=0)
+    scheduler.add_task_with_dependencies("transform_b", transform_b, ["extract"], pass_results=True, max_retries=0)
+    scheduler.add_task_with_dependencies("load", load, ["transform_a", "transform_b"], pass_results=True)
+
+    assert scheduler.get_execution_plan() == [["extract"], ["transform_a", "transform_b"], ["load"]]
+
+    # 环检测：不允许 extract 依赖 load
+    try:
+        scheduler.add_task_with_dependencies("extract", extract, ["load"])
+        assert False, "应检测到环"
+    except ValueError as e:
+        assert "环" in str(e)
+    assert scheduler.get_execution_plan()[0] == ["extract"]
+
+    # 两个转换分支并行执行，失败时下游被跳过
+    started = time.time()
+    run = scheduler.run_dag()
+    assert time.time() - started < 0.55
+    assert run.status == "failed"
+    assert run.states["transform_a"] == "success"
+    assert run.failed_nodes() == ["transform_b"]
+    assert run.skipped_nodes() == ["load"]
+
+    # 从失败节点局部重跑，已成功的节点不再执行
+    flaky_state['fail'] = False
+    calls.clear()
+    rerun = scheduler.rerun_dag(run.run_id)
+    assert rerun.succeeded
+    assert sorted(calls) == ["load", "transform_b"]
+    assert rerun.results["load"] == 6 + 3
+
+    # 指定目标只执行其上游
+    calls.clear()
+    partial = scheduler.run_dag(["transform_a"])
+    assert sorted(calls) == ["extract", "transform_a"]
+    assert partial.succeeded
+
+    # 被依赖的任务不能直接移除
+    try:
+        scheduler.remove_task("extract")
+        assert False, "应拒绝移除被依赖的任务"
+    except ValueError as e:
+        assert "依赖" in str(e)
+
+    print("✅ DAG执行测试通过")
+
+
+def test_job_store_persistence():
+    """测试持久化任务存储：运行日志、重启恢复与misfire策略"""
+    import tempfile
+    from datetime import datetime, timedelta
+
+    db_path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+    scheduler = TaskScheduler(job_store=db_path)
+
+    ticks = []
+    def tick():
+        ticks.append(time.time())
+        if len(ticks) == 2:
+            raise Exception("boom")
+
+    scheduler.add_interval_task("tick", tick, interval_seconds=0.1, max_retries=0)
+    scheduler.add_interval_task("hourly", time.time, interval_seconds=3600, misfire_policy="catch_up")
+    scheduler.add_cron_task("nightly", time.time, cron_expr="0 3 * * *", misfire_policy="skip")
+
+    scheduler.start()
+    time.sleep(0.55)
+    scheduler.stop()
+
+    history = scheduler.get_task_history("tick", limit=3)
+    assert len(history) == 3
+    assert history[0]['run_time'] >= history[1]['run_time']
+    assert all(h['duration'] >= 0 for h in history)
+    failed = scheduler.get_task_history("tick", status="failed")
+    assert len(failed) == 1 and failed[0]['error'] == "boom"
+    assert len(scheduler.get_slow_runs(limit=2)) == 2
+
+    # 历史查询命中索引
+    plan = scheduler.job_store.explain(
+        "SELECT * FROM runs WHERE task_id = ? ORDER BY started_at DESC LIMIT 10", ("tick",)
+    )
+    assert any("idx_runs_task_started" in line for line in plan)
+
+    # 模拟停机：hourly 错过了3个多小时，nightly 错过了一次
+    store = scheduler.job_store
+    now = datetime.now()
+    store.update_next_run_time("hourly", now - timedelta(hours=3, seconds=10))
+    store.update_next_run_time("nightly", now - timedelta(days=1))
+    planned_tick = now + timedelta(minutes=5)
+    store.update_next_run_time("tick", planned_tick)
+
+    restarted = TaskScheduler(job_store=db_path)
+    # 闭包函数无法按导入路径恢复，保留在存储中等待重新添加
+    assert restarted.unresolved_jobs == ["tick"]
+
+    hourly = restarted.scheduler.get_task("hourly")
+    assert len(hourly.missed_runs) == 3
+    assert hourly.next_run_time < now
+
+    nightly = restarted.scheduler.get_task("nightly")
+    assert nightly.next_run_time > now
+    assert nightly.missed_runs == []
+
+    # 不支持的misfire策略在加入调度器之前就报错
+    try:
+        restarted.add_interval_task("bad_policy", time.time, interval_seconds=60, misfire_policy="later")
+        assert False, "应该拒绝不支持的misfire策略"
+    except ValueError:
+        pass
+    assert restarted.scheduler.get_task("bad_policy") is None
+
+    # 以相同ID和调度重新添加时沿用存储中的触发时间
+    restarted.add_interval_task("tick", tick, interval_seconds=0.1)
+    restored_tick = restarted.scheduler.get_task("tick")
+    assert abs((restored_tick.next_run_time - planned_tick).total_seconds()) < 0.001
+
+    # 运行日志在重启后仍可查询
+    assert len(restarted.get_task_history("tick", limit=100)) >= 3
+
+    # 逐次补跑时每次运行记录各自错过的触发时间
+    restarted.start()
+    deadline = time.time() + 5
+    while len(restarted.get_task_history("hourly", limit=10)) < 4 and time.time() < deadline:
+        time.sleep(0.05)
+    restarted.stop()
+    slots = sorted(h['scheduled_time'] for h in restarted.get_task_history("hourly", limit=10))
+    assert len(slots) == 4
+    assert all(abs((b - a).total_seconds() - 3600) < 0.001 for a, b in zip(slots, slots[1:]))
+
+    print("✅ 持久化任务存储测试通过")
+
+
+def test_distributed_queue():
+    """测试分布式队列：去重发布、租约与可见性超时、工作进程执行"""
+    import tempfile
+
+    broker_path = os.path.join(tempfile.mkdtemp(), "broker.db")
+    broker = task_scheduler_module.SQLiteBroker(broker_path)
+    Worker = task_scheduler_module.Worker
+
+    # 同一次触发重复发布只入队一次
+    assert broker.publish("job@1", "job", "time:time") is True
+    assert broker.publish("job@1", "job", "time:time") is False
+
+    # 领取后在可见性超时内对其他工作进程不可见
+    lease = broker.claim("w1", visibility_timeout=0.2)[0]
+    assert broker.claim("w2", visibility_timeout=0.2) == []
+
+    # 租约过期后被重新领取，旧租约的迟到确认被拒绝
+    time.sleep(0.25)
+    new_lease = broker.claim("w2", visibility_timeout=5)[0]
+    assert new_lease.attempt == 2
+    assert broker.ack(lease, "late") is False
+    assert broker.ack(new_lease, 1.0) is True
+    assert broker.get("job@1")['status'] == "done"
+
+    # 执行失败按重试次数重新入队，用尽后标记失败
+    broker.publish("bad@1", "bad", "os:rmdir", args=("/nonexistent/dir",), max_retries=1)
+    worker = Worker(broker, "w3", retry_delay=0)
+    assert worker.run_once() == 1
+    assert broker.get("bad@1")['status'] == "ready"
+    assert worker.run_once() == 1
+    bad = broker.get("bad@1")
+    assert bad['status'] == "failed" and "FileNotFoundError" in bad['error']
+
+    # 工作进程崩溃（租约一直过期）时同样受重试次数限制
+    broker.publish("crash@1", "crash", "time:time", max_retries=1)
+    assert broker.claim("w4", visibility_timeout=0.05)[0].attempt == 1
+    time.sleep(0.1)
+    assert broker.claim("w4", visibility_timeout=0.05)[0].attempt == 2
+    time.sleep(0.1)
+    assert broker.claim("w4", visibility_timeout=0.05) == []
+    assert broker.get("crash@1")['status'] == "failed"
+
+    # Redis队列尚未实现：显式的redis://地址报错；use_redis 只警告，分布式任务回退为本地SQLite Broker
+    try:
+        TaskScheduler(broker="redis://localhost:6379/0")
+        assert False, "redis:// Broker 应该报错"
+    except ValueError:
+        pass
+    fallback = TaskScheduler(use_redis=True)
+    assert fallback.broker is None
+    assert fallback._fallback_broker == task_scheduler_module.distributed_module.DEFAULT_BROKER_PATH
+
+    # Broker 是抽象接口
+    try:
+        task_scheduler_module.Broker()
+        assert False, "Broker 不应可直接实例化"
+    except TypeError:
+        pass
+
+    # 两个调度器发布同一任务，本机2个工作进程执行，每次触发只执行一次
+    leader = TaskScheduler(broker=broker_path)
+    follower = TaskScheduler(broker=broker_path)
+    leader.add_distributed_task("beat", time.time, interval_seconds=0.2, workers=2)
+    follower.add_distributed_task("beat", time.time, interval_seconds=0.2, workers=0)
+
+    leader.start()
+    follower.start()
+    time.sleep(1.5)
+    # 先停止两边的发布，工作进程继续处理剩余任务
+    follower.stop()
+    leader.scheduler.stop()
+    deadline = time.time() + 5
+    while broker.stats("beat")['ready'] + broker.stats("beat")['leased'] and time.time() < deadline:
+        time.sleep(0.1)
+    status = leader.get_distributed_status("beat")
+    leader.stop()
+
+    fires = broker.list_fires("beat")
+    published = (
+        leader.scheduler.get_task("beat").run_count
+        + follower.scheduler.get_task("beat").run_count
+    )
+    assert status['local_workers'] == 2
+    assert 4 <= len(fires) <= 10
+    # 两个调度器都发布了，但每次触发只入队、执行一次
+    assert published > len(fires)
+    assert status['done'] == len(fires)
+    assert all(f['attempts'] == 1 for f in fires)
+
+    print("✅ 分布式队列测试通过")
+
+
+def test_module_isolation():
+    """测试加载调度器不会替换宿主程序的同名模块"""
+    import types
+
+    names = ("cron", "utils", "store", "task", "scheduler", "dependency", "distributed")
+    saved = {name: sys.modules.get(name) for name in names}
+    sentinels = {name: types.ModuleType(name) for name in names}
+    sys.modules.update(sentinels)
+    try:
+        probe = load_module("task_scheduler_probe", os.path.join(src_dir, "task_scheduler.py"))
+        for name in names:
+            assert sys.modules[name] is sentinels[name], f"{name} 被替换"
+        # 同目录模块只加载一次，再次加载复用同一份
+        assert probe.utils_module is utils_module
+        assert probe.TaskScheduler is not None
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+    print("✅ 模块隔离测试通过")
+
+
 if __name__ == "__main__":
     test_utils_functions()
     test_task_creation()
     test_cron_task()
+    test_cron_engine()
     test_interval_task()
     test_scheduler_basic()
     test_scheduler_run()
+    test_heap_scheduling()
     test_task_retry()
+    test_worker_pool_execution()
     test_statistics()
     test_task_with_dependencies()
+    test_dag_execution()
+    test_job_store_persistence()
+    test_distributed_queue()
+    test_module_isolation()
 
     print("\n🎉 所有测试通过！")